@@ -0,0 +1,89 @@
+import argparse
+import sys
+
+from server.models import db
+
+from . import kernel_benchmarks, server_benchmarks  # noqa: F401 registers benchmarks
+from .harness import BENCHMARKS, RunResults, compare, run_benchmarks, select_benchmarks
+
+
+def parse_thresholds(values: list[str]) -> dict[str, float]:
+    thresholds = {}
+    for value in values:
+        name, _, threshold = value.partition("=")
+        thresholds[name] = float(threshold)
+    return thresholds
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Run the Neptyne benchmarks and compare them against a baseline",
+    )
+    parser.add_argument(
+        "only",
+        nargs="*",
+        help="Groups (kernel, server) or benchmarks to run. Runs everything by default",
+    )
+    parser.add_argument("--list", action="store_true", help="List the benchmarks")
+    parser.add_argument("--output", "-o", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", "-b", help="Results file to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Allowed relative slowdown of a median before failing (default 0.25)",
+    )
+    parser.add_argument(
+        "--benchmark-threshold",
+        action="append",
+        default=[],
+        metavar="NAME=THRESHOLD",
+        help="Override --threshold for one measurement, e.g. server.kernel_startup=1",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Multiplier for the sheet sizes. Only compare runs with the same scale",
+    )
+    args = parser.parse_args()
+
+    if args.list:
+        for bench in BENCHMARKS:
+            print(f"{bench.group}.{bench.name}")
+        return 0
+
+    benchmarks = select_benchmarks(args.only)
+    if not benchmarks:
+        parser.error(f"No benchmarks match {args.only}")
+
+    db.configure_preset("sqlite")
+    db.create_all()
+
+    results = run_benchmarks(
+        benchmarks, repeat=args.repeat, scale=args.scale, warmup=args.warmup
+    )
+    if args.output:
+        results.save(args.output)
+
+    if args.baseline:
+        regressions = compare(
+            results,
+            RunResults.load(args.baseline),
+            args.threshold,
+            parse_thresholds(args.benchmark_threshold),
+        )
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterator
+
+RESULTS_VERSION = 1
+
+# A benchmark only counts as regressed if it got slower by both the relative threshold and
+# this many seconds, so that millisecond noise in fast benchmarks doesn't fail the run.
+MIN_REGRESSION_SECONDS = 0.005
+
+
+class Timer:
+    """Handed to a benchmark so it can time only the part it is interested in. Everything
+    outside of measure() is setup."""
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = {}
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        self.samples.setdefault(name, []).append(time.perf_counter() - start)
+
+
+BenchmarkFunction = Callable[[Timer, float], None]
+
+
+@dataclass
+class Benchmark:
+    group: str
+    name: str
+    func: BenchmarkFunction
+
+
+BENCHMARKS: list[Benchmark] = []
+
+
+def benchmark(group: str) -> Callable[[BenchmarkFunction], BenchmarkFunction]:
+    """Register a benchmark. It is called with a Timer and the scale factor for its sizes
+    and should time its interesting parts with timer.measure(name); the full name of a
+    measurement is group.name."""
+
+    def decorator(func: BenchmarkFunction) -> BenchmarkFunction:
+        BENCHMARKS.append(Benchmark(group, func.__name__, func))
+        return func
+
+    return decorator
+
+
+@dataclass
+class BenchmarkResult:
+    samples: list[float]
+    median: float = 0.0
+    min: float = 0.0
+    mean: float = 0.0
+    stdev: float = 0.0
+
+    def __post_init__(self) -> None:
+        self.median = statistics.median(self.samples)
+        self.min = min(self.samples)
+        self.mean = statistics.fmean(self.samples)
+        self.stdev = statistics.stdev(self.samples) if len(self.samples) > 1 else 0.0
+
+
+@dataclass
+class Regression:
+    name: str
+    baseline: float
+    current: float
+    threshold: float
+
+    @property
+    def change(self) -> float:
+        return self.current / self.baseline - 1
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name}: {self.baseline * 1000:.1f} ms -> {self.current * 1000:.1f} ms"
+            f" ({self.change:+.0%}, allowed {self.threshold:+.0%})"
+        )
+
+
+@dataclass
+class RunResults:
+    results: dict[str, BenchmarkResult]
+    scale: float
+    repeat: int
+    created: str = field(
+        default_factory=lambda: datetime.now(timezone.utc).isoformat(timespec="seconds")
+    )
+    machine: dict[str, Any] = field(default_factory=lambda: machine_info())
+    version: int = RESULTS_VERSION
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "RunResults":
+        if data.get("version") != RESULTS_VERSION:
+            raise ValueError(f"Unsupported results version {data.get('version')}")
+        return cls(
+            results={
+                name: BenchmarkResult(result["samples"])
+                for name, result in data["results"].items()
+            },
+            scale=data["scale"],
+            repeat=data["repeat"],
+            created=data["created"],
+            machine=data["machine"],
+        )
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write("\n")
+
+    @classmethod
+    def load(cls, path: str) -> "RunResults":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def machine_info() -> dict[str, Any]:
+    try:
+        git_sha = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except OSError:
+        git_sha = ""
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "git_sha": git_sha,
+    }
+
+
+def select_benchmarks(patterns: list[str] | None) -> list[Benchmark]:
+    if not patterns:
+        return list(BENCHMARKS)
+    return [
+        b
+        for b in BENCHMARKS
+        if any(
+            pattern in (b.group, b.name, f"{b.group}.{b.name}") for pattern in patterns
+        )
+    ]
+
+
+def run_benchmarks(
+    benchmarks: list[Benchmark],
+    *,
+    repeat: int,
+    scale: float,
+    warmup: int = 1,
+    log: Callable[[str], None] = print,
+) -> RunResults:
+    samples: dict[str, list[float]] = {}
+    for bench in benchmarks:
+        bench_samples: dict[str, list[float]] = {}
+        for i in range(warmup + repeat):
+            timer = Timer()
+            bench.func(timer, scale)
+            if i >= warmup:
+                for name, measured in timer.samples.items():
+                    bench_samples.setdefault(f"{bench.group}.{name}", []).extend(
+                        measured
+                    )
+        for name, measured in bench_samples.items():
+            log(f"{name:<40} {BenchmarkResult(measured).median * 1000:10.1f} ms")
+        samples.update(bench_samples)
+    return RunResults(
+        results={name: BenchmarkResult(s) for name, s in samples.items()},
+        scale=scale,
+        repeat=repeat,
+    )
+
+
+def compare(
+    current: RunResults,
+    baseline: RunResults,
+    threshold: float,
+    thresholds: dict[str, float] | None = None,
+) -> list[Regression]:
+    """Compare the medians of current against the baseline. thresholds can override the
+    allowed relative slowdown per benchmark."""
+    if current.scale != baseline.scale:
+        raise ValueError(
+            f"Baseline was recorded with scale {baseline.scale}, not {current.scale}"
+        )
+    thresholds = thresholds or {}
+    regressions = []
+    for name, result in current.results.items():
+        if (base := baseline.results.get(name)) is None:
+            continue
+        allowed = thresholds.get(name, threshold)
+        slowdown = result.median - base.median
+        if slowdown > MIN_REGRESSION_SECONDS and slowdown > base.median * allowed:
+            regressions.append(Regression(name, base.median, result.median, allowed))
+    return regressions
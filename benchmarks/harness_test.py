@@ -0,0 +1,67 @@
+import pytest
+
+from .harness import (
+    Benchmark,
+    BenchmarkResult,
+    RunResults,
+    Timer,
+    compare,
+    run_benchmarks,
+)
+
+
+def make_results(scale: float = 1.0, **medians: float) -> RunResults:
+    return RunResults(
+        results={name: BenchmarkResult([median]) for name, median in medians.items()},
+        scale=scale,
+        repeat=1,
+    )
+
+
+def test_run_benchmarks():
+    calls = []
+
+    def bench(timer: Timer, scale: float) -> None:
+        calls.append(scale)
+        with timer.measure("first"):
+            pass
+        with timer.measure("second"):
+            pass
+
+    results = run_benchmarks(
+        [Benchmark("group", "bench", bench)],
+        repeat=3,
+        scale=0.5,
+        warmup=1,
+        log=lambda _msg: None,
+    )
+    assert calls == [0.5] * 4
+    assert set(results.results) == {"group.first", "group.second"}
+    assert len(results.results["group.first"].samples) == 3
+
+
+def test_compare():
+    baseline = make_results(fast=0.001, slow=1.0, other=1.0)
+    current = make_results(fast=0.002, slow=1.3, other=1.1, new=5.0)
+
+    regressions = compare(current, baseline, threshold=0.25)
+    assert [r.name for r in regressions] == ["slow"]
+    assert regressions[0].change == pytest.approx(0.3)
+
+    assert compare(current, baseline, threshold=0.25, thresholds={"slow": 0.5}) == []
+    assert [r.name for r in compare(current, baseline, threshold=0.05)] == [
+        "slow",
+        "other",
+    ]
+
+    with pytest.raises(ValueError):
+        compare(make_results(scale=2.0, slow=1.0), baseline, threshold=0.25)
+
+
+def test_save_load(tmp_path):
+    path = str(tmp_path / "results.json")
+    results = make_results(a=0.5)
+    results.save(path)
+    loaded = RunResults.load(path)
+    assert loaded.results["a"].median == 0.5
+    assert loaded.machine == results.machine
@@ -0,0 +1,682 @@
+"""Benchmarks that drive a real Dash in an in-process kernel through the same message
+handling the server uses, by way of the kernel simulator from the tests."""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from functools import partial
+from http.server import (
+    BaseHTTPRequestHandler,
+    SimpleHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+from typing import Any, Iterator
+from unittest import mock
+
+import numpy as np
+from IPython.core.history import HistoryManager
+from IPython.core.interactiveshell import InteractiveShell
+from jupyter_client.utils import run_sync
+
+from neptyne_kernel import linter, spreadsheet_error
+from neptyne_kernel.cell_address import Address, Range
+from neptyne_kernel.expression_compiler import Dimension
+from neptyne_kernel.formulas.financial import ODDFYIELD, YIELD, price_terms, solve_yield
+from neptyne_kernel.formulas.text import TEXT
+from neptyne_kernel.formulas.text_formatter import formatter
+from neptyne_kernel.neptyne_protocol import (
+    CellChange,
+    InsertDeleteContent,
+    MessageTypes,
+    PopulateFrom,
+    RunCellsContent,
+    SheetAutofillContent,
+    SheetTransform,
+)
+from neptyne_kernel.tyne_model.cell import SheetCell
+from server.fake_executor import FakeExecutor
+from server.kernel_simulation_tests.kernel_simulator import Simulator
+from server.models import db
+from server.tyne_contents_manager import TyneContentsManager
+from server.tyne_storer import TyneStorer
+
+from .harness import Timer, benchmark
+
+GROUP = "kernel"
+
+ROWS = 1000
+COLS = 10
+# Compiling formulas dominates anything that touches them, so those sheets are smaller
+FORMULAS = 200
+SHEETS = 5
+
+
+def scaled(n: int, scale: float) -> int:
+    return max(1, round(n * scale))
+
+
+@contextmanager
+def simulator() -> Iterator[Simulator]:
+    instance = InteractiveShell._instance
+    InteractiveShell._instance = None
+    history_enabled = HistoryManager.enabled
+    HistoryManager.enabled = False
+    show_full_traceback = spreadsheet_error.SHOW_FULL_TRACEBACK
+    spreadsheet_error.SHOW_FULL_TRACEBACK = False
+    session = db.sessionmaker()
+    sim = Simulator(session, TyneStorer(FakeExecutor()))
+    try:
+        yield sim
+    finally:
+        sim.stop()
+        session.close()
+        InteractiveShell._instance = instance
+        HistoryManager.enabled = history_enabled
+        spreadsheet_error.SHOW_FULL_TRACEBACK = show_full_traceback
+
+
+def paste(sim: Simulator, cells: dict[Address, str]) -> None:
+    """Send cells to the kernel as one run_cells message, like a paste from the client."""
+    msg = sim.default_msg(
+        MessageTypes.RUN_CELLS.value,
+        content=RunCellsContent(
+            current_sheet=0,
+            to_run=[
+                CellChange(
+                    attributes=None,
+                    cell_id=address.to_float_coord(),
+                    content=code,
+                    mime_type=None,
+                )
+                for address, code in cells.items()
+            ],
+            notebook=False,
+            for_ai=False,
+            gs_mode=False,
+            ai_tables=None,
+            current_sheet_name="Sheet0",
+            sheet_ids_by_name={"Sheet0": 0},
+        ).to_dict(),
+    )
+    run_sync(sim.tyne_info.run_cells)(
+        msg, replier=sim.tyne_proxy, kernel_session=sim.simulator_session
+    )
+    sim.wait_for_kernel()
+
+
+class StubResearchProxy(BaseHTTPRequestHandler):
+    """Answers /research/value requests with the arguments, after some latency"""
+
+    latency = 0.02
+
+    def do_GET(self) -> None:
+        time.sleep(self.latency)
+        args = self.path.split("args=", 1)[1]
+        body = json.dumps({"value": args}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@contextmanager
+def research_proxy() -> Iterator[None]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubResearchProxy)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with (
+            tempfile.TemporaryDirectory() as cache_dir,
+            mock.patch.dict(
+                os.environ,
+                {
+                    "API_PROXY_HOST_PORT": f"127.0.0.1:{server.server_port}",
+                    "NEPTYNE_AI_CACHE_DIR": cache_dir,
+                    "NEPTYNE_API_TOKEN": "benchmark",
+                },
+            ),
+        ):
+            yield
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class QuietFileHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+
+@contextmanager
+def file_server(directory: str) -> Iterator[str]:
+    """Serves the files in directory with an empty HTTP cache, yielding the base URL"""
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(QuietFileHandler, directory=directory)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with (
+            tempfile.TemporaryDirectory() as cache_dir,
+            mock.patch.dict(os.environ, {"NEPTYNE_HTTP_CACHE_DIR": cache_dir}),
+        ):
+            yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def insert_delete(
+    sim: Simulator, sheet_transform: SheetTransform, dimension: Dimension, index: int
+) -> None:
+    msg = sim.default_msg(
+        MessageTypes.INSERT_DELETE_CELLS.value,
+        content=InsertDeleteContent(
+            amount=1,
+            boundary=None,
+            cells_to_populate=None,
+            dimension=dimension,
+            selected_index=index,
+            sheet_id=0,
+            sheet_transform=sheet_transform,
+        ).to_dict(),
+    )
+    run_sync(sim.tyne_proxy.handle_client_message)(sim.client_msg_context(msg))
+    sim.wait_for_kernel()
+
+
+def reopen(sim: Simulator) -> None:
+    """Like Simulator.restart, but without saving the kernel state first."""
+    sim.kernel_manager.restart_kernel()
+    sim.tyne_proxy = run_sync(TyneContentsManager(sim.tyne_store).get)(
+        sim.tyne_info.file_name,
+        sim.session,
+        user=mock.Mock(tyne_owner_id="neptyne", id=0, organization=None),
+    )
+    sim.tyne_info = sim.tyne_proxy.tyne_info
+    sim.init_and_patch(clear_state=False)
+
+
+def value_block(rows: int, cols: int, col_offset: int = 0) -> dict[Address, str]:
+    return {
+        Address(col + col_offset, row, 0): str(row * cols + col)
+        for row in range(rows)
+        for col in range(cols)
+    }
+
+
+def lookup_table(rows: int) -> dict[Address, str]:
+    cells = {}
+    for row in range(rows):
+        cells[Address(0, row, 0)] = str(row + 1)
+        cells[Address(1, row, 0)] = str((row * 7919) % 1000)
+    return cells
+
+
+@benchmark(GROUP)
+def paste_cells(timer: Timer, scale: float) -> None:
+    values = value_block(scaled(ROWS, scale), COLS)
+    formulas = {
+        Address(COLS, row, 0): f"=SUM(A{row + 1}:J{row + 1})"
+        for row in range(scaled(FORMULAS, scale))
+    }
+    with simulator() as sim:
+        with timer.measure("paste_values"):
+            paste(sim, values)
+        with timer.measure("paste_formulas"):
+            paste(sim, formulas)
+
+
+@benchmark(GROUP)
+def fill_down(timer: Timer, scale: float) -> None:
+    rows = scaled(FORMULAS, scale)
+    with simulator() as sim:
+        paste(sim, value_block(rows, 1))
+        sim.run_cell("B1", "=A1 * 2 + 1")
+        msg = sim.default_msg(
+            MessageTypes.SHEET_AUTOFILL.value,
+            content=SheetAutofillContent(
+                populate_from=[
+                    PopulateFrom(Address(1, 0, 0).to_float_coord(), "=A1 * 2 + 1")
+                ],
+                populate_to_start=Address(1, 1, 0).to_float_coord(),
+                populate_to_end=Address(1, rows - 1, 0).to_float_coord(),
+                autofill_context=[],
+                table=None,
+                to_fill=None,
+            ).to_dict(),
+        )
+        with timer.measure("fill_down"):
+            run_sync(sim.tyne_info.sheet_autofill)(
+                msg, kernel_session=sim.simulator_session
+            )
+            sim.wait_for_kernel()
+
+
+@benchmark(GROUP)
+def insert_delete_rows(timer: Timer, scale: float) -> None:
+    rows = scaled(FORMULAS, scale)
+    with simulator() as sim:
+        paste(sim, value_block(rows, 1))
+        paste(sim, {Address(1, row, 0): f"=A{row + 1} + 1" for row in range(rows)})
+        paste(sim, {Address(2, 0, 0): f"=SUM(B1:B{rows})"})
+        with timer.measure("insert_row"):
+            insert_delete(sim, SheetTransform.INSERT_BEFORE, Dimension.ROW, 0)
+        with timer.measure("delete_row"):
+            insert_delete(sim, SheetTransform.DELETE, Dimension.ROW, 0)
+
+
+@benchmark(GROUP)
+def recalc_lookups(timer: Timer, scale: float) -> None:
+    rows = scaled(ROWS, scale)
+    formulas = scaled(FORMULAS, scale)
+    with simulator() as sim:
+        paste(sim, lookup_table(rows))
+        sim.run_cell("D1", "1")
+        paste(
+            sim,
+            {
+                Address(4, i, 0): (
+                    f"=VLOOKUP(MOD(D1 + {i}, {rows}) + 1, A1:B{rows}, 2, FALSE)"
+                )
+                for i in range(formulas)
+            },
+        )
+        with timer.measure("recalc_lookups"):
+            sim.run_cell(
+                "D1",
+                "2",
+                expected_cells={"D1", *(f"E{i + 1}" for i in range(formulas))},
+            )
+
+
+@benchmark(GROUP)
+def recalc_aggregates(timer: Timer, scale: float) -> None:
+    rows = scaled(ROWS, scale)
+    formulas = scaled(FORMULAS, scale)
+    with simulator() as sim:
+        paste(sim, value_block(rows, 1))
+        paste(
+            sim,
+            {
+                Address(2, i, 0): f"=SUM(A1:A{rows}) + AVERAGE(A1:A{rows}) * {i}"
+                for i in range(formulas)
+            },
+        )
+        with timer.measure("recalc_aggregates"):
+            sim.run_cell(
+                "A1",
+                "-1",
+                expected_cells={"A1", *(f"C{i + 1}" for i in range(formulas))},
+            )
+
+
+@benchmark(GROUP)
+def save_load(timer: Timer, scale: float) -> None:
+    rows = scaled(ROWS, scale)
+    with simulator() as sim:
+        paste(sim, value_block(rows, COLS))
+        paste(
+            sim,
+            {
+                Address(COLS, row, 0): f"=SUM(A{row + 1}:J{row + 1})"
+                for row in range(scaled(FORMULAS, scale))
+            },
+        )
+        with timer.measure("save"):
+            sim.get_kernel_state()
+        with timer.measure("load"):
+            with db.sessionmaker() as session:
+                content = run_sync(sim.tyne_store.load)(
+                    sim.tyne_info.file_name, session
+                )
+        assert content.sheets.get(Address(COLS - 1, rows - 1, 0)) is not None
+
+
+@benchmark(GROUP)
+def open_multi_sheet(timer: Timer, scale: float) -> None:
+    """Time to interactive when reopening a tyne with several big sheets: restarting the
+    kernel and loading the tyne, the first edit on the first sheet and the first formula
+    reading from one of the other sheets."""
+    rows = scaled(ROWS, scale)
+    with simulator() as sim:
+        sim.repl_command("import neptyne as nt")
+        for i in range(1, SHEETS):
+            sim.repl_command(f"nt.sheets.new_sheet('Data{i}')")
+            sim.repl_command(
+                f"Data{i}!A1 = [[row * {COLS} + col for col in range({COLS})] "
+                f"for row in range({rows})]"
+            )
+        paste(sim, value_block(rows, COLS))
+        sim.get_kernel_state()
+        with timer.measure("open_tyne"):
+            reopen(sim)
+        with timer.measure("first_edit"):
+            sim.run_cell("A1", "-1")
+        with timer.measure("first_cross_sheet_read"):
+            sim.run_cell("M1", f"=SUM(Data{SHEETS - 1}!A1:A{rows})")
+        assert sim.get("M1") == sum(row * COLS for row in range(rows))
+
+
+@benchmark(GROUP)
+def text_formatting(timer: Timer, scale: float) -> None:
+    """TEXT() one cell at a time and format_array on a whole column, for number, percent,
+    currency and date formats."""
+    rng = np.random.default_rng(0)
+    numbers = rng.uniform(-1e6, 1e6, scaled(ROWS * 100, scale))
+    dates = rng.uniform(30000, 50000, len(numbers))
+    for name, format_str, values in (
+        ("number", "#,##0.00", numbers),
+        ("percent", "0%", numbers / 1e6),
+        ("currency", "[$$-409]#,##0.00;-[$$-409]#,##0.00", numbers),
+        ("date", "yyyy-mm-dd hh:mm", dates),
+    ):
+        cells = values.tolist()
+        with timer.measure(f"text_{name}"):
+            for value in cells:
+                TEXT(value, format_str)
+        with timer.measure(f"format_array_{name}"):
+            formatter.format_array(values, format_str)
+
+
+@benchmark(GROUP)
+def bond_yields(timer: Timer, scale: float) -> None:
+    """YIELD() and ODDFYIELD() one scenario at a time for a grid of bonds, and
+    solve_yield for a whole column of prices of one bond."""
+    rng = np.random.default_rng(0)
+    count = scaled(ROWS, scale)
+    settlements = [
+        date(2010, 1, 2) + timedelta(int(days)) for days in rng.integers(0, 3650, count)
+    ]
+    prices = rng.uniform(60, 140, count).tolist()
+    with timer.measure("yield"):
+        for settlement, pr in zip(settlements, prices):
+            YIELD(settlement, date(2039, 12, 31), 0.05, pr, 100, 2, 0)
+    with timer.measure("oddfyield"):
+        for settlement, pr in zip(settlements, prices):
+            ODDFYIELD(
+                settlement,
+                date(2039, 12, 31),
+                settlement - timedelta(30),
+                settlement + timedelta(90),
+                0.05,
+                pr,
+                100,
+                2,
+                0,
+            )
+    terms = price_terms(date(2010, 1, 2), date(2039, 12, 31), 0.05, 100, 2, 0)
+    column = rng.uniform(60, 140, count * 100)
+    with timer.measure("solve_yield"):
+        solve_yield(terms, column, 2, 0.05)
+
+
+@benchmark(GROUP)
+def lint_code_panel(timer: Timer, scale: float) -> None:
+    """Lint a code panel with many functions, then again after editing one of them."""
+    functions = [
+        f"def f{i}(a, b=1):\n"
+        f"    x = a + b + {i}\n"
+        f"    for row in range(x):\n"
+        f"        unused = row\n"
+        f"    return f{i - 1}(x) if a else x\n"
+        for i in range(scaled(FORMULAS, scale))
+    ]
+    code = "import math\n\n\n" + "\n\n".join(functions)
+    linter.definition_warnings.clear()
+    with timer.measure("lint"):
+        linter.check_warnings(code)
+    edited = code.replace("    x = a + b + 0\n", "    x = a + b\n    y = 0\n")
+    with timer.measure("lint_after_edit"):
+        linter.check_warnings(edited)
+
+
+@benchmark(GROUP)
+def redefine_function(timer: Timer, scale: float) -> None:
+    """Find the cells that call a function from the code panel when it is redefined,
+    in a tyne that was loaded with many formulas calling other functions."""
+    rows = scaled(ROWS * 10, scale)
+    with simulator() as sim:
+        dash = sim.get_dash()
+        addresses = [Address(col, row, 0) for row in range(rows) for col in range(COLS)]
+        dash.load_cells(
+            (
+                address,
+                SheetCell(
+                    address,
+                    output=address.row,
+                    raw_code=f"=helper{(address.row + address.column) % 100}(1)",
+                    compiled_code=f"helper{(address.row + address.column) % 100}(1)",
+                ),
+            )
+            for address in addresses
+        )
+        with timer.measure("find_callers_first"):
+            dash.process_function_changes(["helper0"])
+        with timer.measure("find_callers"):
+            dash.process_function_changes(["helper1"])
+
+
+@benchmark(GROUP)
+def unbounded_ranges(timer: Timer, scale: float) -> None:
+    """Resolve where whole-row and whole-column ranges end in a big sheet, the way a
+    formula referencing A:A or a loop reading one row at a time does."""
+    rows = scaled(ROWS * 10, scale)
+    lookups = scaled(FORMULAS, scale)
+    with simulator() as sim:
+        dash = sim.get_dash()
+        dash.load_cells(
+            (address, SheetCell(address, output=address.row))
+            for address in (
+                Address(col, row, 0) for row in range(rows) for col in range(COLS)
+            )
+        )
+        with timer.measure("whole_columns"):
+            for i in range(lookups):
+                col = i % COLS
+                dash.resolve_max_col_row(Range(col, col, 0, -1, 0))
+        with timer.measure("whole_rows"):
+            for i in range(lookups):
+                row = i * rows // lookups
+                dash.resolve_max_col_row(Range(0, -1, row, row, 0))
+
+
+@benchmark(GROUP)
+def ai_formulas(timer: Timer, scale: float) -> None:
+    """Recalculate a column of ai.value formulas against a research proxy that takes
+    20ms to answer, then again once the answers are cached."""
+    formulas = scaled(FORMULAS, scale)
+    with simulator() as sim, research_proxy():
+        from neptyne_kernel.neptyne_api.ai import ai
+
+        ai._payloads.clear()
+        sim.run_cell("D1", "1")
+        paste(
+            sim,
+            {
+                Address(1, row, 0): f'=ai.value("count", {row}, D1)'
+                for row in range(formulas)
+            },
+        )
+        expected_cells = {"D1", *(f"B{row + 1}" for row in range(formulas))}
+        with timer.measure("ai_formulas"):
+            sim.run_cell("D1", "2", expected_cells=expected_cells)
+        with timer.measure("ai_formulas_cached"):
+            sim.run_cell("D1", "1", expected_cells=expected_cells)
+
+
+@benchmark(GROUP)
+def geo_formulas(timer: Timer, scale: float) -> None:
+    """Recalculate geo formulas that each measure a point against the same range of
+    regions, after one of the regions changed."""
+    regions = scaled(ROWS // 5, scale)
+    formulas = scaled(FORMULAS, scale)
+    with simulator() as sim:
+        sim.repl_command("from shapely import Point, box")
+        sim.repl_command(
+            f'D1 = [["name", "shape"]] + [[f"r{{i}}", box(i / 10, 0, i / 10 + 0.05, 1)]'
+            f" for i in range({regions})]"
+        )
+        sim.repl_command(f"A1 = [Point(i / 100, 0.5) for i in range({formulas})]")
+        paste(
+            sim,
+            {
+                Address(1, row, 0): f"=min(geo.distance(A{row + 1}, D1:E{regions + 1}))"
+                for row in range(formulas)
+            },
+        )
+        with timer.measure("geo_formulas"):
+            sim.run_cell(
+                "D2",
+                "first",
+                expected_cells={"D2", *(f"B{row + 1}" for row in range(formulas))},
+            )
+
+
+@benchmark(GROUP)
+def range_arithmetic(timer: Timer, scale: float) -> None:
+    """Multiply two long columns and compare the products against a threshold, the way a
+    formula like =A1:A100000 * B1:B100000 > 5 does."""
+    rows = scaled(ROWS * 100, scale)
+    with simulator() as sim:
+        sim.get_dash().load_cells(
+            (address, SheetCell(address, output=address.row / (address.column + 1)))
+            for address in (
+                Address(col, row, 0) for row in range(rows) for col in range(2)
+            )
+        )
+        with timer.measure("range_arithmetic"):
+            sim.repl_command(f"mask = A1:A{rows} * B1:B{rows} > 5")
+
+
+@benchmark(GROUP)
+def sort_filter_rows(timer: Timer, scale: float) -> None:
+    """Sort a wide table by two of its columns, then filter it and drop duplicate rows in
+    place from the REPL."""
+    rows = scaled(ROWS * 100, scale)
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 1000, size=(rows, COLS)).tolist()
+    with simulator() as sim:
+        sim.get_dash().load_cells(
+            (address, SheetCell(address, output=data[address.row][address.column]))
+            for address in (
+                Address(col, row, 0) for row in range(rows) for col in range(COLS)
+            )
+        )
+        table = f"A1:J{rows}"
+        with timer.measure("sort_rows"):
+            sim.repl_command(f"{table}.sort_rows([2, 0])")
+        with timer.measure("filter_rows"):
+            sim.repl_command(f"{table}.filter_rows(A1:A{rows} > 500)")
+        with timer.measure("unique_rows"):
+            sim.repl_command(f"{table}.unique_rows(by_column=1)")
+
+
+@benchmark(GROUP)
+def data_csv(timer: Timer, scale: float) -> None:
+    """Import a big CSV file from a local web server with data.csv, then again the way a
+    recalculation does, and preview its first rows."""
+    rows = scaled(ROWS * 100, scale)
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "big.csv"), "w") as f:
+            f.write(",".join(f"c{col}" for col in range(COLS)) + "\n")
+            for row in range(rows):
+                f.write(",".join(str(row * col) for col in range(COLS)) + "\n")
+        with simulator() as sim, file_server(directory) as base_url:
+            from neptyne_kernel import http_cache
+
+            http_cache._parsed.clear()
+            sim.repl_command("from neptyne_kernel.neptyne_api import data")
+            with timer.measure("data_csv"):
+                sim.repl_command(f'df = data.csv("{base_url}/big.csv")')
+            with timer.measure("data_csv_cached"):
+                sim.repl_command(f'df = data.csv("{base_url}/big.csv")')
+            with timer.measure("data_csv_preview"):
+                sim.repl_command(f'df = data.csv("{base_url}/big.csv", nrows=100)')
+
+
+@benchmark(GROUP)
+def range_to_dataframe(timer: Timer, scale: float) -> None:
+    """Convert a wide table of numbers, labels and blanks to a DataFrame, in one go and in
+    chunks, the way to_dataframe() does in a formula or the REPL."""
+    rows = scaled(ROWS * 100, scale)
+    labels = ["north", "south", "east", "west"]
+
+    def value(address: Address) -> Any:
+        if address.row == 0:
+            return f"c{address.column}"
+        if address.column % 3 == 1:
+            return labels[address.row % 4]
+        return address.row * (address.column + 1)
+
+    with simulator() as sim:
+        # Every tenth row of every third column is blank:
+        sim.get_dash().load_cells(
+            (address, SheetCell(address, output=value(address)))
+            for address in (
+                Address(col, row, 0) for row in range(rows) for col in range(COLS)
+            )
+            if address.column % 3 != 2 or address.row % 10 != 5
+        )
+        table = f"A1:J{rows}"
+        with timer.measure("to_dataframe"):
+            sim.repl_command(f"df = {table}.to_dataframe()")
+        with timer.measure("to_dataframe_nullable"):
+            sim.repl_command(
+                f'df = {table}.to_dataframe(dtype_backend="numpy_nullable")'
+            )
+        with timer.measure("to_dataframe_chunks"):
+            sim.repl_command(
+                f"rows = sum(len(chunk) for chunk in {table}.to_dataframe(chunksize=10000))"
+            )
+
+
+@benchmark(GROUP)
+def streaming_updates(timer: Timer, scale: float) -> None:
+    """A feed that rewrites a table of prices from a background thread a number of times,
+    with only some of the prices changed each time, and the flushes that send them."""
+    rows = scaled(ROWS, scale)
+    ticks = 20
+    rng = np.random.default_rng(0)
+    prices = rng.uniform(10, 1000, size=(rows, COLS)).round(2)
+    with simulator() as sim:
+        dash = sim.get_dash()
+        dash[Address(0, 0, 0)] = prices.tolist()
+        dash.flush_dirty_cells_now()
+        for tick in range(ticks):
+            prices[:, tick % COLS] = rng.uniform(10, 1000, size=rows).round(2)
+            with timer.measure("stream_tick"):
+                dash[Address(0, 0, 0)] = prices.tolist()
+                dash.flush_dirty_cells_now()
+
+
+@benchmark(GROUP)
+def ai_tables(timer: Timer, scale: float) -> None:
+    """Find the tables of a sheet to tell the AI about, with a note far below them, and
+    again for a second prompt on the unchanged sheet."""
+    rows = scaled(ROWS * 10, scale)
+    with simulator() as sim:
+        dash = sim.get_dash()
+        dash.load_cells(
+            (address, SheetCell(address, output=value))
+            for table in range(3)
+            for address, value in (
+                (
+                    Address(table * (COLS + 1) + col, row, 0),
+                    f"c{col}" if row == 0 else row * col,
+                )
+                for row in range(rows)
+                for col in range(COLS)
+            )
+        )
+        note = Address(COLS, 1_000_000, 0)
+        dash.load_cells([(note, SheetCell(note, output="note"))])
+        with timer.measure("ai_tables"):
+            dash.compute_ai_tables()
+        with timer.measure("ai_tables_cached"):
+            dash.compute_ai_tables()
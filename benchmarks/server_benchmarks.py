@@ -0,0 +1,304 @@
+"""Benchmarks that run the Tornado app on a local port against SQLite, with kernels started
+by the local provisioner, and talk to it over HTTP and websockets like a browser would."""
+
+import asyncio
+import json
+import shutil
+import tempfile
+from io import BytesIO
+from typing import Any, Awaitable, Callable
+from unittest import mock
+from uuid import uuid4
+
+import openpyxl
+import tornado.websocket
+from tornado.httpclient import AsyncHTTPClient, HTTPResponse
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+
+from neptyne_kernel.cell_address import Address
+from neptyne_kernel.neptyne_protocol import CellChange, MessageTypes, RunCellsContent
+from neptyne_kernel.packed_cells import unpack_cell_updates
+from server import application
+from server.fake_executor import FakeExecutor
+from server.messages import HEADER_TAG, MSG_TYPE_TAG
+from server.models import APIKey, FirebaseUser, Tyne, User, db
+from server.tyne_contents_manager import TyneContentsManager
+from server.tyne_handler import REMOTE_TYNE_KEY
+from server.tyne_storer import TyneStorer
+from server.websocket_fanout import deserialize_binary_message
+
+from .harness import Timer, benchmark
+
+GROUP = "server"
+
+XLSX_ROWS = 2000
+XLSX_COLS = 10
+RANGE_READS = 20
+SESSIONS = 20
+BURST_ROWS = 2000
+BURST_COLS = 10
+
+BENCHMARK_USER = User(
+    id=0,
+    tyne_owner_id=0,
+    firebase_users=[FirebaseUser(firebase_uid="0")],
+    organization=None,
+)
+
+
+def scaled(n: int, scale: float) -> int:
+    return max(1, round(n * scale))
+
+
+class BenchmarkServer:
+    def __init__(self) -> None:
+        self.tmpdir = tempfile.mkdtemp()
+        self.tyne_contents_manager = TyneContentsManager(TyneStorer(FakeExecutor()))
+        app, self.kernel_manager = application.create_neptyne_app(
+            self.tyne_contents_manager, self.tmpdir, db
+        )
+        sock, self.port = bind_unused_port()
+        self.http_server = HTTPServer(app)
+        self.http_server.add_sockets([sock])
+        self.client = AsyncHTTPClient()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    async def fetch(self, path: str, **kwargs: Any) -> HTTPResponse:
+        headers = kwargs.pop("headers", {})
+        headers["Authorization"] = "Bearer 0"
+        return await self.client.fetch(
+            self.url(path), headers=headers, request_timeout=300, **kwargs
+        )
+
+    async def close(self) -> None:
+        self.http_server.stop()
+        await self.tyne_contents_manager.disconnect_tynes()
+        shutil.rmtree(self.tmpdir)
+
+
+def run_server_benchmark(
+    body: Callable[[BenchmarkServer], Awaitable[None]],
+) -> None:
+    async def run() -> None:
+        server = BenchmarkServer()
+        try:
+            await body(server)
+        finally:
+            await server.close()
+
+    with mock.patch("server.users._authenticate_request", return_value=BENCHMARK_USER):
+        asyncio.run(run())
+
+
+def xlsx_fixture(rows: int, cols: int) -> bytes:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row in range(1, rows + 1):
+        ws.append([row * cols + col for col in range(cols)])
+        ws.cell(row, cols + 1, f"=SUM(A{row}:{ws.cell(row, cols).column_letter}{row})")
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def multipart_body(field: str, file_name: str, contents: bytes, boundary: str) -> bytes:
+    return b"\r\n".join(
+        [
+            f"--{boundary}".encode(),
+            f'Content-Disposition: form-data; name="{field}"; filename="{file_name}"'.encode(),
+            b"Content-Type: application/octet-stream",
+            b"",
+            contents,
+            f"--{boundary}--".encode(),
+            b"",
+        ]
+    )
+
+
+async def import_xlsx(server: BenchmarkServer, contents: bytes) -> str:
+    boundary = uuid4().hex
+    response = await server.fetch(
+        "/api/tyne_import",
+        method="POST",
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        body=multipart_body("notebook", "benchmark.xlsx", contents, boundary),
+    )
+    return json.loads(response.body)[REMOTE_TYNE_KEY]["file_name"]
+
+
+@benchmark(GROUP)
+def xlsx_import_export(timer: Timer, scale: float) -> None:
+    contents = xlsx_fixture(scaled(XLSX_ROWS, scale), XLSX_COLS)
+
+    async def body(server: BenchmarkServer) -> None:
+        with timer.measure("xlsx_import"):
+            file_name = await import_xlsx(server, contents)
+        with timer.measure("xlsx_export"):
+            response = await server.fetch(f"/api/tyne_download/{file_name}/xlsx")
+        assert response.body
+
+    run_server_benchmark(body)
+
+
+@benchmark(GROUP)
+def api_range_reads(timer: Timer, scale: float) -> None:
+    rows = scaled(XLSX_ROWS, scale)
+    contents = xlsx_fixture(rows, XLSX_COLS)
+
+    async def body(server: BenchmarkServer) -> None:
+        file_name = await import_xlsx(server, contents)
+        api_key = str(uuid4())
+        with db.sessionmaker() as session:
+            tyne = session.query(Tyne).filter_by(file_name=file_name).one()
+            session.add(APIKey(user_id=0, tyne_id=tyne.id, key=api_key))
+            session.commit()
+
+        with timer.measure("api_range_reads"):
+            for _ in range(RANGE_READS):
+                response = await server.fetch(
+                    f"/api/v1/tynes/{file_name}?range=A1:K{rows}&apiKey={api_key}"
+                )
+                assert len(json.loads(response.body)) == rows
+
+    run_server_benchmark(body)
+
+
+def run_cell_msg(address: Address, code: str) -> dict[str, Any]:
+    return {
+        "header": {
+            "msg_id": str(uuid4()),
+            "msg_type": MessageTypes.RUN_CELLS.value,
+            "username": "",
+            "session": "",
+            "date": "",
+            "version": "5.2",
+        },
+        "parent_header": {},
+        "metadata": {"sheetId": 0},
+        "content": RunCellsContent(
+            current_sheet=0,
+            to_run=[
+                CellChange(
+                    attributes=None,
+                    cell_id=address.to_float_coord(),
+                    content=code,
+                    mime_type=None,
+                )
+            ],
+            notebook=False,
+            for_ai=False,
+            gs_mode=False,
+            ai_tables=None,
+            current_sheet_name="Sheet0",
+            sheet_ids_by_name={"Sheet0": 0},
+        ).to_dict(),
+        "buffers": [],
+        "channel": "shell",
+    }
+
+
+class WebsocketSession:
+    def __init__(self) -> None:
+        self.connected = asyncio.Event()
+        self.updated: set[tuple[float, ...]] = set()
+        self.update_event = asyncio.Event()
+        self.ws: tornado.websocket.WebSocketClientConnection | None = None
+
+    async def connect(self, server: BenchmarkServer, file_name: str) -> None:
+        def on_message(raw: str | bytes | None) -> None:
+            if raw is None:
+                return
+            self.connected.set()
+            if isinstance(raw, bytes):
+                msg = deserialize_binary_message(raw)
+            else:
+                msg = json.loads(raw)
+            if msg[HEADER_TAG][MSG_TYPE_TAG] == MessageTypes.SHEET_UPDATE.value:
+                cells = msg["content"]["cellUpdates"]
+                if packed_cells := msg["content"].get("packedCells"):
+                    cells += unpack_cell_updates(packed_cells, msg["buffers"][0])
+                for cell in cells:
+                    cell_id = cell["cellId"] if isinstance(cell, dict) else cell[0]
+                    self.updated.add(tuple(cell_id))
+                self.update_event.set()
+
+        self.ws = await tornado.websocket.websocket_connect(
+            f"ws://127.0.0.1:{server.port}/ws/0/api/kernels/{file_name}/channels",
+            on_message_callback=on_message,
+            # Like browsers, which all ask for permessage-deflate:
+            compression_options={},
+        )
+        await self.ws.write_message(
+            json.dumps(
+                {
+                    "header": {"msg_type": MessageTypes.AUTH_REPLY.value},
+                    "content": {"token": "auth-token", "projectId": None},
+                }
+            )
+        )
+        await self.connected.wait()
+
+    async def wait_for_update(self, address: Address) -> None:
+        cell_id = tuple(address.to_float_coord())
+        while cell_id not in self.updated:
+            self.update_event.clear()
+            await self.update_event.wait()
+
+    def close(self) -> None:
+        if self.ws:
+            self.ws.close()
+
+
+@benchmark(GROUP)
+def websocket_sessions(timer: Timer, scale: float) -> None:
+    sessions_count = scaled(SESSIONS, scale)
+
+    async def body(server: BenchmarkServer) -> None:
+        with db.sessionmaker() as session:
+            file_name = (
+                await server.tyne_contents_manager.new_tyne(session, BENCHMARK_USER)
+            ).tyne_model.file_name
+
+        first = WebsocketSession()
+        with timer.measure("kernel_startup"):
+            await first.connect(server, file_name)
+        sessions = [WebsocketSession() for _ in range(sessions_count)]
+        try:
+            with timer.measure("connect_sessions"):
+                await asyncio.gather(*(s.connect(server, file_name) for s in sessions))
+
+            address = Address(0, 0, 0)
+            assert first.ws is not None
+            with timer.measure("broadcast_update"):
+                await first.ws.write_message(
+                    json.dumps(run_cell_msg(address, "=1 + 1"))
+                )
+                await asyncio.wait_for(
+                    asyncio.gather(*(s.wait_for_update(address) for s in sessions)),
+                    60,
+                )
+
+            rows = scaled(BURST_ROWS, scale)
+            last = Address(BURST_COLS - 1, rows, 0)
+            with timer.measure("broadcast_burst"):
+                await first.ws.write_message(
+                    json.dumps(
+                        run_cell_msg(
+                            Address(0, 1, 0),
+                            f"=[[r * {BURST_COLS} + c for c in range({BURST_COLS})]"
+                            f" for r in range({rows})]",
+                        )
+                    )
+                )
+                await asyncio.wait_for(
+                    asyncio.gather(*(s.wait_for_update(last) for s in sessions)),
+                    120,
+                )
+        finally:
+            for s in [first, *sessions]:
+                s.close()
+
+    run_server_benchmark(body)
@@ -1,5 +1,5 @@
 import { KernelMessage } from "@jupyterlab/services";
-import { processCondensedMessages } from "./KernelSession";
+import { processCondensedMessages, unpackSheetUpdate } from "./KernelSession";
 import { JSONObject } from "@lumino/coreutils";
 import { v4 as uuid } from "uuid";
 import { MessageTypes } from "./NeptyneProtocol";
@@ -86,3 +86,31 @@ test("Condensed Message Processing", () => {
 
   expect((reduced[1].content as any).cellUpdates[0][1]).toEqual("een");
 });
+
+test("Unpacking packed cells", () => {
+  const values = new Float64Array([1, 2.5, -3, 4, 5, 6]);
+  const msg = createMsg(
+    MessageTypes.SheetUpdate,
+    {},
+    {
+      cellUpdates: [simpleCell(0, "een")],
+      packedCells: [
+        [0, 1, 1, 2, 2],
+        [1, 0, 0, 1, 2],
+      ],
+    }
+  );
+  msg.buffers = [new DataView(values.buffer)];
+  unpackSheetUpdate(msg);
+
+  expect((msg.content as any).packedCells).toBeUndefined();
+  expect((msg.content as any).cellUpdates).toEqual([
+    simpleCell(0, "een"),
+    [[1, 1, 0], 1],
+    [[2, 1, 0], 2.5],
+    [[1, 2, 0], -3],
+    [[2, 2, 0], 4],
+    [[0, 0, 1], 5],
+    [[0, 1, 1], 6],
+  ]);
+});
@@ -43,6 +43,7 @@ import {
   RemoteSheet,
   RemoteSheetCell,
   RemoteTyne,
+  SimpleSheetCell,
 } from "./neptyne-container/NeptyneContainer";
 import { NBCell } from "./notebook/NeptyneNotebook";
 import { getGSheetAppConfig } from "./gsheet_app_config";
@@ -138,6 +139,33 @@ function remoteCellsForSheetUpdate(msg: KernelMessage.IMessage) {
   return (msg.content as SheetUpdateContent).cellUpdates as RemoteSheetCell[];
 }
 
+/**
+ * Turns the packed numbers of a sheet update back into cell updates. Each block of
+ * packedCells is [sheet, col, row, width, height] and takes the next width * height
+ * float64s of the message's first buffer, row by row.
+ */
+export function unpackSheetUpdate(msg: KernelMessage.IMessage) {
+  const content = msg.content as SheetUpdateContent;
+  if (!content.packedCells) {
+    return;
+  }
+  const buffer = msg.buffers![0];
+  const view = ArrayBuffer.isView(buffer)
+    ? new DataView(buffer.buffer, buffer.byteOffset, buffer.byteLength)
+    : new DataView(buffer);
+  const cellUpdates = content.cellUpdates as SimpleSheetCell[];
+  let i = 0;
+  for (const [sheet, col, row, width, height] of content.packedCells) {
+    for (let r = row; r < row + height; r++) {
+      for (let c = col; c < col + width; c++) {
+        cellUpdates.push([[c, r, sheet], view.getFloat64(i * 8, true)]);
+        i++;
+      }
+    }
+  }
+  delete content.packedCells;
+}
+
 export function processCondensedMessages(
   queue: KernelMessage.IMessage[],
   processMessage: (msg: KernelMessage.IMessage) => void
@@ -351,6 +379,9 @@ export class KernelSession {
     if (this.timeoutId) {
       clearTimeout(this.timeoutId);
     }
+    if ((msg.header.msg_type as string) === MessageTypes.SheetUpdate) {
+      unpackSheetUpdate(msg);
+    }
     this.queue.push(msg);
     this.timeoutId = setTimeout(() => {
       this.timeoutId = undefined;
@@ -187,6 +187,7 @@ export enum MessageTypes {
   InsertDeleteCellsReply = "insert_delete_cells_reply",
   InstallRequirements = "install_requirements",
   InterruptKernel = "interrupt_kernel",
+  KernelMetrics = "kernel_metrics",
   Linter = "linter",
   LogEvent = "log_event",
   NavigateTo = "navigate_to",
@@ -321,6 +322,7 @@ export interface RerunCellsContent {
 
 export interface SheetUpdateContent {
   cellUpdates: any[];
+  packedCells?: number[][];
 }
 
 export interface TynePropertyUpdateContentChange {
@@ -495,6 +497,16 @@ export interface TickReplyContent {
   expressions: string[];
 }
 
+// Sent by the kernel every so often with the counts since the previous report. Handled by the
+// server and never forwarded to clients.
+export interface KernelMetricsContent {
+  cellsEvaluated: number;
+  // Number of recalculations that needed that many cascades, indexed by cascade depth
+  cascadeDepthCounts: number[];
+  flushes: number;
+  flushedCells: number;
+}
+
 export interface OrganizationCreateContent {
   name: string;
   domain?: string;
@@ -1,20 +1,82 @@
 import json
 import re
-from dataclasses import dataclass, replace
-from typing import Any, Iterator, Union
+from dataclasses import dataclass, field, replace
+from typing import Any, Iterator, Mapping, TypeVar, Union
 
 CoordAddr = tuple[int, int, int]
+T = TypeVar("T")
 
 
-@dataclass(frozen=True, slots=True)
+# Cell addresses are packed into one integer, column in the low bits, then the row, then the
+# sheet. This fits in 64 bits for sheet ids below 256.
+COLUMN_BITS = 24
+ROW_BITS = 32
+_COLUMN_MASK = (1 << COLUMN_BITS) - 1
+_ROW_MASK = (1 << ROW_BITS) - 1
+_SHEET_SHIFT = COLUMN_BITS + ROW_BITS
+
+
+def pack_address(column: int, row: int, sheet: int) -> int:
+    if not (0 <= column <= _COLUMN_MASK and 0 <= row <= _ROW_MASK and sheet >= 0):
+        raise ValueError(f"Can't pack address {(column, row, sheet)}")
+    return (sheet << _SHEET_SHIFT) | (row << COLUMN_BITS) | column
+
+
+def unpack_address(key: int) -> CoordAddr:
+    return key & _COLUMN_MASK, (key >> COLUMN_BITS) & _ROW_MASK, key >> _SHEET_SHIFT
+
+
+@dataclass(frozen=True, slots=True, init=False, eq=False)
 class Address:
     """Address points to a cell within a sheet. It can be parsed from A1 notation, but always
     refers to a specific sheet by unique ID, so will infer the default sheet ID if none is
-    specified. It is a frozen dataclass so that it can be used as a key in the Dash map"""
+    specified. It is immutable so that it can be used as a key in the Dash map; hashing and
+    equality go through the packed integer form of the address (see pack_address)"""
 
     column: int
     row: int
     sheet: int
+    _key: int | CoordAddr = field(repr=False, init=False)
+
+    def __init__(self, column: int, row: int, sheet: int) -> None:
+        # quicktype/json round trips can make floats out of ints. Ensure this class always uses
+        # ints.
+        if column.__class__ is not int:
+            column = int(column)
+        if row.__class__ is not int:
+            row = int(row)
+        if sheet.__class__ is not int:
+            sheet = int(sheet)
+        # we need object.__setattr__ because this is a frozen dataclass
+        setattr_ = object.__setattr__
+        setattr_(self, "column", column)
+        setattr_(self, "row", row)
+        setattr_(self, "sheet", sheet)
+        if 0 <= column <= _COLUMN_MASK and 0 <= row <= _ROW_MASK and sheet >= 0:
+            setattr_(
+                self, "_key", (sheet << _SHEET_SHIFT) | (row << COLUMN_BITS) | column
+            )
+        else:
+            setattr_(self, "_key", (column, row, sheet))
+
+    def __hash__(self) -> int:
+        return hash(self._key)
+
+    def __eq__(self, other: Any) -> bool:
+        if other.__class__ is Address:
+            return self._key == other._key
+        return NotImplemented
+
+    @property
+    def key(self) -> int:
+        """The address packed into one integer"""
+        if isinstance(self._key, tuple):
+            raise ValueError(f"Can't pack address {self._key}")
+        return self._key
+
+    @classmethod
+    def from_key(cls, key: int) -> "Address":
+        return cls(*unpack_address(key))
 
     @classmethod
     def from_r1c1(cls, r1c1: str, sheet: int = 0) -> "Address":
@@ -95,13 +157,30 @@ class Address:
             other.row,
         )
 
-    def __post_init__(self) -> None:
-        # quicktype/json round trips can make floats out of ints. Ensure this class always uses
-        # ints.
-        # we need object.__setattr__ because this is a frozen dataclass
-        object.__setattr__(self, "column", int(self.column))
-        object.__setattr__(self, "row", int(self.row))
-        object.__setattr__(self, "sheet", int(self.sheet))
+
+class AddressInterner:
+    """Hands out one shared Address per cell, keyed by its packed form. Loading a tyne mentions
+    the same address many times (as a key, in depends_on and feeds_into of its neighbours),
+    so sharing the instances saves both the memory and the time to construct them."""
+
+    def __init__(self) -> None:
+        self.addresses: dict[int, Address] = {}
+
+    def __call__(self, address: Address) -> Address:
+        if isinstance(key := address._key, tuple):
+            return address
+        return self.addresses.setdefault(key, address)
+
+    def from_coord(self, coord: CoordAddr | list[int]) -> Address:
+        column, row, sheet = coord
+        try:
+            key = pack_address(column, row, sheet)
+        except ValueError:
+            return Address(column, row, sheet)
+        address = self.addresses.get(key)
+        if address is None:
+            address = self.addresses[key] = Address(column, row, sheet)
+        return address
 
 
 @dataclass(frozen=True)
@@ -329,6 +408,35 @@ def replace_negative_bounds_with_grid_size(
     return replace(src_range, max_col=max_col, max_row=max_row)
 
 
+def items_in_range(
+    mapping: Mapping[Address, T], cell_range: Range
+) -> Iterator[tuple[Address, T]]:
+    """The entries of mapping within the bounded cell_range. Unless the range is small next
+    to the mapping, going over all entries is cheaper than making an Address for every
+    cell of the range."""
+    min_col, max_col, min_row, max_row, sheet = (
+        cell_range.min_col,
+        cell_range.max_col,
+        cell_range.min_row,
+        cell_range.max_row,
+        cell_range.sheet,
+    )
+    if len(mapping) < 4 * (max_col - min_col + 1) * (max_row - min_row + 1):
+        for address, value in mapping.items():
+            if (
+                min_row <= address.row <= max_row
+                and min_col <= address.column <= max_col
+                and address.sheet == sheet
+            ):
+                yield address, value
+    else:
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                address = Address(col, row, sheet)
+                if address in mapping:
+                    yield address, mapping[address]
+
+
 def format_cell(*args: Any, **kwargs: Any) -> str:
     """Converts a pair of integers into an A1 notation cell reference."""
     if len(args) == 2:
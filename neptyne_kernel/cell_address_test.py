@@ -1,6 +1,16 @@
+import pickle
+from dataclasses import replace
+
 import pytest
 
-from .cell_address import Address, Range
+from .cell_address import (
+    Address,
+    AddressInterner,
+    Range,
+    pack_address,
+    unpack_address,
+)
+from .tyne_model.sheet import TyneSheets
 
 
 @pytest.mark.parametrize(
@@ -51,3 +61,82 @@ def test_contains(outer, inner, result):
 def test_intersects(r1, r2, result):
     assert r1.intersects(r2) == result
     assert r2.intersects(r1) == result
+
+
+@pytest.mark.parametrize(
+    "coord",
+    [(0, 0, 0), (25, 999, 3), (2**24 - 1, 2**32 - 1, 7), (1, 2, 2**20)],
+)
+def test_pack_address_roundtrip(coord):
+    key = pack_address(*coord)
+    assert unpack_address(key) == coord
+    address = Address(*coord)
+    assert address.key == key
+    assert Address.from_key(key) == address
+    assert hash(Address.from_key(key)) == hash(address)
+
+
+def test_pack_address_out_of_range():
+    with pytest.raises(ValueError):
+        pack_address(2**24, 0, 0)
+    with pytest.raises(ValueError):
+        pack_address(0, -1, 0)
+    big = Address(0, 2**32, 0)
+    assert big == Address(0, 2**32, 0)
+    assert big != Address(0, 0, 1)
+    with pytest.raises(ValueError):
+        big.key
+
+
+def test_address_value_semantics():
+    a = Address(1, 2, 3)
+    assert a == Address(1.0, 2, 3)  # type: ignore
+    assert a != Address(2, 1, 3)
+    assert a != (1, 2, 3)
+    assert replace(a, row=5) == Address(1, 5, 3)
+    assert pickle.loads(pickle.dumps(a)) == a
+    assert {a: 1}[Address(1, 2, 3)] == 1
+    assert sorted([Address(0, 0, 1), Address(1, 0, 0), Address(0, 1, 0)]) == [
+        Address(0, 1, 0),
+        Address(1, 0, 0),
+        Address(0, 0, 1),
+    ]
+
+
+def test_address_interner_shares_instances():
+    interner = AddressInterner()
+    a = interner(Address(1, 2, 0))
+    assert interner(Address(1, 2, 0)) is a
+    assert interner.from_coord((1, 2, 0)) is a
+    assert interner.from_coord([1, 3, 0]) == Address(1, 3, 0)
+
+    sheets = TyneSheets.from_dict(
+        {
+            "sheets": [
+                {
+                    "id": 0,
+                    "name": "Sheet0",
+                    "cells": [
+                        {
+                            "cell_id": [0, 0, 0],
+                            "outputs": None,
+                            "feeds_into": [[0, 1, 0]],
+                        },
+                        {
+                            "cell_id": [0, 1, 0],
+                            "outputs": None,
+                            "depends_on": [[0, 0, 0]],
+                        },
+                    ],
+                    "attributes": {},
+                    "grid_size": [10, 10],
+                }
+            ],
+            "next_sheet_id": 1,
+        }
+    )
+    cells = sheets.sheets[0].cells
+    a1 = cells[Address(0, 0, 0)]
+    a2 = cells[Address(0, 1, 0)]
+    assert next(iter(a2.depends_on)) is a1.cell_id
+    assert next(iter(a1.feeds_into)) is a2.cell_id
@@ -31,16 +31,25 @@ class CellExecutionGraph:
         to_process = set(cell_ids)
         while to_process:
             next_cell = to_process.pop()
+            # Cascading into a sheet that hasn't been loaded yet needs its part of the graph
+            dash.cells.hydrate(next_cell.sheet)
             if next_cell not in graph:
                 graph[next_cell] = []
             # Resolve the graph, but skip anything that is calculated by the to_process we are getting
             # the graph for since we will override those connections. This allows local self reference,
             # i.e. you can put a formula in A1 that reads and writes from a range starting in A1
 
+            # Cells spilled into that nothing depends on have nothing to run, so leave
+            # them out rather than adding every cell of a big spill to the graph:
             feeds_into = [
                 cell
                 for cell in dash.graph.feeds_into.get(next_cell, ())
                 if dash.graph.calculated_by.get(next_cell) != cell
+                and (
+                    dash.graph.calculated_by.get(cell) != next_cell
+                    or dash.graph.feeds_into.get(cell)
+                    or cell in cell_ids
+                )
             ]
             to_process.update(cell for cell in feeds_into if cell not in graph)
             for c in feeds_into:
@@ -79,15 +88,22 @@ class CellExecutionGraph:
             self.pre_clear_op = None
         for cell_run in self.ts.get_ready():
             compiled_code = self.dash.get_or_create_cell_meta(cell_run).compiled_code
-            calculated_by_to_clear = self.dash.cells_calculated_by(cell_run)
             if compiled_code:
-                if op := self.process_clear_statements(calculated_by_to_clear):
-                    statements.append(op)
+                # A spill of known extent is overwritten in place, and set_item clears
+                # only the cells it no longer covers:
+                if not self.spills_in_place(cell_run):
+                    if op := self.process_clear_statements(
+                        self.dash.cells_calculated_by(cell_run)
+                    ):
+                        statements.append(op)
                 statements.append(ExecOp(cell_run, compiled_code))
             else:
                 # If we evaluated an origin cell and it no longer has code, we need to clear it:
                 if cell_run in self.cell_ids and not compiled_code:
-                    if op := self.process_clear_statements(calculated_by_to_clear):
+                    self.dash.graph.spill_regions.pop(cell_run, None)
+                    if op := self.process_clear_statements(
+                        self.dash.cells_calculated_by(cell_run)
+                    ):
                         statements.append(op)
                     statements.append(ClearOp([cell_run]))
                 else:
@@ -95,6 +111,18 @@ class CellExecutionGraph:
 
         return statements
 
+    def spills_in_place(self, cell_id: Address) -> bool:
+        region = self.dash.graph.spill_regions.get(cell_id)
+        if region is None:
+            return False
+        # A formula that reads its own spill sees it cleared, like before:
+        if any(
+            other in region for other in self.dash.graph.depends_on.get(cell_id, ())
+        ):
+            del self.dash.graph.spill_regions[cell_id]
+            return False
+        return True
+
     def process_clear_statements(
         self, calculated_by_to_clear: set[Address]
     ) -> ClearOp | None:
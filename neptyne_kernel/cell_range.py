@@ -22,15 +22,17 @@ from typing import (
     Any,
     Callable,
     Iterator,
+    NamedTuple,
     Optional,
     TypeVar,
+    overload,
 )
 
 import numpy as np
 import pandas as pd
 
 from .api_ref import ApiRef, Int, IntOrSlice, shape, slice_or_int_to_range
-from .cell_address import Address, Range
+from .cell_address import Address, Range, items_in_range
 from .cell_api import CellApiMixin
 from .neptyne_protocol import (
     CellAttribute,
@@ -39,6 +41,8 @@ from .neptyne_protocol import (
     SheetTransform,
 )
 from .primitives import Empty, NeptyneFloat, NeptyneInt, unproxy_val
+from .range_dataframe import DtypeBackend, block_frame, block_frames, column_series
+from .row_order import sort_order, unique_order
 from .transformation import Transformation, is_insert_delete_unbounded
 
 if TYPE_CHECKING:
@@ -72,6 +76,186 @@ def unproxy_for_dataframe(val: T) -> T | float | datetime:
     return unproxy_val(val)
 
 
+# Element-wise operators over ranges of numbers are computed with NumPy on the raw cell
+# values rather than going through a proxy per cell. Elements that aren't plain numbers
+# (blanks, strings, errors), divisions by zero and ints big enough to overflow still get the
+# Python operator applied to them, so the results are the same as they always were.
+VECTORIZED_OPERATORS: dict[Callable, np.ufunc] = {
+    __add__: np.add,
+    __sub__: np.subtract,
+    __mul__: np.multiply,
+    __truediv__: np.true_divide,
+    __floordiv__: np.floor_divide,
+    __lt__: np.less,
+    __gt__: np.greater,
+    __le__: np.less_equal,
+    __ge__: np.greater_equal,
+    __eq__: np.equal,
+    __ne__: np.not_equal,
+}
+VECTORIZE_MIN_SIZE = 32
+VECTORIZE_MAX_INT = 2**31
+
+_NOT_NUMERIC, _INT, _FLOAT = 0, 1, 2
+_NUMERIC_KINDS = {
+    int: _INT,
+    bool: _INT,
+    NeptyneInt: _INT,
+    float: _FLOAT,
+    NeptyneFloat: _FLOAT,
+}
+_INT_TYPES = {t for t, kind in _NUMERIC_KINDS.items() if kind == _INT}
+_FLOAT_TYPES = {t for t, kind in _NUMERIC_KINDS.items() if kind == _FLOAT}
+
+
+class _Operand(NamedTuple):
+    values: list
+    """The raw values, flattened row by row"""
+    shape: tuple[int, ...]
+    element: Callable[[int], Any]
+    """What iterating over the operand would have produced at a flat index"""
+
+
+def _scalar_operand(value: Any) -> _Operand | None:
+    if value.__class__ not in _NUMERIC_KINDS:
+        return None
+    return _Operand([value], (), lambda i: value)
+
+
+def _ref_operand(cell_range: "CellRangeRef") -> _Operand | None:
+    """The values of the cells in the shape CellRangeRef.__iter__ walks them"""
+    from .dash_ref import DashRef
+
+    ref = cell_range.ref
+    if not isinstance(ref, DashRef) or ref.dash.gsheet_service:
+        return None
+    max_col, max_row = ref.current_max_col_row()
+    if max_row == -1 or max_col == -1:
+        return None
+    r = replace(ref.range, max_col=max_col, max_row=max_row)
+    h, w = r.shape()
+    if h == 1 and ref.range.max_row != -1:
+        shape: tuple[int, ...] = (w,)
+    elif w == 1 and ref.range.max_col != -1:
+        shape = (h,)
+    else:
+        shape = (h, w)
+
+    dash = ref.dash
+    if dash.profiler is not None:
+        dash.profiler.record_ref_read()
+    dash.cells.hydrate(r.sheet)
+    values = [None] * (h * w)
+    for address, value in items_in_range(dash.cells[r.sheet], r):
+        values[(address.row - r.min_row) * w + address.column - r.min_col] = value
+
+    def element(i: int) -> Any:
+        return dash[Address(r.min_col + i % w, r.min_row + i // w, r.sheet)]
+
+    return _Operand(values, shape, element)
+
+
+def _operand(value: Any) -> _Operand | None:
+    if isinstance(value, CellRangeRef):
+        return _ref_operand(value)
+    if value.__class__ is CellRangeList and value.two_dimensional:
+        rows = value._values
+        width = len(rows[0])
+        if any(len(row) != width for row in rows):
+            return None
+        values = [cell for row in rows for cell in row]
+        return _Operand(
+            values, (len(rows), width), lambda i: rows[i // width][i % width]
+        )
+    if value.__class__ in (CellRangeList, list, tuple):
+        values = [*value]
+        if values and isinstance(values[0], CellRange):
+            return None
+        return _Operand(values, (len(values),), values.__getitem__)
+    return None
+
+
+def _numeric_arrays(operand: _Operand) -> tuple[np.ndarray, np.ndarray]:
+    """The kind of each value of operand and the value as a float where it is a number"""
+    types = set(map(type, operand.values))
+    if types <= _FLOAT_TYPES or (
+        types <= _INT_TYPES
+        and -VECTORIZE_MAX_INT < min(operand.values)
+        and max(operand.values) < VECTORIZE_MAX_INT
+    ):
+        numbers = np.array(operand.values, dtype=np.float64).reshape(operand.shape)
+        kind = _FLOAT if types <= _FLOAT_TYPES else _INT
+        return np.full(operand.shape, kind, dtype=np.int8), numbers
+
+    kinds = []
+    numbers = []
+    for value in operand.values:
+        kind = _NUMERIC_KINDS.get(value.__class__, _NOT_NUMERIC)
+        if kind == _INT and not -VECTORIZE_MAX_INT < value < VECTORIZE_MAX_INT:
+            kind = _NOT_NUMERIC
+        kinds.append(kind)
+        numbers.append(value if kind else 0)
+    return (
+        np.array(kinds, dtype=np.int8).reshape(operand.shape),
+        np.array(numbers, dtype=np.float64).reshape(operand.shape),
+    )
+
+
+def vectorized_operator(left: Any, right: Any, op: Callable) -> "CellRangeList | None":
+    """Applies op element-wise between left and right like CellRange.apply_operator does,
+    or returns None if this can't be done faster than going through the elements one by one.
+    """
+    ufunc = VECTORIZED_OPERATORS.get(op)
+    if ufunc is None:
+        return None
+    lhs = _operand(left) or _scalar_operand(left)
+    rhs = _operand(right) or _scalar_operand(right)
+    if lhs is None or rhs is None or lhs.shape == rhs.shape == ():
+        return None
+    if len(lhs.shape) == len(rhs.shape) == 1 and lhs.shape != rhs.shape:
+        # zip stops at the shorter one:
+        size = min(lhs.shape[0], rhs.shape[0])
+        lhs = lhs._replace(values=lhs.values[:size], shape=(size,))
+        rhs = rhs._replace(values=rhs.values[:size], shape=(size,))
+    elif lhs.shape and rhs.shape and lhs.shape != rhs.shape:
+        return None
+    shape = lhs.shape or rhs.shape
+    if np.prod(shape) < VECTORIZE_MIN_SIZE:
+        return None
+
+    left_kinds, left_numbers = _numeric_arrays(lhs)
+    right_kinds, right_numbers = _numeric_arrays(rhs)
+    numeric = (left_kinds != _NOT_NUMERIC) & (right_kinds != _NOT_NUMERIC)
+    if op is __truediv__ or op is __floordiv__:
+        numeric &= right_numbers != 0
+    numeric = np.broadcast_to(numeric, shape)
+    ints = np.broadcast_to((left_kinds == _INT) & (right_kinds == _INT), shape)
+
+    with np.errstate(all="ignore"):
+        result = ufunc(left_numbers, right_numbers)
+        if result.dtype != np.bool_ and op is not __truediv__ and ints.any():
+            int_result = ufunc(
+                np.where(left_kinds == _INT, left_numbers, 0).astype(np.int64),
+                np.where(right_kinds == _INT, right_numbers, 0).astype(np.int64),
+            )
+            if ints.all():
+                result = int_result
+            else:
+                result = result.astype(object)
+                result[ints] = int_result[ints].astype(object)
+    values = result.tolist()
+
+    # Whatever isn't a pair of numbers goes through the Python operator, in the order
+    # iterating would have visited it:
+    for i in np.flatnonzero(~numeric).tolist():
+        value = op(lhs.element(i), rhs.element(i))
+        if len(shape) == 1:
+            values[i] = value
+        else:
+            values[i // shape[1]][i % shape[1]] = value
+    return CellRangeList(values)
+
+
 class CellRange(Sequence):
     two_dimensional: bool
     """Whether or not the cell range is 2D. Single rows and columns are represented as 1D cell range."""
@@ -433,6 +617,46 @@ class CellRange(Sequence):
             raise ValueError("No empty column found")
         return self.insert_column(col_index, data, amount)
 
+    def _row_block(self) -> Range | None:
+        """The bounded range of the cell range if the dash can reorder its rows as a block"""
+        from .dash_ref import DashRef
+
+        if not isinstance(self.ref, DashRef) or self.ref.dash.gsheet_service:
+            return None
+        return self.ref.resolve().range
+
+    def _block_columns(self, block: Range, columns: Sequence[int]) -> list[list[Any]]:
+        """The raw values of the given columns of block, one list per column"""
+        values: list[list[Any]] = [
+            [None] * (block.max_row - block.min_row + 1) for _ in columns
+        ]
+        positions = {block.min_col + column: i for i, column in enumerate(columns)}
+        for address, value in items_in_range(self.ref.dash.cells[block.sheet], block):
+            if (i := positions.get(address.column)) is not None:
+                values[i][address.row - block.min_row] = value
+        return values
+
+    def _rows_in_order(self, order: Sequence[int]) -> None:
+        block = self._row_block()
+        if block is not None:
+            self.ref.dash.reorder_rows(block, order)
+            return
+        rows = [*self]
+        blank: Any = [None] * len(rows[0]) if self.two_dimensional else None
+        self[0] = [rows[i] for i in order] + [blank] * (len(rows) - len(order))
+
+    def _check_columns(self, by_column: int | Sequence[int] | None) -> list[int]:
+        assert self.ref is not None
+        width = (self._row_block() or self.ref.range).shape()[1]
+        if by_column is None:
+            return [*range(width)]
+        if isinstance(by_column, int):
+            by_column = [by_column]
+        for column in by_column:
+            if column < 0 or column >= width:
+                raise ValueError(f"Column index: {column} out of range")
+        return [*by_column]
+
     def sort_rows(
         self,
         by_column: int | Sequence[int] | None = None,
@@ -449,25 +673,57 @@ class CellRange(Sequence):
         if key and by_column:
             raise ValueError("Cannot specify both key and by_column")
 
-        if by_column is None and key is None:
-            by_column = [*range(self.ref.range.max_col - self.ref.range.min_col + 1)]
-
-        if by_column is not None:
-            if isinstance(by_column, int):
-                by_column = [by_column]
-
-            for column in by_column:
-                if column < 0 or column >= (
-                    self.ref.range.max_col - self.ref.range.min_col + 1
-                ):
-                    raise ValueError(f"Column index: {column} out of range")
-
-            def splicer(row: Sequence[Any]) -> Any:
-                return [getattr(row[col], "value", row[col]) for col in by_column]
+        columns = self._check_columns(by_column) if key is None else []
+        order = None
+        if (block := self._row_block()) is not None and columns:
+            order = sort_order(self._block_columns(block, columns), reverse)
+        if order is None:
+            rows = [*self]
+            if key is None:
+
+                def splicer(row: Any) -> Any:
+                    if not self.two_dimensional:
+                        row = [row]
+                    return [getattr(row[col], "value", row[col]) for col in columns]
+
+                key = splicer
+            order = sorted(
+                range(len(rows)), key=lambda i: key(rows[i]), reverse=reverse
+            )
+        self._rows_in_order(order)
 
-            key = splicer
+    def filter_rows(self, keep: Callable[[Any], Any] | Iterable[Any]) -> None:
+        """Keeps the rows in the cell range for which **keep** is true, moving them up in place and clearing the rows left over at the bottom.\n\n
+        **keep** is either a function that is called with each row, or has a value for each row, like `A1:A10 > 5` does.\n\n
+        """
+        assert self.ref is not None
+        if callable(keep):
+            mask = [keep(row) for row in self]
+        else:
+            mask = [*keep]
+            if len(mask) != len(self):
+                raise ValueError(
+                    f"Expected a value for each of the {len(self)} rows, got {len(mask)}"
+                )
+        self._rows_in_order([i for i, keep_row in enumerate(mask) if keep_row])
 
-        self[0] = sorted(self, key=key, reverse=reverse)
+    def unique_rows(self, by_column: int | Sequence[int] | None = None) -> None:
+        """Removes rows that repeat an earlier row in place, moving up the rest and clearing the rows left over at the bottom.\n\n
+        If **by_column** is provided, rows count as repeated when the values in the specified column(s) are.\n\n
+        """
+        assert self.ref is not None
+        columns = self._check_columns(by_column)
+        if (block := self._row_block()) is not None:
+            keys = [*zip(*self._block_columns(block, columns))]
+        else:
+            keys = [
+                tuple(
+                    unproxy_val(row[col] if self.two_dimensional else row)
+                    for col in columns
+                )
+                for row in self
+            ]
+        self._rows_in_order(unique_order(keys))
 
     def __bool__(self) -> bool:
         raise ValueError(
@@ -500,6 +756,10 @@ class CellRange(Sequence):
         `A1:A4 < 4`\n
         will return a cell range with the same shape as A1:A4, where each cell is True if the value in A1:A4 is less than 4, and False otherwise.\n\n
         """
+        if other.__class__ in _NUMERIC_KINDS:
+            result = vectorized_operator(self, other, op)
+            if result is not None:
+                return result
         return CellRangeList([op(value, other) for value in self])
 
     def __lt__(self, other: "SimpleCellValue"):  # type: ignore
@@ -522,6 +782,9 @@ class CellRange(Sequence):
             return self.boolean_mask_operator(other, __eq__)
         if len(self) != len(other):  # type: ignore
             return False
+        result = vectorized_operator(self, other, __eq__)
+        if result is not None:
+            return result
         return CellRange([s == o for s, o in zip(self, other)])
 
     def __contains__(self, item: Any) -> bool:
@@ -539,6 +802,13 @@ class CellRange(Sequence):
         `A1:B2 + A3:B4`\n
         will return a cell range maintaining the 2x2 shape of A1:B2 and A3:B4, where each cell is the sum of the corresponding cells in A1:B2 and A3:B4.\n\n
         """
+        result = (
+            vectorized_operator(other, self, op)
+            if reverse
+            else vectorized_operator(self, other, op)
+        )
+        if result is not None:
+            return result
         if isinstance(other, str) or not hasattr(other, "__iter__"):
             other = [other] * len(self)
         src = zip(other, self) if reverse else zip(self, other)
@@ -583,19 +853,83 @@ class CellRange(Sequence):
     def __json__(self) -> list:
         return [*self]
 
+    @overload
+    def to_dataframe(
+        self,
+        header: bool = True,
+        dtype: dict[str, Any] | None = None,
+        chunksize: None = None,
+        dtype_backend: DtypeBackend = "numpy",
+    ) -> pd.DataFrame: ...
+
+    @overload
     def to_dataframe(
-        self, header: bool = True, dtype: dict[str, Any] | None = None
-    ) -> pd.DataFrame:
-        """Converts the cell range to a pandas DataFrame. The first row will be used as the column names. Subsequent rows will be the data."""
+        self,
+        header: bool = True,
+        dtype: dict[str, Any] | None = None,
+        *,
+        chunksize: int,
+        dtype_backend: DtypeBackend = "numpy",
+    ) -> Iterator[pd.DataFrame]: ...
+
+    def to_dataframe(
+        self,
+        header: bool = True,
+        dtype: dict[str, Any] | None = None,
+        chunksize: int | None = None,
+        dtype_backend: DtypeBackend = "numpy",
+    ) -> pd.DataFrame | Iterator[pd.DataFrame]:
+        """Converts the cell range to a pandas DataFrame. The first row will be used as the column names. Subsequent rows will be the data.\n\n
+        If **chunksize** is provided, returns an iterator of DataFrames with up to that many rows each instead, to go through a big range without holding all of it in memory.\n
+        If **dtype_backend** is "numpy_nullable", each column gets the narrowest type that holds its values, with blanks as missing values: int64/Int64, float64, bool/boolean, datetime64, category for strings that repeat and Arrow strings otherwise.\n\n
+        """
         from .dash_ref import DashRef
 
         if isinstance(self.ref, DashRef) and not self.ref.range.is_fully_bounded():
-            return CellRange(self.ref.resolve()).to_dataframe(header=header)
+            return CellRange(self.ref.resolve()).to_dataframe(
+                header=header,
+                dtype=dtype,
+                chunksize=chunksize,
+                dtype_backend=dtype_backend,
+            )
         self_shape = self.shape
         start = self._get_first_row_number(header)
 
+        block = self._row_block()
+        # Columns and tables with rows below the header are read straight from the cells:
+        if (
+            block is not None
+            and (len(self_shape) == 2 or block.min_col == block.max_col)
+            and not (header and block.min_row == block.max_row)
+        ):
+            names = (
+                ([*self[0]] if len(self_shape) == 2 else [self[0]]) if header else []
+            )
+            data = replace(block, min_row=block.min_row + 1) if header else block
+            names += [None] * (data.max_col - data.min_col + 1 - len(names))
+            dash = self.ref.dash
+            if chunksize is not None:
+                return block_frames(
+                    dash, data, names, start, dtype, dtype_backend, chunksize
+                )
+            return block_frame(dash, data, names, start, dtype, dtype_backend)
+
+        if chunksize is not None:
+            frame = self.to_dataframe(
+                header=header, dtype=dtype, dtype_backend=dtype_backend
+            )
+            return (
+                frame.iloc[i : i + chunksize] for i in range(0, len(frame), chunksize)
+            )
+
         def column(data: Any, name: str | None = None) -> pd.Series:
             col_dtype = dtype.get(name) if dtype and name in dtype else None
+            if dtype_backend == "numpy_nullable":
+                values = [
+                    None if isinstance(x, Empty) else unproxy_for_dataframe(x)
+                    for x in data
+                ]
+                return column_series(values, name, start, col_dtype, dtype_backend)
             return pd.Series(
                 [unproxy_for_dataframe(x) for x in data],
                 name=name,
@@ -1,11 +1,32 @@
-from operator import __eq__, __ge__, __gt__, __le__, __lt__, __ne__
+import random
+from operator import (
+    __add__,
+    __eq__,
+    __floordiv__,
+    __ge__,
+    __gt__,
+    __le__,
+    __lt__,
+    __mul__,
+    __ne__,
+    __sub__,
+    __truediv__,
+)
 
 import numpy as np
+import pandas as pd
 import pytest
 
-from .cell_range import CellRange, slice_or_int_to_range
+from . import cell_range
+from .cell_address import Range
+from .cell_range import CellRange, CellRangeRef, slice_or_int_to_range
+from .dash_ref import DashRef
 from .formulas.helpers import assert_equal
+from .neptyne_protocol import CellAttribute
 from .primitives import Empty
+from .spreadsheet_error import VALUE_ERROR
+from .test_utils import a1
+from .tyne_model.cell import CellMetadata
 
 
 def test_binary_operators():
@@ -170,3 +191,151 @@ def test_equal():
     assert len(eq3) == 2
     assert len(eq3[0]) == 3
     assert eq3.all()
+
+
+def flattened(result):
+    if isinstance(result, CellRange):
+        return [flattened(value) for value in result]
+    return type(result), result
+
+
+def applied(compute):
+    try:
+        return flattened(compute())
+    except Exception as e:
+        return type(e), str(e)
+
+
+@pytest.mark.parametrize(
+    "op", [__add__, __sub__, __mul__, __truediv__, __floordiv__, __lt__, __eq__]
+)
+@pytest.mark.parametrize(
+    "shape",
+    [
+        a1("A1:A40"),
+        a1("A1:B20"),
+        a1("A1:AN1"),
+        a1("A1:AN40"),
+        Range(0, 0, 0, -1, 0),
+        Range(1, 2, 0, -1, 0),
+    ],
+)
+def test_vectorized_operators_match_elementwise(dash, monkeypatch, op, shape):
+    rng = random.Random(f"{op.__name__} {shape!r}")
+    choices = [
+        lambda: rng.randint(-10, 10),
+        lambda: rng.uniform(-10, 10),
+        lambda: rng.choice([True, False]),
+        lambda: 0,
+        lambda: 2**40,
+        lambda: None,
+    ]
+    for attempt in range(6):
+        # Mostly numbers, sometimes with the odd blank, string or error mixed in:
+        odd = [lambda: "x", lambda: VALUE_ERROR] if attempt % 3 == 0 else []
+        values = [
+            [rng.choice(choices + odd)() for _col in range(50)] for _row in range(40)
+        ]
+        dash[a1("A1:AX40")] = values
+        left = CellRange(DashRef(dash, shape))
+        right = CellRange(DashRef(dash, shape.translated(10, 0)))
+        scalar = rng.choice([3, -2.5, 0, True])
+        as_list = CellRange(values[0][:40]) if shape == a1("A1:A40") else None
+
+        def both(compute):
+            fast = applied(compute)
+            with monkeypatch.context() as m:
+                m.setattr(cell_range, "VECTORIZED_OPERATORS", {})
+                slow = applied(compute)
+            assert fast == slow
+
+        both(lambda: op(left, scalar))
+        if op not in (__lt__, __eq__):
+            both(lambda: op(left, right))
+            both(lambda: op(scalar, left))
+            if as_list is not None:
+                both(lambda: op(left, as_list))
+                both(lambda: op(as_list, right))
+
+
+def test_vectorized_operators_keep_shape(dash):
+    dash[a1("A1:B40")] = [[row, row / 2] for row in range(40)]
+    doubled = CellRange(DashRef(dash, a1("A1:B40"))) * 2
+    assert doubled.two_dimensional
+    assert doubled[3].to_list() == [6, 3.0]
+    assert (CellRange(DashRef(dash, a1("A1:A40"))) > 37).to_list()[-3:] == [
+        False,
+        True,
+        True,
+    ]
+    shorter = CellRange(DashRef(dash, a1("A1:A40"))) + list(range(35))
+    assert len(shorter) == 35
+    with pytest.raises(ZeroDivisionError):
+        CellRange(DashRef(dash, a1("B1:B40"))) / CellRange(DashRef(dash, a1("A1:A40")))
+
+
+def test_to_dataframe_matches_proxies(dash, monkeypatch):
+    rng = random.Random(0)
+    choices = [
+        lambda: rng.randint(-10, 10),
+        lambda: rng.uniform(-10, 10),
+        lambda: rng.choice([True, False]),
+        lambda: rng.choice(["x", "y"]),
+        lambda: None,
+        lambda: VALUE_ERROR,
+    ]
+    dash[a1("A1:D1")] = ["ints", "floats", "mixed", "dates"]
+    for row in range(2, 41):
+        dash[a1(f"A{row}:D{row}")] = [
+            row,
+            None if row % 7 == 0 else row / 4,
+            rng.choice(choices)(),
+            40000 + row,
+        ]
+    dash.cell_meta[a1("D5")] = CellMetadata(
+        attributes={CellAttribute.NUMBER_FORMAT.value: "date-yyyy-mm-dd"}
+    )
+
+    def frames():
+        for r in ("A1:D40", "A1:A40", "B5:C9", "C1:C40", "A3:D3", "A7:A7"):
+            cell_range = CellRange(DashRef(dash, a1(r)))
+            yield cell_range.to_dataframe()
+            yield cell_range.to_dataframe(header=False, dtype={"ints": "float64"})
+        yield CellRange(DashRef(dash, Range(0, 1, 0, -1, 0))).to_dataframe()
+
+    fast = [*frames()]
+    monkeypatch.setattr(CellRangeRef, "_row_block", lambda self: None)
+    for fast_frame, slow_frame in zip(fast, frames()):
+        pd.testing.assert_frame_equal(fast_frame, slow_frame)
+
+
+def test_to_dataframe_dtypes_and_chunks(dash):
+    dash[a1("A1:F1")] = ["int", "blank_int", "bool", "float", "label", "text"]
+    for row in range(2, 12):
+        dash[a1(f"A{row}:F{row}")] = [
+            row,
+            None if row == 5 else row,
+            row % 2 == 0,
+            row / 2,
+            "even" if row % 2 == 0 else "odd",
+            f"text {row}",
+        ]
+    cell_range = CellRange(DashRef(dash, a1("A1:F11")))
+
+    df = cell_range.to_dataframe(dtype_backend="numpy_nullable")
+    assert [str(dtype) for dtype in df.dtypes] == [
+        "int64",
+        "Int64",
+        "bool",
+        "float64",
+        "category",
+        "string",
+    ]
+    assert df["blank_int"].isna().tolist() == [row == 5 for row in range(2, 12)]
+    assert df.index[0] == 1
+
+    chunks = [*cell_range.to_dataframe(chunksize=4)]
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    pd.testing.assert_frame_equal(pd.concat(chunks), cell_range.to_dataframe())
+    listed = CellRange([[1, 2], [3, 4], [5, 6]]).to_dataframe(chunksize=1)
+    assert [chunk.values.tolist() for chunk in listed] == [[[3, 4]], [[5, 6]]]
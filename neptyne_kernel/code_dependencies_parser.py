@@ -1,7 +1,21 @@
 import ast
+import hashlib
 import inspect
-from collections import defaultdict
-from typing import Any
+from collections import OrderedDict, defaultdict
+from typing import Any, NamedTuple
+
+DEPENDENCY_CACHE_SIZE = 4096
+
+
+class StatementSummary(NamedTuple):
+    # (name used, name of the top-level definition using it):
+    references: list[tuple[str, str]]
+    source_for_name: dict[str, str]
+
+
+# Summaries of top-level statements by the hash of their source, so that only the
+# definitions that were edited are walked (and unparsed) again:
+_statement_summaries: OrderedDict[tuple[bytes, int], StatementSummary] = OrderedDict()
 
 
 def get_code_dependencies(
@@ -21,6 +35,56 @@ def get_code_dependencies(
             if inner_module is None or inner_module.__name__ == "__main__":
                 dependencies[parent].add(child)
 
+    def flatten(parent: str, children: set[str]) -> None:
+        """Flatten multilevel dependencies"""
+        for child in list(children):
+            if child != parent and child not in (depends_on := dependencies[parent]):
+                depends_on.add(child)
+                flatten(parent, dependencies.get(child, set()))
+
+    def reverse(depends_on: dict[str, set[str]]) -> dict[str, set[str]]:
+        """Reverse the dependency tree dict {name: names it depends on} into {name: names that depend on this name}"""
+        reversed = defaultdict(set)
+        for parent, names in depends_on.items():
+            for name in names:
+                reversed[name].add(parent)
+        return reversed
+
+    root = ast.parse(code)
+    lines = code.splitlines()
+    for node in root.body:
+        first_line = min(
+            (decorator.lineno for decorator in getattr(node, "decorator_list", ())),
+            default=node.lineno,
+        )
+        source = "\n".join(lines[first_line - 1 : node.end_lineno])
+        key = (hashlib.sha1(source.encode()).digest(), node.col_offset)
+        summary = _statement_summaries.get(key)
+        if summary is None:
+            summary = _statement_summaries[key] = summarize_statement(node)
+            if len(_statement_summaries) > DEPENDENCY_CACHE_SIZE:
+                _statement_summaries.popitem(last=False)
+        else:
+            _statement_summaries.move_to_end(key)
+        for child, parent in summary.references:
+            maybe_add_dependent_node(child, parent)
+        source_for_name.update(summary.source_for_name)
+
+    for parent, children in dependencies.items():
+        flatten(parent, children)
+
+    return reverse(dependencies), source_for_name
+
+
+def summarize_statement(statement: ast.stmt) -> StatementSummary:
+    """The names a top-level statement uses and the source of what it defines,
+    before filtering by the module globals."""
+    references: list[tuple[str, str]] = []
+    source_for_name: dict[str, str] = {}
+
+    def maybe_add_dependent_node(child: str, parent: str) -> None:
+        references.append((child, parent))
+
     def visit_name(node: ast.Name) -> str:
         return node.id
 
@@ -100,25 +164,5 @@ def get_code_dependencies(
                         source_for_name[target.id] = ast.unparse(child_node.value)
                         process_assign(target, child_node.value)
 
-    def flatten(parent: str, children: set[str]) -> None:
-        """Flatten multilevel dependencies"""
-        for child in list(children):
-            if child != parent and child not in (depends_on := dependencies[parent]):
-                depends_on.add(child)
-                flatten(parent, dependencies.get(child, set()))
-
-    def reverse(depends_on: dict[str, set[str]]) -> dict[str, set[str]]:
-        """Reverse the dependency tree dict {name: names it depends on} into {name: names that depend on this name}"""
-        reversed = defaultdict(set)
-        for parent, names in depends_on.items():
-            for name in names:
-                reversed[name].add(parent)
-        return reversed
-
-    root = ast.parse(code)
-    iter_module_or_class(root)
-
-    for parent, children in dependencies.items():
-        flatten(parent, children)
-
-    return reverse(dependencies), source_for_name
+    iter_module_or_class(ast.Module(body=[statement], type_ignores=[]))
+    return StatementSummary(references, source_for_name)
@@ -0,0 +1,41 @@
+from . import code_dependencies_parser
+from .code_dependencies_parser import get_code_dependencies
+
+CODE = """import math
+
+
+def a(x):
+    return b(x) + math.pi
+
+
+def b(y):
+    return c(y)
+
+
+def c(z):
+    return z
+
+
+v = a(2); w = c(1)
+"""
+
+
+def test_get_code_dependencies():
+    code_dependencies_parser._statement_summaries.clear()
+    module_globals: dict = {"__name__": "__main__"}
+    exec(CODE, module_globals)
+
+    dependents, source_for_name = get_code_dependencies(CODE, module_globals)
+    assert dependents == {"b": {"a"}, "c": {"b", "w"}, "a": {"v"}}
+    assert source_for_name["b"] == "def b(y):\n    return c(y)"
+    assert source_for_name["v"] == "a(2)"
+    assert source_for_name["w"] == "c(1)"
+
+    # Only the edited function is summarized again:
+    edited = CODE.replace("return c(y)", "return y")
+    exec(edited, module_globals)
+    summaries = len(code_dependencies_parser._statement_summaries)
+    dependents, source_for_name = get_code_dependencies(edited, module_globals)
+    assert len(code_dependencies_parser._statement_summaries) == summaries + 1
+    assert dependents == {"b": {"a"}, "a": {"v"}, "c": {"w"}}
+    assert source_for_name["b"] == "def b(y):\n    return y"
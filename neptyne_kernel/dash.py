@@ -20,7 +20,8 @@ import traceback
 import types
 import uuid
 from collections import defaultdict
-from contextlib import ExitStack, contextmanager
+from concurrent.futures import Future
+from contextlib import AbstractContextManager, ExitStack, contextmanager
 from dataclasses import dataclass, field, fields, replace
 from io import BytesIO
 from pathlib import Path
@@ -84,6 +85,7 @@ from .expression_compiler import (
     replace_n_with_a1_match,
     tokenize_with_ranges,
     try_parse_capitalized_range,
+    words_in_code,
 )
 from .get_ipython_mockable import get_ipython_mockable
 from .gsheets_api import (
@@ -95,7 +97,9 @@ from .gsheets_api import (
 )
 from .insert_delete_helper import add_delete_cells_helper
 from .json_tools import json_clean
+from .kernel_metrics import KernelMetrics
 from .kernel_runtime import get_kernel, send_sync_request
+from .lazy_sheet_cells import LazySheetCells
 from .linter import TyneCachingCompiler
 from .mime_handling import (
     as_json,
@@ -146,11 +150,26 @@ from .neptyne_protocol import (
     WidgetParamType,
 )
 from .ops import ClearOp, ExecOp
+from .packed_cells import pack_cell_updates
 from .pandas_unrolling import dataframe_to_grid
+from .pending_call import CallPending, deferring_calls
 from .pip import neptyne_pip_install
 from .primitives import Empty, proxy_val, unproxy_val
 from .proxied_apis import get_api_error_service
+from .recalc_profiler import (
+    NO_PROFILE,
+    PHASE_CASCADE,
+    PHASE_CELL_META,
+    PHASE_COMPILE,
+    PHASE_EVAL,
+    PHASE_FLUSH,
+    PHASE_GRAPH,
+    PHASE_RECALC,
+    PHASE_SET_ITEM,
+    RecalcProfiler,
+)
 from .renderers import InlineWrapper, WithSourceMixin
+from .row_order import reorder_rows
 from .session_info import NeptyneSessionInfo
 from .sheet_api import NeptyneSheetCollection
 from .spreadsheet_datetime import SpreadsheetDateTimeBase
@@ -174,6 +193,7 @@ from .tyne_model.jupyter_notebook import Output, OutputType
 from .tyne_model.kernel_init_data import (
     InitPhase1Payload,
     InitPhase2Payload,
+    decode_sheet_cells,
 )
 from .tyne_model.save_message import V1DashSaveMessage, json_encode
 from .tyne_model.sheet import TyneSheets
@@ -243,6 +263,9 @@ CELL_ATTRIBUTES_TO_CLEAR_ON_CLEAR = {
 
 MAX_CASCADE_COUNT = 10
 
+# Executes the kernel asks for itself, which don't come with edits from the client:
+KERNEL_REQUESTS = {MessageTypes.TICK_REPLY.value, MessageTypes.RERUN_CELLS.value}
+
 UPDATE_CELL_METADATA_CHANGE = "update_cell_metadata_change"
 CLEAR_CELL_METADATA_CHANGE = "clear_cell_metadata_change"
 
@@ -455,13 +478,19 @@ class Dash:
 
     in_post_execute_hook = False
 
-    cells: dict[int, dict[Address, Any]]
+    cells: LazySheetCells
     cell_meta: dict[Address, CellMetadata]
     graph: DashGraph
     sheets: NeptyneSheetCollection
     _named_ranges: GSheetNamedRanges | None
 
+    # The tables of each sheet for the AI, with what they were found for:
+    ai_tables: dict[int, tuple[tuple, list[TableForAI]]]
+
     dirty_cells: set[Address]
+    # A hash of what the client was last sent for each cell that isn't empty, to leave out
+    # cells that look the same:
+    sent_cells: dict[Address, int]
     resized_sheets: set[int]
 
     kernel: Kernel
@@ -480,6 +509,7 @@ class Dash:
 
     _cell_execution_stack: list[Address]
     local_repl_mode: bool = False
+    profiler: RecalcProfiler | None = None
 
     def __init__(self, silent: bool = False) -> None:
         if Dash._instance is not None:
@@ -487,14 +517,16 @@ class Dash:
 
         Dash._instance = self
 
-        self.cells = defaultdict(dict)
+        self.cells = LazySheetCells(self.load_lazy_sheet)
         self.cell_meta = defaultdict()
         self.graph = DashGraph()
         self.sheets = NeptyneSheetCollection(self)
+        self.ai_tables = {}
         self.silent = silent
 
         self.dirty_cell_flush_lock = threading.Lock()
         self.dirty_cells = set()
+        self.sent_cells = {}
         self.resized_sheets = set()
         self.scheduled_undo = None
 
@@ -516,6 +548,8 @@ class Dash:
         self._cell_execution_stack = []
         self._pending_display_msg: dict[str, Any] | None = None
         self._mutex_manager = MutexManager()
+        self.profiler = None
+        self.metrics = KernelMetrics(MAX_CASCADE_COUNT)
 
         if ip is not None:
             parent = ip if isinstance(ip, InteractiveShell) else None
@@ -581,6 +615,30 @@ class Dash:
             cls._instance = cls()
         return cls._instance
 
+    def profile_recalc(self) -> RecalcProfiler:
+        """Start profiling recalculations. Call stop() on the result to end profiling."""
+        if self.profiler is not None:
+            self.profiler.stop()
+
+        def cell_label(address: Address) -> str:
+            if address.sheet in self.sheets:
+                return f"{self.sheets[address.sheet].name}!{address.to_a1()}"
+            return address.to_a1()
+
+        def on_stop(profiler: RecalcProfiler) -> None:
+            if self.profiler is profiler:
+                self.profiler = None
+
+        self.profiler = RecalcProfiler(cell_label, on_stop)
+        return self.profiler
+
+    def _profile(
+        self, phase: str, address: Address | None = None, stacked: bool = True
+    ) -> AbstractContextManager:
+        if self.profiler is None:
+            return NO_PROFILE
+        return self.profiler.phase(phase, address, stacked)
+
     @property
     def gsheets_spreadsheet_id(self) -> str:
         if override := sheet_context.gsheet_id_override.get():
@@ -635,6 +693,7 @@ class Dash:
         (credentials.parent / "authorized_user.json").write_text(creds.to_json("token"))
 
     def get_raw_code(self, address: Address) -> str:
+        self.cells.hydrate(address.sheet)
         meta = self.cell_meta.get(address)
         if meta:
             return meta.raw_code
@@ -646,12 +705,14 @@ class Dash:
         return str(cell)
 
     def has_formula(self, address: Address) -> bool:
+        self.cells.hydrate(address.sheet)
         meta = self.cell_meta.get(address)
         if not meta or not meta.raw_code:
             return False
         return is_cell_formula(meta.raw_code)
 
     def set_raw_code(self, address: Address, code: str) -> None:
+        self.cells.hydrate(address.sheet)
         meta = (
             self.get_or_create_cell_meta(address)
             if is_cell_formula(code)
@@ -742,44 +803,20 @@ class Dash:
         return False
 
     def resolve_max_col_row(self, range: Range) -> tuple[int, int]:
-        on_empty_value = -1
-
         if range.max_col >= 0 and range.max_row >= 0:
             return range.max_col, range.max_row
 
         cells = self.cells[range.sheet]
         if range.max_row >= 0:
-            return (
-                max(
-                    (
-                        k.column
-                        for k in cells
-                        if range.max_row >= k.row >= range.min_row
-                    ),
-                    default=on_empty_value,
-                ),
-                range.max_row,
-            )
+            return cells.max_col(range.min_row, range.max_row), range.max_row
         elif range.max_col >= 0:
-            return (
-                range.max_col,
-                max(
-                    (
-                        k.row
-                        for k in cells
-                        if range.max_col >= k.column >= range.min_col
-                    ),
-                    default=on_empty_value,
-                ),
-            )
+            return range.max_col, cells.max_row(range.min_col, range.max_col)
 
         # [-1,-1]
-        return (
-            max((a.column for a in cells), default=on_empty_value),
-            max((a.row for a in cells), default=on_empty_value),
-        )
+        return cells.rows_by_column.last_line(), cells.columns_by_row.last_line()
 
     def all_keys(self) -> set[Address]:
+        self.cells.hydrate_all()
         res: set[Address] = set()
         for sheet in self.cells.values():
             res.update(sheet.keys())
@@ -916,10 +953,17 @@ class Dash:
         cells_to_populate: list[dict] | None = None,
         send_undo: bool = False,
     ) -> None:
+        # Inserting and deleting rewrites references on every sheet
+        self.cells.hydrate_all()
+        # The client moves its cells along:
+        self.forget_sent_cells()
         return add_delete_cells_helper(
             self, transformation, cells_to_populate, send_undo
         )
 
+    def reorder_rows(self, cell_range: Range, order: Sequence[int]) -> None:
+        reorder_rows(self, cell_range, order)
+
     def undo_msg(self, msg_type: MessageTypes, payload: dict) -> dict[str, Any]:
         if not self.kernel.session:
             return {}
@@ -963,7 +1007,19 @@ class Dash:
 
     def load_values(self, sheets: TyneSheets) -> None:
         upgrade_model(sheets)
-        for cell_id, cell in sheets.all_cells():
+        self.forget_sent_cells()
+        self.load_cells(sheets.all_cells())
+        if not self.in_gs_mode:
+            self.sheets._load_serializable_sheets(sheets.sheets.values())
+        self.tick_cell_queue.initialize(self.cell_meta)
+
+    def load_lazy_sheet(self, sheet_id: int, block: str) -> None:
+        """Load the cells of a sheet that was kept encoded when the tyne was opened"""
+        self.load_cells(decode_sheet_cells(block).items())
+
+    def load_cells(self, cells: Iterable[tuple[Address, SheetCell]]) -> None:
+        self.graph.names_indexed = False
+        for cell_id, cell in cells:
             if isinstance(cell.output, Output):
                 value = output_to_value(cell.output.data)
                 output_needs_meta = not represents_simple_value(cell.output)
@@ -999,9 +1055,6 @@ class Dash:
                     next_execution_time=cell.next_execution_time,
                     output=(cell.output if output_needs_meta else value),
                 )
-        if not self.in_gs_mode:
-            self.sheets._load_serializable_sheets(sheets.sheets.values())
-        self.tick_cell_queue.initialize(self.cell_meta)
 
     def broadcast_init_stage(self, state: KernelInitState) -> None:
         parent = self.kernel.get_parent("shell")
@@ -1071,6 +1124,7 @@ class Dash:
 
     def initialize_phase_2_decoded(self, init_payload: InitPhase2Payload) -> None:
         self.broadcast_init_stage(KernelInitState.LOADING_SHEET_VALUES)
+        self.cells.pending.update(init_payload.lazy_sheets)
         self.load_values(init_payload.sheets)
 
         if init_payload.requires_recompile:
@@ -1291,7 +1345,8 @@ class Dash:
                 # TODO: Custom string format to make the error look nicer.
                 value = PYTHON_ERROR.with_message(str(errors))
 
-        self.update_cell_meta_on_value_change(address, value)
+        with self._profile(PHASE_CELL_META):
+            self.update_cell_meta_on_value_change(address, value)
         if value is Empty.MakeItSo or value is None:
             if address in self.cells[address.sheet]:
                 del self.cells[address.sheet][address]
@@ -1309,22 +1364,59 @@ class Dash:
                 dirty_cells = self.dirty_cells.copy()
                 self.dirty_cells.clear()
                 try:
-                    cell_updates = [
-                        self.sheet_cell_for_address(addr).export(compact=True)
-                        for addr in dirty_cells
-                    ]
-
-                    self.reply_to_client(
-                        MessageTypes.SHEET_UPDATE,
-                        SheetUpdateContent(cell_updates=cell_updates).to_dict(),
-                        undo_msg=self.scheduled_undo,
-                    )
+                    with self._profile(PHASE_FLUSH, stacked=False):
+                        cell_updates = []
+                        for addr in dirty_cells:
+                            cell_update = self.sheet_cell_for_address(addr).export(
+                                compact=True
+                            )
+                            is_empty = (
+                                addr not in self.cells[addr.sheet]
+                                and addr not in self.cell_meta
+                            )
+                            if is_empty:
+                                # Empty cells are always sent, and not remembered:
+                                self.sent_cells.pop(addr, None)
+                                cell_updates.append(cell_update)
+                                continue
+                            # repr tells 1, 1.0 and True apart, unlike ==:
+                            fingerprint = hash(repr(cell_update))
+                            if self.sent_cells.get(addr) != fingerprint:
+                                self.sent_cells[addr] = fingerprint
+                                cell_updates.append(cell_update)
+                        if cell_updates or self.scheduled_undo:
+                            self.send_sheet_update(cell_updates)
                     self.scheduled_undo = None
+                    self.metrics.record_flush(len(cell_updates))
+                    if self.profiler is not None:
+                        self.profiler.record_flush(len(cell_updates))
 
                 except Exception as e:
                     print("Server error: ", e, file=sys.stderr)
                     traceback.print_exc(file=sys.stderr)
 
+    def send_sheet_update(self, cell_updates: list[Any]) -> None:
+        cell_updates, packed_cells, buffer = pack_cell_updates(cell_updates)
+        self.reply_to_client(
+            MessageTypes.SHEET_UPDATE,
+            SheetUpdateContent(
+                cell_updates=cell_updates, packed_cells=packed_cells or None
+            ).to_dict(),
+            undo_msg=self.scheduled_undo,
+            buffers=[buffer] if buffer else None,
+        )
+
+    def forget_sent_cells(self, sheet_id: int | None = None) -> None:
+        """Sends every dirty cell (of sheet_id, if given) at the next flush, whether it
+        changed or not. For when the client may have changed its cells itself, or the
+        sheet is gone."""
+        with self.dirty_cell_flush_lock:
+            if sheet_id is None:
+                self.sent_cells.clear()
+            else:
+                for address in [a for a in self.sent_cells if a.sheet == sheet_id]:
+                    del self.sent_cells[address]
+
     def flush_loop(self) -> None:
         while True:
             time.sleep(0.1)
@@ -1350,11 +1442,16 @@ class Dash:
                 ).to_dict(),
             )
 
+    def report_metrics(self) -> None:
+        if content := self.metrics.take():
+            self.reply_to_client(MessageTypes.KERNEL_METRICS, content.to_dict())
+
     def tick_loop(self) -> None:
         while True:
             try:
                 if self.initialized:
                     self.tick()
+                    self.report_metrics()
             except Exception as e:
                 sys.stderr.write(f"Error in tick() thread: {e}")
             time.sleep(1)
@@ -1366,7 +1463,11 @@ class Dash:
         *,
         broadcast: bool = True,
         undo_msg: dict[str, Any] | None = None,
+        parent: dict[str, Any] | None = None,
+        buffers: list[bytes] | None = None,
     ) -> None:
+        """Send a message to the client. It goes out in reply to the request being
+        handled, unless a parent is given (for replies sent from other threads)."""
         if self.silent:
             return
 
@@ -1374,12 +1475,16 @@ class Dash:
         if undo_msg:
             metadata = {"undo": undo_msg}
 
-        self.kernel.send_response(
-            self.kernel.iopub_socket if broadcast else self.kernel.shell_stream,
-            message_type if isinstance(message_type, str) else message_type.value,
-            content,
-            metadata=metadata,
-        )
+        stream = self.kernel.iopub_socket if broadcast else self.kernel.shell_stream
+        msg_type = message_type if isinstance(message_type, str) else message_type.value
+        if parent is not None:
+            self.kernel.session.send(
+                stream, msg_type, content, parent, metadata=metadata, buffers=buffers
+            )
+        else:
+            self.kernel.send_response(
+                stream, msg_type, content, metadata=metadata, buffers=buffers
+            )
 
     def notify_client_cells_have_changed(
         self,
@@ -1507,6 +1612,8 @@ class Dash:
             value is None or (isinstance(value, list) and not value)
         ):
             self.update_cell(address, Empty.MakeItSo)
+            if dynamic_unroll:
+                self.update_spill_region(address, [1])
             return address
 
         def strip_cell_range(value: Any, depth: int) -> Any:
@@ -1533,7 +1640,9 @@ class Dash:
             self.side_effect_cells.add(cell_address)
             if dy > 0 or dx > 0:
                 if dynamic_unroll:
-                    self.set_unroll_source(source_address, cell_address)
+                    # Cells still spilled from a previous run only get their value updated:
+                    if self.graph.calculated_by.get(cell_address) != source_address:
+                        self.set_unroll_source(source_address, cell_address)
                 else:
                     maybe_set_raw_code()
                     calculated_by = self.graph.calculated_by.pop(cell_address, None)
@@ -1543,9 +1652,14 @@ class Dash:
                 maybe_set_raw_code()
 
         def assign_cell(cell: Any, address: Address, dx: int = 0, dy: int = 0) -> None:
-            cell_address = replace(
-                address, column=address.column + dx, row=address.row + dy
-            )
+            cell_address = Address(address.column + dx, address.row + dy, address.sheet)
+            if (
+                dynamic_unroll
+                and (dx > 0 or dy > 0)
+                and self.graph.calculated_by.get(cell_address) == address
+                and self.spilled_value_unchanged(cell_address, cell)
+            ):
+                return
             handle_meta(cell, cell_address, address, dx, dy)
             self.update_cell(
                 cell_address,
@@ -1561,17 +1675,82 @@ class Dash:
             if w == 1 and h == 1:
                 value = strip_cell_range(value, 2)
                 assign_cell(value, address)
+                widths = [1]
             else:
                 value = [maybe_resolve_cell_ranges(row) for row in value]
+                widths = []
                 for dy, row in enumerate(value):
                     if not hasattr(row, "__iter__") or isinstance(row, str):
                         assign_cell(row, address, 0, dy)
+                        widths.append(1)
                         continue
+                    width = 0
                     for dx, cell in enumerate(row):
                         assign_cell(cell, address, dx, dy)
+                        width += 1
+                    widths.append(width)
+            if dynamic_unroll:
+                self.update_spill_region(address, widths)
 
         return address
 
+    def spilled_value_unchanged(self, address: Address, value: Any) -> bool:
+        """Whether a plain value that spills into address is what it holds already, so
+        that rerunning a big spill only touches the cells that changed."""
+        value = unproxy_val(value)
+        if type(value) not in (int, float, str, bool):
+            return False
+        current = self.cells[address.sheet].get(address)
+        return type(current) is type(value) and current == value
+
+    def update_spill_region(self, anchor: Address, widths: list[int]) -> None:
+        """Record the rectangle the value of anchor spilled into, given the number of
+        cells written to each row, and clear what it spilled into the previous time
+        that wasn't overwritten now. That takes time in proportion to the difference
+        between the two, not to their size."""
+        height = max(len(widths), 1)
+        width = max(*widths, 1)
+        region = Range(
+            anchor.column,
+            anchor.column + width - 1,
+            anchor.row,
+            anchor.row + height - 1,
+            anchor.sheet,
+        )
+        previous = self.graph.spill_regions.get(anchor)
+        self.graph.spill_regions[anchor] = region
+        if previous is None:
+            # Without a region, the cells were cleared before the anchor ran
+            return
+
+        def written(column: int, row: int) -> bool:
+            dy = row - anchor.row
+            return 0 <= dy < len(widths) and 0 <= column - anchor.column < widths[dy]
+
+        calculated_by = self.graph.calculated_by
+        stale = []
+        columns: Iterable[int]
+        for row in range(previous.min_row, previous.max_row + 1):
+            if region.min_row <= row <= region.max_row and (
+                widths[row - anchor.row] == width
+            ):
+                columns = range(region.max_col + 1, previous.max_col + 1)
+            else:
+                columns = [
+                    column
+                    for column in range(previous.min_col, previous.max_col + 1)
+                    if not written(column, row)
+                ]
+            for column in columns:
+                cell_id = Address(column, row, anchor.sheet)
+                if cell_id != anchor and calculated_by.get(cell_id) == anchor:
+                    stale.append(cell_id)
+        if stale:
+            for cell_id in stale:
+                self.unlink(cell_id)
+            self.clear_cells_internal(stale)
+            self.notify_client_cells_have_changed(stale)
+
     def initialize_colab(self, gsheet_id: str | None = None) -> None:
         from google.auth import default
         from google.colab import auth
@@ -1667,6 +1846,9 @@ class Dash:
             )
 
         item = self.from_coordinate(item)
+        if self.profiler is not None:
+            self.profiler.record_ref_read()
+        self.cells.hydrate(item.sheet)
 
         if isinstance(item, Address):
             check_max_col_for_address(item)
@@ -1682,6 +1864,7 @@ class Dash:
 
     def __setitem__(self, coord: AddressTuple, value: Any) -> None:
         address = self.from_coordinate(coord)
+        self.cells.hydrate(address.sheet)
 
         if isinstance(value, str | int | float | bool | Empty) or value is None:
             assert isinstance(address, Address)
@@ -1753,96 +1936,104 @@ class Dash:
             for statement in statements:
                 if isinstance(statement, ExecOp):
                     address = statement.address
-                    while True:
-                        skip_value_set = False
-                        try:
-                            with self.use_cell_id(address):
-                                value = eval(
-                                    statement.expression,
-                                    self.shell.user_global_ns,
-                                    self.shell.user_ns,
-                                )
-                            if (
-                                value is None
-                                and self._pending_display_msg
-                                and (
-                                    content := self._pending_display_msg.get("content")
-                                )
-                            ):
-                                value = output_to_value(content.get("data", {}))
-                            break
-                        except DashRecursionError:
-                            skip_value_set = True
-                            value = None  # to satisfy the linter, mostly
-                            break
-                        except NameError as e:
-                            if not is_cell(cell_addr_upper := e.name.upper()):
-                                value = self.stack_trace()
+                    self.metrics.record_eval()
+                    with self._profile(PHASE_EVAL, address):
+                        while True:
+                            skip_value_set = False
+                            try:
+                                with self.use_cell_id(address), deferring_calls():
+                                    value = eval(
+                                        statement.expression,
+                                        self.shell.user_global_ns,
+                                        self.shell.user_ns,
+                                    )
+                                if (
+                                    value is None
+                                    and self._pending_display_msg
+                                    and (
+                                        content := self._pending_display_msg.get(
+                                            "content"
+                                        )
+                                    )
+                                ):
+                                    value = output_to_value(content.get("data", {}))
                                 break
-                            cell = self.get_or_create_cell_meta(address)
-                            new_raw_code = rename_variable_in_code(
-                                cell.compiled_code,
-                                cell.raw_code,
-                                e.name,
-                                cell_addr_upper,
-                            )
-                            if new_raw_code is None:
-                                value = self.stack_trace()
+                            except DashRecursionError:
+                                skip_value_set = True
+                                value = None  # to satisfy the linter, mostly
                                 break
-
-                            cell.raw_code = new_raw_code
-
-                            self.compile_and_update_cell_meta(address)
-                            statement.expression = cell.compiled_code
-                        except SyntaxError as e:
-                            # Try parse a:b as A:B and a1:b1 as A1:B1
-                            if (
-                                e.offset is not None
-                                and e.end_offset is not None
-                                and e.text
-                                and e.text[
-                                    (start_offset := e.offset - 1) : (
-                                        end_offset := e.end_offset - 1
-                                    )
-                                ]
-                                == ":"
-                            ):
+                            except CallPending as e:
+                                value = self.eval_when_done(statement, e.future)
+                                break
+                            except NameError as e:
+                                if not is_cell(cell_addr_upper := e.name.upper()):
+                                    value = self.stack_trace()
+                                    break
                                 cell = self.get_or_create_cell_meta(address)
-                                positions: dict[tuple[int, int], str] = {}
-                                replaced_code = replace_n_with_a1(
+                                new_raw_code = rename_variable_in_code(
                                     cell.compiled_code,
-                                    func=replace_n_with_a1_match,
-                                    positions=positions,
+                                    cell.raw_code,
+                                    e.name,
+                                    cell_addr_upper,
                                 )
-                                modified_code = try_parse_capitalized_range(
-                                    replaced_code,
-                                    positions,
-                                    start_offset,
-                                    end_offset,
-                                )
-                                if modified_code:
-                                    cell.raw_code = "=" + modified_code
-                                    self.compile_and_update_cell_meta(address)
-                                    statement.expression = cell.compiled_code
+                                if new_raw_code is None:
+                                    value = self.stack_trace()
+                                    break
+
+                                cell.raw_code = new_raw_code
+
+                                self.compile_and_update_cell_meta(address)
+                                statement.expression = cell.compiled_code
+                            except SyntaxError as e:
+                                # Try parse a:b as A:B and a1:b1 as A1:B1
+                                if (
+                                    e.offset is not None
+                                    and e.end_offset is not None
+                                    and e.text
+                                    and e.text[
+                                        (start_offset := e.offset - 1) : (
+                                            end_offset := e.end_offset - 1
+                                        )
+                                    ]
+                                    == ":"
+                                ):
+                                    cell = self.get_or_create_cell_meta(address)
+                                    positions: dict[tuple[int, int], str] = {}
+                                    replaced_code = replace_n_with_a1(
+                                        cell.compiled_code,
+                                        func=replace_n_with_a1_match,
+                                        positions=positions,
+                                    )
+                                    modified_code = try_parse_capitalized_range(
+                                        replaced_code,
+                                        positions,
+                                        start_offset,
+                                        end_offset,
+                                    )
+                                    if modified_code:
+                                        cell.raw_code = "=" + modified_code
+                                        self.compile_and_update_cell_meta(address)
+                                        statement.expression = cell.compiled_code
+                                    else:
+                                        value = self.stack_trace()
+                                        break
                                 else:
                                     value = self.stack_trace()
                                     break
-                            else:
+
+                            except Exception:
                                 value = self.stack_trace()
                                 break
-
-                        except Exception:
-                            value = self.stack_trace()
-                            break
-                    is_awaitable = inspect.isawaitable(value)
-                    if not skip_value_set:
-                        if is_awaitable:
-                            task = asyncio.create_task(value)
-                            setattr(task, "neptyne_cell_id", address)
-                            awaitables.add(task)
-                        else:
-                            self.set_item(address, value, dynamic_unroll=True)
-                            changed.add(address)
+                        is_awaitable = inspect.isawaitable(value)
+                        if not skip_value_set:
+                            if is_awaitable:
+                                task = asyncio.create_task(value)
+                                setattr(task, "neptyne_cell_id", address)
+                                awaitables.add(task)
+                            else:
+                                with self._profile(PHASE_SET_ITEM, address):
+                                    self.set_item(address, value, dynamic_unroll=True)
+                                changed.add(address)
                     if not is_awaitable:
                         graph.done(address)
                 elif isinstance(statement, ClearOp):
@@ -1859,7 +2050,12 @@ class Dash:
                 for task in done:
                     addr = getattr(task, "neptyne_cell_id")
                     graph.done(addr)
-                    self.set_item(addr, task.result(), dynamic_unroll=True)
+                    try:
+                        value = task.result()
+                    except Exception:
+                        value = self.stack_trace()
+                    with self._profile(PHASE_SET_ITEM, addr):
+                        self.set_item(addr, value, dynamic_unroll=True)
                     changed.add(addr)
 
         self.notify_client_cells_have_changed(
@@ -1868,6 +2064,22 @@ class Dash:
         )
         return changed
 
+    async def eval_when_done(self, statement: ExecOp, future: Future) -> Any:
+        """Evaluate the statement again once the call it was waiting for is done"""
+        while True:
+            try:
+                await asyncio.wrap_future(future)
+                with self.use_cell_id(statement.address), deferring_calls():
+                    return eval(
+                        statement.expression,
+                        self.shell.user_global_ns,
+                        self.shell.user_ns,
+                    )
+            except CallPending as e:
+                future = e.future
+            except Exception:
+                return self.stack_trace()
+
     def maybe_notify_error(self, traceback: list[str]) -> None:
         for line in traceback:
             if service := get_api_error_service(line):
@@ -2136,19 +2348,22 @@ class Dash:
         return response  # type: ignore
 
     def clear_sheet(self, sheet_id: int) -> set[Address]:
-        if sheet_id in self.cells:
-            del self.cells[sheet_id]
+        self.forget_sent_cells(sheet_id)
+        self.cells.hydrate(sheet_id)
+        self.cells.drop(sheet_id)
         cells_to_reevaluate = set()
         for addr in [a for a in self.cell_meta.keys() if a.sheet == sheet_id]:
             for feeds_into_id in self.graph.feeds_into.get(addr, ()):
                 cells_to_reevaluate.add(feeds_into_id)
             self.disconnect_cell(addr)
+            self.graph.pop_names_mentioned(addr)
             del self.cell_meta[addr]
         return cells_to_reevaluate
 
     def rename_sheet_reference(self, old_name: str, new_name: str) -> None:
         changed: set[Address] = set()
         ref_name = repr(new_name) if not new_name.isidentifier() else new_name
+        self.cells.hydrate_all()
         for cell_id, cell_meta in self.cell_meta.items():
             raw_code = self.get_raw_code(cell_id)
             if self.has_formula(cell_id) and old_name in raw_code:
@@ -2182,6 +2397,7 @@ class Dash:
         )
 
     def update_execution_policy(self, address: Address, policy: int) -> None:
+        self.cells.hydrate(address.sheet)
         if address not in self.cell_meta and policy == -1:
             return
         metadata = self.get_or_create_cell_meta(address)
@@ -2200,6 +2416,7 @@ class Dash:
         self, address: Address, attribute: str, value: Any, overwrite: bool = True
     ) -> None:
         """Only updates the state in kernel without broadcast to the client"""
+        self.cells.hydrate(address.sheet)
         if attribute == CellAttribute.EXECUTION_POLICY.value:
             self.update_execution_policy(address, policy=int(value) if value else -1)
         else:
@@ -2220,6 +2437,7 @@ class Dash:
         for ud in update.updates:
             addr = Address.from_list(ud.cell_id)
             changed_addresses.add(addr)
+            self.cells.hydrate(addr.sheet)
             undo_change = copy.deepcopy(ud)
             attributes = (
                 self.cell_meta[addr].attributes if addr in self.cell_meta else None
@@ -2313,6 +2531,7 @@ class Dash:
             self.cell_meta,
             self.graph,
             self.tick_cell_queue.next_tick(),
+            self.cells.pending,
         )
         self.reply_to_client(
             MessageTypes.SAVE_KERNEL_STATE,
@@ -2324,21 +2543,26 @@ class Dash:
         )
 
     def process_function_changes(self, changed_fns: list[str]) -> None:
-        def should_rerun_cell(raw_code: str) -> bool:
-            for change in changed_fns:
-                if change in raw_code:
-                    if change in set(re.split(r"[\W]", raw_code)):
-                        return True
-            return False
-
-        cells_to_update = []
-        for cell_id, cell in self.cell_meta.items():
-            if (
-                self.has_formula(cell_id)
-                and should_rerun_cell(self.get_raw_code(cell_id))
-                and not cell.is_input_widget()
-            ):
-                cells_to_update.append(cell_id)
+        self.cells.hydrate_all()
+        if not self.graph.names_indexed:
+            # Formulas loaded with the tyne were compiled before, index their words:
+            names_mentioned = self.graph.names_mentioned
+            for cell_id, meta in self.cell_meta.items():
+                if cell_id not in names_mentioned and is_cell_formula(meta.raw_code):
+                    self.graph.set_names_mentioned(
+                        cell_id, words_in_code(meta.raw_code)
+                    )
+            self.graph.names_indexed = True
+
+        cells_to_update = sorted(
+            (
+                cell_id
+                for cell_id in self.graph.cells_mentioning(changed_fns)
+                if self.has_formula(cell_id)
+                and not self.cell_meta[cell_id].is_input_widget()
+            ),
+            key=lambda cell_id: (cell_id.sheet, cell_id.row, cell_id.column),
+        )
         self.reply_to_client(
             MessageTypes.RERUN_CELLS,
             RerunCellsContent(
@@ -2373,16 +2597,17 @@ class Dash:
             else None
         )
 
-        if cell_changes:
-            to_run = self.preprocess_changes(cell_changes)
-        else:
-            to_run = set(cell_ids) if cell_ids else set()
-        expected_changes = self.compile_and_execute_cells(
-            to_run,
-            pre_clear=pre_clear,
-            undo_content=undo_content,
-        )
-        self.flush_side_effects(expected_changes=expected_changes)
+        with self._profile(PHASE_RECALC):
+            if cell_changes:
+                to_run = self.preprocess_changes(cell_changes)
+            else:
+                to_run = set(cell_ids) if cell_ids else set()
+            expected_changes = self.compile_and_execute_cells(
+                to_run,
+                pre_clear=pre_clear,
+                undo_content=undo_content,
+            )
+            self.flush_side_effects(expected_changes=expected_changes)
 
     def copy_cells(self, d: dict) -> None:
         copy_cells_content = CopyCellsContent.from_dict(d)
@@ -2455,6 +2680,7 @@ class Dash:
         if expected_changes is None:
             expected_changes = set()
         try:
+            cascade_depth = 0
             for i in range(MAX_CASCADE_COUNT):
                 to_run = set()
                 if widget_trigger_cell:
@@ -2471,7 +2697,14 @@ class Dash:
                 to_run = to_run.difference(expected_changes)
                 if not to_run:
                     break
-                expected_changes = self.compile_and_execute_cells(to_run)
+                cascade_depth = i + 1
+                with self._profile(PHASE_CASCADE):
+                    expected_changes = self.compile_and_execute_cells(to_run)
+            self.metrics.record_cascade(cascade_depth)
+            if self.profiler is not None:
+                self.profiler.record_cascade(
+                    cascade_depth, hit_limit=cascade_depth == MAX_CASCADE_COUNT
+                )
             self.apply_on_value_change_rule(
                 expected_changes.union(self.side_effect_cells)
             )
@@ -2488,9 +2721,13 @@ class Dash:
         """Warning: Do not use this function standalone. Use flush_side_effects or run_cells_with_cascade.
         Using this standalone won't trigger proper cascading"""
         for cell_id in cells_to_run:
-            self.compile_and_update_cell_meta(cell_id)
+            with self._profile(PHASE_COMPILE, cell_id):
+                self.compile_and_update_cell_meta(cell_id)
 
-        execution_graph = self.get_execution_graph(cells_to_run, pre_clear=pre_clear)
+        with self._profile(PHASE_GRAPH):
+            execution_graph = self.get_execution_graph(
+                cells_to_run, pre_clear=pre_clear
+            )
 
         from jupyter_core.utils import run_sync
 
@@ -2499,12 +2736,18 @@ class Dash:
     def compute_run_cells_undo_changes(
         self, cell_changes: list[dict[str, Any]]
     ) -> dict:
-        content_before = []
-
+        cell_ids = []
         for dict_change in cell_changes:
             change = CellChange.from_dict(dict_change)
             assert change.cell_id
-            cell_id = Address(*change.cell_id)
+            cell_ids.append(Address(*change.cell_id))
+        return self.run_cells_undo_content(cell_ids)
+
+    def run_cells_undo_content(self, cell_ids: Iterable[Address]) -> dict:
+        """The RUN_CELLS content that puts back the cells as they are now"""
+        content_before = []
+
+        for cell_id in cell_ids:
             cell_meta = self.cell_meta.get(cell_id) or CellMetadata()
             code_before = self.get_raw_code(cell_id)
             attributes_before = cell_meta.attributes or {}
@@ -2570,6 +2813,7 @@ class Dash:
             )
         elif not cell_meta and not self.has_formula(cell_id):
             self.unlink(cell_id)
+            self.graph.pop_names_mentioned(cell_id)
             if cell_meta:
                 cell_meta.compiled_code = ""
             return
@@ -2594,6 +2838,9 @@ class Dash:
                 # We failed to compile. Try to run the code in the kernel, which will then send a
                 # message back to the user with the SyntaxError
                 cell_meta.compiled_code = self.get_raw_code(cell_id)
+                self.graph.set_names_mentioned(
+                    cell_id, words_in_code(cell_meta.compiled_code)
+                )
                 return
 
             cell_meta.compiled_code = compile_results.compiled_code
@@ -2602,6 +2849,7 @@ class Dash:
 
         # Rekey the graph from compilation result.
         self.update_cell_graph(cell_id, compile_results)
+        self.graph.set_names_mentioned(cell_id, compile_results.names_mentioned)
 
     def recompile_everything(self) -> None:
         for cell_id in self.all_keys():
@@ -2624,6 +2872,7 @@ class Dash:
         return CellExecutionGraph(self, cell_ids, pre_clear)
 
     def get_or_create_cell_meta(self, cell_id: Address) -> CellMetadata:
+        self.cells.hydrate(cell_id.sheet)
         if cell_id in self.cell_meta:
             return self.cell_meta[cell_id]
         cell_meta = CellMetadata(raw_code=self.get_raw_code(cell_id))
@@ -2633,6 +2882,7 @@ class Dash:
     def link(self, source_cell_id: Address, target_cell_id: Address) -> None:
         """source_cell's formula references target_cell"""
         if source_cell_id != target_cell_id:
+            self.cells.hydrate(target_cell_id.sheet)
             self.graph.depends_on.setdefault(source_cell_id, set()).add(target_cell_id)
             self.graph.feeds_into.setdefault(target_cell_id, set()).add(source_cell_id)
 
@@ -2640,6 +2890,8 @@ class Dash:
         """unlink a cell from the dependency graph of things it depends on"""
 
         def clear_from_other(other_id: Address | None) -> None:
+            if other_id:
+                self.cells.hydrate(other_id.sheet)
             if other_id and other_id in self.graph.feeds_into:
                 self.graph.feeds_into[other_id].discard(cell_id)
 
@@ -2750,6 +3002,7 @@ class Dash:
         self, transformation: Transformation
     ) -> tuple[Transformation, list[dict[str, Any]]]:
         cells_to_populate: list[dict[str, Any]]
+        self.cells.hydrate_all()
 
         if transformation.operation == SheetTransform.INSERT_BEFORE:
             return (
@@ -2807,6 +3060,10 @@ class Dash:
 
     def pre_execute(self) -> None:
         if not Dash.in_post_execute_hook:
+            # Requests from the client may come with edits it has already shown:
+            header = self._get_header()
+            if not header or header.get("orgMsgType") not in KERNEL_REQUESTS:
+                self.forget_sent_cells()
             if self._parent_header_matches_codepanel_cell():
                 self.clear_runtime_scoped_objects()
             self.write_secrets_to_fs()
@@ -2983,7 +3240,13 @@ class Dash:
     ) -> Iterator[TableForAI]:
         cells = self.cells.get(sheet_num, {})
         sheet = self.sheets[sheet_num]
-        return ai_tables_for_sheet(cells, sheet.name, assume_filled)
+        # Found again only once a cell of the sheet has changed:
+        key = (getattr(cells, "version", None), sheet.name, assume_filled)
+        cached = self.ai_tables.get(sheet_num)
+        if cached is None or cached[0] != key:
+            tables = [*ai_tables_for_sheet(cells, sheet.name, assume_filled)]
+            cached = self.ai_tables[sheet_num] = (key, tables)
+        return iter(cached[1])
 
     def init_widget_copy_from(self, cell_id: Address) -> BaseWidget | None:
         init_code = self.get_or_create_cell_meta(cell_id).compiled_code
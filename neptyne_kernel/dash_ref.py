@@ -48,6 +48,8 @@ class DashRef(ApiRef):
             if col > self.range.max_col > 0:
                 raise IndexError(f"Trying to read outside of cellrange ({col})")
             addr = Address(col, self.range.min_row, self.range.sheet)
+        if self.dash.profiler is not None:
+            self.dash.profiler.record_ref_read()
         return proxy_val(
             self.dash.cells[addr.sheet].get(addr), DashRef(self.dash, addr)
         )
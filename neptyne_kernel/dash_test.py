@@ -13,12 +13,24 @@ from .cell_range import CellRange
 from .dash import hash_function, shape
 from .formulas import AVERAGE
 from .formulas.helpers import assert_equal
-from .neptyne_protocol import Dimension, MessageTypes, SheetTransform
+from .insert_delete_helper import _update_keys_combined
+from .neptyne_protocol import (
+    CellAttributesUpdate,
+    CellAttributeUpdate,
+    Dimension,
+    MessageTypes,
+    SheetTransform,
+)
 from .ops import ClearOp, ExecOp
 from .test_utils import a1
 from .transformation import Transformation
 from .tyne_model.cell import SheetCell
 from .tyne_model.jupyter_notebook import Output, OutputType
+from .tyne_model.kernel_init_data import (
+    LAZY_SHEET_MIN_CELLS,
+    InitPhase2Payload,
+    TyneInitializationData,
+)
 from .tyne_model.sheet import TyneSheets
 
 
@@ -114,6 +126,91 @@ def test_neptyne_load_values(dash):
     assert dash[Address(2, 6, 0)] == 3503
 
 
+def load_lazily(dash, sheets: TyneSheets, lazy_sheet_id: int) -> None:
+    init_data = TyneInitializationData(
+        sheets=sheets,
+        code_panel_code="",
+        requirements="",
+        requires_recompile=False,
+        shard_id=0,
+        tyne_file_name="tyne",
+        in_gs_mode=False,
+        gsheets_sheet_id="",
+        time_zone="UTC",
+        env={},
+    )
+    payload = InitPhase2Payload.from_bytes(init_data.phase_2_payload().to_bytes())
+    assert set(payload.lazy_sheets) == {lazy_sheet_id}
+
+    dash.cells.pending.update(payload.lazy_sheets)
+    dash.load_values(payload.sheets)
+
+
+def test_lazy_sheet_hydration(dash):
+    sheets = TyneSheets()
+    sheets.sheets[0].cells[a1("A1")] = SheetCell(
+        cell_id=a1("A1"), output=1, feeds_into={Address(1, 0, 1)}
+    )
+    _, big_sheet = sheets.new_sheet("Big")
+    for row in range(LAZY_SHEET_MIN_CELLS):
+        address = Address(0, row, big_sheet.id)
+        big_sheet.cells[address] = SheetCell(cell_id=address, output=row)
+    formula = Address(1, 0, big_sheet.id)
+    big_sheet.cells[formula] = SheetCell(
+        cell_id=formula,
+        output=2,
+        raw_code="=Sheet0!A1 * 2",
+        compiled_code="N_[0, 0, 0] * 2",
+        depends_on={a1("A1")},
+    )
+    load_lazily(dash, sheets, big_sheet.id)
+    assert dash[a1("A1")] == 1
+    assert big_sheet.id not in dash.cells
+    assert "Big" in dash.sheets
+
+    # Cascading from Sheet0 into the lazy sheet loads it, including its part of the graph
+    dash.get_execution_graph({a1("A1")})
+    assert not dash.cells.pending
+    assert dash.graph.depends_on[formula] == {a1("A1")}
+    assert dash.get_raw_code(formula) == "=Sheet0!A1 * 2"
+    assert dash[Address(0, 10, big_sheet.id)] == 10
+
+
+def test_attributes_of_lazy_sheets(dash):
+    sheets = TyneSheets()
+    _, big_sheet = sheets.new_sheet("Big")
+    for row in range(LAZY_SHEET_MIN_CELLS):
+        address = Address(0, row, big_sheet.id)
+        big_sheet.cells[address] = SheetCell(cell_id=address, output=row)
+    bold = Address(1, 0, big_sheet.id)
+    big_sheet.cells[bold] = SheetCell(
+        cell_id=bold, output=1, attributes={"textStyle": "bold"}
+    )
+    ticking = Address(1, 1, big_sheet.id)
+    big_sheet.cells[ticking] = SheetCell(
+        cell_id=ticking, output=1, raw_code="=1", compiled_code="1"
+    )
+    load_lazily(dash, sheets, big_sheet.id)
+
+    notified = []
+    dash.notify_client_cells_have_changed = lambda *args, **kwargs: notified.append(
+        kwargs["undo"]
+    )
+    dash.update_cells_attributes(
+        CellAttributesUpdate(
+            updates=[CellAttributeUpdate("textStyle", bold.to_float_coord(), None)]
+        ).to_dict()
+    )
+    [(_, undo)] = notified
+    assert [update.get("value") for update in undo["updates"]] == ["bold"]
+
+    dash.update_execution_policy(ticking, 60)
+    dash.cells.hydrate_all()
+    assert "textStyle" not in dash.cell_meta[bold].attributes
+    assert dash.cell_meta[ticking].execution_policy == 60
+    assert dash.cell_meta[ticking].raw_code == "=1"
+
+
 def test_set_region(dash):
     dash[Address(0, 0, 0)] = [1, 2, 3]
 
@@ -540,6 +637,38 @@ def test_recompile_everything(dash):
     assert set(graph) == {a1("C1"), a1("A1")}
 
 
+def test_process_function_changes(dash):
+    replies = []
+    dash.reply_to_client = lambda msg_type, content: replies.append(content)
+
+    process_code_update(dash, "A1", "=foo(1)")
+    process_code_update(dash, "A2", "=bar(2) + foo(2)")
+    process_code_update(dash, "A3", '="foo"')
+    process_code_update(dash, "A4", "=foo(3)", should_compile=False)
+    process_code_update(dash, "A5", "=bar(1)")
+
+    def rerun(*changed_fns):
+        replies.clear()
+        dash.process_function_changes(list(changed_fns))
+        (reply,) = replies
+        return [Address.from_coord(address).to_a1() for address in reply["addresses"]]
+
+    # A4 wasn't compiled and gets indexed by the words in its code:
+    assert rerun("foo") == ["A1", "A2", "A4"]
+    assert rerun("bar", "baz") == ["A2", "A5"]
+
+    process_code_update(dash, "A1", "=baz()")
+    process_code_update(dash, "A4", "4")
+    assert rerun("foo") == ["A2"]
+
+    _update_keys_combined(
+        dash, {a1("A2"): a1("B2"), a1("A5"): a1("B5")}, [a1("A1")], []
+    )
+    assert rerun("bar") == ["B2", "B5"]
+    assert rerun("baz") == []
+    dash.graph.check_integrity()
+
+
 def test_get_autofill_context(dash):
     dash[a1("B1")] = "Hello"
     ctx = dash.get_autofill_context(1, 0, 0, 0, transpose=False)
@@ -656,3 +785,60 @@ def test_upload_csv(dash):
     assert dash.sheets[sheet_id].name == "countries"
 
     assert (dash[Range(0, 2, 0, 0, 1)] == ["country", "capital", "population"]).all()
+
+
+def test_flush_sends_changed_cells_once(dash):
+    replies = []
+    dash.reply_to_client = lambda msg_type, content, **kwargs: replies.append(
+        (content, kwargs["buffers"])
+    )
+
+    def flush(*addresses):
+        replies.clear()
+        dash.dirty_cells.update(addresses)
+        dash.flush_dirty_cells_now()
+        return replies
+
+    block = [Address(col, row, 0) for row in range(10) for col in range(2)]
+    dash[a1("A1")] = [[row * 2 + col + 0.5 for col in range(2)] for row in range(10)]
+    dash[a1("D1")] = "label"
+    [(content, buffers)] = flush(*block, Address(3, 0, 0))
+    assert content["cellUpdates"] == [[(3, 0, 0), "label"]]
+    assert content["packedCells"] == [[0, 0, 0, 2, 10]]
+    assert np.frombuffer(buffers[0]).tolist() == [i + 0.5 for i in range(20)]
+
+    assert flush(*block, Address(3, 0, 0)) == []
+
+    dash[a1("B2")] = 1
+    [(content, buffers)] = flush(*block)
+    assert content == {"cellUpdates": [[(1, 1, 0), 1, "1"]]}
+    assert buffers is None
+
+    dash.forget_sent_cells()
+    [(content, _buffers)] = flush(Address(1, 1, 0))
+    assert content == {"cellUpdates": [[(1, 1, 0), 1, "1"]]}
+
+    # Cleared cells are sent every time and not remembered:
+    dash.clear_cells_internal([Address(3, 0, 0)])
+    assert len(flush(Address(3, 0, 0))) == 1
+    assert len(flush(Address(3, 0, 0))) == 1
+    assert Address(3, 0, 0) not in dash.sent_cells
+
+    dash.sheets._register_sheet(1, "Sheet1")
+    dash[Address(0, 0, 1)] = 1
+    flush(Address(0, 0, 1))
+    dash.clear_sheet(1)
+    assert {address.sheet for address in dash.sent_cells} == {0}
+
+
+def test_ai_tables_are_found_again_once_the_sheet_changes(dash):
+    dash[a1("A1")] = [["One", "Two"], [1, 2], [3, 4]]
+    [table] = dash.ai_tables_for_sheet(0)
+    assert str(table.range) == "A1:B3"
+    assert next(iter(dash.ai_tables_for_sheet(0))) is table
+
+    dash[a1("A4")] = [[5, 6]]
+    [table] = dash.ai_tables_for_sheet(0)
+    assert str(table.range) == "A1:B4"
+    [table] = dash.ai_tables_for_sheet(0, Range.from_a1("A5:B5"))
+    assert str(table.range) == "A1:B5"
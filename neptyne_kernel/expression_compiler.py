@@ -1,6 +1,6 @@
 import ast
 import re
-from dataclasses import dataclass, replace
+from dataclasses import dataclass, field, replace
 from io import BytesIO
 from token import (
     COMMENT,
@@ -104,6 +104,14 @@ def find_fstring_expressions(s: str) -> list[tuple[str, int, int]]:
     return expressions
 
 
+IDENTIFIER_RE = re.compile(r"[^\W\d]\w*")
+
+
+def words_in_code(code: str) -> set[str]:
+    """Everything in code that could be an identifier, for when it can't be tokenized"""
+    return set(IDENTIFIER_RE.findall(code))
+
+
 def is_cell_formula(formula: str) -> bool:
     return formula.startswith("=")
 
@@ -196,6 +204,8 @@ class CompileResult:
     compiled_code: str
     cells_mentioned: set[Address]
     raw_code: str | None = None
+    # The identifiers the expression uses, from the tokenizer:
+    names_mentioned: set[str] = field(default_factory=set)
 
 
 def compile_shell(expression: str) -> str:
@@ -749,8 +759,13 @@ def in_excel_formula(function_expression_stack: list[str | None]) -> bool:
 def replacements(
     code: str,
     sheet_cell: bool,
+    names_mentioned: set[str] | None = None,
 ) -> Iterable[tuple[int, int, str, str | None]]:
     tokens = [*tokenize_with_ranges(code)]
+    if names_mentioned is not None:
+        names_mentioned.update(
+            tokval for toknum, tokval, *_ in tokens if toknum == NAME
+        )
     sheet_name = None
     line_lengths = [len(line) + 1 for line in code.splitlines()]
     function_expression_stack: list[str | None] = []
@@ -781,7 +796,7 @@ def replacements(
             if is_f_string(tokval):
                 for expr, start, end in find_fstring_expressions(tokval):
                     for rpos, rlength, replacement, sheet_name in replacements(
-                        expr, sheet_cell
+                        expr, sheet_cell, names_mentioned
                     ):
                         yield rpos + pos + start, rlength, replacement, sheet_name
         elif toknum == OP:
@@ -946,11 +961,14 @@ def compile_expression(
         target_sheet = 0
 
     cells_mentioned: set[Address] = set()
+    names_mentioned: set[str] = set()
 
     parts = []
     start = 0
 
-    for pos, length, replacement, sheet_name in replacements(expression, sheet_cell):
+    for pos, length, replacement, sheet_name in replacements(
+        expression, sheet_cell, names_mentioned
+    ):
         parts.append(expression[start:pos])
         if isinstance(replacement, (Address, Range)):
             cell_addr = replacement
@@ -1003,7 +1021,11 @@ def compile_expression(
                 code = " ".join(lines)
             else:
                 code = "\n".join(lines)
-            return CompileResult(compiled_code=code, cells_mentioned=cells_mentioned)
+            return CompileResult(
+                compiled_code=code,
+                cells_mentioned=cells_mentioned,
+                names_mentioned=names_mentioned,
+            )
     else:
         lines = compiled.splitlines()
 
@@ -1016,6 +1038,7 @@ def compile_expression(
         compiled_code=joiner.join(lines),
         cells_mentioned=cells_mentioned,
         raw_code="=" + expression,
+        names_mentioned=names_mentioned,
     )
 
 
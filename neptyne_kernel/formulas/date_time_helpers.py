@@ -1,7 +1,7 @@
 from calendar import isleap, monthrange
 from datetime import date, datetime, time
 from enum import IntEnum
-from functools import wraps
+from functools import lru_cache, wraps
 from typing import Callable, Iterable
 
 from dateutil.parser import ParserError
@@ -107,6 +107,12 @@ def find_pcd_ncd(
     return pcd, ncd
 
 
+# Coupon schedules are walked back from maturity one period at a time, and every
+# coupon function asks for them several times over, so keep the recent ones around:
+COUPON_SCHEDULE_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=COUPON_SCHEDULE_CACHE_SIZE)
 def find_coupon_dates(settl: date, mat: date, freq: int) -> tuple[date, date]:
     end_month = last_day_of_month(mat.year, mat.month, mat.day)
     num_months = -freq2months(freq)
@@ -2,12 +2,12 @@ import math
 from calendar import isleap
 from datetime import date
 from enum import IntEnum
-from functools import reduce
+from functools import lru_cache, reduce
 from typing import Callable
 
+import numpy as np
 import pyxirr
 from dateutil.relativedelta import relativedelta
-from scipy.optimize import root
 
 from ..cell_range import CellRange
 from ..spreadsheet_datetime import SpreadsheetDate
@@ -15,6 +15,7 @@ from ..spreadsheet_error import NUM_ERROR, ZERO_DIV_ERROR
 from .boolean import FALSE, TRUE, BooleanValue
 from .date_time_helpers import (
     _DAY_COUNT,
+    COUPON_SCHEDULE_CACHE_SIZE,
     AccrIntCalcMethod,
     DateValue,
     DayCountBasis,
@@ -454,6 +455,88 @@ def aggr_between(
     return initial_value
 
 
+# The price of a bond is a list of amounts, each discounted over a (fractional) number
+# of periods, less the accrued interest. The schedule only depends on the dates, so it
+# is worked out once and the sum is evaluated with NumPy for as many yields as needed.
+PriceTerms = tuple[np.ndarray, np.ndarray, float]
+
+
+def discounted_sum(
+    amounts: np.ndarray, periods: np.ndarray, yld: Numeric | np.ndarray, frequency: int
+) -> np.ndarray:
+    base = 1 + np.asarray(yld, dtype=float)[..., None] / frequency
+    return (amounts * base**-periods).sum(axis=-1)
+
+
+def discounted_sum_derivative(
+    amounts: np.ndarray, periods: np.ndarray, yld: Numeric | np.ndarray, frequency: int
+) -> np.ndarray:
+    base = 1 + np.asarray(yld, dtype=float)[..., None] / frequency
+    return (-amounts * periods / frequency * base ** (-periods - 1)).sum(axis=-1)
+
+
+def newton_bisect(
+    func: Callable[[np.ndarray], np.ndarray],
+    derivative: Callable[[np.ndarray], np.ndarray],
+    guess: np.ndarray,
+    low: float,
+    high: float,
+    tolerance: float = 1e-12,
+    max_iterations: int = 100,
+) -> np.ndarray:
+    """Find a root of func for every element of guess at once.
+
+    Newton steps are taken as long as they stay within [low, high], which is narrowed
+    down as we go; otherwise the bracket is bisected. Where func doesn't change sign
+    over [low, high] only Newton steps are taken. Elements that don't converge are nan.
+    """
+    x = np.array(guess, dtype=float)
+    low = np.full(x.shape, low, dtype=float)
+    high = np.full(x.shape, high, dtype=float)
+    done = np.zeros(x.shape, dtype=bool)
+    with np.errstate(all="ignore"):
+        sign_low = np.sign(func(low))
+        bracketed = sign_low * np.sign(func(high)) < 0
+        for _ in range(max_iterations):
+            f = func(x)
+            done |= f == 0
+            if done.all():
+                break
+            inside = bracketed & (low < x) & (x < high)
+            below = np.sign(f) == sign_low
+            low = np.where(inside & below, x, low)
+            high = np.where(inside & ~below, x, high)
+
+            x_new = x - f / derivative(x)
+            outside = ~np.isfinite(x_new) | (x_new <= low) | (x_new >= high)
+            x_new = np.where(bracketed & outside, (low + high) / 2, x_new)
+            converged = np.abs(x_new - x) <= tolerance * (1 + np.abs(x))
+            x = np.where(done, x, x_new)
+            done |= converged & np.isfinite(x)
+            if done.all():
+                break
+    return np.where(done, x, np.nan)
+
+
+def solve_yield(
+    terms: PriceTerms, pr: Numeric | np.ndarray, frequency: int, guess: Numeric
+) -> np.ndarray:
+    """The yields at which the bond described by terms has price pr"""
+    amounts, periods, accrued = terms
+    target = np.asarray(pr, dtype=float) + accrued
+    return newton_bisect(
+        lambda yld: discounted_sum(amounts, periods, yld, frequency) - target,
+        lambda yld: discounted_sum_derivative(amounts, periods, yld, frequency),
+        np.full(target.shape, guess, dtype=float),
+        -frequency / 2,
+        100 * frequency,
+    )
+
+
+def yield_or_error(yld: np.ndarray) -> Numeric:
+    return NUM_ERROR if np.isnan(yld) else float(yld)
+
+
 def CUMIPMT(
     rate: Numeric,
     nper: int,
@@ -984,42 +1067,35 @@ def days_between_not_neg_with_hack(
     )
 
 
-def odd_fprice(
+@lru_cache(maxsize=COUPON_SCHEDULE_CACHE_SIZE)
+def odd_fprice_terms(
     settlement: date,
     maturity: date,
     issue: date,
     first_coupon: date,
     rate: Numeric,
-    yld: Numeric,
     redemption: Numeric,
     frequency: int,
     basis: int,
-) -> Numeric:
+) -> PriceTerms:
     dc = _DAY_COUNT[basis]
     num_months = freq2months(frequency)
     num_months_neg = -num_months
     e = dc.coup_days(settlement, first_coupon, frequency)
     n = dc.coup_num(settlement, maturity, frequency)
     m = frequency
+    coupon = 100.0 * rate / m
     dfc = days_between_not_neg(dc, issue, first_coupon)
     if dfc < e:
         dsc = days_between_not_neg(dc, settlement, first_coupon)
         a = days_between_not_neg(dc, issue, settlement)
-        x = yld / m + 1
         y = dsc / e
-        p1 = x
-        p3 = p1 ** (n - 1 + y)
-        term1 = redemption / p3
-        term2 = 100.0 * rate / m * dfc / e / (p1**y)
-        term3 = aggr_between(
-            2,
-            int(n),
-            (lambda acc, index: acc + 100 * rate / m / (p1 ** (index - 1 + y))),
-            0,
+        coupons = np.arange(2, int(n) + 1)
+        amounts = np.concatenate(
+            ([redemption, coupon * dfc / e], np.full(len(coupons), coupon))
         )
-        p2 = rate / m
-        term4 = a / e * p2 * 100
-        return term1 + term2 + term3 - term4
+        periods = np.concatenate(([n - 1 + y, y], coupons - 1 + y))
+        return amounts, periods, coupon * a / e
     else:
         nc = dc.coup_num(issue, first_coupon, frequency)
         late_coupon = [first_coupon]
@@ -1051,20 +1127,30 @@ def odd_fprice(
             dsc = e - a
         nq = coup_number(first_coupon, settlement, num_months, basis, True)
         n = dc.coup_num(first_coupon, maturity, frequency)
-        x = yld / m + 1
         y = dsc / e
-        p1 = x
-        p3 = p1 ** (y + nq + n)
-        term1 = redemption / p3
-        term2 = 100.0 * rate / m * dcnl / p1 ** (nq + y)
-        term3 = aggr_between(
-            1,
-            int(n),
-            lambda acc, index: acc + 100.0 * rate / m / p1 ** (index + nq + y),
-            0,
+        coupons = np.arange(1, int(n) + 1)
+        amounts = np.concatenate(
+            ([redemption, coupon * dcnl], np.full(len(coupons), coupon))
         )
-        term4 = 100.0 * rate / m * anl
-        return term1 + term2 + term3 - term4
+        periods = np.concatenate(([y + nq + n, nq + y], coupons + nq + y))
+        return amounts, periods, coupon * anl
+
+
+def odd_fprice(
+    settlement: date,
+    maturity: date,
+    issue: date,
+    first_coupon: date,
+    rate: Numeric,
+    yld: Numeric,
+    redemption: Numeric,
+    frequency: int,
+    basis: int,
+) -> Numeric:
+    amounts, periods, accrued = odd_fprice_terms(
+        settlement, maturity, issue, first_coupon, rate, redemption, frequency, basis
+    )
+    return float(discounted_sum(amounts, periods, yld, frequency)) - accrued
 
 
 @convert_args_to_pydatetime([0, 1, 2, 3])
@@ -1119,21 +1205,10 @@ def odd_f_yield(
     num = rate * years * 100 - px
     denum = px / 4 + years * px / 2 + years * 100
     guess = num / denum
-    return root(
-        lambda yld: pr
-        - odd_fprice(
-            settlement,
-            maturity,
-            issue,
-            first_coupon,
-            rate,
-            yld,
-            redemption,
-            frequency,
-            basis,
-        ),
-        guess,
-    ).x
+    terms = odd_fprice_terms(
+        settlement, maturity, issue, first_coupon, rate, redemption, frequency, basis
+    )
+    return yield_or_error(solve_yield(terms, pr, frequency, guess))
 
 
 @convert_args_to_pydatetime([0, 1, 2, 3])
@@ -1305,6 +1380,7 @@ def PMT(
     )
 
 
+@lru_cache(maxsize=COUPON_SCHEDULE_CACHE_SIZE)
 def get_price_yield_factors(
     settlement: date, maturity: date, frequency: int, basis: int
 ) -> Numeric:
@@ -1316,30 +1392,40 @@ def get_price_yield_factors(
     return n, pcd, a, e, e - a
 
 
-def price(
+@lru_cache(maxsize=COUPON_SCHEDULE_CACHE_SIZE)
+def price_terms(
     settlement: date,
     maturity: date,
     rate: Numeric,
-    yld: Numeric,
     redemption: Numeric,
     frequency: int,
     basis: int,
-) -> Numeric:
+) -> PriceTerms:
     n, pcd, a, e, dsc = get_price_yield_factors(settlement, maturity, frequency, basis)
     coupon = 100 * rate / frequency
-    accr_int = 100 * rate / frequency * a / e
+    amounts = np.append(np.full(int(n), coupon), redemption)
+    periods = np.append(np.arange(int(n)) + dsc / e, n - 1 + dsc / e)
+    return amounts, periods, coupon * a / e
 
-    def pv_factor(k):
-        return (1 + yld / frequency) ** (k - 1 + dsc / e)
 
-    pv_of_redemption = redemption / pv_factor(n)
-    pv_of_coupons = 0
-    for k in range(1, int(n) + 1):
-        pv_of_coupons += coupon / pv_factor(k)
+def price(
+    settlement: date,
+    maturity: date,
+    rate: Numeric,
+    yld: Numeric,
+    redemption: Numeric,
+    frequency: int,
+    basis: int,
+) -> Numeric:
+    n, pcd, a, e, dsc = get_price_yield_factors(settlement, maturity, frequency, basis)
     if n == 1:
+        coupon = 100 * rate / frequency
+        accr_int = coupon * a / e
         return (redemption + coupon) / (1 + dsc / e * yld / frequency) - accr_int
-    else:
-        return pv_of_redemption + pv_of_coupons - accr_int
+    amounts, periods, accrued = price_terms(
+        settlement, maturity, rate, redemption, frequency, basis
+    )
+    return float(discounted_sum(amounts, periods, yld, frequency)) - accrued
 
 
 @convert_args_to_pydatetime([0, 1])
@@ -1664,11 +1750,8 @@ def yield_func(
             pr / 100 + (a / e * rate / frequency)
         ) - 1
         return k * frequency * e / dsr
-    return root(
-        lambda yld: price(settlement, maturity, rate, yld, redemption, frequency, basis)
-        - pr,
-        0.05,
-    ).x
+    terms = price_terms(settlement, maturity, rate, redemption, frequency, basis)
+    return yield_or_error(solve_yield(terms, pr, frequency, 0.05))
 
 
 @convert_args_to_pydatetime([0, 1])
@@ -1,6 +1,9 @@
-from datetime import date, datetime
+import random
+from datetime import date, datetime, timedelta
 
+import numpy as np
 import pytest
+from scipy.optimize import brentq
 
 from ..cell_range import CellRange
 from ..spreadsheet_datetime import SpreadsheetDate
@@ -62,6 +65,11 @@ from .financial import (
     YIELD,
     YIELDDISC,
     YIELDMAT,
+    get_price_yield_factors,
+    newton_bisect,
+    price,
+    price_terms,
+    solve_yield,
 )
 
 
@@ -1263,3 +1271,66 @@ def test_YIELDMAT(settlement, maturity, issue, rate, pr, basis, result):
     assert YIELDMAT(settlement, maturity, issue, rate, pr, basis) == pytest.approx(
         result, rel=1e-3
     )
+
+
+def loop_price(settlement, maturity, rate, yld, redemption, frequency, basis):
+    n, pcd, a, e, dsc = get_price_yield_factors(settlement, maturity, frequency, basis)
+    coupon = 100 * rate / frequency
+    pv_of_coupons = 0
+    for k in range(1, int(n) + 1):
+        pv_of_coupons += coupon / (1 + yld / frequency) ** (k - 1 + dsc / e)
+    pv_of_redemption = redemption / (1 + yld / frequency) ** (n - 1 + dsc / e)
+    return pv_of_redemption + pv_of_coupons - coupon * a / e
+
+
+def test_price_and_yield_match_reference():
+    rng = random.Random(7)
+    for _ in range(200):
+        settlement = date(2000, 1, 1) + timedelta(rng.randint(0, 8000))
+        maturity = settlement + timedelta(rng.randint(200, 11000))
+        rate = rng.choice([0, 0.02, 0.0575, 0.5])
+        yld = rng.choice([0.001, 0.03, 0.07, 0.2])
+        frequency = rng.choice([1, 2, 4])
+        basis = rng.randint(0, 4)
+        args = settlement, maturity, rate
+        if get_price_yield_factors(settlement, maturity, frequency, basis)[0] <= 1:
+            continue
+
+        pr = PRICE(*args, yld, 100, frequency, basis)
+        assert pr == pytest.approx(
+            loop_price(*args, yld, 100, frequency, basis), rel=1e-12
+        )
+        expected = brentq(
+            lambda y: loop_price(*args, y, 100, frequency, basis) - pr, -0.5, 10
+        )
+        assert YIELD(*args, pr, 100, frequency, basis) == pytest.approx(
+            expected, rel=1e-9, abs=1e-12
+        )
+
+
+def test_solve_yield_for_many_prices():
+    terms = price_terms(date(2010, 1, 2), date(2039, 12, 31), 0.05, 100, 2, 0)
+    prices = np.linspace(20, 300, 1000)
+    ylds = solve_yield(terms, prices, 2, 0.05)
+    assert ylds.shape == prices.shape
+    assert np.all(np.diff(ylds) < 0)
+    # Prices above the bond's value at a zero yield need a negative one:
+    assert ylds[-1] < 0
+    for pr, yld in zip(prices[::97], ylds[::97]):
+        assert price(
+            date(2010, 1, 2), date(2039, 12, 31), 0.05, yld, 100, 2, 0
+        ) == pytest.approx(pr, rel=1e-9)
+
+
+def test_newton_bisect():
+    # Newton alone overshoots on arctan from far out; the bracket catches that:
+    roots = newton_bisect(
+        lambda x: np.arctan(x - np.array([1.0, -2.0, 3.0])),
+        lambda x: 1 / (1 + (x - np.array([1.0, -2.0, 3.0])) ** 2),
+        np.array([10.0, 10.0, 3.0]),
+        -100,
+        100,
+    )
+    assert roots == pytest.approx([1, -2, 3])
+    # No sign change and no convergence:
+    assert np.isnan(newton_bisect(lambda x: x**2 + 1, lambda x: 2 * x, [1.0], 0, 1))
@@ -9,7 +9,7 @@ import numpy as np
 import roman
 
 from ..cell_range import CellRange
-from ..primitives import check_none
+from ..primitives import NeptyneFloat, NeptyneInt, check_none
 from ..spreadsheet_datetime import SpreadsheetDateTime
 from ..spreadsheet_error import (
     NA_ERROR,
@@ -262,6 +262,88 @@ def mat_func(
     return decorator
 
 
+# What range_to_array found in each cell:
+NUMBER, BOOLEAN, TEXT, EMPTY, ERROR = range(5)
+
+_PLAIN_NUMBER_TYPES = frozenset(
+    (int, float, bool, np.float64, NeptyneInt, NeptyneFloat)
+)
+
+
+def flatten_values(args: Iterable) -> list:
+    """Flattens (nested) ranges and other iterables into one list of cell values, in the
+    order agg_func visits them."""
+    values = []
+    for arg in args:
+        if (
+            type(arg) in _PLAIN_NUMBER_TYPES
+            or isinstance(arg, str | BooleanValue | SpreadsheetError)
+            or check_none(arg)
+            or not isinstance(arg, Iterable)
+        ):
+            values.append(arg)
+        else:
+            values.extend(flatten_values(arg))
+    return values
+
+
+def range_to_array(args: Iterable) -> tuple[np.ndarray, np.ndarray]:
+    """Reads the cell values in args into an array of floats and an array with the kind of
+    each value (NUMBER, BOOLEAN, TEXT, EMPTY or ERROR) to mask them with. Booleans read as
+    0 or 1, other non-numbers as 0. Anything else that can't be converted to a float
+    raises a TypeError."""
+    return _values_to_array(flatten_values(args))
+
+
+def _values_to_array(values: list) -> tuple[np.ndarray, np.ndarray]:
+    if set(map(type, values)) <= _PLAIN_NUMBER_TYPES:
+        return np.array(values, dtype=float), np.full(len(values), NUMBER, np.int8)
+
+    numbers = np.zeros(len(values))
+    kinds = np.full(len(values), NUMBER, np.int8)
+    for i, value in enumerate(values):
+        if isinstance(value, str):
+            kinds[i] = TEXT
+        elif check_none(value):
+            kinds[i] = EMPTY
+        elif isinstance(value, BooleanValue):
+            kinds[i] = BOOLEAN
+            numbers[i] = int(value)
+        elif isinstance(value, SpreadsheetError):
+            kinds[i] = ERROR
+        else:
+            numbers[i] = float(value)
+    return numbers, kinds
+
+
+def agg_array(
+    args: Iterable,
+    count_text=True,
+    count_bool=True,
+    count_empty=False,
+    bool_as_num=False,
+) -> np.ndarray:
+    """The values agg_func would pass on, as an array of floats. Raises a
+    SpreadsheetErrorException for the first error in args."""
+    values = flatten_values(args)
+    numbers, kinds = _values_to_array(values)
+    if kinds.any():
+        errors = np.flatnonzero(kinds == ERROR)
+        if len(errors):
+            raise SpreadsheetErrorException(values[errors[0]])
+        keep = kinds == NUMBER
+        if count_text:
+            keep |= kinds == TEXT
+        if count_empty:
+            keep |= kinds == EMPTY
+        if count_bool:
+            keep |= kinds == BOOLEAN
+            if not bool_as_num:
+                numbers[kinds == BOOLEAN] = 0
+        numbers = numbers[keep]
+    return numbers
+
+
 def agg_func(
     func,
     make_list=False,
@@ -270,10 +352,29 @@ def agg_func(
     count_empty=False,
     bool_as_num=False,
     result_if_zero=0,
+    as_array=False,
 ):
+    """Aggregates over all values in the arguments, flattening ranges. With as_array, func
+    is called with an array of floats rather than the values themselves."""
+
     def decorator(f):
         @wraps(f)
         def wrapper(*args):
+            if as_array:
+                try:
+                    values = agg_array(
+                        args, count_text, count_bool, count_empty, bool_as_num
+                    )
+                    if make_list and not len(values):
+                        return result_if_zero
+                    return func(values)
+                except SpreadsheetErrorException as e:
+                    return e.args[0]
+                except TypeError:
+                    return VALUE_ERROR
+                except (RecursionError, ValueError, FloatingPointError):
+                    return NUM_ERROR
+
             def flatten(args):
                 for arg in args:
                     if isinstance(arg, str):
@@ -479,7 +580,10 @@ def cellrange2np(cell_range, count_bool=True, raise_on_error=True):
     dtypes = tuple(dtypes)
     if cell_range.two_dimensional:
         return np.asarray([np.array(x) for x in cell_range])
-    return np.asarray([as_number(n) for n in cell_range if isinstance(n, dtypes)])
+    values = [*cell_range]
+    if set(map(type, values)) <= _PLAIN_NUMBER_TYPES:
+        return np.array(values)
+    return np.asarray([as_number(n) for n in values if isinstance(n, dtypes)])
 
 
 def assert_equal(value, expected):
@@ -1,6 +1,6 @@
 import math
-import operator
 import statistics
+from collections import OrderedDict
 from typing import Callable, Iterable
 
 import numpy as np
@@ -16,12 +16,10 @@ from scipy.stats import (
     hypergeom,
     linregress,
     lognorm,
-    median_abs_deviation,
     nbinom,
     norm,
     pearsonr,
     poisson,
-    rankdata,
     t,
     trim_mean,
     ttest_ind,
@@ -138,7 +136,21 @@ __all__ = [
 from ..primitives import Empty
 
 
-@agg_func(median_abs_deviation)
+def _variance(a: np.ndarray, ddof: int) -> float:
+    # Too few values is an error, like it is for statistics.variance
+    if len(a) <= ddof:
+        raise ValueError("not enough values")
+    return float(np.var(a, ddof=ddof))
+
+
+@agg_func(
+    lambda a: float(np.mean(np.abs(a - a.mean()))),
+    make_list=True,
+    count_text=False,
+    count_bool=False,
+    result_if_zero=NUM_ERROR,
+    as_array=True,
+)
 def AVEDEV(number: CellValue, *numbers: CellValue) -> Numeric:
     """Returns the average of the absolute deviations of data points from their mean"""
     pass
@@ -565,26 +577,46 @@ class PERCENTILE:
         pass
 
 
+# RANK and PERCENTRANK filled down a column look up each of its values in the same range.
+# The last few ranges are kept sorted, so that each lookup is a binary search.
+SORTED_CACHE_SIZE = 8
+_sorted_arrays: OrderedDict[tuple, tuple[np.ndarray, np.ndarray]] = OrderedDict()
+
+
+def _sorted(arr: np.ndarray) -> np.ndarray:
+    """arr flattened and sorted, from the cache if it was sorted recently."""
+    key = (arr.dtype.str, arr.shape, hash(arr.tobytes()))
+    if (cached := _sorted_arrays.get(key)) is not None and np.array_equal(
+        cached[0], arr
+    ):
+        _sorted_arrays.move_to_end(key)
+        return cached[1]
+    result = np.sort(arr, axis=None)
+    _sorted_arrays[key] = (arr.copy(), result)
+    if len(_sorted_arrays) > SORTED_CACHE_SIZE:
+        _sorted_arrays.popitem(last=False)
+    return result
+
+
 def _percent_rank(arr, score, sig_digits=3, exc=False):
-    data_len = len(arr)
+    data_len = arr.size
     if not data_len or sig_digits < 1:
         return NUM_ERROR
-    op = operator.__lt__  # operator.__le__ if exc else operator.__lt__
     bound_len = data_len + 1 if exc else data_len - 1
-    arr = np.asarray(arr)
-    if score in arr:
-        small = op(arr, score).sum() + int(exc)
+    arr = _sorted(arr)
+    # The number of values smaller than the score:
+    position = int(np.searchsorted(arr, score))
+    if position < data_len and arr[position] == score:
+        small = position + int(exc)
         return round_to_digits_func(small / bound_len, sig_digits, int)
     else:
-        if score < arr.min() or score > arr.max():
+        if score < arr[0] or score > arr[-1]:
             return NA_ERROR
         else:
-            arr = np.sort(arr)
-            position = np.searchsorted(arr, score)
             small = arr[position - 1]
             large = arr[position]
-            small_rank = (op(arr, score).sum() - int(not exc)) / bound_len
-            large_rank = (op(arr, score).sum() + int(exc)) / bound_len
+            small_rank = (position - int(not exc)) / bound_len
+            large_rank = (position + int(exc)) / bound_len
             step = (score - small) / (large - small)
             rank = small_rank + step * (large_rank - small_rank)
 
@@ -752,25 +784,31 @@ def MINA(value1: CellValue, *values: CellValue) -> Numeric:
     pass
 
 
-def _rank(n, rng, o, method="average"):
-    flat_rng = list(rng if o else -rng)
-
-    ranks = rankdata(flat_rng, method=method)
-    try:
-        return ranks[flat_rng.index(n if o else -n)]
-    except ValueError:
+def _rank(n, rng, o=0, average=False):
+    if n.size != 1:
         return NA_ERROR
+    n = n.item()
+    rng = _sorted(rng)
+    smaller = int(np.searchsorted(rng, n, "left"))
+    equal = int(np.searchsorted(rng, n, "right")) - smaller
+    if not equal:
+        return NA_ERROR
+    # In descending order (the default) the values that are bigger go first:
+    before = smaller if o else rng.size - smaller - equal
+    if average:
+        return before + (equal + 1) / 2
+    return before + 1
 
 
 class RANK:
     @staticmethod
-    @mat_func(lambda n, r, o: _rank(n, r, o, "average"), NUM_ERROR)
+    @mat_func(lambda n, r, o=0: _rank(n, r, o, average=True), NUM_ERROR)
     def AVG(number: Numeric, ref: CellValue, order: int = 0) -> Numeric:
         """Returns the rank of a number in a list of numbers"""
         pass
 
     @staticmethod
-    @mat_func(lambda n, r, o: _rank(n, r, o, "min"), NUM_ERROR)
+    @mat_func(_rank, NUM_ERROR)
     def EQ(number: Numeric, ref: CellValue, order: int = 0) -> Numeric:
         """Returns the rank of a number in a list of numbers"""
         pass
@@ -787,18 +825,18 @@ def RSQ(known_ys: Matrix, known_xs: Matrix) -> Numeric:
     pass
 
 
-def _skew(args, p=False):
-    n = len(args)
+def _skew(a: np.ndarray, p=False):
+    n = len(a)
     if n < 3:
         return ZERO_DIV_ERROR
-    s = statistics.pstdev(args) if p else statistics.stdev(args)
+    s = np.std(a, ddof=0 if p else 1)
     if not s:
         return ZERO_DIV_ERROR
-    u = statistics.mean(args)
+    cubes = float(np.sum(((a - a.mean()) / s) ** 3))
     if p:
-        return sum(((x - u) / s) ** 3 for x in args) / n
+        return cubes / n
     else:
-        return n / ((n - 1) * (n - 2)) * sum(((x - u) / s) ** 3 for x in args)
+        return n / ((n - 1) * (n - 2)) * cubes
 
 
 @num_func(norm.pdf)
@@ -808,7 +846,11 @@ def PHI(number: Numeric) -> Numeric:
 
 
 @agg_func(
-    lambda args: _skew(args, False), make_list=True, bool_as_num=True, count_text=False
+    lambda a: _skew(a, False),
+    make_list=True,
+    bool_as_num=True,
+    count_text=False,
+    as_array=True,
 )
 def SKEW(number: CellValue, *numbers: CellValue) -> Numeric:
     """Returns the skewness of a distribution"""
@@ -816,7 +858,11 @@ def SKEW(number: CellValue, *numbers: CellValue) -> Numeric:
 
 
 @agg_func(
-    lambda args: _skew(args, True), make_list=True, bool_as_num=True, count_text=False
+    lambda a: _skew(a, True),
+    make_list=True,
+    bool_as_num=True,
+    count_text=False,
+    as_array=True,
 )
 def _skew_p(number: CellValue, *numbers: CellValue) -> Numeric:
     """Returns the skewness of a distribution based on a population: a characterization of the degree of asymmetry of a distribution around its mean"""
@@ -832,13 +878,13 @@ def SLOPE(known_ys: Matrix, known_xs: Matrix) -> Numeric:
     pass
 
 
-@agg_func(statistics.stdev)
+@agg_func(lambda a: math.sqrt(_variance(a, 1)), as_array=True)
 def STDEV(value1: CellValue, *values: CellValue) -> Numeric:
     """Estimates standard deviation based on a sample"""
     pass
 
 
-@agg_func(statistics.pstdev)
+@agg_func(lambda a: math.sqrt(_variance(a, 0)), as_array=True)
 def STDEVP(value1: CellValue, *values: CellValue) -> Numeric:
     """Calculates standard deviation based on the entire population"""
     pass
@@ -848,13 +894,23 @@ STDEV.S = STDEV
 STDEV.P = STDEVP
 
 
-@agg_func(statistics.stdev, count_text=True, bool_as_num=True)
+@agg_func(
+    lambda a: math.sqrt(_variance(a, 1)),
+    count_text=True,
+    bool_as_num=True,
+    as_array=True,
+)
 def STDEVA(value1: CellValue, *values: CellValue) -> Numeric:
     """Estimates standard deviation based on a sample, including numbers, text, and logical values"""
     pass
 
 
-@agg_func(statistics.pstdev, count_text=True, bool_as_num=True)
+@agg_func(
+    lambda a: math.sqrt(_variance(a, 0)),
+    count_text=True,
+    bool_as_num=True,
+    as_array=True,
+)
 def STDEVPA(value1: CellValue, *values: CellValue) -> Numeric:
     """Calculates standard deviation based on the entire population, including numbers, text, and logical values"""
     pass
@@ -878,13 +934,13 @@ def STANDARDIZE(x: Numeric, mean: Numeric, st_dev: Numeric) -> Numeric:
     pass
 
 
-@agg_func(statistics.variance)
+@agg_func(lambda a: _variance(a, 1), as_array=True)
 def VAR(value1: CellValue, *values: CellValue) -> Numeric:
     """Estimates variance based on a sample"""
     pass
 
 
-@agg_func(statistics.pvariance)
+@agg_func(lambda a: _variance(a, 0), as_array=True)
 def VARP(value1: CellValue, *values: CellValue) -> Numeric:
     """Calculates variance based on the entire population"""
     pass
@@ -894,13 +950,13 @@ VAR.S = VAR
 VAR.P = VARP
 
 
-@agg_func(statistics.variance, count_text=True, bool_as_num=True)
+@agg_func(lambda a: _variance(a, 1), count_text=True, bool_as_num=True, as_array=True)
 def VARA(value1: CellValue, *values: CellValue) -> Numeric:
     """Estimates variance based on a sample, including numbers, text, and logical values"""
     pass
 
 
-@agg_func(statistics.pvariance, count_text=True, bool_as_num=True)
+@agg_func(lambda a: _variance(a, 0), count_text=True, bool_as_num=True, as_array=True)
 def VARPA(value1: CellValue, *values: CellValue) -> Numeric:
     """Calculates variance based on the entire population, including numbers, text, and logical values"""
     pass
@@ -1251,8 +1307,13 @@ def FORECAST_ETS(
 
 
 def _frequency(data, bins):
-    bins = bins.ravel()
-    bins.sort()
+    bins = np.sort(bins, axis=None)
+    if data.dtype.kind in "biuf" and bins.dtype.kind in "biuf":
+        # Each value counts towards the first bin that is at least as big:
+        freqs = np.bincount(
+            np.searchsorted(bins, data.ravel()), minlength=len(bins) + 1
+        ).tolist()
+        return freqs if len(bins) else [0, *freqs]
     freqs = [0] * (len(bins) + 1)
     for item in data.ravel():
         for i, bin_val in enumerate(bins):
@@ -1387,19 +1448,18 @@ class HYPGEOM:
         pass
 
 
-def _kurt(args):
-    n = len(args)
-    if len(args) < 4:
+def _kurt(a: np.ndarray):
+    n = len(a)
+    if n < 4:
         return ZERO_DIV_ERROR
-    s = statistics.stdev(args)
+    s = np.std(a, ddof=1)
     if not s:
         return ZERO_DIV_ERROR
-    xi = statistics.mean(args)
     n1 = n - 1
     n2 = n - 2
     n3 = n - 3
-    return n * (n + 1) / (n1 * n2 * n3) * np.sum(
-        ((np.array(args) - xi) / s) ** 4
+    return n * (n + 1) / (n1 * n2 * n3) * float(
+        np.sum(((a - a.mean()) / s) ** 4)
     ) - 3 * n1**2 / (n2 * n3)
 
 
@@ -1410,6 +1470,7 @@ def _kurt(args):
     count_bool=False,
     make_list=True,
     result_if_zero=ZERO_DIV_ERROR,
+    as_array=True,
 )
 def KURT(value1: CellValue, *values: CellValue) -> Numeric:
     """Returns the kurtosis of a data set"""
@@ -1417,12 +1478,13 @@ def KURT(value1: CellValue, *values: CellValue) -> Numeric:
 
 
 @agg_func(
-    lambda a: np.sum((np.asarray(a) - np.mean(a)) ** 2),
+    lambda a: float(np.sum((a - a.mean()) ** 2)),
     count_text=False,
     bool_as_num=False,
     count_bool=False,
     make_list=True,
     result_if_zero=ZERO_DIV_ERROR,
+    as_array=True,
 )
 def DEVSQ(value1: CellValue, *values: CellValue) -> Numeric:
     """Returns the sum of squares of deviations"""
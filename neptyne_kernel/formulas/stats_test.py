@@ -1,5 +1,9 @@
 # ruff: noqa: F405
+import random
+import statistics
+
 import pytest
+from scipy.stats import rankdata
 
 from ..cell_range import CellRange
 from ..spreadsheet_datetime import *  # noqa: F403
@@ -7,6 +11,7 @@ from ..spreadsheet_error import *  # noqa: F403
 from .boolean import *  # noqa: F403
 from .helpers import assert_equal, cellrange2np
 from .stats import *  # noqa: F403
+from .stats import _sorted_arrays
 
 
 @pytest.mark.parametrize(
@@ -18,7 +23,7 @@ from .stats import *  # noqa: F403
     ],
 )
 def test_AVEDEV(args, result):
-    return AVEDEV(*args) == pytest.approx(result)
+    assert AVEDEV(*args) == pytest.approx(result)
 
 
 @pytest.mark.parametrize(
@@ -2096,3 +2101,91 @@ def test_AGGREGATE(function_num, options, args, result):
     assert AGGREGATE(function_num, options, *args) == (
         result if not isinstance(result, float) else pytest.approx(result, 1e-3)
     )
+
+
+DISPERSION_CASES = [
+    ((CellRange([1, 2, 3, 4]),), [1, 2, 3, 4]),
+    # Text and booleans in a range count as 0, empty cells are skipped:
+    ((CellRange([1, "x", TRUE, None, 2.5]), 7), [1, 0, 0, 2.5, 7]),
+    ((CellRange([[1, 2], [3, 1e10]]),), [1, 2, 3, 1e10]),
+    ((CellRange([0.1] * 5),), [0.1] * 5),
+    ((CellRange([-5, 5]), SpreadsheetDateTime(45000.5)), [-5, 5, 45000.5]),
+]
+
+
+@pytest.mark.parametrize(
+    "func, reference",
+    [
+        (STDEV, statistics.stdev),
+        (STDEV.P, statistics.pstdev),
+        (VAR, statistics.variance),
+        (VAR.P, statistics.pvariance),
+    ],
+)
+@pytest.mark.parametrize("args, values", DISPERSION_CASES)
+def test_dispersion_matches_statistics(func, reference, args, values):
+    assert func(*args) == pytest.approx(reference(values), rel=1e-12, abs=1e-12)
+
+
+def test_dispersion_errors():
+    assert STDEV(CellRange([1])) == NUM_ERROR
+    assert VAR(CellRange([None, None])) == NUM_ERROR
+    assert VAR.P(CellRange([3])) == 0
+    assert STDEV(CellRange([1, 2, NA_ERROR, VALUE_ERROR])) == NA_ERROR
+    assert VAR(CellRange([1, 2]), [object()]) == VALUE_ERROR
+
+
+def reference_rank(n, values, order, method):
+    flat = [value if order else -value for value in values]
+    ranks = rankdata(flat, method=method)
+    try:
+        return ranks[flat.index(n if order else -n)]
+    except ValueError:
+        return NA_ERROR
+
+
+def test_RANK_matches_rankdata():
+    rng = random.Random(7)
+    values = [rng.randint(0, 200) / 4 for _ in range(2000)]
+    column = CellRange(values)
+    _sorted_arrays.clear()
+    for order in 0, 1:
+        for n in values[:100] + [-1, 1000, 0.1]:
+            assert RANK.EQ(n, column, order) == reference_rank(n, values, order, "min")
+            assert RANK.AVG(n, column, order) == reference_rank(
+                n, values, order, "average"
+            )
+    # The column was only sorted once:
+    assert len(_sorted_arrays) == 1
+
+
+def test_RANK():
+    ref = CellRange([7, 3.5, 3.5, 1, 2, "text", None])
+    assert RANK.EQ(3.5, ref) == 2
+    assert RANK.EQ(3.5, ref, 1) == 3
+    assert RANK.AVG(3.5, ref) == 2.5
+    assert RANK.AVG(7, ref, 1) == 5
+    assert RANK.EQ(5, ref) == NA_ERROR
+    assert RANK.EQ(2, CellRange([[1, 2], [3, 4]])) == 3
+
+
+def reference_frequency(data, bins):
+    bins = sorted(bins)
+    freqs = [0] * (len(bins) + 1)
+    for item in data:
+        for i, bin_val in enumerate(bins):
+            if item <= bin_val:
+                freqs[i] += 1
+                break
+        else:
+            freqs[len(bins)] += 1
+    return freqs if bins else [0, *freqs]
+
+
+@pytest.mark.parametrize("num_bins", [0, 1, 5, 50])
+def test_FREQUENCY_matches_loop(num_bins):
+    rng = random.Random(num_bins)
+    data = [rng.randint(-100, 100) for _ in range(1000)]
+    bins = [rng.randint(-120, 120) for _ in range(num_bins)]
+    result = FREQUENCY(CellRange(data), CellRange(bins))
+    assert result.to_list() == [[f] for f in reference_frequency(data, bins)]
@@ -1280,3 +1280,14 @@ def test_TEXT_duration(value, format_text, result):
 )
 def test_TEXT_duration_from_timedelta(value, format_text, result):
     assert TEXT(value.total_seconds() / 86400, format_text) == result
+
+
+def test_TEXT_range():
+    assert TEXT(CellRange([[1, 2.5], [-3, "x"]]), "#,##0.00").to_list() == [
+        ["1.00", "2.50"],
+        ["-3.00", "x"],
+    ]
+    assert TEXT(CellRange([43648, 43648.75]), "yyyy-mm-dd hh:mm").to_list() == [
+        "2019-07-02 00:00",
+        "2019-07-02 18:00",
+    ]
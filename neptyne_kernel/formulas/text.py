@@ -3,6 +3,7 @@ import re
 from itertools import cycle
 
 import jaconv
+import numpy as np
 from bahttext import bahttext
 
 from ..cell_range import CellRange
@@ -561,6 +562,9 @@ def VALUETOTEXT(value: SimpleCellValue, ret_format: int = 0) -> str:
     return value
 
 
-def TEXT(value: Numeric, format_text: str) -> str:
+def TEXT(value: Numeric | CellRange, format_text: str) -> str | CellRange:
     """Formats a number and converts it to text"""
+    if isinstance(value, CellRange):
+        values = np.array(value.to_list(), dtype=object)
+        return CellRange(formatter.format_array(values, format_text).tolist())
     return formatter.run(value, format_text)
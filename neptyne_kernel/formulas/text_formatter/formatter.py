@@ -1,29 +1,34 @@
 import calendar
 from datetime import datetime, timedelta
-from math import floor, log10
-from typing import Any
+from functools import lru_cache, partial
+from math import floor, isfinite, log10
+from typing import Any, Callable
 
-from ...spreadsheet_datetime import excel2datetime
+import numpy as np
+
+from ...spreadsheet_datetime import excel2datetime, excel2datetime64
 from ..helpers import round_half_up
 from .decimal_section import DecimalSection
-from .evaluator import get_section
-from .number_format import NumberFormat
+from .evaluator import get_first_section, get_numeric_section, get_section
+from .number_format import NUMBER_FORMAT_CACHE_SIZE, get_number_format
 from .section import Section, SectionType
 from .token import is_date_part, is_general, is_placeholder
 
+# Dates in bulk are converted with numpy for serial numbers safely within the range
+# of a datetime, anything else goes through excel2datetime one by one
+MIN_DATE_SERIAL = 0
+MAX_DATE_SERIAL = 2_958_000
+
 # Formatter is adapted from the C# repo: https://github.com/andersnm/ExcelNumberFormat
 
 
 def run(value: Any, node: [str | Section]):
     if isinstance(node, str):
-        fmt = NumberFormat(node)
-        if not fmt.is_valid:
-            return str(value)
+        return compile_format(node)(value)
+    return format_section(value, node)
 
-        node = get_section(fmt.sections, value)
-        if not node:
-            return str(value)
 
+def format_section(value: Any, node: Section) -> str:
     match node.section_type:
         case SectionType.Number:
             # Hide sign under certain conditions and section index
@@ -57,6 +62,304 @@ def run(value: Any, node: [str | Section]):
             return format_fraction(float(value), node)
 
 
+@lru_cache(maxsize=NUMBER_FORMAT_CACHE_SIZE)
+def compile_format(format_str: str) -> Callable[[Any], str]:
+    """Returns a function that formats a value like run(value, format_str) does, with the
+    format parsed once and every section turned into a formatter of its own."""
+    fmt = get_number_format(format_str)
+    if not fmt.is_valid:
+        return str
+
+    sections = fmt.sections
+    compiled = [compile_section(section) for section in sections]
+    if len(sections) == 1 and not sections[0].condition:
+        # The only section applies to every number
+        format_only_section = compiled[0]
+
+        def format_value(value: Any) -> str:
+            if isinstance(value, int | float):
+                return format_only_section(value)
+            if (section := get_section(sections, value)) is None:
+                return str(value)
+            return compiled[section.index](value)
+
+        return format_value
+
+    def format_value(value: Any) -> str:
+        if (section := get_section(sections, value)) is None:
+            return str(value)
+        return compiled[section.index](value)
+
+    return format_value
+
+
+def compile_section(node: Section) -> Callable[[Any], str]:
+    match node.section_type:
+        case SectionType.Number:
+            return compile_number(node)
+        case SectionType.Date:
+            format_compiled_date = compile_date(node.general_text_date_duration_parts)
+            return lambda value: format_compiled_date(excel2datetime(value))
+    return partial(format_section, node=node)
+
+
+def fixed_point_parts(fmt: DecimalSection) -> tuple[str, str, str] | None:
+    """Splits the most common number formats, like #,##0.00, 0% or $#,##0, into the
+    literals around the number and a format spec that renders the number the same way
+    format_number_str does. Returns None for formats that need the full treatment: zero
+    padding, optional decimals, literals in between digits and so on."""
+    before_decimal = fmt.before_decimal
+    placeholders = [
+        i for i, token in enumerate(before_decimal) if is_placeholder(token)
+    ]
+    if not placeholders:
+        return None
+    first, last = placeholders[0], placeholders[-1]
+    digits = [token for token in before_decimal[first : last + 1] if token != ","]
+    if len(digits) != len(placeholders) or digits[-1] != "0" or "0" in digits[:-1]:
+        return None
+    if "?" in digits:
+        return None
+
+    prefix = before_decimal[:first]
+    suffix = before_decimal[last + 1 :]
+    decimals = 0
+    if fmt.decimal_sep:
+        after_decimal = fmt.after_decimal
+        while decimals < len(after_decimal) and after_decimal[decimals] == "0":
+            decimals += 1
+        if not decimals or any(token != "," for token in suffix):
+            return None
+        suffix = after_decimal[decimals:]
+        if any(is_placeholder(token) or token == "." for token in suffix):
+            return None
+
+    prefix_str: list[str] = []
+    suffix_str: list[str] = []
+    for token in prefix:
+        format_literal(token, prefix_str)
+    for token in suffix:
+        format_literal(token, suffix_str)
+    spec = f"{',' if fmt.thousand_sep else ''}.{decimals}f"
+    return "".join(prefix_str), spec, "".join(suffix_str)
+
+
+def hides_sign(node: Section) -> bool:
+    return bool((node.index == 0 and node.condition) or node.index == 1)
+
+
+def compile_number(node: Section) -> Callable[[Any], str]:
+    fmt = node.number
+    hide_sign = hides_sign(node)
+    parts = fixed_point_parts(fmt)
+    if parts is None:
+        return partial(format_section, node=node)
+
+    prefix, spec, suffix = parts
+    divisor = fmt.thousand_divisor
+    multiplier = fmt.percent_multiplier
+
+    def format_value(value: Any) -> str:
+        number = float(value)
+        if hide_sign:
+            number = abs(number)
+        scaled = number / divisor * multiplier
+        if not isfinite(scaled):
+            return format_number_str(number, fmt)
+        if scaled < 0:
+            return f"-{prefix}{-scaled:{spec}}{suffix}"
+        # abs() for -0.0, which format_number_str shows without a sign
+        return f"{prefix}{abs(scaled):{spec}}{suffix}"
+
+    return format_value
+
+
+def compile_date(tokens: list[str]) -> Callable[[datetime], str]:
+    """Turns the tokens of a date section into a str.format template and the date fields
+    it needs, so formatting a date doesn't have to look at the tokens again."""
+    has_ampm = contains_ampm(tokens)
+    template: list[str] = []
+    fields: dict[str, Callable[[datetime], Any]] = {}
+
+    def field(name: str, getter: Callable[[datetime], Any], spec: str = "") -> None:
+        fields[name] = getter
+        template.append(f"{{{name}{':' + spec if spec else ''}}}")
+
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        ltoken = token.lower()
+        if ltoken.startswith("y"):
+            digits = len(ltoken)
+            if digits < 2:
+                digits = 2
+            elif digits == 3:
+                digits = 4
+            if digits == 2:
+                field("year2", lambda d: d.year % 100, ">02")
+            else:
+                field("year", lambda d: d.year, f">0{digits}")
+
+        elif ltoken.startswith("m"):
+            digits = len(ltoken)
+            if look_back_date_part(tokens, i - 1, "h") or look_ahead_date_part(
+                tokens, i + 1, "s"
+            ):
+                field("minute", lambda d: d.minute, f">0{digits}")
+            elif digits == 3:
+                field("month_abbr", lambda d: calendar.month_abbr[d.month])
+            elif digits == 4:
+                field("month_name", lambda d: calendar.month_name[d.month])
+            elif digits == 5:
+                field("month_letter", lambda d: calendar.month_name[d.month][0])
+            else:
+                field("month", lambda d: d.month, f">0{digits}")
+
+        elif ltoken.startswith("d"):
+            digits = len(ltoken)
+            if digits == 3:
+                field("day_abbr", lambda d: calendar.day_abbr[d.weekday()])
+            elif digits == 4:
+                field("day_name", lambda d: calendar.day_name[d.weekday()])
+            else:
+                field("day", lambda d: d.day, f">0{digits}")
+
+        elif ltoken.startswith("h"):
+            if has_ampm:
+                field("hour12", lambda d: (d.hour + 11) % 12 + 1, f">0{len(ltoken)}")
+            else:
+                field("hour", lambda d: d.hour, f">0{len(ltoken)}")
+
+        elif ltoken.startswith("s"):
+            field("second", lambda d: d.second, f">0{len(ltoken)}")
+
+        elif ltoken == "am/pm":
+            field("ampm", lambda d: d.strftime("%p").upper())
+        elif ltoken == "a/p":
+            if token[0].isupper():
+                field("ap_upper", lambda d: d.strftime("%p")[0].upper())
+            else:
+                field("ap_lower", lambda d: d.strftime("%p")[0].lower())
+        elif ltoken.startswith(".0"):
+            template.append(".")
+            field("millisecond", lambda d: d.microsecond // 1000, f">0{len(token) - 1}")
+        elif token == "/":
+            template.append(token)
+        elif token == ",":
+            while i < len(tokens) - 1 and tokens[i + 1] == ",":
+                i += 1
+            template.append(token)
+        else:
+            literal: list[str] = []
+            format_literal(token, literal)
+            template.append(literal[0].replace("{", "{{").replace("}", "}}"))
+        i += 1
+
+    format_template = "".join(template).format
+    getters = [*fields.items()]
+
+    def format_value(date: datetime) -> str:
+        return format_template(**{name: getter(date) for name, getter in getters})
+
+    return format_value
+
+
+def format_array(values: np.ndarray, format_str: str) -> np.ndarray:
+    """Formats every element of values, an array of numbers, datetime64s or anything
+    run() accepts, with format_str. Returns an array of strings with the same shape.
+
+    Where the format has no conditions, numbers are assigned to their section in bulk and
+    then scaled for it or, for dates, converted from serial numbers with numpy. That
+    covers most formats used in practice; everything else goes through the compiled
+    format one element at a time."""
+    values = np.asarray(values)
+    result = np.empty(values.shape, dtype=object)
+    flat = values.reshape(-1)
+    out = result.reshape(-1)
+    format_value = compile_format(format_str)
+
+    if flat.dtype.kind == "M":
+        fmt = get_number_format(format_str)
+        date_section = get_first_section(fmt.sections, SectionType.Date)
+        if date_section is not None:
+            format_date_value = compile_date(
+                date_section.general_text_date_duration_parts
+            )
+            dates = flat.astype("datetime64[us]").tolist()
+            out[:] = [
+                str(date) if date is None else format_date_value(date) for date in dates
+            ]
+            return result
+        flat = flat.astype(object)
+
+    if flat.dtype.kind == "O" and all(
+        isinstance(value, int | float) for value in flat.tolist()
+    ):
+        # Cell values come in as objects, most of them plain numbers
+        flat = flat.astype(float)
+
+    if flat.dtype.kind in "biuf" and flat.size:
+        format_numbers(flat, out, format_str)
+        return result
+
+    out[:] = [format_value(value) for value in flat.tolist()]
+    return result
+
+
+def format_numbers(values: np.ndarray, out: np.ndarray, format_str: str) -> None:
+    format_value = compile_format(format_str)
+    fmt = get_number_format(format_str)
+    sections = fmt.sections
+    if not fmt.is_valid or any(section.condition for section in sections):
+        out[:] = [format_value(value) for value in values.tolist()]
+        return
+
+    # Without conditions, the section only depends on the sign of the number
+    numbers = values.astype(float)
+    done = np.zeros(len(values), dtype=bool)
+    for sign, mask in ((1, numbers > 0), (0, numbers == 0), (-1, numbers < 0)):
+        section = get_numeric_section(sections, sign)
+        if section is None or not mask.any():
+            continue
+        if section.section_type == SectionType.Date:
+            selected = numbers[mask]
+            in_range = (selected >= MIN_DATE_SERIAL) & (selected <= MAX_DATE_SERIAL)
+            mask[mask] = in_range
+            format_date_value = compile_date(section.general_text_date_duration_parts)
+            dates = excel2datetime64(selected[in_range]).tolist()
+            out[mask] = [format_date_value(date) for date in dates]
+            done |= mask
+            continue
+        parts = (
+            fixed_point_parts(section.number)
+            if section.section_type == SectionType.Number
+            else None
+        )
+        if parts is None:
+            continue
+        prefix, spec, suffix = parts
+        selected = numbers[mask]
+        if hides_sign(section):
+            selected = np.abs(selected)
+        scaled = selected / section.number.thousand_divisor
+        scaled = scaled * section.number.percent_multiplier
+        finite = np.isfinite(scaled)
+        if not finite.all():
+            mask[mask] = finite
+            scaled = scaled[finite]
+        out[mask] = [
+            f"-{prefix}{-number:{spec}}{suffix}"
+            if number < 0
+            else f"{prefix}{abs(number):{spec}}{suffix}"
+            for number in scaled.tolist()
+        ]
+        done |= mask
+
+    rest = np.flatnonzero(~done)
+    if len(rest):
+        out[rest] = [format_value(value) for value in values[rest].tolist()]
+
+
 def look_ahead_date_part(tokens: list[str], from_ind: int, starts_with: str) -> bool:
     starts_with = starts_with.lower()
     for token in tokens[from_ind:]:
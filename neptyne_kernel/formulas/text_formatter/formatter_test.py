@@ -0,0 +1,107 @@
+import random
+
+import numpy as np
+import pytest
+
+from .evaluator import get_section
+from .formatter import compile_format, format_array, format_section, run
+from .number_format import NumberFormat, get_number_format
+
+FORMATS = [
+    "#,##0.00",
+    "#,##0",
+    "0",
+    "0%",
+    "0.00%",
+    "$#,##0.00",
+    "[$$-409]#,##0.00; -[$$-409]#,##0.00",
+    '#,##0.00,,"M"',
+    "0.000_);(0.000)",
+    '0.00;(0.00);"zero"',
+    '[<0]"p"0;"m"0',
+    "0.0#",
+    "000.00",
+    "###.##",
+    "# ?/?",
+    '"x"0 "y"',
+    "{0}",
+    "yyyy-mm-dd",
+    "m/d/yy",
+    "d mmm yyyy h:mm AM/PM",
+    "dddd, mmmm d, yy hh:mm:ss.00",
+    "h:mm a/p",
+    "[h]:mm:ss",
+    "General",
+    "@",
+]
+
+VALUES = [
+    0,
+    -0.0,
+    1,
+    -1,
+    0.5,
+    -0.005,
+    1.005,
+    2.675,
+    59,
+    60,
+    61,
+    1234.5678,
+    -98765.4321,
+    45000.75,
+    123456789,
+]
+
+
+def uncompiled(value, format_str: str) -> str:
+    fmt = NumberFormat(format_str)
+    if not fmt.is_valid:
+        return str(value)
+    section = get_section(fmt.sections, value)
+    if section is None:
+        return str(value)
+    return format_section(value, section)
+
+
+@pytest.fixture(scope="module")
+def values() -> list[float]:
+    rng = random.Random(42)
+    return (
+        VALUES
+        + [rng.uniform(-1e6, 1e6) for _ in range(100)]
+        + [rng.uniform(0, 60000) for _ in range(100)]
+    )
+
+
+@pytest.mark.parametrize("format_str", FORMATS)
+def test_compiled_format_matches(format_str, values):
+    if format_str[0] in "ydmh[":
+        values = [value for value in values if 0 <= value < 100_000]
+    for value in values:
+        assert run(value, format_str) == uncompiled(value, format_str)
+
+    for array in np.array(values), np.array(values).astype(int):
+        assert format_array(array, format_str).tolist() == [
+            uncompiled(value, format_str) for value in array.tolist()
+        ]
+
+
+def test_format_array():
+    assert format_array(
+        np.array([[1, 1234.5], [-2, 0]]), "#,##0.00;(#,##0.00)"
+    ).tolist() == [["1.00", "1,234.50"], ["(2.00)", "0.00"]]
+    assert format_array(np.array([np.nan, 1]), "0.0").tolist() == ["nan.0", "1.0"]
+    assert format_array(
+        np.array([1, "text", None], dtype=object), '0.00;0.00;0.00;"t"@'
+    ).tolist() == ["1.00", "ttext", "None"]
+    assert format_array(
+        np.array(["2024-01-05T13:04:05", "NaT"], dtype="datetime64[s]"),
+        "yyyy-mm-dd hh:mm",
+    ).tolist() == ["2024-01-05 13:04", "None"]
+    assert format_array(np.array([]), "0.00").tolist() == []
+
+
+def test_formats_are_cached():
+    assert get_number_format("#,##0.00") is get_number_format("#,##0.00")
+    assert compile_format("0%") is compile_format("0%")
@@ -1,7 +1,11 @@
+from functools import lru_cache
+
 from .evaluator import get_first_section
 from .parser import parse_sections
 from .section import Section, SectionType
 
+NUMBER_FORMAT_CACHE_SIZE = 1024
+
 
 class NumberFormat:
     def __init__(self, format_str: str):
@@ -18,3 +22,10 @@ class NumberFormat:
             )
         else:
             self.sections: list[Section] = []
+
+
+@lru_cache(maxsize=NUMBER_FORMAT_CACHE_SIZE)
+def get_number_format(format_str: str) -> NumberFormat:
+    """Parsing is by far the most expensive part of formatting a value, and the same few
+    formats are used over and over. The returned NumberFormat is shared, don't modify it."""
+    return NumberFormat(format_str)
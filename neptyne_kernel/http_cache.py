@@ -0,0 +1,286 @@
+"""A cache on disk for files fetched over HTTP, so that formulas that read a URL don't
+download it again every time they are recalculated.
+
+A response is used as is for as long as its Cache-Control max-age (or Expires) says it is
+fresh. After that it is revalidated with If-None-Match/If-Modified-Since, and a 304 keeps
+the copy on disk. Once the cache grows over NEPTYNE_HTTP_CACHE_SIZE bytes, the least
+recently used responses are evicted.
+
+Parsing a big file takes as long as downloading it, so the last few parsed results are
+also kept in memory, by URL and parser options, for as long as the body doesn't change.
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import IO, Any, Callable, Iterator, Mapping
+from urllib.parse import urlparse
+
+import requests
+
+DEFAULT_CACHE_SIZE = 1024**3
+CHUNK_SIZE = 1024 * 1024
+PARSED_CACHE_SIZE = 8
+
+session = requests.Session()
+
+_parsed: OrderedDict[tuple[str, str], tuple[str, Any]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def cache_dir() -> Path:
+    return Path(
+        os.getenv("NEPTYNE_HTTP_CACHE_DIR", "~/.cache/neptyne/http")
+    ).expanduser()
+
+
+def cache_size() -> int:
+    return int(os.getenv("NEPTYNE_HTTP_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+
+
+def is_url(url_or_str: Any) -> bool:
+    return isinstance(url_or_str, str) and urlparse(url_or_str).scheme in (
+        "http",
+        "https",
+    )
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    digest: str
+    size: int
+    etag: str | None = None
+    last_modified: str | None = None
+    # Until when the body can be used without asking the server, if at all:
+    fresh_until: float | None = None
+    # Bodies of responses that can't be stored are kept here instead:
+    content: bytes | None = None
+
+    @property
+    def body_path(self) -> Path:
+        return cache_dir() / f"{url_key(self.url)}.{self.digest[:16]}.body"
+
+    def open(self) -> IO[bytes]:
+        if self.content is not None:
+            return io.BytesIO(self.content)
+        return self.body_path.open("rb")
+
+
+def url_key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def fresh_until(headers: Mapping[str, str], now: float) -> float | None:
+    directives = {}
+    for directive in headers.get("Cache-Control", "").split(","):
+        name, _, value = directive.strip().partition("=")
+        directives[name.lower()] = value.strip('"')
+    if "no-cache" in directives:
+        return None
+    if "max-age" in directives:
+        try:
+            return now + int(directives["max-age"])
+        except ValueError:
+            return None
+    if expires := headers.get("Expires"):
+        try:
+            return parsedate_to_datetime(expires).timestamp()
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def cached_response(url: str) -> CachedResponse | None:
+    try:
+        meta = json.loads((cache_dir() / f"{url_key(url)}.json").read_text())
+        response = CachedResponse(**meta)
+    except (OSError, TypeError, ValueError):
+        return None
+    if response.url != url or not response.body_path.exists():
+        return None
+    return response
+
+
+def write_meta(response: CachedResponse) -> None:
+    meta_path = cache_dir() / f"{url_key(response.url)}.json"
+    temp = meta_path.with_suffix(f".{threading.get_ident()}.meta.tmp")
+    temp.write_text(json.dumps(asdict(response)))
+    temp.replace(meta_path)
+
+
+def touch(response: CachedResponse) -> None:
+    # The meta file's mtime is when the response was last used, for evicting:
+    try:
+        os.utime(cache_dir() / f"{url_key(response.url)}.json")
+    except OSError:
+        pass
+
+
+def store(url: str, http_response: requests.Response, now: float) -> CachedResponse:
+    directory = cache_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    temp = directory / f"{url_key(url)}.{threading.get_ident()}.tmp"
+    digest = hashlib.sha256()
+    size = 0
+    with temp.open("wb") as f:
+        for chunk in http_response.iter_content(CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+            f.write(chunk)
+    previous = cached_response(url)
+    response = CachedResponse(
+        url=url,
+        digest=digest.hexdigest(),
+        size=size,
+        etag=http_response.headers.get("ETag"),
+        last_modified=http_response.headers.get("Last-Modified"),
+        fresh_until=fresh_until(http_response.headers, now),
+    )
+    # The body goes first, so that the meta file never points at a missing body:
+    temp.replace(response.body_path)
+    write_meta(response)
+    if previous and previous.body_path != response.body_path:
+        previous.body_path.unlink(missing_ok=True)
+    evict(keep=url_key(url))
+    return response
+
+
+def evict(keep: str) -> None:
+    """Removes the least recently used responses until the cache fits its size, except
+    for the one with key keep, which is about to be read"""
+    directory = cache_dir()
+    entries = []
+    total = 0
+    for meta_path in directory.glob("*.json"):
+        try:
+            meta = json.loads(meta_path.read_text())
+            used = meta_path.stat().st_mtime
+        except (OSError, ValueError):
+            continue
+        total += meta.get("size", 0)
+        if meta_path.stem != keep:
+            entries.append((used, meta_path, meta))
+    entries.sort(key=lambda entry: entry[0])
+    limit = cache_size()
+    for _used, meta_path, meta in entries:
+        if total <= limit:
+            break
+        meta_path.unlink(missing_ok=True)
+        for body_path in directory.glob(f"{meta_path.stem}.*.body"):
+            body_path.unlink(missing_ok=True)
+        total -= meta.get("size", 0)
+
+
+def is_fresh(cached: CachedResponse | None, now: float) -> bool:
+    return bool(cached and cached.fresh_until is not None and now < cached.fresh_until)
+
+
+def revalidation_headers(cached: CachedResponse | None) -> dict[str, str]:
+    headers = {}
+    if cached and cached.etag:
+        headers["If-None-Match"] = cached.etag
+    if cached and cached.last_modified:
+        headers["If-Modified-Since"] = cached.last_modified
+    return headers
+
+
+def revalidated(
+    cached: CachedResponse, http_response: requests.Response, now: float
+) -> CachedResponse:
+    """cached, after the server said with http_response that it hasn't changed"""
+    cached.fresh_until = fresh_until(http_response.headers, now)
+    cached.etag = http_response.headers.get("ETag", cached.etag)
+    write_meta(cached)
+    return cached
+
+
+def fetch(url: str) -> CachedResponse:
+    """The response to GET url, from the cache if it's fresh or the server says it
+    hasn't changed. A stale copy is used if the server can't be reached."""
+    cached = cached_response(url)
+    now = time.time()
+    if cached and is_fresh(cached, now):
+        touch(cached)
+        return cached
+    try:
+        http_response = session.get(
+            url, headers=revalidation_headers(cached), stream=True
+        )
+    except (requests.ConnectionError, requests.Timeout):
+        if cached:
+            return cached
+        raise
+    with http_response:
+        if cached and http_response.status_code == 304:
+            return revalidated(cached, http_response, now)
+        http_response.raise_for_status()
+        if "no-store" in http_response.headers.get("Cache-Control", ""):
+            content = http_response.content
+            return CachedResponse(
+                url=url,
+                digest=hashlib.sha256(content).hexdigest(),
+                size=len(content),
+                content=content,
+            )
+        return store(url, http_response, now)
+
+
+def load(url: str, parse: Callable[[IO[bytes]], Any], options: Any = None) -> Any:
+    """parse() of the body of url. The result is reused by calls with the same url and
+    options for as long as the body stays the same, so it shouldn't be modified."""
+    response = fetch(url)
+    key = (url, repr(options))
+    with _lock:
+        if (parsed := _parsed.get(key)) and parsed[0] == response.digest:
+            _parsed.move_to_end(key)
+            return parsed[1]
+    with response.open() as f:
+        value = parse(f)
+    with _lock:
+        _parsed[key] = (response.digest, value)
+        while len(_parsed) > PARSED_CACHE_SIZE:
+            _parsed.popitem(last=False)
+    return value
+
+
+@contextmanager
+def stream(url: str) -> Iterator[IO[bytes]]:
+    """The body of url as it's downloaded, for reading just the start of it. Reads from
+    the cache if url is in it and is fresh or the server says it hasn't changed. What is
+    downloaded isn't cached, since only the start of it may be read."""
+    cached = cached_response(url)
+    now = time.time()
+    if cached and not is_fresh(cached, now):
+        try:
+            http_response = session.get(
+                url, headers=revalidation_headers(cached), stream=True
+            )
+        except (requests.ConnectionError, requests.Timeout):
+            # A stale copy beats none, like fetch():
+            http_response = None
+        if http_response is not None:
+            with http_response:
+                if http_response.status_code != 304:
+                    http_response.raise_for_status()
+                    http_response.raw.decode_content = True
+                    yield http_response.raw
+                    return
+                revalidated(cached, http_response, now)
+    if cached:
+        touch(cached)
+        with cached.open() as f:
+            yield f
+        return
+    with session.get(url, stream=True) as http_response:
+        http_response.raise_for_status()
+        http_response.raw.decode_content = True
+        yield http_response.raw
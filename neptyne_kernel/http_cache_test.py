@@ -0,0 +1,161 @@
+import hashlib
+import os
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from . import http_cache
+
+
+class StubServer(ThreadingHTTPServer):
+    """Serves the bodies in files with the headers in headers, by path"""
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.files: dict[str, bytes] = {}
+        self.headers: dict[str, dict[str, str]] = {}
+        self.requests: list[tuple[str, str | None]] = []
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_port}{path}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: StubServer
+
+    def do_GET(self) -> None:
+        body = self.server.files[self.path]
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if_none_match = self.headers.get("If-None-Match")
+        self.server.requests.append((self.path, if_none_match))
+        if if_none_match == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in self.server.headers.get(self.path, {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    server = StubServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("NEPTYNE_HTTP_CACHE_DIR", str(tmp_path))
+    http_cache._parsed.clear()
+    yield server
+    http_cache._parsed.clear()
+    server.shutdown()
+    server.server_close()
+
+
+def test_fresh_responses_are_not_requested_again(server):
+    server.files["/a.csv"] = b"a,b\n1,2\n"
+    server.headers["/a.csv"] = {"Cache-Control": "max-age=3600"}
+    url = server.url("/a.csv")
+    assert http_cache.fetch(url).open().read() == b"a,b\n1,2\n"
+    assert http_cache.fetch(url).open().read() == b"a,b\n1,2\n"
+    assert server.requests == [("/a.csv", None)]
+
+
+def test_stale_responses_are_revalidated(server):
+    server.files["/a.csv"] = b"a,b\n1,2\n"
+    server.headers["/a.csv"] = {"Cache-Control": "no-cache"}
+    url = server.url("/a.csv")
+    parsed = []
+
+    def parse(f):
+        parsed.append(f.read())
+        return parsed[-1]
+
+    assert http_cache.load(url, parse) == b"a,b\n1,2\n"
+    assert http_cache.load(url, parse) == b"a,b\n1,2\n"
+    # The second request asks whether the body has changed:
+    assert [if_none_match is None for _, if_none_match in server.requests] == [
+        True,
+        False,
+    ]
+    # Not modified, so not parsed again:
+    assert len(parsed) == 1
+
+    # Different options are parsed separately:
+    http_cache.load(url, parse, "other")
+    assert len(parsed) == 2
+
+    server.files["/a.csv"] = b"a,b\n3,4\n"
+    assert http_cache.load(url, parse) == b"a,b\n3,4\n"
+    assert len(parsed) == 3
+    assert len(server.requests) == 4
+
+
+def test_no_store(server, tmp_path):
+    server.files["/secret"] = b"secret"
+    server.headers["/secret"] = {"Cache-Control": "no-store"}
+    assert http_cache.fetch(server.url("/secret")).open().read() == b"secret"
+    assert [*tmp_path.iterdir()] == []
+
+
+def test_least_recently_used_are_evicted(server, monkeypatch, tmp_path):
+    monkeypatch.setenv("NEPTYNE_HTTP_CACHE_SIZE", "250")
+    for path in ("/a", "/b", "/c"):
+        server.files[path] = path.encode() * 50
+        server.headers[path] = {"Cache-Control": "max-age=3600"}
+
+    http_cache.fetch(server.url("/a"))
+    http_cache.fetch(server.url("/b"))
+    os.utime(tmp_path / f"{http_cache.url_key(server.url('/a'))}.json", (100, 100))
+    os.utime(tmp_path / f"{http_cache.url_key(server.url('/b'))}.json", (200, 200))
+    # Using /a makes /b the least recently used:
+    http_cache.fetch(server.url("/a"))
+    http_cache.fetch(server.url("/c"))
+
+    assert http_cache.cached_response(server.url("/a")) is not None
+    assert http_cache.cached_response(server.url("/b")) is None
+    assert http_cache.cached_response(server.url("/c")) is not None
+    assert len([*tmp_path.glob("*.body")]) == 2
+
+
+def test_stream_reads_the_start(server):
+    server.files["/big.csv"] = b"a,b\n" + b"1,2\n" * 100_000
+    url = server.url("/big.csv")
+    with http_cache.stream(url) as f:
+        assert f.read(8) == b"a,b\n1,2\n"
+    assert http_cache.cached_response(url) is None
+
+
+def test_stream_revalidates_stale_copies(server, monkeypatch):
+    server.files["/a.csv"] = b"a,b\n1,2\n"
+    server.headers["/a.csv"] = {"Cache-Control": "max-age=60"}
+    url = server.url("/a.csv")
+    http_cache.fetch(url)
+
+    server.files["/a.csv"] = b"a,b\n3,4\n"
+    with http_cache.stream(url) as f:
+        assert f.read() == b"a,b\n1,2\n"
+    assert len(server.requests) == 1
+
+    now = time.time()
+    monkeypatch.setattr(
+        http_cache, "time", types.SimpleNamespace(time=lambda: now + 120)
+    )
+    with http_cache.stream(url) as f:
+        assert f.read() == b"a,b\n3,4\n"
+    # Asked whether the cached copy was still good:
+    assert server.requests[-1][1] is not None
+
+    # Not modified, so the cached copy is read:
+    server.files["/a.csv"] = b"a,b\n1,2\n"
+    with http_cache.stream(url) as f:
+        assert f.read() == b"a,b\n1,2\n"
+    assert server.requests[-1][1] is not None
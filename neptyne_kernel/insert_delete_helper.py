@@ -190,6 +190,7 @@ def _update_keys_combined(
             dash.graph.calculated_by.pop(old_id, None),
             dash.graph.feeds_into.pop(old_id, None),
             dash.graph.depends_on.pop(old_id, None),
+            dash.graph.pop_names_mentioned(old_id),
         )
     for cell_id, (
         value,
@@ -197,6 +198,7 @@ def _update_keys_combined(
         calculated_by,
         feeds_in,
         depends_on,
+        names_mentioned,
     ) in key_new_to_value.items():
         changes.append(dash.set_item(cell_id, [[value]]))
         if cell_meta is not None:
@@ -215,6 +217,10 @@ def _update_keys_combined(
             dash.graph.depends_on[cell_id] = depends_on
         elif cell_id in dash.graph.depends_on:
             del dash.graph.depends_on[cell_id]
+        if names_mentioned is not None:
+            dash.graph.set_names_mentioned(cell_id, names_mentioned)
+        else:
+            dash.graph.pop_names_mentioned(cell_id)
 
     # Clear only value, not metadata
     if to_clear_values:
@@ -230,6 +236,7 @@ def _update_keys_combined(
             dash.graph.calculated_by.pop(cell_id, None)
             dash.graph.feeds_into.pop(cell_id, None)
             dash.graph.depends_on.pop(cell_id, None)
+            dash.graph.pop_names_mentioned(cell_id)
 
     return changes
 
@@ -333,7 +340,9 @@ def add_delete_cells_helper(
     if transformation.operation == SheetTransform.INSERT_BEFORE:
         seed_attributes = _compute_attribute_transfer_dict(dash, transformation)
 
-    # Re-key dependency graph prior to changing cell keys
+    # Re-key dependency graph prior to changing cell keys. Spill regions are simply
+    # dropped, the anchors that run next clear their cells one by one instead:
+    dash.graph.spill_regions.clear()
     spilled_to_clear = set()
     for cell_id, calculated_by_id in [*dash.graph.calculated_by.items()]:
         if cell_id in to_unlink:
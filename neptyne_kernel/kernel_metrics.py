@@ -0,0 +1,61 @@
+import threading
+import time
+
+from .neptyne_protocol import KernelMetricsContent
+
+# Seconds between two reports to the server. Nothing is sent while the kernel is idle.
+REPORT_INTERVAL = 15
+
+
+class KernelMetrics:
+    """Counters for the recalculation hot paths, reported to the server with a
+    kernel_metrics message. Only the counts since the previous report are kept here; the
+    server accumulates them and exports them on /metrics."""
+
+    def __init__(self, max_cascade_depth: int) -> None:
+        self._lock = threading.Lock()
+        self._max_cascade_depth = max_cascade_depth
+        self._reset()
+        self.last_report = time.monotonic()
+
+    def _reset(self) -> None:
+        self.cells_evaluated = 0
+        self.cascade_depth_counts = [0] * (self._max_cascade_depth + 1)
+        self.flushes = 0
+        self.flushed_cells = 0
+
+    def record_eval(self) -> None:
+        with self._lock:
+            self.cells_evaluated += 1
+
+    def record_cascade(self, depth: int) -> None:
+        with self._lock:
+            self.cascade_depth_counts[min(depth, self._max_cascade_depth)] += 1
+
+    def record_flush(self, cell_count: int) -> None:
+        with self._lock:
+            self.flushes += 1
+            self.flushed_cells += cell_count
+
+    def take(
+        self, min_interval: float = REPORT_INTERVAL
+    ) -> KernelMetricsContent | None:
+        """Return the counts since the last report and start over, or None if it is too
+        early to report again or nothing happened."""
+        now = time.monotonic()
+        if now - self.last_report < min_interval:
+            return None
+        with self._lock:
+            if not (
+                self.cells_evaluated or self.flushes or any(self.cascade_depth_counts)
+            ):
+                return None
+            content = KernelMetricsContent(
+                cascade_depth_counts=self.cascade_depth_counts,
+                cells_evaluated=self.cells_evaluated,
+                flushed_cells=self.flushed_cells,
+                flushes=self.flushes,
+            )
+            self._reset()
+            self.last_report = now
+        return content
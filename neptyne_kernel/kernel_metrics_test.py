@@ -0,0 +1,23 @@
+from .kernel_metrics import KernelMetrics
+
+
+def test_take():
+    metrics = KernelMetrics(max_cascade_depth=3)
+    assert metrics.take(min_interval=0) is None
+
+    metrics.record_eval()
+    metrics.record_eval()
+    metrics.record_cascade(0)
+    metrics.record_cascade(5)
+    metrics.record_flush(4)
+    assert metrics.take(min_interval=60) is None
+
+    content = metrics.take(min_interval=0)
+    assert content is not None
+    assert content.to_dict() == {
+        "cascadeDepthCounts": [1, 0, 0, 1],
+        "cellsEvaluated": 2,
+        "flushedCells": 4,
+        "flushes": 1,
+    }
+    assert metrics.take(min_interval=0) is None
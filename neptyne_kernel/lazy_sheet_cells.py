@@ -0,0 +1,188 @@
+import heapq
+from itertools import count
+from typing import Any, Callable, Iterable
+
+from .cell_address import Address
+
+
+class LineExtents:
+    """For every line (row or column) with cells in it, the positions of those cells
+    along it, so that the last position on a line and the last line are known without
+    a scan.
+
+    The maxima are max-heaps whose entries are dropped lazily once the position (or the
+    line) is gone, so that clearing the end of a line doesn't rescan the rest of it.
+    """
+
+    def __init__(self) -> None:
+        self.positions: dict[int, set[int]] = {}
+        self.heaps: dict[int, list[int]] = {}
+        self.line_heap: list[int] = []
+
+    def add(self, line: int, position: int) -> None:
+        positions = self.positions.get(line)
+        if positions is None:
+            positions = self.positions[line] = set()
+            self.heaps[line] = []
+            heapq.heappush(self.line_heap, -line)
+        if position not in positions:
+            positions.add(position)
+            heapq.heappush(self.heaps[line], -position)
+
+    def remove(self, line: int, position: int) -> None:
+        positions = self.positions[line]
+        positions.discard(position)
+        if not positions:
+            del self.positions[line]
+            del self.heaps[line]
+            self._compact(self.line_heap, self.positions)
+        else:
+            self._compact(self.heaps[line], positions)
+
+    @staticmethod
+    def _compact(heap: list[int], live: Any) -> None:
+        # Re-adding cleared cells would otherwise grow the heap without bound:
+        if len(heap) > 2 * len(live) + 16:
+            heap[:] = [entry for entry in heap if -entry in live]
+            heapq.heapify(heap)
+
+    def last_position(self, line: int) -> int:
+        positions = self.positions.get(line)
+        if positions is None:
+            return -1
+        heap = self.heaps[line]
+        while -heap[0] not in positions:
+            heapq.heappop(heap)
+        return -heap[0]
+
+    def last_line(self) -> int:
+        heap = self.line_heap
+        while heap and -heap[0] not in self.positions:
+            heapq.heappop(heap)
+        return -heap[0] if heap else -1
+
+    def last_position_in(self, first_line: int, last_line: int) -> int:
+        """The last position on any of the lines first_line..last_line, -1 if empty"""
+        if last_line - first_line < len(self.positions):
+            lines: Iterable[int] = range(first_line, last_line + 1)
+        else:
+            lines = [line for line in self.positions if first_line <= line <= last_line]
+        return max((self.last_position(line) for line in lines), default=-1)
+
+    def clear(self) -> None:
+        self.positions.clear()
+        self.heaps.clear()
+        self.line_heap.clear()
+
+
+# Shared by all sheets, so that a version never comes back, not even for another sheet:
+_versions = count()
+
+
+class SheetCells(dict[Address, Any]):
+    """The values of the cells of a sheet, by address. Keeps track of the extent of every
+    row and column as cells are set and removed, for resolving unbounded ranges.
+
+    version changes whenever a cell does, so that what is worked out from the cells can be
+    kept for as long as it is the same."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.rows_by_column = LineExtents()
+        self.columns_by_row = LineExtents()
+        self.version = next(_versions)
+
+    def __reduce__(self) -> tuple:
+        # The extents are rebuilt as the items are set again:
+        return self.__class__, (), None, None, iter(self.items())
+
+    def __setitem__(self, address: Address, value: Any) -> None:
+        if address not in self:
+            self.rows_by_column.add(address.column, address.row)
+            self.columns_by_row.add(address.row, address.column)
+        super().__setitem__(address, value)
+        self.version = next(_versions)
+
+    def __delitem__(self, address: Address) -> None:
+        super().__delitem__(address)
+        self.version = next(_versions)
+        self.rows_by_column.remove(address.column, address.row)
+        self.columns_by_row.remove(address.row, address.column)
+
+    def pop(self, address: Address, *default: Any) -> Any:
+        if address in self:
+            value = super().pop(address)
+            self.version = next(_versions)
+            self.rows_by_column.remove(address.column, address.row)
+            self.columns_by_row.remove(address.row, address.column)
+            return value
+        return super().pop(address, *default)
+
+    def popitem(self) -> tuple[Address, Any]:
+        address, value = super().popitem()
+        self.version = next(_versions)
+        self.rows_by_column.remove(address.column, address.row)
+        self.columns_by_row.remove(address.row, address.column)
+        return address, value
+
+    def setdefault(self, address: Address, default: Any = None) -> Any:
+        if address not in self:
+            self[address] = default
+        return self[address]
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        for address, value in dict(*args, **kwargs).items():
+            self[address] = value
+
+    def clear(self) -> None:
+        super().clear()
+        self.version = next(_versions)
+        self.rows_by_column.clear()
+        self.columns_by_row.clear()
+
+    def max_col(self, min_row: int, max_row: int) -> int:
+        """The last column with a cell in rows min_row..max_row, -1 if there is none"""
+        return self.columns_by_row.last_position_in(min_row, max_row)
+
+    def max_row(self, min_col: int, max_col: int) -> int:
+        """The last row with a cell in columns min_col..max_col, -1 if there is none"""
+        return self.rows_by_column.last_position_in(min_col, max_col)
+
+
+class LazySheetCells(dict[int, SheetCells]):
+    """The values of the cells per sheet. Behaves like a defaultdict(dict), except that sheets
+    can be registered as pending: their cells are kept as an encoded block and only loaded
+    (by calling load_sheet) the first time the sheet is looked up or hydrated explicitly.
+
+    Indexing and get() hydrate, iterating does not: code that walks every sheet should call
+    hydrate_all() first.
+    """
+
+    def __init__(self, load_sheet: Callable[[int, str], None]) -> None:
+        super().__init__()
+        self.pending: dict[int, str] = {}
+        self.load_sheet = load_sheet
+
+    def __missing__(self, sheet_id: int) -> SheetCells:
+        self.hydrate(sheet_id)
+        return self.setdefault(sheet_id, SheetCells())
+
+    def get(self, sheet_id: int, default: Any = None) -> Any:  # type: ignore[override]
+        self.hydrate(sheet_id)
+        return super().get(sheet_id, default)
+
+    def hydrate(self, sheet_id: int) -> None:
+        if sheet_id not in self.pending:
+            return
+        block = self.pending.pop(sheet_id, None)
+        if block is not None:
+            self.setdefault(sheet_id, SheetCells())
+            self.load_sheet(sheet_id, block)
+
+    def hydrate_all(self) -> None:
+        for sheet_id in [*self.pending]:
+            self.hydrate(sheet_id)
+
+    def drop(self, sheet_id: int) -> None:
+        self.pending.pop(sheet_id, None)
+        self.pop(sheet_id, None)
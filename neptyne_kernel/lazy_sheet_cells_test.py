@@ -0,0 +1,64 @@
+import copy
+import pickle
+import random
+
+from .cell_address import Address
+from .lazy_sheet_cells import SheetCells
+
+
+def scanned_max_col(cells, min_row, max_row):
+    return max((a.column for a in cells if min_row <= a.row <= max_row), default=-1)
+
+
+def scanned_max_row(cells, min_col, max_col):
+    return max((a.row for a in cells if min_col <= a.column <= max_col), default=-1)
+
+
+def test_sheet_cells_extents():
+    rng = random.Random(7)
+    cells = SheetCells()
+    assert cells.max_col(0, 100) == -1
+    assert cells.rows_by_column.last_line() == -1
+
+    for step in range(5000):
+        address = Address(rng.randint(0, 20), rng.randint(0, 40), 0)
+        action = rng.random()
+        if action < 0.5:
+            cells[address] = step
+        elif action < 0.7:
+            cells.pop(address, None)
+        elif action < 0.8 and address in cells:
+            del cells[address]
+        elif action < 0.82:
+            cells.setdefault(address, step)
+        elif action < 0.83 and cells:
+            cells.popitem()
+        elif action < 0.835:
+            cells.clear()
+
+        first, last = sorted((rng.randint(0, 40), rng.randint(0, 40)))
+        assert cells.max_col(first, last) == scanned_max_col(cells, first, last)
+        first, last = sorted((rng.randint(0, 20), rng.randint(0, 20)))
+        assert cells.max_row(first, last) == scanned_max_row(cells, first, last)
+        assert cells.rows_by_column.last_line() == max(
+            (a.column for a in cells), default=-1
+        )
+        assert cells.columns_by_row.last_line() == max(
+            (a.row for a in cells), default=-1
+        )
+
+    # Lazily deleted entries don't pile up:
+    for line, heap in cells.columns_by_row.heaps.items():
+        assert len(heap) <= 2 * len(cells.columns_by_row.positions[line]) + 16
+
+
+def test_sheet_cells_copy():
+    cells = SheetCells()
+    cells.update({Address(3, 5, 0): 1, Address(1, 9, 0): 2})
+    copied = copy.deepcopy(cells)
+    assert copied == cells
+    assert copied.max_row(0, 10) == 9
+    del copied[Address(1, 9, 0)]
+    assert copied.max_row(0, 10) == 5
+    assert cells.max_row(0, 10) == 9
+    assert pickle.loads(pickle.dumps(cells)).max_col(0, 10) == 3
@@ -1,5 +1,11 @@
+import ast
+import copy
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any
+from functools import lru_cache
+from typing import Any, NamedTuple
 
 from IPython.core.compilerop import CachingCompiler
 from pyflakes import checker
@@ -63,6 +69,16 @@ EXCLUDE_WARNINGS = {
 }
 
 
+# Warnings whose second message argument is the line number of an earlier binding:
+LINE_ARG_WARNINGS = {RedefinedWhileUnused, ImportShadowedByLoopVar, UndefinedLocal}
+
+LINT_CACHE_SIZE = 256
+DEFINITION_CACHE_SIZE = 4096
+
+# Lint results are sent to the client from here, so that execution doesn't wait on them:
+lint_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="linter")
+
+
 class TyneCachingCompiler(CachingCompiler):
     def ast_parse(
         self, source: str, filename: str = "<unknown>", symbol: str = "exec"
@@ -70,12 +86,19 @@ class TyneCachingCompiler(CachingCompiler):
         from .dash import Dash
 
         tree = super().ast_parse(source, filename, symbol)
-        warnings = check_warnings(source, filename, tree)
-        if warnings:
-            Dash.instance().reply_to_client(MessageTypes.LINTER, {"linter": warnings})
+        dash = Dash.instance()
+        if not dash.silent:
+            parent = dash.kernel.get_parent("shell")
+            lint_executor.submit(publish_warnings, dash, source, parent)
         return tree
 
 
+def publish_warnings(dash: Any, source: str, parent: dict) -> None:
+    warnings = check_warnings(source)
+    if warnings:
+        dash.reply_to_client(MessageTypes.LINTER, {"linter": warnings}, parent=parent)
+
+
 def is_valid_warning(warning: Message) -> bool:
     """Skip import error for Excel formulas and N_"""
     warning_type = type(warning)
@@ -88,19 +111,184 @@ def is_valid_warning(warning: Message) -> bool:
     return True
 
 
-def check_warnings(code: str, filename: str, tree: Any) -> list[dict]:
-    reporter = TynePyFlakesReporter()
-    file_tokens = checker.make_tokens(code)
-    w = checker.Checker(tree, file_tokens=file_tokens, filename=filename)
-    for warning in w.messages:
-        reporter.flake(warning)
-
+def check_warnings(code: str) -> list[dict]:
     return [
         TracebackFrame(True, None, w.line, w.lineno).to_dict()
-        for w in reporter.warnings
+        for w in lint_source(code)
     ]
 
 
+@lru_cache(maxsize=LINT_CACHE_SIZE)
+def lint_source(code: str) -> tuple["WarningItem", ...]:
+    """The pyflakes warnings for code, analysing only the top-level functions that
+    changed since they were last seen.
+
+    The module is checked with the body of every function that is in the definition
+    cache replaced by a pass, and the warnings those bodies had last time are added
+    back. The cache key of a function is its source, its indentation and the
+    module-level bindings of the names it assigns to, which is what its warnings
+    depend on (apart from whether an import was already used elsewhere).
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return ()
+    lines = code.splitlines()
+    bindings = module_bindings(tree)
+
+    body: list[ast.stmt] = []
+    cached_warnings: list[WarningItem] = []
+    uncached: dict[
+        tuple[bytes, int, tuple], ast.FunctionDef | ast.AsyncFunctionDef
+    ] = {}
+    skipped_lines: list[range] = []
+    for node in tree.body:
+        if (
+            not isinstance(node, ast.FunctionDef | ast.AsyncFunctionDef)
+            or node.body[0].lineno == node.lineno
+        ):
+            body.append(node)
+            continue
+        key = definition_key(node, lines, bindings)
+        cached = definition_warnings.get(key)
+        if cached is None:
+            uncached[key] = node
+            body.append(node)
+            continue
+        definition_warnings.move_to_end(key)
+        cached_warnings.extend(
+            WarningItem(
+                message % shift_line_arg(args, node.lineno), lineno + node.lineno
+            )
+            for message, args, lineno in cached
+        )
+        stub = copy.copy(node)
+        stub.body = [ast.copy_location(ast.Pass(), node.body[0])]
+        body.append(stub)
+        skipped_lines.append(range(node.body[0].lineno, node.end_lineno + 1))
+
+    # Tokenizing is only needed to find type comments:
+    if "type:" in code:
+        file_tokens = [
+            token
+            for token in checker.make_tokens(code)
+            if not any(token.start[0] in skipped for skipped in skipped_lines)
+        ]
+    else:
+        file_tokens = []
+    module = ast.Module(body=body, type_ignores=tree.type_ignores)
+    messages = checker.Checker(module, file_tokens=file_tokens).messages
+
+    reporter = TynePyFlakesReporter()
+    for warning in messages:
+        reporter.flake(warning)
+    reporter.warnings.update(cached_warnings)
+
+    for key, node in uncached.items():
+        first, last = node.body[0].lineno, node.end_lineno
+        definition_warnings[key] = [
+            (
+                warning.message,
+                relative_args(warning, node),
+                warning.lineno - node.lineno,
+            )
+            for warning in messages
+            if first <= warning.lineno <= last and is_valid_warning(warning)
+        ]
+    while len(definition_warnings) > DEFINITION_CACHE_SIZE:
+        definition_warnings.popitem(last=False)
+
+    return tuple(reporter.warnings)
+
+
+# The warnings of top-level functions, with line numbers relative to the def line,
+# so that moving a function around doesn't invalidate them:
+definition_warnings: OrderedDict[
+    tuple[bytes, int, tuple], list[tuple[str, Any, int]]
+] = OrderedDict()
+
+
+# The names assigned to in a function, by the hash of its source:
+definition_names: dict[bytes, set[str]] = {}
+
+
+class LineArgs(NamedTuple):
+    name: str
+    lineno: int
+
+
+def relative_args(warning: Message, node: ast.stmt) -> Any:
+    """Make a line number argument pointing into the function relative to it.
+    Lines outside it are module-level bindings and are part of the cache key."""
+    args = warning.message_args
+    if (
+        type(warning) in LINE_ARG_WARNINGS
+        and isinstance(args, tuple)
+        and node.lineno <= args[1] <= node.end_lineno
+    ):
+        return LineArgs(args[0], args[1] - node.lineno)
+    return args
+
+
+def shift_line_arg(args: Any, offset: int) -> Any:
+    if isinstance(args, LineArgs):
+        return LineArgs(args[0], args[1] + offset)
+    return args
+
+
+def definition_key(
+    node: ast.FunctionDef | ast.AsyncFunctionDef,
+    lines: list[str],
+    bindings: dict[str, tuple[int, bool]],
+) -> tuple[bytes, int, tuple]:
+    source = "\n".join(lines[node.lineno - 1 : node.end_lineno])
+    digest = hashlib.sha1(source.encode()).digest()
+    names = definition_names.get(digest)
+    if names is None:
+        names = definition_names[digest] = assigned_names(node.args, *node.body)
+        if len(definition_names) > DEFINITION_CACHE_SIZE:
+            definition_names.pop(next(iter(definition_names)))
+    context = tuple(
+        sorted((name, *bindings[name]) for name in names if name in bindings)
+    )
+    return digest, node.col_offset, context
+
+
+def module_bindings(tree: ast.Module) -> dict[str, tuple[int, bool]]:
+    """{name: (line of its last module-level binding, whether that is an import)}"""
+    bindings = {}
+    for statement in tree.body:
+        if isinstance(statement, ast.FunctionDef | ast.AsyncFunctionDef | ast.ClassDef):
+            bindings[statement.name] = (statement.lineno, False)
+            continue
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+                bindings[node.id] = (node.lineno, False)
+            elif isinstance(node, ast.Import | ast.ImportFrom):
+                for alias in node.names:
+                    name = alias.asname or alias.name.split(".")[0]
+                    bindings[name] = (node.lineno, True)
+    return bindings
+
+
+def assigned_names(*nodes: ast.AST) -> set[str]:
+    names = set()
+    for child in (child for node in nodes for child in ast.walk(node)):
+        if isinstance(child, ast.Name) and not isinstance(child.ctx, ast.Load):
+            names.add(child.id)
+        elif isinstance(child, ast.arg):
+            names.add(child.arg)
+        elif isinstance(child, ast.alias):
+            names.add(child.asname or child.name.split(".")[0])
+        elif isinstance(
+            child, ast.FunctionDef | ast.AsyncFunctionDef | ast.ClassDef
+        ) or (isinstance(child, ast.ExceptHandler) and child.name):
+            names.add(child.name)
+        elif isinstance(child, ast.Global | ast.Nonlocal):
+            names.update(child.names)
+    return names
+
+
 @dataclass
 class WarningItem:
     line: str
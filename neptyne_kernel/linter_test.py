@@ -0,0 +1,107 @@
+import ast
+
+from pyflakes import checker
+
+from . import linter
+from .linter import TynePyFlakesReporter, WarningItem, lint_source, publish_warnings
+
+CODE = """import os
+import os
+from math import *
+x = 1
+y = 2
+
+
+def unused_local(a, b=1):
+    z = a + b
+    for os in range(3):
+        pass
+    return {1: 1, 1: 2}
+
+
+def literal(a):
+    if a is "s":
+        return f"no" + "%s %s" % (a,)
+
+
+def shadows_global():
+    print(x)
+    x = 2
+
+
+def redefines():
+    import json
+    import json
+    return json
+
+
+def one_liner(): unused = 1
+
+
+class Klass:
+    def method(self):
+        unused = 1
+"""
+
+
+def reference(code: str) -> set[WarningItem]:
+    reporter = TynePyFlakesReporter()
+    tree = ast.parse(code)
+    for warning in checker.Checker(
+        tree, file_tokens=checker.make_tokens(code)
+    ).messages:
+        reporter.flake(warning)
+    return reporter.warnings
+
+
+def test_lint_source_matches_pyflakes():
+    linter.definition_warnings.clear()
+    warnings = set(lint_source(CODE))
+    assert warnings == reference(CODE)
+    assert (
+        WarningItem("local variable 'z' is assigned to but never used", 9) in warnings
+    )
+    assert len(linter.definition_warnings) == 4
+
+    # Lines shift below an edit, only the edited function is checked again:
+    edited = CODE.replace("    z = a + b\n", "    z = a + b\n    w = 1\n")
+    assert set(lint_source(edited)) == reference(edited)
+    assert len(linter.definition_warnings) == 5
+
+    # Moving the global that shadows_global refers to invalidates it:
+    moved = CODE.replace("x = 1\ny = 2\n", "y = 2\nx = 1\n")
+    assert set(lint_source(moved)) == reference(moved)
+    assert len(linter.definition_warnings) == 6
+
+
+def test_lint_source_type_comments():
+    code = "def f(a):\n    b = 1  # type: (\n    return a\n\n\ndef g():\n    pass\n"
+    assert set(lint_source(code)) == reference(code)
+    assert set(lint_source(code + "\n")) == reference(code)
+
+
+def test_publish_warnings():
+    replies = []
+
+    class FakeDash:
+        def reply_to_client(self, message_type, content, *, parent):
+            replies.append((message_type.value, content, parent))
+
+    parent = {"header": {"cellId": "00"}}
+    publish_warnings(FakeDash(), "x = 1\n", parent)
+    publish_warnings(FakeDash(), "def f():\n    x = 1\n", parent)
+    assert replies == [
+        (
+            "linter",
+            {
+                "linter": [
+                    {
+                        "current_cell": True,
+                        "line": "local variable 'x' is assigned to but never used",
+                        "lineno": 2,
+                    }
+                ]
+            },
+            parent,
+        )
+    ]
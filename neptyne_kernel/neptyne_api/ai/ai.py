@@ -1,22 +1,137 @@
+import hashlib
 import json
 import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import wraps
-from typing import Callable
+from pathlib import Path
+from typing import Any, Callable
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from ...kernel_runtime import get_api_token
+from ...pending_call import result_or_pending
 from ...proxied_apis import TOKEN_HEADER_NAME
 from ...renderers import create_with_source
 
+# Calls made while recalculating run concurrently, up to this many at a time:
+MAX_CONCURRENT_CALLS = 8
+PAYLOAD_CACHE_SIZE = 1024
+# Answers are reused for this long, after which the question is asked again:
+CACHE_SECONDS = 24 * 60 * 60
+CACHING_TYPES = ("never", "always")
 
-def make_call(method, *args):
+call_executor = ThreadPoolExecutor(
+    max_workers=MAX_CONCURRENT_CALLS, thread_name_prefix="ai"
+)
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_maxsize=MAX_CONCURRENT_CALLS))
+
+_in_flight: dict[str, Future] = {}
+# The payloads by call key, with the time they were fetched:
+_payloads: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def cache_dir() -> Path:
+    return Path(os.getenv("NEPTYNE_AI_CACHE_DIR", "~/.cache/neptyne/ai")).expanduser()
+
+
+def call_key(method: str, encoded_args: str) -> str:
+    return hashlib.sha256(f"{method}\n{encoded_args}".encode()).hexdigest()
+
+
+def cached_payload(key: str) -> dict[str, Any] | None:
+    expired = time.time() - CACHE_SECONDS
+    with _lock:
+        if (entry := _payloads.get(key)) is not None:
+            fetched_at, payload = entry
+            if fetched_at > expired:
+                _payloads.move_to_end(key)
+                return payload
+            del _payloads[key]
+    path = cache_dir() / f"{key}.json"
+    try:
+        fetched_at = path.stat().st_mtime
+        if fetched_at <= expired:
+            path.unlink(missing_ok=True)
+            return None
+        payload = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    with _lock:
+        remember_payload(key, payload, fetched_at)
+    return payload
+
+
+def remember_payload(
+    key: str, payload: dict[str, Any], fetched_at: float | None = None
+) -> None:
+    _payloads[key] = (time.time() if fetched_at is None else fetched_at, payload)
+    while len(_payloads) > PAYLOAD_CACHE_SIZE:
+        _payloads.popitem(last=False)
+
+
+def write_payload(key: str, payload: dict[str, Any]) -> None:
+    try:
+        directory = cache_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        temp = directory / f"{key}.{threading.get_ident()}.tmp"
+        temp.write_text(json.dumps(payload))
+        temp.replace(directory / f"{key}.json")
+    except OSError:
+        pass
+
+
+def fetch_payload(
+    method: str, encoded_args: str, headers: dict[str, str | None]
+) -> dict[str, Any]:
     host_port = os.getenv("API_PROXY_HOST_PORT", "localhost:8888")
     url = f"http://{host_port}/research/{method}"
-    params = {"args": json.dumps(args)}
-    headers = {TOKEN_HEADER_NAME: get_api_token()}
+    return session.get(url, params={"args": encoded_args}, headers=headers).json()
 
-    payload = requests.get(url, params=params, headers=headers).json()
+
+def succeeded(future: Future) -> bool:
+    return future.exception() is None and not future.result().get("error")
+
+
+def request_payload(key: str, method: str, encoded_args: str) -> Future:
+    """The future payload of the call, shared with an identical call still in flight,
+    or already done if the result is cached."""
+    if (payload := cached_payload(key)) is not None:
+        future: Future = Future()
+        future.set_result(payload)
+        return future
+
+    def done(future: Future) -> None:
+        # A call answered with an error stays in flight until it is reported, so that
+        # evaluating the cell again doesn't make the call again:
+        if succeeded(future):
+            write_payload(key, future.result())
+            with _lock:
+                del _in_flight[key]
+                remember_payload(key, future.result())
+        elif future.exception() is not None:
+            # Reported by whoever waits for it, and the next call tries again:
+            with _lock:
+                if _in_flight.get(key) is future:
+                    del _in_flight[key]
+
+    with _lock:
+        if (future := _in_flight.get(key)) is not None:
+            return future
+        headers = {TOKEN_HEADER_NAME: get_api_token()}
+        future = call_executor.submit(fetch_payload, method, encoded_args, headers)
+        _in_flight[key] = future
+    future.add_done_callback(done)
+    return future
+
+
+def value_from_payload(payload: dict[str, Any]) -> Any:
     if error := payload.get("error"):
         raise ValueError(error)
     value = payload["value"]
@@ -40,10 +155,49 @@ def make_call(method, *args):
     return value
 
 
+def make_call(method, *args, caching: str = "always"):
+    encoded_args = json.dumps(args)
+    if caching == "never":
+        headers = {TOKEN_HEADER_NAME: get_api_token()}
+        return value_from_payload(fetch_payload(method, encoded_args, headers))
+    key = call_key(method, encoded_args)
+    future = request_payload(key, method, encoded_args)
+    try:
+        payload = result_or_pending(future)
+    finally:
+        if future.done() and not succeeded(future):
+            with _lock:
+                if _in_flight.get(key) is future:
+                    del _in_flight[key]
+    return value_from_payload(payload)
+
+
+def caller_caching() -> str | None:
+    """The caching of the innermost function up the stack that is marked with
+    nt.cache.never or nt.cache.always, like the function of the user a formula calls"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        function = frame.f_globals.get(frame.f_code.co_name)
+        if getattr(function, "__code__", None) is frame.f_code and (
+            caching := getattr(function, "caching", None)
+        ):
+            return caching
+        frame = frame.f_back
+    return None
+
+
 def _api_call(func: Callable):
+    """Answers are cached by the arguments of the call for CACHE_SECONDS. caching="never"
+    makes the call without the cache, as does calling from a function that is marked
+    with nt.cache.never"""
+
     @wraps(func)
-    def wrapper(*args):
-        return make_call(func.__name__, *args)
+    def wrapper(*args, caching: str | None = None):
+        if caching is None:
+            caching = caller_caching() or "always"
+        elif caching not in CACHING_TYPES:
+            raise ValueError(f"caching should be one of {', '.join(CACHING_TYPES)}")
+        return make_call(func.__name__, *args, caching=caching)
 
     return wrapper
 
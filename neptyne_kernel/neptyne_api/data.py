@@ -1,4 +1,7 @@
 from json import JSONDecodeError
+from pathlib import PurePosixPath
+from typing import Literal, Sequence
+from urllib.parse import urlparse
 
 import feedparser
 import google.cloud.bigquery
@@ -7,8 +10,22 @@ import requests
 from google.api_core.exceptions import GoogleAPICallError
 from iexfinance.stocks import Stock
 
+from .. import http_cache
 from ..spreadsheet_error import VALUE_ERROR
 
+# pandas infers these from the name of the file, which the cached copy doesn't have:
+COMPRESSION_BY_SUFFIX = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".zip": "zip",
+    ".xz": "xz",
+    ".zst": "zstd",
+}
+
+
+def _compression(url: str) -> str | None:
+    return COMPRESSION_BY_SUFFIX.get(PurePosixPath(urlparse(url).path).suffix)
+
 
 def json(url_or_str: str) -> pd.DataFrame:
     """Import a JSON file from the web.
@@ -17,6 +34,13 @@ def json(url_or_str: str) -> pd.DataFrame:
         =data.json("https://data.cityofnewyork.us/resource/erm2-nwe9.json")
     """
     try:
+        if http_cache.is_url(url_or_str):
+            compression = _compression(url_or_str)
+            return http_cache.load(
+                url_or_str,
+                lambda f: pd.read_json(f, compression=compression),
+                "json",
+            ).copy()
         return pd.read_json(url_or_str)
     except JSONDecodeError as e:
         return VALUE_ERROR.with_message(str(e))
@@ -33,13 +57,35 @@ def geojson(url_or_str: str) -> pd.DataFrame:
     return geo.dataset(url_or_str)
 
 
-def csv(url_or_str: str) -> pd.DataFrame:
+def csv(
+    url_or_str: str,
+    usecols: Sequence[str | int] | None = None,
+    nrows: int | None = None,
+    engine: Literal["c", "python", "pyarrow"] | None = None,
+) -> pd.DataFrame:
     """Import a CSV file from the web.
 
+    usecols: only import these columns, by name or position
+    nrows: only import this many rows. Only the start of the file is downloaded, which makes
+        for a quick preview of a big file.
+    engine: the parser to use. "pyarrow" reads big files using multiple threads, but
+        doesn't support nrows.
+
+    Files are downloaded again only when they have changed.
+
     Example:
         =data.csv("https://data.cityofnewyork.us/resource/erm2-nwe9.csv")
     """
-    return pd.read_csv(url_or_str)
+    options = {"usecols": usecols, "nrows": nrows, "engine": engine}
+    if not http_cache.is_url(url_or_str):
+        return pd.read_csv(url_or_str, **options)
+    options["compression"] = _compression(url_or_str)
+    if nrows is not None:
+        with http_cache.stream(url_or_str) as f:
+            return pd.read_csv(f, **options)
+    return http_cache.load(
+        url_or_str, lambda f: pd.read_csv(f, **options), ("csv", options)
+    ).copy()
 
 
 def rss(url: str) -> pd.DataFrame:
@@ -48,7 +94,10 @@ def rss(url: str) -> pd.DataFrame:
     Example:
         =data.rss("https://www.reddit.com/r/Python/.rss")
     """
-    feed = feedparser.parse(url)
+    if http_cache.is_url(url):
+        feed = http_cache.load(url, feedparser.parse, "rss")
+    else:
+        feed = feedparser.parse(url)
     entries = feed.entries
     data = [
         {
@@ -73,14 +122,17 @@ def web_table(url: str, idx=-1) -> pd.DataFrame:
         =data.web_table("https://en.wikipedia.org/wiki/List_of_countries_by_GDP_(nominal)")
     """
 
-    tables = pd.read_html(url)
+    if http_cache.is_url(url):
+        tables = http_cache.load(url, pd.read_html, "html")
+    else:
+        tables = pd.read_html(url)
     if idx == -1:
-        return max(tables, key=lambda t: t.shape[0])
+        return max(tables, key=lambda t: t.shape[0]).copy()
     if idx >= len(tables):
         return VALUE_ERROR.with_message(
             f"Table index {idx} out of range - only {len(tables)} tables found"
         )
-    return tables[idx]
+    return tables[idx].copy()
 
 
 def big_query(sql: str) -> pd.DataFrame:
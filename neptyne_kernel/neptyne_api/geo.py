@@ -1,32 +1,146 @@
-from functools import partial, wraps
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache, partial, wraps
 from typing import Any, Callable
 
 import geopandas
 import numpy as np
-import pyproj
+import shapely
 from folium import GeoJson
 from geodatasets import get_path
 from geopandas import GeoDataFrame, GeoSeries, read_file
 from geopandas.tools import geocode as geopanda_geocode
 from geopandas.tools import reverse_geocode
+from pyproj import CRS, Transformer
 from shapely import Point, transform
 from shapely.geometry.base import BaseGeometry
 
+from ..cell_address import Address
 from ..cell_range import CellRange, unproxy_for_dataframe
+from ..dash_ref import DashRef
 from ..spreadsheet_error import UNSUPPORTED_ERROR, VALUE_ERROR
 
+RANGE_FRAME_CACHE_SIZE = 64
+TRANSFORMER_CACHE_SIZE = 256
+PROJECTIONS_PER_RANGE = 4
+
+
+@lru_cache(maxsize=TRANSFORMER_CACHE_SIZE)
+def meters_transformer(center_lat: float, center_lng: float) -> Transformer:
+    return Transformer.from_crs(
+        "EPSG:4326",
+        CRS(proj="aeqd", lat_0=center_lat, lon_0=center_lng),
+        always_xy=True,
+    )
+
 
 def transform_coord_to_meters(center_lat, center_lng, args):
-    source_proj = pyproj.Proj(init="epsg:4326")
-    target_proj = pyproj.Proj(proj="aeqd", lat_0=center_lat, lon_0=center_lng)
-    res = pyproj.transform(source_proj, target_proj, args[:, 0], args[:, 1])
-    return np.array(res).T
+    x, y = meters_transformer(center_lat, center_lng).transform(args[:, 0], args[:, 1])
+    return np.column_stack([x, y])
+
+
+def shape_array(shapes: list) -> np.ndarray:
+    # Not np.array(shapes), which would look inside multi-part shapes:
+    array = np.empty(len(shapes), dtype=object)
+    array[:] = shapes
+    return array
+
+
+def centroid_sums(shapes: list) -> tuple[float, float, int]:
+    """The sums of the latitudes and longitudes of the centroids of shapes and their
+    number, skipping anything that isn't a shape"""
+    centroids = shapely.get_coordinates(
+        shapely.centroid(
+            shape_array([shape for shape in shapes if isinstance(shape, BaseGeometry)])
+        )
+    )
+    return centroids[:, 1].sum(), centroids[:, 0].sum(), len(centroids)
+
+
+def to_meters(arg: Any, center: tuple[float, float]) -> Any:
+    to_meters_func = partial(transform_coord_to_meters, *center)
+    if isinstance(arg, BaseGeometry):
+        return transform(arg, to_meters_func)
+    if isinstance(arg, list):
+        if arg and all(isinstance(shape, BaseGeometry) for shape in arg):
+            # All coordinates in one go:
+            return list(transform(shape_array(arg), to_meters_func))
+        return [to_meters(shape, center) for shape in arg]
+    return arg
+
+
+@dataclass
+class RangeFrame:
+    """A cell range as a GeoDataFrame, along with what the geo functions derive from it.
+    Kept for as long as the cells in the range hold the same values."""
+
+    values: list
+    frame: GeoDataFrame
+    _shapes: list | None = None
+    _centroid_sums: tuple[float, float, int] | None = None
+    _projected: OrderedDict[tuple[float, float], list] = field(
+        default_factory=OrderedDict
+    )
+
+    @property
+    def shapes(self) -> list:
+        if self._shapes is None:
+            self._shapes = [
+                unproxy_for_dataframe(shape) for shape in self.frame.geometry
+            ]
+        return self._shapes
+
+    @property
+    def centroid_sums(self) -> tuple[float, float, int]:
+        if self._centroid_sums is None:
+            self._centroid_sums = centroid_sums(self.shapes)
+        return self._centroid_sums
+
+    def projected(self, center: tuple[float, float]) -> list:
+        if (shapes := self._projected.get(center)) is None:
+            shapes = self._projected[center] = to_meters(self.shapes, center)
+            if len(self._projected) > PROJECTIONS_PER_RANGE:
+                self._projected.popitem(last=False)
+        return shapes
+
+
+_range_frames: OrderedDict[tuple, RangeFrame] = OrderedDict()
+
+
+def range_frame(cell_range: CellRange) -> RangeFrame:
+    """The GeoDataFrame for the cell range, reused while its cells don't change"""
+    ref = cell_range.ref
+    if not isinstance(ref, DashRef):
+        return RangeFrame([], cell_range.to_geodataframe())
+    if not ref.range.is_fully_bounded():
+        ref = ref.resolve()
+    rng = ref.range
+    cells = ref.dash.cells[rng.sheet]
+    values = [
+        cells.get(Address(col, row, rng.sheet))
+        for row in range(rng.min_row, rng.max_row + 1)
+        for col in range(rng.min_col, rng.max_col + 1)
+    ]
+    key = (rng, cell_range.two_dimensional)
+    cached = _range_frames.get(key)
+    # The values are compared by identity, setting a cell stores a new one:
+    if (
+        cached is not None
+        and len(cached.values) == len(values)
+        and all(a is b for a, b in zip(cached.values, values))
+    ):
+        _range_frames.move_to_end(key)
+        return cached
+    cached = _range_frames[key] = RangeFrame(values, cell_range.to_geodataframe())
+    if len(_range_frames) > RANGE_FRAME_CACHE_SIZE:
+        _range_frames.popitem(last=False)
+    return cached
 
 
 def with_geodata_frames(func: Callable):
     def maybe_to_dataframe(arg: Any) -> Any:
         if isinstance(arg, CellRange) and arg.two_dimensional:
-            return arg.to_geodataframe()
+            return range_frame(arg).frame
         return arg
 
     @wraps(func)
@@ -118,46 +232,48 @@ def geo_call(convert_to_meters=True):
             if isinstance(arg, BaseGeometry):
                 return unproxy_for_dataframe(arg)
             if isinstance(arg, CellRange):
-                arg = arg.to_geodataframe()
+                return range_frame(arg).shapes
             if isinstance(arg, GeoDataFrame):
                 arg = arg.geometry
             if isinstance(arg, GeoSeries):
                 arg = [unproxy_for_dataframe(shape) for shape in arg]
             return arg
 
-        def get_centroid(args):
+        def get_centroid(args, frames):
             lat_sum = 0
             lng_sum = 0
             count = 0
-            for arg in args:
-                if isinstance(arg, BaseGeometry):
-                    lat_sum += arg.centroid.y
-                    lng_sum += arg.centroid.x
-                    count += 1
+            for arg, frame in zip(args, frames):
+                if frame is not None:
+                    sums = frame.centroid_sums
+                elif isinstance(arg, BaseGeometry):
+                    sums = arg.centroid.y, arg.centroid.x, 1
                 elif isinstance(arg, list):
-                    for shape in arg:
-                        if isinstance(shape, BaseGeometry):
-                            lat_sum += shape.centroid.y
-                            lng_sum += shape.centroid.x
-                            count += 1
+                    sums = centroid_sums(arg)
+                else:
+                    continue
+                lat_sum += sums[0]
+                lng_sum += sums[1]
+                count += sums[2]
             if count == 0:
                 return None, None
             return lat_sum / count, lng_sum / count
 
-        def maybe_transform(arg, to_meters):
-            if isinstance(arg, BaseGeometry):
-                return transform(arg, to_meters)
-            if isinstance(arg, list):
-                return [maybe_transform(shape, to_meters) for shape in arg]
-            return arg
-
         @wraps(func)
         def wrapper(*args, **kwargs):
-            args = [convert_arg(arg) for arg in args]
+            frames = [
+                range_frame(arg) if isinstance(arg, CellRange) else None for arg in args
+            ]
+            args = [
+                frame.shapes if frame else convert_arg(arg)
+                for arg, frame in zip(args, frames)
+            ]
             if convert_to_meters:
-                center_lat, center_lng = get_centroid(args)
-                to_meters = partial(transform_coord_to_meters, center_lat, center_lng)
-                args = [maybe_transform(arg, to_meters) for arg in args]
+                center = get_centroid(args, frames)
+                args = [
+                    frame.projected(center) if frame else to_meters(arg, center)
+                    for arg, frame in zip(args, frames)
+                ]
                 kwargs = {key: convert_arg(value) for key, value in kwargs.items()}
             method = getattr(args[0], func.__name__, None)
             if isinstance(method, float) or isinstance(method, int):
@@ -300,6 +416,52 @@ def sjoin(
     )
 
 
+def spatial_lookup(
+    target: CellRange | BaseGeometry | list,
+    layer: CellRange | GeoDataFrame,
+    column: str | None = None,
+    predicate: str = "intersects",
+    default: Any = None,
+) -> Any:
+    """For each shape in target, the value in column of the first row of layer whose
+    shape matches it, or default if none does. Without a column, whether any does.
+
+    All shapes are matched in one query against the spatial index of layer, which is
+    kept around for as long as the cells of layer don't change.
+
+    predicate : string, default 'intersects'
+        How the shape in target relates to the shape in layer, like 'within',
+        'contains' or 'touches'. See ``layer.sindex.valid_query_predicates``
+
+    Example:
+        =geo.spatial_lookup(A2:A1000, regions!A1:C200, "name", "within")
+        -- the name of the region each of the points in A2:A1000 lies in
+    """
+    if isinstance(layer, CellRange):
+        layer = range_frame(layer).frame
+    if isinstance(target, BaseGeometry):
+        shapes = [unproxy_for_dataframe(target)]
+    elif isinstance(target, CellRange) and target.two_dimensional:
+        shapes = range_frame(target).shapes
+    else:
+        shapes = [
+            unproxy_for_dataframe(shape) if isinstance(shape, BaseGeometry) else None
+            for shape in target
+        ]
+
+    input_indices, layer_indices = layer.sindex.query(
+        shape_array(shapes), predicate=predicate
+    )
+    first_match = np.full(len(shapes), len(layer))
+    np.minimum.at(first_match, input_indices, layer_indices)
+    if column is None:
+        results = (first_match < len(layer)).tolist()
+    else:
+        values = [*layer[column].tolist(), default]
+        results = [values[index] for index in first_match]
+    return results[0] if isinstance(target, BaseGeometry) else results
+
+
 @with_geodata_frames
 def buffer(
     target: BaseGeometry,
@@ -376,6 +538,7 @@ __all__ = [
     "plot",
     "reverse_geocode",
     "sjoin",
+    "spatial_lookup",
     "symmetric_difference",
     "union",
     "wkt",
@@ -69,6 +69,7 @@
 #     result = set_secrets_content_from_dict(json.loads(json_string))
 #     result = secrets_from_dict(json.loads(json_string))
 #     result = tick_reply_content_from_dict(json.loads(json_string))
+#     result = kernel_metrics_content_from_dict(json.loads(json_string))
 #     result = organization_create_content_from_dict(json.loads(json_string))
 #     result = access_mode_from_dict(json.loads(json_string))
 #     result = g_sheets_image_from_dict(json.loads(json_string))
@@ -499,6 +500,7 @@ class MessageTypes(Enum):
     INSERT_DELETE_CELLS_REPLY = "insert_delete_cells_reply"
     INSTALL_REQUIREMENTS = "install_requirements"
     INTERRUPT_KERNEL = "interrupt_kernel"
+    KERNEL_METRICS = "kernel_metrics"
     LINTER = "linter"
     LOG_EVENT = "log_event"
     NAVIGATE_TO = "navigate_to"
@@ -819,19 +821,32 @@ class RerunCellsContent:
 
 class SheetUpdateContent:
     cell_updates: List[Any]
+    packed_cells: Optional[List[List[float]]]
 
-    def __init__(self, cell_updates: List[Any]) -> None:
+    def __init__(
+        self, cell_updates: List[Any], packed_cells: Optional[List[List[float]]]
+    ) -> None:
         self.cell_updates = cell_updates
+        self.packed_cells = packed_cells
 
     @staticmethod
     def from_dict(obj: Any) -> "SheetUpdateContent":
         assert isinstance(obj, dict)
         cell_updates = from_list(lambda x: x, obj.get("cellUpdates"))
-        return SheetUpdateContent(cell_updates)
+        packed_cells = from_union(
+            [lambda x: from_list(lambda x: from_list(from_float, x), x), from_none],
+            obj.get("packedCells"),
+        )
+        return SheetUpdateContent(cell_updates, packed_cells)
 
     def to_dict(self) -> dict:
         result: dict = {}
         result["cellUpdates"] = from_list(lambda x: x, self.cell_updates)
+        if self.packed_cells is not None:
+            result["packedCells"] = from_union(
+                [lambda x: from_list(lambda x: from_list(to_float, x), x), from_none],
+                self.packed_cells,
+            )
         return result
 
 
@@ -1759,6 +1774,44 @@ class TickReplyContent:
         return result
 
 
+class KernelMetricsContent:
+    cascade_depth_counts: List[float]
+    cells_evaluated: float
+    flushed_cells: float
+    flushes: float
+
+    def __init__(
+        self,
+        cascade_depth_counts: List[float],
+        cells_evaluated: float,
+        flushed_cells: float,
+        flushes: float,
+    ) -> None:
+        self.cascade_depth_counts = cascade_depth_counts
+        self.cells_evaluated = cells_evaluated
+        self.flushed_cells = flushed_cells
+        self.flushes = flushes
+
+    @staticmethod
+    def from_dict(obj: Any) -> "KernelMetricsContent":
+        assert isinstance(obj, dict)
+        cascade_depth_counts = from_list(from_float, obj.get("cascadeDepthCounts"))
+        cells_evaluated = from_float(obj.get("cellsEvaluated"))
+        flushed_cells = from_float(obj.get("flushedCells"))
+        flushes = from_float(obj.get("flushes"))
+        return KernelMetricsContent(
+            cascade_depth_counts, cells_evaluated, flushed_cells, flushes
+        )
+
+    def to_dict(self) -> dict:
+        result: dict = {}
+        result["cascadeDepthCounts"] = from_list(to_float, self.cascade_depth_counts)
+        result["cellsEvaluated"] = to_float(self.cells_evaluated)
+        result["flushedCells"] = to_float(self.flushed_cells)
+        result["flushes"] = to_float(self.flushes)
+        return result
+
+
 class OrganizationCreateContent:
     domain: Optional[str]
     name: str
@@ -2651,6 +2704,14 @@ def tick_reply_content_to_dict(x: TickReplyContent) -> Any:
     return to_class(TickReplyContent, x)
 
 
+def kernel_metrics_content_from_dict(s: Any) -> KernelMetricsContent:
+    return KernelMetricsContent.from_dict(s)
+
+
+def kernel_metrics_content_to_dict(x: KernelMetricsContent) -> Any:
+    return to_class(KernelMetricsContent, x)
+
+
 def organization_create_content_from_dict(s: Any) -> OrganizationCreateContent:
     return OrganizationCreateContent.from_dict(s)
 
@@ -0,0 +1,102 @@
+"""Numbers that change in rectangles of the sheet, like a live feed of prices or a column
+that was recalculated, go to the client as float64s in a buffer of the SHEET_UPDATE
+message instead of one JSON cell update each. Every block in packedCells is
+[sheet, col, row, width, height] and takes the next width * height numbers of the buffer,
+row by row. The client turns them back into [cellId, value] cell updates.
+"""
+
+import math
+from typing import Any
+
+import numpy as np
+
+# Fewer numbers than this in a rectangle aren't worth a block:
+MIN_PACKED_CELLS = 16
+# Beyond this, the client's numbers can't tell ints apart:
+MAX_EXACT_INT = 2**53
+
+
+def packable_number(cell_update: Any) -> int | float | None:
+    """The number of a compact cell update that the client can rebuild from the number
+    alone, which means its code is how JavaScript prints the number."""
+    if not isinstance(cell_update, list) or len(cell_update) != 3:
+        return None
+    _cell_id, value, code = cell_update
+    if value.__class__ is int:
+        if -MAX_EXACT_INT < value < MAX_EXACT_INT and code == str(value):
+            return value
+    elif value.__class__ is float and math.isfinite(value):
+        # Python and JavaScript print floats the same way, except for exponents and
+        # whole numbers:
+        if code == repr(value) and "e" not in code and not code.endswith(".0"):
+            return value
+    return None
+
+
+def pack_cell_updates(
+    cell_updates: list[Any],
+) -> tuple[list[Any], list[list[int]], bytes | None]:
+    """Splits cell_updates into the ones that stay JSON, the blocks of packed numbers and
+    the buffer with their values"""
+    numbers: dict[tuple[int, int, int], tuple[int, int | float]] = {}
+    for i, cell_update in enumerate(cell_updates):
+        if (value := packable_number(cell_update)) is not None:
+            col, row, sheet = cell_update[0]
+            numbers[sheet, row, col] = (i, value)
+    if len(numbers) < MIN_PACKED_CELLS:
+        return cell_updates, [], None
+
+    # Runs of neighbouring cells in a row first, then the same runs in the rows below:
+    runs: list[list[int]] = []
+    for sheet, row, col in sorted(numbers):
+        if runs and runs[-1][:2] == [sheet, row] and sum(runs[-1][2:]) == col:
+            runs[-1][3] += 1
+        else:
+            runs.append([sheet, row, col, 1])
+    blocks: list[list[int]] = []
+    open_blocks: dict[tuple[int, int, int], list[int]] = {}
+    for sheet, row, col, width in runs:
+        block = open_blocks.get((sheet, col, width))
+        if block is not None and block[2] + block[4] == row:
+            block[4] += 1
+        else:
+            block = open_blocks[sheet, col, width] = [sheet, col, row, width, 1]
+            blocks.append(block)
+
+    packed_blocks = []
+    values: list[int | float] = []
+    packed: set[int] = set()
+    for block in blocks:
+        sheet, col, row, width, height = block
+        if width * height < MIN_PACKED_CELLS:
+            continue
+        packed_blocks.append(block)
+        for r in range(row, row + height):
+            for c in range(col, col + width):
+                i, value = numbers[sheet, r, c]
+                values.append(value)
+                packed.add(i)
+    if not packed_blocks:
+        return cell_updates, [], None
+    rest = [
+        cell_update for i, cell_update in enumerate(cell_updates) if i not in packed
+    ]
+    return rest, packed_blocks, np.array(values, dtype="<f8").tobytes()
+
+
+def unpack_cell_updates(
+    packed_blocks: list[list[int]], buffer: bytes | memoryview
+) -> list[list]:
+    """The [cellId, value] cell updates of packed_blocks, like the client makes them"""
+    values = np.frombuffer(buffer, dtype="<f8").tolist()
+    cell_updates = []
+    i = 0
+    for sheet, col, row, width, height in packed_blocks:
+        for r in range(row, row + height):
+            for c in range(col, col + width):
+                value = values[i]
+                cell_updates.append(
+                    [(c, r, sheet), int(value) if value.is_integer() else value]
+                )
+                i += 1
+    return cell_updates
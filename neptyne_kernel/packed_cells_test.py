@@ -0,0 +1,47 @@
+import pytest
+
+from .packed_cells import pack_cell_updates, packable_number, unpack_cell_updates
+
+
+@pytest.mark.parametrize(
+    "cell_update, expected",
+    [
+        ([(0, 0, 0), 1, "1"], 1),
+        ([(0, 0, 0), -2.5, "-2.5"], -2.5),
+        ([(0, 0, 0), 0.1, "0.1"], 0.1),
+        ([(0, 0, 0), 1, "=A2"], None),
+        ([(0, 0, 0), 5.0, "5.0"], None),
+        ([(0, 0, 0), 1e30, "1e+30"], None),
+        ([(0, 0, 0), 2**60, str(2**60)], None),
+        ([(0, 0, 0), float("nan"), "nan"], None),
+        ([(0, 0, 0), True, "True"], None),
+        ([(0, 0, 0), "1"], None),
+        ({"cellId": (0, 0, 0), "code": "1"}, None),
+    ],
+)
+def test_packable_number(cell_update, expected):
+    assert packable_number(cell_update) == expected
+
+
+def test_pack_cell_updates_round_trip():
+    numbers = [
+        [(col, row, 1), row * 10 + col, str(row * 10 + col)]
+        for row in range(5)
+        for col in range(2, 6)
+    ]
+    # Too narrow to be worth a block:
+    column = [[(8, row, 1), row + 0.5, str(row + 0.5)] for row in range(5)]
+    others = [[(0, 0, 0), "x"], {"cellId": (1, 0, 0), "code": "=A1"}]
+    cell_updates = [*others, *column, *numbers[::-1]]
+
+    rest, packed_blocks, buffer = pack_cell_updates(cell_updates)
+    assert packed_blocks == [[1, 2, 0, 4, 5]]
+    assert rest == [*others, *column]
+    assert unpack_cell_updates(packed_blocks, buffer) == [
+        [cell_id, value] for cell_id, value, _code in numbers
+    ]
+
+
+def test_pack_cell_updates_leaves_few_numbers():
+    cell_updates = [[(col, 0, 0), col, str(col)] for col in range(10)]
+    assert pack_cell_updates(cell_updates) == (cell_updates, [], None)
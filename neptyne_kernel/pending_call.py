@@ -0,0 +1,39 @@
+"""Slow calls made while evaluating a formula, like asking the AI, can run in the
+background so that the rest of the sheet doesn't wait for them one at a time.
+
+A call that supports this raises CallPending with the future of its result when it is
+made during a recalculation (see deferring_calls). The recalculation then evaluates the
+cell again once that future is done, at which point the call returns its result.
+"""
+
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+_defer_calls: ContextVar[bool] = ContextVar("defer_calls", default=False)
+
+
+class CallPending(BaseException):
+    """Raised instead of blocking on the result of a call. Derives from BaseException
+    so that user code catching Exception doesn't swallow it."""
+
+    def __init__(self, future: Future) -> None:
+        super().__init__()
+        self.future = future
+
+
+@contextmanager
+def deferring_calls() -> Iterator[None]:
+    token = _defer_calls.set(True)
+    try:
+        yield
+    finally:
+        _defer_calls.reset(token)
+
+
+def result_or_pending(future: Future) -> Any:
+    """The result of future, waiting for it unless calls are being deferred"""
+    if not future.done() and _defer_calls.get():
+        raise CallPending(future)
+    return future.result()
@@ -0,0 +1,178 @@
+"""Ranges of the sheet become DataFrames by reading the values of their cells straight
+from the dash, one column at a time, instead of going through a proxy per cell and
+transposing the rows. The values end up the same as unproxy_for_dataframe would make
+them: blanks are missing and numbers formatted as dates are datetimes.
+"""
+
+from types import NoneType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Iterable,
+    Iterator,
+    Literal,
+    NamedTuple,
+    Sequence,
+)
+
+import numpy as np
+import pandas as pd
+
+from .cell_address import Address, Range, items_in_range
+from .neptyne_protocol import CellAttribute, NumberFormat
+from .spreadsheet_datetime import excel2datetime
+
+if TYPE_CHECKING:
+    from .dash import Dash
+    from .tyne_model.cell import CellMetadata
+
+DtypeBackend = Literal["numpy", "numpy_nullable"]
+
+INT64_MIN = -(2**63)
+INT64_MAX = 2**63 - 1
+
+
+class Addresses(NamedTuple):
+    values: list[Address]
+    meta: list[Address]
+
+
+def block_columns(
+    dash: "Dash",
+    block: Range,
+    dtype_backend: DtypeBackend = "numpy",
+    addresses: Addresses | None = None,
+) -> list[list[Any]]:
+    """The values of the cells of the bounded block, one list per column. addresses, if
+    given, are the addresses in block that have values and metadata."""
+    height, width = block.shape()
+    columns: list[list[Any]] = [[None] * height for _ in range(width)]
+    cells = dash.cells[block.sheet]
+    if addresses is None:
+        values: Iterable[tuple[Address, Any]] = items_in_range(cells, block)
+        metas: Iterable[tuple[Address, CellMetadata]] = items_in_range(
+            dash.cell_meta, block
+        )
+    else:
+        values = ((address, cells[address]) for address in addresses.values)
+        metas = ((address, dash.cell_meta[address]) for address in addresses.meta)
+    # Booleans come out of cells as the ints their proxies are, unless the columns get
+    # their own dtypes:
+    bools_as_ints = dtype_backend == "numpy"
+    for address, value in values:
+        if bools_as_ints and value.__class__ is bool:
+            value = int(value)
+        columns[address.column - block.min_col][address.row - block.min_row] = value
+    for address, meta in metas:
+        number_format = meta.attributes.get(CellAttribute.NUMBER_FORMAT.value)
+        if number_format and number_format.startswith(NumberFormat.DATE.value):
+            column = columns[address.column - block.min_col]
+            value = column[address.row - block.min_row]
+            if isinstance(value, int | float):
+                column[address.row - block.min_row] = excel2datetime(value)
+    return columns
+
+
+def tight_dtype(values: Sequence[Any]) -> Any:
+    """The narrowest dtype that holds values, with missing values for the Nones. None
+    if pandas should infer it."""
+    types = set(map(type, values))
+    has_missing = NoneType in types
+    types.discard(NoneType)
+    if not types:
+        return "float64"
+    if types == {bool}:
+        return "boolean" if has_missing else "bool"
+    if types == {int}:
+        present = [value for value in values if value is not None]
+        if INT64_MIN <= min(present) and max(present) <= INT64_MAX:
+            return "Int64" if has_missing else "int64"
+        return None
+    if types <= {int, float}:
+        return "float64"
+    if types == {str}:
+        distinct = len(set(values)) - has_missing
+        # Repeating strings take less memory and compare faster as categories:
+        if distinct * 2 <= len(values):
+            return "category"
+        return pd.StringDtype("pyarrow")
+    return None
+
+
+def column_series(
+    values: list[Any],
+    name: Any,
+    start: int,
+    dtype: Any,
+    dtype_backend: DtypeBackend,
+) -> pd.Series:
+    if dtype_backend == "numpy_nullable":
+        if dtype is None:
+            dtype = tight_dtype(values)
+    elif NoneType in set(map(type, values)):
+        values = [np.nan if value is None else value for value in values]
+    return pd.Series(
+        values,
+        name=name,
+        dtype=dtype,
+        index=pd.RangeIndex(start=start, stop=start + len(values)),
+    )
+
+
+def block_frame(
+    dash: "Dash",
+    block: Range,
+    names: Sequence[Any],
+    start: int,
+    dtype: dict[str, Any] | None,
+    dtype_backend: DtypeBackend,
+    addresses: Addresses | None = None,
+) -> pd.DataFrame:
+    series = []
+    columns = block_columns(dash, block, dtype_backend, addresses)
+    for values, name in zip(columns, names):
+        col_dtype = dtype.get(name) if dtype and name in dtype else None
+        series.append(column_series(values, name, start, col_dtype, dtype_backend))
+    if len(series) == 1:
+        return series[0].to_frame()
+    return pd.concat(series, axis=1)
+
+
+def block_frames(
+    dash: "Dash",
+    block: Range,
+    names: Sequence[Any],
+    start: int,
+    dtype: dict[str, Any] | None,
+    dtype_backend: DtypeBackend,
+    chunksize: int,
+) -> Iterator[pd.DataFrame]:
+    """The rows of block as DataFrames of up to chunksize rows each"""
+    # Going over the cells once and then looking up the values of each chunk is a lot
+    # cheaper than finding the cells of every chunk on its own:
+    chunks = [
+        Addresses([], [])
+        for _ in range((block.max_row - block.min_row) // chunksize + 1)
+    ]
+    for address, _ in items_in_range(dash.cells[block.sheet], block):
+        chunks[(address.row - block.min_row) // chunksize].values.append(address)
+    for address, _ in items_in_range(dash.cell_meta, block):
+        chunks[(address.row - block.min_row) // chunksize].meta.append(address)
+    for i, addresses in enumerate(chunks):
+        min_row = block.min_row + i * chunksize
+        chunk = Range(
+            block.min_col,
+            block.max_col,
+            min_row,
+            min(min_row + chunksize - 1, block.max_row),
+            block.sheet,
+        )
+        yield block_frame(
+            dash,
+            chunk,
+            names,
+            start + min_row - block.min_row,
+            dtype,
+            dtype_backend,
+            addresses,
+        )
@@ -0,0 +1,299 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any, Callable, Iterator
+
+from .cell_address import Address
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+PHASE_RECALC = "recalc"
+PHASE_CASCADE = "cascade"
+PHASE_COMPILE = "compile"
+PHASE_GRAPH = "build_graph"
+PHASE_EVAL = "eval"
+PHASE_SET_ITEM = "set_item"
+PHASE_CELL_META = "cell_meta"
+PHASE_FLUSH = "flush"
+
+# Returned by Dash when no profiler is attached, so the hot paths only pay for an attribute
+# check. nullcontext instances are reusable and reentrant.
+NO_PROFILE = nullcontext()
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+@dataclass
+class CellProfile:
+    """Accumulated timings for a single cell. Times are in seconds and include the time
+    spent writing the result back into the sheet (set_time)."""
+
+    cell: str
+    evaluations: int = 0
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    compile_time: float = 0.0
+    set_time: float = 0.0
+
+
+@dataclass
+class _Frame:
+    name: str
+    phase: str
+    address: Address | None
+    start_wall: float
+    start_cpu: float
+    child_wall: float = 0.0
+
+
+class RecalcProfiler:
+    """Collects timings of a recalculation while attached to the Dash.
+
+    Start one with `N_.profile_recalc()`, edit some cells and call `stop()`. It can also be
+    used as a context manager. Afterwards `report()` gives a table of the slowest cells,
+    `to_dataframe()` a sortable version of the same and `save_speedscope()` or
+    `save_flamegraph()` write files that can be opened with speedscope.app or flamegraph.pl.
+    """
+
+    def __init__(
+        self,
+        cell_label: Callable[[Address], str] | None = None,
+        on_stop: Callable[["RecalcProfiler"], None] | None = None,
+    ) -> None:
+        self._cell_label = cell_label or (lambda address: address.to_a1())
+        self._on_stop = on_stop
+        self._lock = threading.Lock()
+        self._stack: list[_Frame] = []
+        self._frames: dict[str, int] = {}
+        self._events: list[tuple[str, int, float]] = []
+        self._folded: dict[tuple[str, ...], float] = defaultdict(float)
+
+        self.cells: dict[Address, CellProfile] = {}
+        self.phase_time: dict[str, float] = defaultdict(float)
+        self.phase_count: dict[str, int] = defaultdict(int)
+        self.ref_reads = 0
+        self.max_cascade_depth = 0
+        self.cascade_limit_hits = 0
+        self.flushed_cells = 0
+        self.start_time = time.perf_counter()
+        self.end_time: float | None = None
+
+    def __enter__(self) -> "RecalcProfiler":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def __repr__(self) -> str:
+        return self.report()
+
+    @property
+    def running(self) -> bool:
+        return self.end_time is None
+
+    @property
+    def total_time(self) -> float:
+        end = self.end_time if self.end_time is not None else time.perf_counter()
+        return end - self.start_time
+
+    def stop(self) -> "RecalcProfiler":
+        if self.end_time is None:
+            self.end_time = time.perf_counter()
+            if self._on_stop:
+                self._on_stop(self)
+        return self
+
+    def _cell_profile(self, address: Address) -> CellProfile:
+        profile = self.cells.get(address)
+        if profile is None:
+            profile = self.cells[address] = CellProfile(self._cell_label(address))
+        return profile
+
+    def _frame_name(self, phase: str, address: Address | None) -> str:
+        if phase == PHASE_EVAL and address is not None:
+            return self._cell_label(address)
+        if address is not None:
+            return f"{phase} {self._cell_label(address)}"
+        return phase
+
+    def _frame_index(self, name: str) -> int:
+        index = self._frames.get(name)
+        if index is None:
+            index = self._frames[name] = len(self._frames)
+        return index
+
+    @contextmanager
+    def phase(
+        self, phase: str, address: Address | None = None, stacked: bool = True
+    ) -> Iterator[None]:
+        """Time the enclosed block as phase, optionally attributed to a cell.
+
+        Work that runs concurrently with the recalculation (the flush loop) should pass
+        stacked=False so it only contributes to the totals and not to the flame graph."""
+        if not self.running:
+            yield
+            return
+        if not stacked:
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self.phase_time[phase] += time.perf_counter() - start
+                    self.phase_count[phase] += 1
+            return
+
+        name = self._frame_name(phase, address)
+        frame = _Frame(name, phase, address, time.perf_counter(), time.thread_time())
+        self._stack.append(frame)
+        self._events.append(("O", self._frame_index(name), frame.start_wall))
+        try:
+            yield
+        finally:
+            self._close(frame)
+
+    def _close(self, frame: _Frame) -> None:
+        end_wall = time.perf_counter()
+        wall = end_wall - frame.start_wall
+        cpu = time.thread_time() - frame.start_cpu
+        stack = self._stack
+        if not any(f is frame for f in stack):
+            return
+        while stack[-1] is not frame:
+            # A frame was left open by a generator that never finished; close it here so the
+            # stack stays balanced.
+            self._close(stack[-1])
+        stack.pop()
+        self._events.append(("C", self._frame_index(frame.name), end_wall))
+        self._folded[(*(f.name for f in stack), frame.name)] += wall - frame.child_wall
+        if stack:
+            stack[-1].child_wall += wall
+
+        if not any(f.phase == frame.phase for f in stack):
+            with self._lock:
+                self.phase_time[frame.phase] += wall
+                self.phase_count[frame.phase] += 1
+
+        if frame.address is not None:
+            profile = self._cell_profile(frame.address)
+            if frame.phase == PHASE_EVAL:
+                profile.evaluations += 1
+                profile.wall_time += wall
+                profile.cpu_time += cpu
+            elif frame.phase == PHASE_COMPILE:
+                profile.compile_time += wall
+            elif frame.phase == PHASE_SET_ITEM:
+                profile.set_time += wall
+
+    def record_ref_read(self) -> None:
+        self.ref_reads += 1
+
+    def record_cascade(self, depth: int, hit_limit: bool) -> None:
+        self.max_cascade_depth = max(self.max_cascade_depth, depth)
+        if hit_limit:
+            self.cascade_limit_hits += 1
+
+    def record_flush(self, cell_count: int) -> None:
+        with self._lock:
+            self.flushed_cells += cell_count
+
+    def rows(self, sort_by: str = "wall_time") -> list[dict[str, Any]]:
+        """Per cell timings as dicts, slowest first."""
+        rows = [asdict(profile) for profile in self.cells.values()]
+        rows.sort(key=lambda row: row[sort_by], reverse=sort_by != "cell")
+        return rows
+
+    def to_dataframe(self, sort_by: str = "wall_time") -> "pd.DataFrame":
+        import pandas as pd
+
+        return pd.DataFrame(
+            self.rows(sort_by),
+            columns=[
+                "cell",
+                "evaluations",
+                "wall_time",
+                "cpu_time",
+                "compile_time",
+                "set_time",
+            ],
+        )
+
+    def report(self, sort_by: str = "wall_time", limit: int | None = 20) -> str:
+        lines = [
+            f"Recalc profile: {self.total_time * 1000:.1f} ms"
+            f"{' (running)' if self.running else ''}",
+        ]
+        for phase, seconds in sorted(
+            self.phase_time.items(), key=lambda item: item[1], reverse=True
+        ):
+            lines.append(
+                f"  {phase:<12} {seconds * 1000:10.2f} ms  {self.phase_count[phase]:8d}x"
+            )
+        lines.append(
+            f"  cell reads {self.ref_reads}, max cascade depth {self.max_cascade_depth}"
+            f", cascade limit hit {self.cascade_limit_hits}x"
+            f", cells flushed {self.flushed_cells}"
+        )
+        rows = self.rows(sort_by)
+        if limit is not None:
+            rows = rows[:limit]
+        if rows:
+            lines.append("")
+            lines.append(
+                f"{'cell':<16}{'evals':>8}{'wall ms':>12}{'cpu ms':>12}"
+                f"{'compile ms':>12}{'set ms':>12}"
+            )
+            for row in rows:
+                lines.append(
+                    f"{row['cell']:<16}{row['evaluations']:>8}"
+                    f"{row['wall_time'] * 1000:>12.3f}{row['cpu_time'] * 1000:>12.3f}"
+                    f"{row['compile_time'] * 1000:>12.3f}{row['set_time'] * 1000:>12.3f}"
+                )
+        return "\n".join(lines)
+
+    def to_speedscope(self) -> dict[str, Any]:
+        """An evented profile in the speedscope file format. Times are in milliseconds."""
+        events = [
+            {"type": kind, "frame": frame, "at": (at - self.start_time) * 1000}
+            for kind, frame, at in self._events
+        ]
+        end_value = max(events[-1]["at"] if events else 0, self.total_time * 1000)
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "exporter": "neptyne",
+            "name": "Neptyne recalc",
+            "activeProfileIndex": 0,
+            "shared": {"frames": [{"name": name} for name in self._frames]},
+            "profiles": [
+                {
+                    "type": "evented",
+                    "name": "Neptyne recalc",
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": end_value,
+                    "events": events,
+                }
+            ],
+        }
+
+    def to_folded(self) -> str:
+        """Collapsed stacks (flamegraph.pl format) with self time in microseconds."""
+        return "\n".join(
+            f"{';'.join(stack)} {round(seconds * 1_000_000)}"
+            for stack, seconds in self._folded.items()
+        )
+
+    def save_speedscope(self, path: str) -> str:
+        with open(path, "w") as f:
+            json.dump(self.to_speedscope(), f)
+        return path
+
+    def save_flamegraph(self, path: str) -> str:
+        with open(path, "w") as f:
+            f.write(self.to_folded())
+            f.write("\n")
+        return path
@@ -0,0 +1,83 @@
+import json
+
+from .recalc_profiler import (
+    PHASE_COMPILE,
+    PHASE_EVAL,
+    PHASE_RECALC,
+    PHASE_SET_ITEM,
+    RecalcProfiler,
+)
+from .test_utils import a1
+
+
+def test_nested_phases():
+    profiler = RecalcProfiler()
+    with profiler.phase(PHASE_RECALC):
+        with profiler.phase(PHASE_COMPILE, a1("A1")):
+            pass
+        for _ in range(2):
+            with profiler.phase(PHASE_EVAL, a1("A1")):
+                with profiler.phase(PHASE_SET_ITEM, a1("A1")):
+                    pass
+    profiler.stop()
+
+    cell = profiler.cells[a1("A1")]
+    assert cell.cell == "A1"
+    assert cell.evaluations == 2
+    assert cell.wall_time >= cell.set_time > 0
+    assert cell.compile_time > 0
+    assert profiler.phase_count[PHASE_EVAL] == 2
+    assert profiler.phase_count[PHASE_RECALC] == 1
+    assert profiler.phase_time[PHASE_RECALC] >= profiler.phase_time[PHASE_EVAL]
+
+    folded = dict(line.rsplit(" ", 1) for line in profiler.to_folded().splitlines())
+    assert set(folded) == {
+        "recalc",
+        "recalc;compile A1",
+        "recalc;A1",
+        "recalc;A1;set_item A1",
+    }
+
+
+def test_stop_detaches():
+    stopped = []
+    profiler = RecalcProfiler(on_stop=stopped.append)
+    with profiler:
+        profiler.record_ref_read()
+        profiler.record_cascade(3, hit_limit=False)
+    assert stopped == [profiler]
+    assert not profiler.running
+
+    with profiler.phase(PHASE_EVAL, a1("B2")):
+        pass
+    assert not profiler.cells
+    assert profiler.ref_reads == 1
+    assert profiler.max_cascade_depth == 3
+
+
+def test_report_and_exports(tmp_path):
+    profiler = RecalcProfiler()
+    for cell in ("A1", "B1", "C1"):
+        with profiler.phase(PHASE_EVAL, a1(cell)):
+            pass
+    profiler.stop()
+
+    rows = profiler.rows()
+    assert [row["wall_time"] for row in rows] == sorted(
+        (row["wall_time"] for row in rows), reverse=True
+    )
+    assert [row["cell"] for row in profiler.rows("cell")] == ["A1", "B1", "C1"]
+    assert "B1" in profiler.report()
+    assert len(profiler.to_dataframe()) == 3
+
+    speedscope = json.loads(
+        open(profiler.save_speedscope(str(tmp_path / "recalc.json"))).read()
+    )
+    assert [frame["name"] for frame in speedscope["shared"]["frames"]] == [
+        "A1",
+        "B1",
+        "C1",
+    ]
+    events = speedscope["profiles"][0]["events"]
+    assert [event["type"] for event in events] == ["O", "C"] * 3
+    assert all(a["at"] <= b["at"] for a, b in zip(events, events[1:]))
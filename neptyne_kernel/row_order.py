@@ -0,0 +1,186 @@
+"""Sorting, filtering and removing duplicate rows of a range work out the order the rows
+should end up in first, and then move the values and metadata of those rows as one block.
+Reading every row through proxies and writing it back cell by cell would also leave the
+formatting of the cells behind.
+"""
+
+from typing import TYPE_CHECKING, Any, Sequence
+
+import numpy as np
+
+from .cell_address import Address, Range, items_in_range
+from .neptyne_protocol import MessageTypes
+
+if TYPE_CHECKING:
+    from .dash import Dash
+    from .tyne_model.cell import CellMetadata
+
+# Beyond this, floats can't tell ints apart:
+MAX_EXACT_INT = 2**53
+
+
+def _sort_key(values: Sequence[Any]) -> np.ndarray | None:
+    types = set(map(type, values))
+    if types <= {int, float, bool}:
+        if int in types and not all(
+            -MAX_EXACT_INT < value < MAX_EXACT_INT for value in values
+        ):
+            return None
+        key = np.array(values, dtype=np.float64)
+        # sorted() doesn't order NaNs consistently, so neither can we:
+        return None if np.isnan(key).any() else key
+    if types == {str}:
+        return np.array(values, dtype=str)
+    return None
+
+
+def sort_order(
+    columns: Sequence[Sequence[Any]], reverse: bool = False
+) -> list[int] | None:
+    """The order of the rows that sorts them by the values of columns, the first column
+    first, the way a stable sorted() does. Returns None if a column mixes types or has
+    blanks, in which case sorted() has to decide."""
+    keys = []
+    for values in columns:
+        key = _sort_key(values)
+        if key is None:
+            return None
+        keys.append(key)
+    if not keys:
+        return None
+    # np.lexsort sorts by the last key first:
+    if not reverse:
+        return np.lexsort(keys[::-1]).tolist()
+    # Sorting the reversed rows and reversing the result keeps equal rows in order:
+    count = len(keys[0])
+    order = np.lexsort([key[::-1] for key in keys[::-1]])
+    return (count - 1 - order)[::-1].tolist()
+
+
+def unique_order(keys: Sequence[tuple]) -> list[int]:
+    """The rows with the first occurrence of each key"""
+    first: dict[Any, int] = {}
+    for i, key in enumerate(keys):
+        try:
+            first.setdefault(key, i)
+        except TypeError:
+            first.setdefault(repr(key), i)
+    return [*first.values()]
+
+
+def reorder_rows(dash: "Dash", cell_range: Range, order: Sequence[int]) -> None:
+    """Moves row order[i] of the bounded cell_range to row i and clears the rows after the
+    last one in order, values, attributes and all. Formulas in the rows that move are
+    replaced by their values and what they spilled outside of cell_range is cleared, like
+    writing the rows back would. The client gets the cells
+    that changed as one update, which can be undone in one go."""
+    # Importing this at the top would import the formulas while they import cell_range:
+    from .expression_compiler import is_cell_formula
+
+    sheet = cell_range.sheet
+    min_row = cell_range.min_row
+    dash.cells.hydrate(sheet)
+    cells = dash.cells[sheet]
+
+    values_by_row: dict[int, list[tuple[int, Any]]] = {}
+    for address, value in items_in_range(cells, cell_range):
+        values_by_row.setdefault(address.row - min_row, []).append(
+            (address.column, value)
+        )
+    meta_by_row: dict[int, list[tuple[int, CellMetadata]]] = {}
+    for address, meta in items_in_range(dash.cell_meta, cell_range):
+        meta_by_row.setdefault(address.row - min_row, []).append((address.column, meta))
+    formulas = {
+        Address(col, min_row + row, sheet)
+        for row, metas in meta_by_row.items()
+        for col, meta in metas
+        if is_cell_formula(meta.raw_code)
+    }
+    spilled = {
+        address for address, _ in items_in_range(dash.graph.calculated_by, cell_range)
+    }
+    recalculated_rows = {address.row - min_row for address in formulas | spilled}
+
+    def occupied(row: int) -> bool:
+        return row in values_by_row or row in meta_by_row
+
+    changed_rows = []
+    for row in range(cell_range.max_row - min_row + 1):
+        source = order[row] if row < len(order) else -1
+        if row in recalculated_rows or (
+            source != row and (occupied(row) or (source >= 0 and occupied(source)))
+        ):
+            changed_rows.append(row)
+    if not changed_rows:
+        return
+
+    # What formulas in the range spilled outside of it is cleared, like writing the rows
+    # back would:
+    spilled_outside = {
+        other
+        for address in formulas
+        for other in dash.cells_calculated_by(address)
+        if other not in cell_range
+    }
+
+    changed: set[Address] = set()
+    for row in changed_rows:
+        columns = {col for col, _ in values_by_row.get(row, ())}
+        columns.update(col for col, _ in meta_by_row.get(row, ()))
+        if row < len(order):
+            columns.update(col for col, _ in values_by_row.get(order[row], ()))
+            columns.update(col for col, _ in meta_by_row.get(order[row], ()))
+        changed.update(Address(col, min_row + row, sheet) for col in columns)
+    undo_content = dash.run_cells_undo_content(
+        sorted(
+            changed | spilled_outside, key=lambda address: (address.row, address.column)
+        )
+    )
+
+    def keep_value_only(address: Address) -> None:
+        dash.unlink(address)
+        if meta := dash.cell_meta.get(address):
+            value = dash.cells[address.sheet].get(address)
+            meta.raw_code = "" if value is None else str(value)
+            meta.compiled_code = ""
+            meta.mime_type = None
+            meta.execution_policy = -1
+
+    # The cells that move become plain values:
+    for address in formulas:
+        for other in dash.cells_calculated_by(address):
+            if other in spilled_outside:
+                dash.unlink(other)
+            else:
+                keep_value_only(other)
+        dash.graph.spill_regions.pop(address, None)
+        dash.graph.pop_names_mentioned(address)
+    for address in formulas | spilled:
+        keep_value_only(address)
+    dash.clear_cells_internal(spilled_outside)
+
+    moved_values: dict[Address, Any] = {}
+    moved_meta: dict[Address, CellMetadata] = {}
+    for row in changed_rows:
+        if row >= len(order):
+            continue
+        for col, value in values_by_row.get(order[row], ()):
+            moved_values[Address(col, min_row + row, sheet)] = value
+        for col, meta in meta_by_row.get(order[row], ()):
+            moved_meta[Address(col, min_row + row, sheet)] = meta
+    # Overwriting in place keeps the extents of the sheet from being updated twice:
+    for address in changed:
+        if address in moved_values:
+            cells[address] = moved_values[address]
+        else:
+            cells.pop(address, None)
+        if address in moved_meta:
+            dash.cell_meta[address] = moved_meta[address]
+        else:
+            dash.cell_meta.pop(address, None)
+
+    changed |= spilled_outside
+    dash.side_effect_cells.update(changed)
+    dash.notify_client_cells_have_changed(
+        changed, undo=(MessageTypes.RUN_CELLS, undo_content)
+    )
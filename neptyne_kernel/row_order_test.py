@@ -0,0 +1,33 @@
+import random
+
+import pytest
+
+from .row_order import sort_order, unique_order
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_sort_order_is_stable_like_sorted(reverse):
+    rng = random.Random(11)
+    for _ in range(50):
+        count = rng.randint(0, 30)
+        numbers = [
+            rng.choice([rng.randint(0, 3), rng.random(), True]) for _ in range(count)
+        ]
+        words = [rng.choice("abc") for _ in range(count)]
+        rows = [*zip(numbers, words)]
+        expected = sorted(range(count), key=lambda i: rows[i], reverse=reverse)
+        assert sort_order([numbers, words], reverse) == expected
+        expected = sorted(range(count), key=lambda i: words[i], reverse=reverse)
+        assert sort_order([words], reverse) == expected
+
+
+def test_sort_order_leaves_mixed_columns_to_sorted():
+    assert sort_order([[1, "a"]]) is None
+    assert sort_order([[1, None]]) is None
+    assert sort_order([[1, float("nan")]]) is None
+    assert sort_order([[2**60, 1]]) is None
+    assert sort_order([[2, 1.5, False]]) == [2, 1, 0]
+
+
+def test_unique_order():
+    assert unique_order([(1, "a"), (2, "b"), (1.0, "a"), ([1],), ([1],)]) == [0, 1, 3]
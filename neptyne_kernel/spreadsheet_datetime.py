@@ -2,6 +2,7 @@ from datetime import date, datetime, time, timedelta
 from operator import __add__, __sub__
 from typing import TYPE_CHECKING, Any, Callable, Optional
 
+import numpy as np
 from dateutil.parser import parse
 from zoneinfo import ZoneInfo
 
@@ -53,6 +54,22 @@ def excel2datetime(number: int | float) -> datetime:
     return datetime.combine(dt, t, tzinfo=SpreadsheetDateTime.TZ_INFO)
 
 
+def excel2datetime64(numbers: np.ndarray) -> np.ndarray:
+    """excel2datetime for an array of serial numbers, as naive datetime64[us]. Rounds to
+    the same microsecond as excel2datetime; the numbers have to be in range for it."""
+    days = np.trunc(numbers).astype("int64")
+    days = np.where(numbers > 59, days - 1, np.where(numbers < 0, days + 1, days))
+    # timedelta(milliseconds=...) rounds the fractional milliseconds only:
+    milliseconds = np.mod(numbers, 1) / EXCEL_MSECOND
+    whole = np.trunc(milliseconds)
+    microseconds = whole.astype("int64") * 1000 + np.rint(
+        (milliseconds - whole) * 1000
+    ).astype("int64")
+    return (np.datetime64(date(EPOCH_FIRST_YEAR - 1, 12, 31), "D") + days).astype(
+        "datetime64[us]"
+    ) + microseconds.astype("timedelta64[us]")
+
+
 def correct_number_of_days(_date: date) -> int:
     if _date > FEB_28_1900:
         return 1
@@ -3,7 +3,7 @@ from dataclasses import dataclass, field
 from enum import Enum
 from typing import Any, Iterator
 
-from ..cell_address import Address, format_cell
+from ..cell_address import Address, AddressInterner, format_cell
 from ..expression_compiler import is_cell_formula
 from ..mime_handling import (
     JSONPrimitive,
@@ -16,11 +16,15 @@ from .jupyter_notebook import Output, OutputType
 CODEPANEL_CELL_ID = "00"
 
 
-def coerce_address(s: str | tuple | Address) -> Address:
+def coerce_address(
+    s: str | tuple | Address, interner: AddressInterner | None = None
+) -> Address:
     if isinstance(s, str):
         return Address.from_a1_or_str(s)
     if isinstance(s, Address):
         return s
+    if interner is not None:
+        return interner.from_coord(s)
     return Address(*s)
 
 
@@ -204,18 +208,23 @@ class SheetCell:
         }
 
     @classmethod
-    def from_dict(cls, value: dict, copy_dict: bool = True) -> "SheetCell":
+    def from_dict(
+        cls,
+        value: dict,
+        copy_dict: bool = True,
+        interner: AddressInterner | None = None,
+    ) -> "SheetCell":
         if copy_dict:
             value = deepcopy(value)
 
         value["depends_on"] = set(
-            coerce_address(s) for s in value.get("depends_on", ())
+            coerce_address(s, interner) for s in value.get("depends_on", ())
         )
         value["feeds_into"] = set(
-            coerce_address(s) for s in value.get("feeds_into", ())
+            coerce_address(s, interner) for s in value.get("feeds_into", ())
         )
         if calculated_by := value.get("calculated_by"):
-            value["calculated_by"] = coerce_address(calculated_by)
+            value["calculated_by"] = coerce_address(calculated_by, interner)
 
         value.setdefault("compiled_code", "")
         value.setdefault("attributes", {})
@@ -240,7 +249,7 @@ class SheetCell:
             value.setdefault("attributes", {})["class"] = value.pop("format")
 
         if not isinstance(value["cell_id"], Address):
-            value["cell_id"] = coerce_address(value["cell_id"])
+            value["cell_id"] = coerce_address(value["cell_id"], interner)
 
         for k in ["cell_type", "execute_count", "execution_count", "outputs"]:
             if k in value:
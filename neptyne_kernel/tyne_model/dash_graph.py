@@ -1,6 +1,6 @@
-from typing import Any
+from typing import Any, Iterable
 
-from ..cell_address import Address
+from ..cell_address import Address, AddressInterner, Range
 
 
 class DashGraph:
@@ -8,6 +8,38 @@ class DashGraph:
         self.feeds_into: dict[Address, set[Address]] = {}
         self.depends_on: dict[Address, set[Address]] = {}
         self.calculated_by: dict[Address, Address] = {}
+        # The rectangle each dynamic array last spilled into, by anchor. Every cell
+        # calculated by an anchor lies within its region, but cells in the region may
+        # have been overwritten since, so calculated_by has the final say. Not saved;
+        # anchors without a region fall back to clearing their cells one by one.
+        self.spill_regions: dict[Address, Range] = {}
+        # The identifiers each formula uses and the other way around, so that a
+        # redefined function finds the cells that call it. Not saved either; formulas
+        # that weren't compiled since loading are added on the first lookup, after
+        # which names_indexed is set.
+        self.names_mentioned: dict[Address, set[str]] = {}
+        self.mentioned_by: dict[str, set[Address]] = {}
+        self.names_indexed = False
+
+    def set_names_mentioned(self, address: Address, names: set[str]) -> None:
+        self.pop_names_mentioned(address)
+        self.names_mentioned[address] = names
+        for name in names:
+            self.mentioned_by.setdefault(name, set()).add(address)
+
+    def pop_names_mentioned(self, address: Address) -> set[str] | None:
+        names = self.names_mentioned.pop(address, None)
+        for name in names or ():
+            cells = self.mentioned_by[name]
+            cells.discard(address)
+            if not cells:
+                del self.mentioned_by[name]
+        return names
+
+    def cells_mentioning(self, names: Iterable[str]) -> set[Address]:
+        return {
+            address for name in names for address in self.mentioned_by.get(name, ())
+        }
 
     def check_integrity(self) -> None:
         depends_on = flatten_edges(self.depends_on)
@@ -33,6 +65,17 @@ class DashGraph:
                     f"depended on or calculated by it"
                 )
 
+        if {
+            (address, name)
+            for address, names in self.names_mentioned.items()
+            for name in names
+        } != {
+            (address, name)
+            for name, addresses in self.mentioned_by.items()
+            for address in addresses
+        }:
+            raise ValueError("names_mentioned and mentioned_by are out of sync")
+
     def to_dict(self) -> dict:
         return {
             "depends_on": [
@@ -43,22 +86,26 @@ class DashGraph:
                 (key.to_coord(), value.to_coord())
                 for key, value in self.calculated_by.items()
             ],
-            # "feeds_into" is omitted and reconstructed in from_dict
+            # "feeds_into" is omitted and reconstructed in from_dict, "spill_regions"
+            # on the next run of each anchor
         }
 
     @classmethod
-    def from_dict(cls, data: dict[str, Any]) -> "DashGraph":
+    def from_dict(
+        cls, data: dict[str, Any], interner: AddressInterner | None = None
+    ) -> "DashGraph":
         res = cls()
+        address = (interner or AddressInterner()).from_coord
         for key_s, values in data["depends_on"]:
-            key = Address.from_coord(key_s)
+            key = address(key_s)
             depends_on = res.depends_on[key] = set()
             for value_s in values:
-                value = Address.from_coord(value_s)
+                value = address(value_s)
                 depends_on.add(value)
                 res.feeds_into.setdefault(value, set()).add(key)
         for key_s, value_s in data["calculated_by"]:
-            key = Address.from_coord(key_s)
-            value = Address.from_coord(value_s)
+            key = address(key_s)
+            value = address(value_s)
             res.calculated_by[key] = value
             res.feeds_into.setdefault(value, set()).add(key)
 
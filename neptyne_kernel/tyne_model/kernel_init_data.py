@@ -1,10 +1,26 @@
-from dataclasses import dataclass
+import json
+from dataclasses import dataclass, field
 from typing import Iterator
 
+from ..cell_address import Address
 from ..json_tools import dict_from_bytes, dict_to_bytes
 from ..streamlit_config import base_url_path
-from .cell import CODEPANEL_CELL_ID
-from .sheet import Sheet, TyneSheets
+from .cell import CODEPANEL_CELL_ID, SheetCell
+from .sheet import Sheet, TyneSheets, cells_from_dicts
+
+# Sheets with fewer cells than this are loaded when the kernel starts. Bigger ones (other than
+# the first sheet) are sent along encoded and only loaded once something uses them.
+LAZY_SHEET_MIN_CELLS = 1000
+
+
+def encode_sheet_cells(sheet: Sheet) -> str:
+    return json.dumps(
+        [cell.to_dict() for cell in sheet.cells.values()], separators=(",", ":")
+    )
+
+
+def decode_sheet_cells(block: str) -> dict[Address, SheetCell]:
+    return cells_from_dicts(json.loads(block))
 
 
 @dataclass
@@ -48,12 +64,17 @@ class InitPhase1Payload:
 class InitPhase2Payload:
     sheets: TyneSheets
     requires_recompile: bool
+    # Encoded cells of the sheets that are loaded on first use, see encode_sheet_cells
+    lazy_sheets: dict[int, str] = field(default_factory=dict)
 
     def to_bytes(self) -> bytes:
         return dict_to_bytes(
             {
                 "sheets": self.sheets.to_dict(),
                 "requires_recompile": self.requires_recompile,
+                "lazy_sheets": [
+                    [sheet_id, block] for sheet_id, block in self.lazy_sheets.items()
+                ],
             }
         )
 
@@ -63,6 +84,9 @@ class InitPhase2Payload:
         return cls(
             sheets=TyneSheets.from_dict(data["sheets"]),
             requires_recompile=data["requires_recompile"],
+            lazy_sheets={
+                sheet_id: block for sheet_id, block in data.get("lazy_sheets", [])
+            },
         )
 
 
@@ -100,12 +124,27 @@ class TyneInitializationData:
         if self.code_panel_code:
             yield CODEPANEL_CELL_ID, self.code_panel_code
 
-        phase_2 = InitPhase2Payload(
-            self.sheets,
-            self.requires_recompile,
-        )
-
-        yield "", f"N_.initialize_phase_2({phase_2.to_bytes()!r})"
+        yield "", f"N_.initialize_phase_2({self.phase_2_payload().to_bytes()!r})"
 
         if self.code_panel_code:
             yield CODEPANEL_CELL_ID, self.code_panel_code
+
+    def phase_2_payload(self) -> InitPhase2Payload:
+        if self.requires_recompile or self.in_gs_mode:
+            return InitPhase2Payload(self.sheets, self.requires_recompile)
+
+        sheets = TyneSheets()
+        sheets.next_sheet_id = self.sheets.next_sheet_id
+        sheets.sheets = {}
+        lazy_sheets = {}
+        for i, (sheet_id, sheet) in enumerate(self.sheets.sheets.items()):
+            if (
+                i == 0
+                or len(sheet.cells) < LAZY_SHEET_MIN_CELLS
+                or any(cell.execution_policy > 0 for cell in sheet.cells.values())
+            ):
+                sheets.sheets[sheet_id] = sheet
+            else:
+                sheets.sheets[sheet_id] = sheet.copy(without_cells=True)
+                lazy_sheets[sheet_id] = encode_sheet_cells(sheet)
+        return InitPhase2Payload(sheets, self.requires_recompile, lazy_sheets)
@@ -1,10 +1,10 @@
 import gzip
 from binascii import b2a_base64
 from collections import defaultdict
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any
 
-from ..cell_address import Address
+from ..cell_address import Address, AddressInterner
 from ..primitives import Empty
 from ..sheet_api import NeptyneSheetCollection
 from .cell import CellMetadata, output_to_dict, represents_simple_value
@@ -116,6 +116,8 @@ class V1DashSaveMessage:
     cell_meta: dict[Address, CellMetadata]
     graph: DashGraph
     next_tick: float | None = None
+    # Sheets the kernel hasn't loaded since the tyne was opened, still encoded
+    lazy_sheets: dict[int, str] = field(default_factory=dict)
 
     @classmethod
     def from_dash_state(
@@ -125,6 +127,7 @@ class V1DashSaveMessage:
         cell_meta: dict[Address, CellMetadata],
         graph: DashGraph,
         next_tick: float | None = None,
+        lazy_sheets: dict[int, str] | None = None,
     ) -> "V1DashSaveMessage":
         tyne_sheets = TyneSheets()
         if sheet_collection is not None:
@@ -142,6 +145,7 @@ class V1DashSaveMessage:
             cell_meta=cell_meta,
             graph=graph,
             next_tick=next_tick,
+            lazy_sheets={**lazy_sheets} if lazy_sheets else {},
         )
 
     def to_dict(self) -> dict[str, Any]:
@@ -171,18 +175,21 @@ class V1DashSaveMessage:
             "cell_meta": cell_meta,
             "graph": self.graph.to_dict(),
             "next_tick": self.next_tick,
+            "lazy_sheets": [
+                [sheet_id, block] for sheet_id, block in self.lazy_sheets.items()
+            ],
         }
 
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> "V1DashSaveMessage":
+        interner = AddressInterner()
+        address = interner.from_coord
         cells = {
-            int(sheet_id): {
-                Address.from_coord(cell_id): cell for cell_id, cell in sheet_cells
-            }
+            int(sheet_id): {address(cell_id): cell for cell_id, cell in sheet_cells}
             for sheet_id, sheet_cells in data["cells"]
         }
         meta = {
-            Address.from_coord(key): CellMetadata.from_dict(value)
+            address(key): CellMetadata.from_dict(value)
             for key, value in data["cell_meta"]
         }
 
@@ -190,8 +197,11 @@ class V1DashSaveMessage:
             sheets_without_cells=TyneSheets.from_dict(data["sheets_without_cells"]),
             cells=cells,
             cell_meta=meta,
-            graph=DashGraph.from_dict(data["graph"]),
+            graph=DashGraph.from_dict(data["graph"], interner),
             next_tick=data.get("next_tick"),
+            lazy_sheets={
+                sheet_id: block for sheet_id, block in data.get("lazy_sheets", [])
+            },
         )
 
     def to_bytes(self) -> bytes:
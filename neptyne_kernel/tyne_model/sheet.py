@@ -1,13 +1,23 @@
 from copy import deepcopy
 from typing import Any, Iterator
 
-import numpy as np
-
-from ..cell_address import Address, Range
+from ..cell_address import Address, AddressInterner
 from ..expression_compiler import DEFAULT_GRID_SIZE
 from ..tyne_model.cell import SheetCell
 
 
+def cells_from_dicts(
+    cells: list[dict[str, Any]], interner: AddressInterner | None = None
+) -> dict[Address, SheetCell]:
+    if interner is None:
+        interner = AddressInterner()
+    result = {}
+    for cell in cells:
+        sheet_cell = SheetCell.from_dict(cell, copy_dict=False, interner=interner)
+        result[sheet_cell.cell_id] = sheet_cell
+    return result
+
+
 class Sheet:
     cells: dict[Address, SheetCell]
     attributes: dict[str, Any]
@@ -32,14 +42,11 @@ class Sheet:
         }
 
     @classmethod
-    def from_dict(cls, data: dict[str, Any]) -> "Sheet":
+    def from_dict(
+        cls, data: dict[str, Any], interner: AddressInterner | None = None
+    ) -> "Sheet":
         sheet = cls(data["id"], data["name"])
-        sheet.cells = {
-            Address.from_coord(cell["cell_id"]): SheetCell.from_dict(
-                cell, copy_dict=False
-            )
-            for cell in data["cells"]
-        }
+        sheet.cells = cells_from_dicts(data["cells"], interner)
         sheet.attributes = data["attributes"]
         sheet.grid_size = data["grid_size"]
         return sheet
@@ -66,20 +73,6 @@ class Sheet:
             "name": self.name,
         }
 
-    def to_numpy_mask(self, assume_filled: Range | None = None) -> np.ndarray:
-        cols, rows = self.grid_size
-        mask = np.full(
-            (rows + 1, cols + 1), False
-        )  # grid_size had an off-by-one bug for a while
-        for cell_id, cell in self.cells.items():
-            if cell.output is not None and cell_id.row < rows and cell_id.column < cols:
-                mask[cell_id.row, cell_id.column] = True
-        if assume_filled:
-            for row in assume_filled:
-                for cell_id in row:
-                    mask[cell_id.row, cell_id.column] = True
-        return mask
-
 
 class TyneSheets:
     sheets: dict[int, Sheet]
@@ -98,8 +91,11 @@ class TyneSheets:
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> "TyneSheets":
         result = cls()
+        # Formulas refer to cells on other sheets, so share the addresses between sheets
+        interner = AddressInterner()
         result.sheets = {
-            sheet.id: sheet for sheet in (Sheet.from_dict(s) for s in data["sheets"])
+            sheet.id: sheet
+            for sheet in (Sheet.from_dict(s, interner) for s in data["sheets"])
         }
         result.next_sheet_id = data["next_sheet_id"]
         return result
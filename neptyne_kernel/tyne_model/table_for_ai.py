@@ -93,13 +93,75 @@ def grid_to_values(grid: list[list[Any]]) -> dict[Address, Any]:
     }
 
 
+# Cells are numbered row << COL_BITS | column, which sorts them by row and then column:
+COL_BITS = 32
+
+
+def filled_cells(
+    cells: dict[Address, Any], assume_filled: Range | None = None
+) -> np.ndarray:
+    """The sorted numbers of the cells with a value and those in assume_filled"""
+    numbers = [
+        cell_id.row << COL_BITS | cell_id.column
+        for cell_id, value in cells.items()
+        if value is not None
+    ]
+    filled = np.array(numbers, dtype=np.int64)
+    if assume_filled:
+        rows, cols = np.mgrid[
+            assume_filled.min_row : assume_filled.max_row + 1,
+            assume_filled.min_col : assume_filled.max_col + 1,
+        ]
+        filled = np.concatenate(
+            [filled, (rows.astype(np.int64) << COL_BITS | cols).ravel()]
+        )
+    return np.unique(filled)
+
+
+def table_bounds(filled: np.ndarray) -> Iterator[tuple[slice, slice]]:
+    """The row and column slices around every group of cells that touch left, right, above
+    or below, in the order of their first cell, like scipy.ndimage.find_objects of the
+    labeled grid"""
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    count = len(filled)
+    sources = []
+    targets = []
+    for step in (1, 1 << COL_BITS):
+        neighbours = np.searchsorted(filled, filled + step)
+        found = neighbours < count
+        found[found] = filled[neighbours[found]] == filled[found] + step
+        sources.append(np.flatnonzero(found))
+        targets.append(neighbours[found])
+    source = np.concatenate(sources)
+    edges = coo_matrix(
+        (np.ones(len(source), dtype=np.int8), (source, np.concatenate(targets))),
+        shape=(count, count),
+    )
+    _, labels = connected_components(edges, directed=False)
+
+    order = np.argsort(labels, kind="stable")
+    starts = np.flatnonzero(np.diff(labels[order], prepend=-1))
+    rows = (filled >> COL_BITS)[order]
+    cols = (filled & ((1 << COL_BITS) - 1))[order]
+    min_rows = np.minimum.reduceat(rows, starts)
+    max_rows = np.maximum.reduceat(rows, starts)
+    min_cols = np.minimum.reduceat(cols, starts)
+    max_cols = np.maximum.reduceat(cols, starts)
+    # order is stable, so the first cell of every group is the first one in the sheet:
+    for i in np.argsort(order[starts]):
+        yield (
+            slice(int(min_rows[i]), int(max_rows[i]) + 1),
+            slice(int(min_cols[i]), int(max_cols[i]) + 1),
+        )
+
+
 def ai_tables_for_sheet(
     cells: dict[Address, Any],
     sheet_name: str,
     assume_filled: Range | None = None,
 ) -> Iterator[TableForAI]:
-    from scipy.ndimage import find_objects, label
-
     if not cells:
         return []
     sheet_id = next(iter(cells)).sheet
@@ -107,25 +169,11 @@ def ai_tables_for_sheet(
     def get_value(col: int, row: int) -> Any:
         return cells.get(Address(col, row, sheet_id))
 
-    max_row, max_col = 0, 0
-    for cell_id in cells:
-        max_row = max(max_row, cell_id.row)
-        max_col = max(max_col, cell_id.column)
-    if assume_filled:
-        max_col = max(max_col, assume_filled.max_col)
-        max_row = max(max_row, assume_filled.max_row)
-
-    mask = np.full((max_row + 1, max_col + 1), False)
-    for cell_id, value in cells.items():
-        if value is not None:
-            mask[cell_id.row, cell_id.column] = True
-    if assume_filled:
-        for row in assume_filled:
-            for cell_id in row:
-                mask[cell_id.row, cell_id.column] = True
+    filled = filled_cells(cells, assume_filled)
+    if not len(filled):
+        return []
 
-    labeled, num_labels = label(mask)
-    for rowslice, colslice in find_objects(labeled):
+    for rowslice, colslice in table_bounds(filled):
 
         def is_empty(value: Any) -> bool:
             return value is None or value == ""
@@ -1,7 +1,14 @@
+import numpy as np
 import pytest
 
-from ..cell_address import Range
-from ..tyne_model.table_for_ai import TableForAI, ai_tables_for_sheet, grid_to_values
+from ..cell_address import Address, Range
+from ..tyne_model.table_for_ai import (
+    TableForAI,
+    ai_tables_for_sheet,
+    filled_cells,
+    grid_to_values,
+    table_bounds,
+)
 from .cell import CellMetadata
 
 
@@ -150,3 +157,26 @@ def test_to_fill_in(cells, fill_in, result):
     }
     for table in ai_tables_for_sheet(cells, "Sheet0"):
         assert table.to_fill_in(cells, meta, Range.from_a1(fill_in)) == result
+
+
+def test_table_bounds_match_labeling_the_grid():
+    from scipy.ndimage import find_objects, label
+
+    rng = np.random.default_rng(3)
+    for _ in range(50):
+        mask = rng.random((rng.integers(1, 30), rng.integers(1, 30))) < 0.4
+        cells = {
+            Address(int(col), int(row), 0): 1 for row, col in zip(*np.nonzero(mask))
+        }
+        if not cells:
+            continue
+        labeled, _ = label(mask)
+        assert [*table_bounds(filled_cells(cells))] == find_objects(labeled)
+
+
+def test_find_tables_far_down_the_sheet():
+    cells = grid_to_values([["One", "Two"], [1, 2], [3, 4]])
+    cells = {Address(a.column, a.row + 1_000_000, 0): v for a, v in cells.items()}
+    cells[Address(5, 0, 0)] = "x"
+    [table] = ai_tables_for_sheet(cells, "Sheet0")
+    assert str(table.range) == "A1000001:B1000003"
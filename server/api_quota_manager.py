@@ -1,9 +1,13 @@
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any
+from typing import Any, Callable
 
-from sqlalchemy import select
+from sqlalchemy import and_, case, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
+from server.metrics import API_QUOTA_DB_SECONDS
 from server.models import APIQuota, User
 from server.users import has_premium_subscription
 
@@ -22,36 +26,118 @@ PREMIUM_DEFAULTS = {key: value * 2 for key, value in DEFAULTS.items()}
 ORGANIZATION_DEFAULTS = {key: value * 10 for key, value in PREMIUM_DEFAULTS.items()}
 
 
+# How long we trust a cached limit and organization membership:
+LIMIT_TTL_SECONDS = 60
+# How often the server writes the accumulated usage to the database:
+FLUSH_INTERVAL_SECONDS = 5
+USAGE_RESET_PERIOD = timedelta(days=30)
+
+# The column and value a quota row is keyed on: ("organization_id", id) or ("user_id", id)
+QuotaOwner = tuple[str, int]
+
+
+@dataclass
+class CachedQuota:
+    limit: int
+    # Usage as last read from or written to the database:
+    usage: int
+    # Usage on this server that hasn't been flushed yet:
+    pending: int
+    expires: float
+
+
 class APIQuotaManager:
+    """Keeps quotas in memory so that checking and deducting them doesn't hit the
+    database. Usage is accumulated per owner and service and written by flush() as
+    atomic increments, so several servers can deduct from the same quota. Limits and
+    the user's organization are reread after LIMIT_TTL_SECONDS.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl: float = LIMIT_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl = ttl
+        self.clock = clock
+        self.owners: dict[int, tuple[QuotaOwner, float]] = {}
+        self.quotas: dict[tuple[QuotaOwner, str], CachedQuota] = {}
+
     def _get_user_organization_id(self, session: Session, user_id: int) -> int | None:
         user = session.execute(select(User).filter(User.id == user_id)).scalar_one()
         return user.organization.organization.id if user.organization else None
 
-    def _get_api_quota(self, session: Session, user_id: int, service: str) -> APIQuota:
+    def _get_owner(self, session: Session, user_id: int) -> QuotaOwner:
+        cached = self.owners.get(user_id)
+        if cached is not None and cached[1] > self.clock():
+            return cached[0]
         org_id = self._get_user_organization_id(session, user_id)
-        query = (
-            select(APIQuota).filter(
-                APIQuota.organization_id == org_id, APIQuota.service_name == service
-            )
-            if org_id is not None
-            else select(APIQuota).filter(
-                APIQuota.user_id == user_id, APIQuota.service_name == service
-            )
+        owner = (
+            ("organization_id", org_id) if org_id is not None else ("user_id", user_id)
+        )
+        self.owners[user_id] = (owner, self.clock() + self.ttl)
+        return owner
+
+    @staticmethod
+    def _owner_filter(owner: QuotaOwner, service: str) -> Any:
+        column, owner_id = owner
+        return and_(
+            getattr(APIQuota, column) == owner_id, APIQuota.service_name == service
         )
-        return session.execute(query).scalar_one_or_none()
 
+    @staticmethod
+    def _current_usage(quota: APIQuota | None) -> int:
+        if quota is None or (
+            quota.last_reset is not None
+            and quota.last_reset < datetime.now() - USAGE_RESET_PERIOD
+        ):
+            return 0
+        return quota.usage
+
+    def _get_cached_quota(
+        self, session: Session, user_id: int, service: str
+    ) -> CachedQuota:
+        owner = self._get_owner(session, user_id)
+        cached = self.quotas.get((owner, service))
+        if cached is not None and cached.expires > self.clock():
+            return cached
+
+        with API_QUOTA_DB_SECONDS.time(operation="load"):
+            quota = session.execute(
+                select(APIQuota).filter(self._owner_filter(owner, service))
+            ).scalar_one_or_none()
+            column, owner_id = owner
+            limit = self._get_usage_limit(session, service, **{column: owner_id})
+        refreshed = CachedQuota(
+            limit=limit,
+            usage=self._current_usage(quota),
+            pending=cached.pending if cached else 0,
+            expires=self.clock() + self.ttl,
+        )
+        self.quotas[(owner, service)] = refreshed
+        return refreshed
+
+    @API_QUOTA_DB_SECONDS.time(operation="get_all")
     def get_all(self, session: Session, user_id: int) -> dict[str, dict[str, int]]:
-        org_id = self._get_user_organization_id(session, user_id)
-        query = (
-            (select(APIQuota).filter(APIQuota.organization_id == org_id))
-            if org_id is not None
-            else (select(APIQuota).filter(APIQuota.user_id == user_id))
+        owner = self._get_owner(session, user_id)
+        column, owner_id = owner
+        quotas = (
+            session.execute(
+                select(APIQuota).filter(getattr(APIQuota, column) == owner_id)
+            )
+            .scalars()
+            .all()
         )
-        quotas = session.execute(query).scalars().all()
-        return {
+        result = {
             quota.service_name: {"limit": quota.limit, "usage": quota.usage}
             for quota in quotas
         }
+        for (cached_owner, service), cached in self.quotas.items():
+            if cached_owner == owner and cached.pending:
+                entry = result.setdefault(service, {"limit": cached.limit, "usage": 0})
+                entry["usage"] += cached.pending
+        return result
 
     def get_quota(
         self,
@@ -59,24 +145,8 @@ class APIQuotaManager:
         user_id: int,
         service: str = NEPTYNE_SERVICE,
     ) -> int:
-        org_id = self._get_user_organization_id(session, user_id)
-        query = (
-            select(APIQuota).filter(
-                APIQuota.organization_id == org_id, APIQuota.service_name == service
-            )
-            if org_id is not None
-            else select(APIQuota).filter(
-                APIQuota.user_id == user_id, APIQuota.service_name == service
-            )
-        )
-        quota = session.execute(query).scalar_one_or_none()
-        if quota is None:
-            return (
-                self._get_usage_limit(session, service, organization_id=org_id)
-                if org_id is not None
-                else self._get_usage_limit(session, service, user_id=user_id)
-            )
-        return quota.limit - quota.usage
+        quota = self._get_cached_quota(session, user_id, service)
+        return quota.limit - quota.usage - quota.pending
 
     def _get_usage_limit(
         self,
@@ -86,51 +156,58 @@ class APIQuotaManager:
         user_id: int | None = None,
         organization_id: int | None = None,
     ) -> int:
+        if organization_id is not None:
+            return ORGANIZATION_DEFAULTS[service]
         assert user_id is not None
 
         user = session.execute(select(User).filter(User.id == user_id)).scalar_one()
         has_premium = has_premium_subscription(session, user)
         return PREMIUM_DEFAULTS[service] if has_premium else DEFAULTS[service]
 
-    def _update_api_quota(
+    def _upsert(
         self,
         session: Session,
+        owner: QuotaOwner,
         service: str,
-        user_id: int,
-        additional_usage: int | None = None,
-        reset_usage: bool = False,
-    ) -> None:
-        org_id = self._get_user_organization_id(session, user_id)
-        limit = (
-            self._get_usage_limit(session, service, organization_id=org_id)
-            if org_id is not None
-            else self._get_usage_limit(session, service, user_id=user_id)
+        limit: int,
+        usage: int,
+        reset_usage: bool,
+    ) -> Any:
+        """An insert of the quota row that adds usage to the existing row if there is
+        one. Done in the database so that concurrent servers don't overwrite each
+        other's usage."""
+        dialect = session.get_bind().dialect.name
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        column, owner_id = owner
+        now = datetime.now()
+        statement = insert(APIQuota).values(
+            **{column: owner_id},
+            service_name=service,
+            usage=usage,
+            limit=limit,
+            last_reset=now,
         )
-
-        id: dict[str, Any] = (
-            {"organization_id": org_id} if org_id is not None else {"user_id": user_id}
+        if reset_usage:
+            expired: Any = True
+        else:
+            expired = or_(
+                APIQuota.last_reset.is_(None),
+                APIQuota.last_reset < now - USAGE_RESET_PERIOD,
+            )
+        return statement.on_conflict_do_update(
+            index_elements=[column, "service_name"],
+            set_={
+                "usage": case(
+                    (expired, statement.excluded.usage),
+                    else_=APIQuota.usage + statement.excluded.usage,
+                ),
+                "last_reset": case(
+                    (expired, statement.excluded.last_reset),
+                    else_=APIQuota.last_reset,
+                ),
+                "limit": statement.excluded.limit,
+            },
         )
-        id["service_name"] = service
-
-        quota = session.execute(select(APIQuota).filter_by(**id)).scalar_one_or_none()
-        if quota is None:
-            quota = APIQuota(**id)
-
-        session.add(quota)
-
-        if (
-            reset_usage
-            or quota.last_reset is None
-            or quota.last_reset < datetime.now() - timedelta(days=30)
-        ):
-            quota.usage = 0
-            quota.last_reset = datetime.now()
-
-        if additional_usage is not None:
-            quota.usage += additional_usage
-
-        quota.limit = limit
-        session.commit()
 
     def deduct_quota(
         self,
@@ -139,9 +216,52 @@ class APIQuotaManager:
         usage: int,
         service: str = NEPTYNE_SERVICE,
     ) -> None:
-        self._update_api_quota(session, service, user_id, additional_usage=usage)
+        self._get_cached_quota(session, user_id, service).pending += usage
 
+    @API_QUOTA_DB_SECONDS.time(operation="flush")
+    def flush(self, session: Session) -> None:
+        """Write the usage accumulated since the last flush in one transaction and
+        pick up what other servers wrote in the meantime."""
+        to_flush = [
+            (key, cached) for key, cached in self.quotas.items() if cached.pending
+        ]
+        if not to_flush:
+            return
+        try:
+            for (owner, service), cached in to_flush:
+                session.execute(
+                    self._upsert(
+                        session, owner, service, cached.limit, cached.pending, False
+                    )
+                )
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        flushed = {key: cached for key, cached in to_flush}
+        for cached in flushed.values():
+            cached.usage += cached.pending
+            cached.pending = 0
+        rows = session.execute(
+            select(APIQuota).filter(
+                or_(*(self._owner_filter(owner, service) for owner, service in flushed))
+            )
+        ).scalars()
+        for quota in rows:
+            column = (
+                "organization_id" if quota.organization_id is not None else "user_id"
+            )
+            key = ((column, getattr(quota, column)), quota.service_name)
+            if key in flushed:
+                flushed[key].usage = self._current_usage(quota)
+
+    @API_QUOTA_DB_SECONDS.time(operation="reset_quota")
     def reset_quota(
         self, session: Session, user_id: int, service: str = NEPTYNE_SERVICE
     ) -> None:
-        self._update_api_quota(session, service, user_id, reset_usage=True)
+        cached = self._get_cached_quota(session, user_id, service)
+        owner = self._get_owner(session, user_id)
+        session.execute(self._upsert(session, owner, service, cached.limit, 0, True))
+        session.commit()
+        cached.usage = 0
+        cached.pending = 0
@@ -0,0 +1,147 @@
+import random
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from .api_quota_manager import (
+    NEPTYNE_SERVICE,
+    ORGANIZATION_DEFAULTS,
+    PREMIUM_DEFAULTS,
+    APIQuotaManager,
+)
+from .models import APIQuota, Organization, User, UserOrg, db
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def shared_engine(tmp_path):
+    # A database file rather than an in-memory one, so that every simulated shard
+    # gets its own connection:
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'quota.db'}",
+        connect_args={"check_same_thread": False, "timeout": 30},
+    )
+    db.Model.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(id=1))
+        session.add(User(id=2))
+        session.add(Organization(id=10, name="org"))
+        session.add(UserOrg(user_id=2, organization_id=10))
+        session.commit()
+    yield engine
+    engine.dispose()
+
+
+def usage_in_db(engine, **owner) -> int:
+    with Session(engine) as session:
+        return session.execute(
+            select(APIQuota.usage).filter_by(service_name=NEPTYNE_SERVICE, **owner)
+        ).scalar_one()
+
+
+def test_deduct_is_cached_until_flush(shared_engine):
+    clock = FakeClock()
+    manager = APIQuotaManager(clock=clock)
+    with Session(shared_engine) as session:
+        assert manager.get_quota(session, 1) == PREMIUM_DEFAULTS[NEPTYNE_SERVICE]
+
+        queries = []
+        session.execute_orig = session.execute
+        session.execute = lambda *args, **kwargs: (
+            queries.append(args) or session.execute_orig(*args, **kwargs)
+        )
+        for _ in range(100):
+            manager.deduct_quota(session, 1, 10)
+            manager.get_quota(session, 1)
+        assert queries == []
+        assert manager.get_quota(session, 1) == PREMIUM_DEFAULTS[NEPTYNE_SERVICE] - 1000
+        assert manager.get_all(session, 1)[NEPTYNE_SERVICE]["usage"] == 1000
+
+        manager.flush(session)
+        assert usage_in_db(shared_engine, user_id=1) == 1000
+        assert manager.get_quota(session, 1) == PREMIUM_DEFAULTS[NEPTYNE_SERVICE] - 1000
+
+        # Organization members share the organization's quota:
+        manager.deduct_quota(session, 2, 5)
+        assert (
+            manager.get_quota(session, 2) == ORGANIZATION_DEFAULTS[NEPTYNE_SERVICE] - 5
+        )
+
+        manager.reset_quota(session, 1)
+        assert usage_in_db(shared_engine, user_id=1) == 0
+        assert manager.get_quota(session, 1) == PREMIUM_DEFAULTS[NEPTYNE_SERVICE]
+
+
+def test_flush_resets_expired_usage(shared_engine):
+    manager = APIQuotaManager()
+    with Session(shared_engine) as session:
+        manager.deduct_quota(session, 1, 100)
+        manager.flush(session)
+        quota = session.execute(select(APIQuota).filter_by(user_id=1)).scalar_one()
+        quota.last_reset = datetime.now() - timedelta(days=31)
+        session.commit()
+
+        manager.deduct_quota(session, 1, 7)
+        manager.flush(session)
+        assert usage_in_db(shared_engine, user_id=1) == 7
+
+
+def test_concurrent_shards(shared_engine):
+    num_shards = 4
+    deductions_per_shard = 200
+    clocks = [FakeClock() for _ in range(num_shards)]
+    managers = [APIQuotaManager(clock=clock, ttl=1) for clock in clocks]
+    expected_total = 0
+    errors = []
+    lock = threading.Lock()
+
+    def run_shard(shard: int) -> None:
+        nonlocal expected_total
+        rng = random.Random(shard)
+        manager = managers[shard]
+        try:
+            with Session(shared_engine) as session:
+                for _ in range(deductions_per_shard):
+                    user_id = rng.choice([1, 2])
+                    usage = rng.randint(1, 100)
+                    manager.deduct_quota(session, user_id, usage)
+                    with lock:
+                        expected_total += usage
+                    if rng.random() < 0.1:
+                        manager.flush(session)
+                    clocks[shard].now += 0.1
+                manager.flush(session)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=run_shard, args=(shard,)) for shard in range(num_shards)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+    user_usage = usage_in_db(shared_engine, user_id=1)
+    org_usage = usage_in_db(shared_engine, organization_id=10)
+    assert user_usage + org_usage == expected_total
+
+    # Once their cache expires, every shard sees what the others deducted:
+    with Session(shared_engine) as session:
+        for manager, clock in zip(managers, clocks):
+            clock.now += 2
+            assert (
+                manager.get_quota(session, 1)
+                == PREMIUM_DEFAULTS[NEPTYNE_SERVICE] - user_usage
+            )
@@ -56,7 +56,7 @@ from neptyne_kernel.neptyne_protocol import (
 from neptyne_kernel.tyne_model.cell import SheetCell
 from neptyne_kernel.tyne_model.jupyter_notebook import Output
 from server import gsheet_auth
-from server.api_quota_manager import APIQuotaManager
+from server.api_quota_manager import FLUSH_INTERVAL_SECONDS, APIQuotaManager
 from server.blob_store import BlobStore, GCSStore
 from server.codeassist import ai_snippet_reply
 from server.cors import allow_cors
@@ -79,6 +79,7 @@ from server.kernels.kernel_handlers import (
 )
 from server.kernels.local_provisioner import NeptyneLocalProvisioner
 from server.kernels.spec_manager import NeptyneKernelSpecManager
+from server.metrics import MetricsHandler, log_request
 from server.models import (
     AccessLevel,
     APIKey,
@@ -95,7 +96,7 @@ from server.models import (
 )
 from server.neptyne_kernel_service import NeptyneKernelService
 from server.proxied_tyne import ProxiedTyne
-from server.publish import MetaTagProxyHandler, TyneEmbedHandler
+from server.publish import MetaTagProxyHandler, RenderCache, TyneEmbedHandler
 from server.sheet_linter import SheetLinterHandler
 from server.streamlit_handlers import (
     StreamlitGuestMainHandler,
@@ -112,7 +113,6 @@ from server.tyne_contents_manager import (
     TyneContentsManager,
     WrongShardError,
     authorized_tyne_query,
-    get_tyne_access_level,
     shard_id,
 )
 from server.tyne_handler import (
@@ -214,7 +214,9 @@ class TyneGetHandler(TyneHandlerAllowMaintenanceAndAnon):
                 raise web.HTTPError(404)
 
         content: TyneContent | None = None
-        access_level = get_tyne_access_level(tyne_id, self.session, self.user)
+        access_level = self.tyne_contents_manager.get_access_level(
+            tyne_id, self.session, self.user
+        )
         is_app = tyne.properties and tyne.properties.get("is_app")
         is_in_gallery = tyne.published and tyne.screenshot_url
         # Check for anonymous user. If the user is not logged in (yet) serve up a readonly version of the original:
@@ -807,7 +809,12 @@ class TyneCopyHandler(TyneHandler):
 
 class TyneCopyIfReadonlyHandler(TyneHandler):
     async def post(self, tyne_id: str) -> None:
-        if get_tyne_access_level(tyne_id, self.session, self.user) == AccessLevel.EDIT:
+        if (
+            self.tyne_contents_manager.get_access_level(
+                tyne_id, self.session, self.user
+            )
+            == AccessLevel.EDIT
+        ):
             tyne_model = await self.tyne_contents_manager.load_tyne_model(
                 tyne_id, self.session, self.user
             )
@@ -1441,6 +1448,7 @@ def create_neptyne_app(
     debug: bool = False,
     single_user_mode: bool = False,
     shared_secret: str | None = None,
+    api_quota_manager: APIQuotaManager | None = None,
 ) -> tuple[web.Application, NeptyneKernelService]:
     kernel_spec_manager = NeptyneKernelSpecManager()
     kernel_connection_dir = Path(kernel_connection_dir)
@@ -1476,15 +1484,19 @@ def create_neptyne_app(
 
     feature_flags = FeatureFlags()
 
-    api_quota_manager = APIQuotaManager()
+    if api_quota_manager is None:
+        api_quota_manager = APIQuotaManager()
 
     sheet_linter_executor = ProcessPoolExecutor(max_workers=2)
+    render_cache = RenderCache()
+    tyne_contents_manager.tyne_store.save_listeners.append(render_cache.on_save)
     streamlit_session_store: set[str] = set()
 
     return (
         web.Application(
             [
                 (r"/livez", LivenessHandler),
+                (r"/metrics", MetricsHandler),
                 # Used to connect a websocket to a kennel. Pick your own session id
                 (
                     r"/ws/\d+/api/kernels/(?P<tyne_id>.*)/channels",
@@ -1640,17 +1652,26 @@ def create_neptyne_app(
                 (
                     r"/embed",
                     TyneEmbedHandler,
-                    {"tyne_contents_manager": tyne_contents_manager},
+                    {
+                        "tyne_contents_manager": tyne_contents_manager,
+                        "render_cache": render_cache,
+                    },
                 ),
                 (
                     r"/embed/(?P<tyne_id>.*)/(?P<cell_id>.*)\.(?P<format>.*)",
                     TyneEmbedHandler,
-                    {"tyne_contents_manager": tyne_contents_manager},
+                    {
+                        "tyne_contents_manager": tyne_contents_manager,
+                        "render_cache": render_cache,
+                    },
                 ),
                 (
                     r"/embed/(?P<tyne_id>.*)\.(?P<format>.*)",
                     TyneEmbedHandler,
-                    {"tyne_contents_manager": tyne_contents_manager},
+                    {
+                        "tyne_contents_manager": tyne_contents_manager,
+                        "render_cache": render_cache,
+                    },
                 ),
                 (
                     r"/api/tyne_import_google",
@@ -1790,6 +1811,7 @@ def create_neptyne_app(
             db=db,
             feature_flags=feature_flags,
             debug=debug,
+            log_function=log_request,
             template_path=str(Path(__file__).parent / "templates"),
             streamlit_session_store=streamlit_session_store,
             single_user_mode=single_user_mode,
@@ -1965,6 +1987,7 @@ def main() -> None:
         shard_index=shard_index,
     )
     kernel_connection_dir = Path(__file__).parent / "kernel_connections"
+    api_quota_manager = APIQuotaManager()
     app, kernel_manager = create_neptyne_app(
         tyne_contents_manager,
         kernel_connection_dir,
@@ -1972,6 +1995,7 @@ def main() -> None:
         debug=args.debug,
         single_user_mode=True,
         shared_secret=gsheet_auth.shared_secret,
+        api_quota_manager=api_quota_manager,
     )
 
     if args.debug:
@@ -1985,12 +2009,6 @@ def main() -> None:
     )
     app.listen(args.port)
 
-    async def tick() -> None:
-        with db.sessionmaker() as db_session:
-            await tyne_contents_manager.tick(
-                session=db_session, kernel_manager=kernel_manager
-            )
-
     async def init_kernel_manager(
         kernel_manager: NeptyneKernelService, tcm: TyneContentsManager
     ) -> None:
@@ -2004,11 +2022,20 @@ def main() -> None:
     )
 
     if not args.disable_tick:
-        ioloop.PeriodicCallback(tick, 60 * 1000).start()
+        ioloop.IOLoop.current().add_callback(
+            tyne_contents_manager.run_tick_scheduler, db.sessionmaker, kernel_manager
+        )
+
+    def flush_api_quotas() -> None:
+        with db.sessionmaker() as db_session:
+            api_quota_manager.flush(db_session)
+
+    ioloop.PeriodicCallback(flush_api_quotas, FLUSH_INTERVAL_SECONDS * 1000).start()
 
     def shutdown_handler(signum: Any, frame: Any) -> None:
         print("saving connected kernels")
         asyncio.run(tyne_contents_manager.prepare_for_shutdown())
+        flush_api_quotas()
         print("shutting down")
         ioloop.IOLoop.current().stop()
 
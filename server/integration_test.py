@@ -14,6 +14,7 @@ from tornado.httpclient import AsyncHTTPClient, HTTPClientError
 import server.proxied_tyne
 from neptyne_kernel.cell_address import Address
 from neptyne_kernel.neptyne_protocol import CellChange, MessageTypes, RunCellsContent
+from neptyne_kernel.packed_cells import unpack_cell_updates
 from neptyne_kernel.tyne_model.cell import CODEPANEL_CELL_ID, NotebookCell
 from server.conftest import MOCK_USER
 from server.gsheet_auth import GSheetTokenClaims
@@ -22,6 +23,7 @@ from server.messages import HEADER_TAG, MSG_TYPE_TAG
 from server.models import Notebook, Sheet, Tyne, db
 from server.tyne_content import TyneContent
 from server.tyne_handler import REMOTE_TYNE_KEY
+from server.websocket_fanout import deserialize_binary_message
 from testing.test_server import ServerTestCase, auth_fetch
 
 FAKE_NOTEBOOK = {
@@ -373,12 +375,18 @@ class KernelTestCase(ServerTestCase):
             if msg is None:
                 pytest.fail("the websocket connection was closed")
             self.kernel_ready = True
-            parsed = json.loads(msg)
+            if isinstance(msg, bytes):
+                parsed = deserialize_binary_message(msg)
+            else:
+                parsed = json.loads(msg)
             self.received.append(parsed)
             msg_type = parsed[HEADER_TAG][MSG_TYPE_TAG]
             print("msg:", msg_type)
             if msg_type == MessageTypes.SHEET_UPDATE.value:
-                for cell in parsed["content"]["cellUpdates"]:
+                cells = parsed["content"]["cellUpdates"]
+                if packed_cells := parsed["content"].get("packedCells"):
+                    cells += unpack_cell_updates(packed_cells, parsed["buffers"][0])
+                for cell in cells:
                     cell = reflate_cell(cell)
                     self.grid[Address(*cell["cellId"])] = cell
             if msg_type == MessageTypes.UPLOAD_FILE.value:
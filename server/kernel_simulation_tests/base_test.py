@@ -6,7 +6,7 @@ from unittest import mock
 import pytest
 from jupyter_client.utils import run_sync
 
-from neptyne_kernel.cell_address import format_cell, parse_cell
+from neptyne_kernel.cell_address import Range, format_cell, parse_cell
 from neptyne_kernel.neptyne_protocol import (
     CellAttribute,
     CellAttributesUpdate,
@@ -24,6 +24,7 @@ from neptyne_kernel.spreadsheet_error import (
     ZERO_DIV_ERROR,
 )
 from neptyne_kernel.test_utils import a1
+from neptyne_kernel.tyne_model.kernel_init_data import LAZY_SHEET_MIN_CELLS
 from neptyne_kernel.widgets.output_widgets import PLOTLY_MIME_TYPE
 from server.messages import (
     HEADER_TAG,
@@ -208,6 +209,69 @@ def test_spill_and_clear(simulator):
     assert simulator.get_cell("J10").raw_code == "9"
 
 
+def test_spill_resize_clears_difference(simulator):
+    dash = simulator.get_dash()
+    simulator.run_cell("A1", "=[[i * 10 + j for j in range(3)] for i in range(4)]")
+    simulator.run_cell("E4", "=C4")
+    assert simulator.get("E4") == 32
+    assert dash.graph.spill_regions[a1("A1")] == Range(0, 2, 0, 3, 0)
+
+    cleared = []
+    clear_cells_internal = dash.clear_cells_internal
+    dash.clear_cells_internal = lambda cell_ids: (
+        cleared.extend(cell_ids) or clear_cells_internal(cell_ids)
+    )
+    try:
+        simulator.run_cell(
+            "A1", "=[[i * 10 + j + 1 for j in range(2)] for i in range(5)]"
+        )
+    finally:
+        dash.clear_cells_internal = clear_cells_internal
+    # Only what the new spill doesn't cover is cleared:
+    assert sorted(cleared) == sorted(a1(cell) for cell in ("C1", "C2", "C3", "C4"))
+    assert simulator.get("A5") == 41
+    assert simulator.get("B4") == 32
+    assert simulator.get("C4") is None
+    assert simulator.get("E4") is None
+    assert dash.graph.spill_regions[a1("A1")] == Range(0, 1, 0, 4, 0)
+    dash.graph.check_integrity()
+
+    # Cells that keep their value aren't written again:
+    updated = []
+    update_cell = dash.update_cell
+    dash.update_cell = lambda address, value: (
+        updated.append(address) or update_cell(address, value)
+    )
+    try:
+        simulator.run_cell(
+            "A1", "=[[i * 10 + j + 1 + (i == 2) for j in range(2)] for i in range(5)]"
+        )
+    finally:
+        dash.update_cell = update_cell
+    assert sorted(updated) == [a1("A1"), a1("A3"), a1("B3")]
+    assert simulator.get("B3") == 23
+
+    # Rows of different lengths:
+    simulator.run_cell("A1", "=[[1, 2], [3]]")
+    assert simulator.get("B1") == 2
+    assert simulator.get("B2") is None
+    assert simulator.get("A3") is None
+    assert dash.cells_calculated_by(a1("A1")) == {a1("B1"), a1("A2")}
+
+    simulator.run_cell("A1", "=5")
+    assert simulator.get("B1") is None
+    assert simulator.get("A2") is None
+    dash.graph.check_integrity()
+
+
+def test_spill_reading_itself(simulator):
+    simulator.run_cell("A1", "=[(A2 or 0) + 1, 10]")
+    assert simulator.get("A1") == 1
+    simulator.run_cell("A1", "=[(A2 or 0) + 1, 10]")
+    assert simulator.get("A1") == 1
+    assert simulator.get("A2") == 10
+
+
 def test_range_update(simulator):
     simulator.run_cell("A10", "1")
     simulator.run_cell("A11", "=A10:A10")
@@ -582,6 +646,27 @@ def test_cell_range_as_dataframe(simulator):
     simulator.restart()
 
 
+def test_lazy_sheet_after_restart(simulator):
+    simulator.repl_command("import neptyne as nt; nt.sheets.new_sheet('Big')")
+    simulator.repl_command(f"Big!A1 = list(range({LAZY_SHEET_MIN_CELLS}))")
+    simulator.run_cell("A1", "=SUM(Big!A1:A2000)")
+    total = sum(range(LAZY_SHEET_MIN_CELLS))
+    assert simulator.get("A1") == total
+
+    big_id = simulator.get_sheets()["Big"].sheet_id
+    simulator.restart()
+    assert big_id in simulator.get_dash().cells.pending
+    # Saving leaves a sheet that was never used encoded
+    simulator.restart()
+    assert big_id in simulator.get_dash().cells.pending
+
+    simulator.run_cell("A1", "-1", sheet_id=big_id)
+    assert big_id not in simulator.get_dash().cells.pending
+    assert simulator.get("A1") == total - 1
+    simulator.restart()
+    assert simulator.get("A1") == total - 1
+
+
 def test_delete_cell_for_sum(simulator):
     simulator.run_cell("A1", "=SUM(B1:B3)")
     simulator.run_cell("B1", "1")
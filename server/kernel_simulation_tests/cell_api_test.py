@@ -237,3 +237,79 @@ def test_sort_rows(simulator):
     assert simulator.get("A2") == 1
     assert simulator.get("A3") == 5
     assert simulator.get("A4") == 6
+
+
+def test_sort_rows_moves_attributes(simulator):
+    simulator.repl_command("A1 = [[3, 'c'], [1, 'a'], [2, 'b']]")
+    simulator.repl_command("A2.set_text_style('bold')")
+    simulator.run_cell("B2", "=A2 * 10")
+    simulator.run_cell("D1", "=A1 + A2 + A3")
+
+    simulator.run_cell(f"0{simulator.next_repl}", "A1:B3.sort_rows()")
+    simulator.next_repl += 1
+    undo = simulator.wait_for_kernel()
+
+    assert [simulator.get(f"A{row}") for row in range(1, 4)] == [1, 2, 3]
+    # The formula in B2 was sorted by its value and moved with its row:
+    assert [simulator.get(f"B{row}") for row in range(1, 4)] == [10, "b", "c"]
+    assert simulator.get_cell("B1").raw_code == "10"
+    assert simulator.get_attribute("A1", CellAttribute.TEXT_STYLE.value) == "bold"
+    assert simulator.get_attribute("A2", CellAttribute.TEXT_STYLE.value) is None
+    assert simulator.get("D1") == 6
+    simulator.get_dash().graph.check_integrity()
+
+    simulator.undo(undo)
+    assert [simulator.get(f"A{row}") for row in range(1, 4)] == [3, 1, 2]
+    assert simulator.get_cell("B2").raw_code == "=A2 * 10"
+    assert simulator.get_attribute("A2", CellAttribute.TEXT_STYLE.value) == "bold"
+
+
+def test_sort_rows_mixed_values(simulator):
+    simulator.repl_command("A1 = [[2, 'x'], [None, 'y'], [1, 'z'], [2, 'w']]")
+    simulator.repl_command("A1:B4.sort_rows(1, reverse=True)")
+    assert [simulator.get(f"B{row}") for row in range(1, 5)] == ["z", "y", "x", "w"]
+
+    simulator.repl_command("A1:A4.sort_rows(key=lambda value: -(value or 0))")
+    assert [simulator.get(f"A{row}") for row in range(1, 5)] == [2, 2, 1, None]
+
+
+def test_filter_and_unique_rows(simulator):
+    simulator.repl_command("A1 = [[5, 'a'], [1, 'b'], [7, 'c'], [5, 'a'], [9, 'a']]")
+    simulator.repl_command("A5.set_text_style('bold')")
+
+    simulator.repl_command("A1:B5.unique_rows()")
+    assert [simulator.get(f"A{row}") for row in range(1, 6)] == [5, 1, 7, 9, None]
+    assert simulator.get_attribute("A4", CellAttribute.TEXT_STYLE.value) == "bold"
+
+    simulator.repl_command("A1:B5.unique_rows(by_column=1)")
+    assert [simulator.get(f"B{row}") for row in range(1, 6)] == [
+        "a",
+        "b",
+        "c",
+        None,
+        None,
+    ]
+
+    simulator.repl_command("A1:B5.filter_rows(A1:A5 > 3)")
+    assert [simulator.get(f"A{row}") for row in range(1, 4)] == [5, 7, None]
+    simulator.repl_command("A1:B5.filter_rows(lambda row: row[1] == 'c')")
+    assert simulator.get("B1") == "c"
+    assert simulator.get("B2") is None
+
+
+def test_sort_rows_clears_spills_outside_the_range(simulator):
+    simulator.repl_command("A1 = [[3, 'c'], [1, 'a'], [2, 'b']]")
+    simulator.run_cell("B2", "=[[20, 30]]")
+    assert simulator.get("C2") == 30
+
+    simulator.run_cell(f"0{simulator.next_repl}", "A1:B3.sort_rows()")
+    simulator.next_repl += 1
+    undo = simulator.wait_for_kernel()
+
+    assert [simulator.get(f"B{row}") for row in range(1, 4)] == [20, "b", "c"]
+    assert simulator.get("C2") is None
+    simulator.get_dash().graph.check_integrity()
+
+    simulator.undo(undo)
+    assert simulator.get_cell("B2").raw_code == "=[[20, 30]]"
+    assert simulator.get("C2") == 30
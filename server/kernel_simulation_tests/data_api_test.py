@@ -0,0 +1,83 @@
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class FileHandler(SimpleHTTPRequestHandler):
+    """Serves files with Last-Modified, answering If-Modified-Since with a 304"""
+
+    def log_request(self, code="-", size="-") -> None:
+        self.server.requests.append((self.path, int(code)))  # type: ignore
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def files(monkeypatch, tmp_path):
+    root = tmp_path / "files"
+    root.mkdir()
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(FileHandler, directory=str(root))
+    )
+    server.requests = []  # type: ignore
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("NEPTYNE_HTTP_CACHE_DIR", str(tmp_path / "cache"))
+    yield root, server, f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def data(simulator):
+    # Importing the API needs the kernel's shell:
+    from neptyne_kernel import http_cache
+    from neptyne_kernel.neptyne_api import data
+
+    http_cache._parsed.clear()
+    yield data
+    http_cache._parsed.clear()
+
+
+def test_csv_is_downloaded_once(data, files):
+    root, server, base_url = files
+    (root / "a.csv").write_text(
+        "x,y,z\n" + "".join(f"{i},{i * 2},a\n" for i in range(100))
+    )
+
+    df = data.csv(f"{base_url}/a.csv")
+    assert df.shape == (100, 3)
+    df["x"] = 0
+    assert data.csv(f"{base_url}/a.csv")["x"].sum() == sum(range(100))
+    assert server.requests == [("/a.csv", 200), ("/a.csv", 304)]
+
+    projected = data.csv(f"{base_url}/a.csv", usecols=["y"], engine="pyarrow")
+    assert [*projected.columns] == ["y"]
+    assert data.csv(f"{base_url}/a.csv", nrows=5).shape == (5, 3)
+
+
+def test_json_and_web_table(data, files):
+    root, server, base_url = files
+    (root / "a.json").write_text('[{"a": 1}, {"a": 2}]')
+    (root / "tables.html").write_text(
+        "<table><tr><th>a</th></tr><tr><td>1</td></tr></table>"
+        "<table><tr><th>b</th></tr><tr><td>1</td></tr><tr><td>2</td></tr></table>"
+    )
+    assert data.json(f"{base_url}/a.json")["a"].tolist() == [1, 2]
+    assert [*data.web_table(f"{base_url}/tables.html").columns] == ["b"]
+    assert [*data.web_table(f"{base_url}/tables.html", 0).columns] == ["a"]
+    assert [code for _, code in server.requests] == [200, 200, 304]
+
+
+def test_rss_and_web_table_without_a_url(data, tmp_path):
+    page = tmp_path / "tables.html"
+    page.write_text("<table><tr><th>a</th></tr><tr><td>1</td></tr></table>")
+    assert [*data.web_table(str(page)).columns] == ["a"]
+    feed = (
+        '<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>'
+        "<item><title>one</title></item></channel></rss>"
+    )
+    assert data.rss(feed)["title"].tolist() == ["one"]
@@ -0,0 +1,47 @@
+import pytest
+
+
+@pytest.fixture
+def regions(simulator):
+    simulator.repl_command("from shapely import Point, box")
+    simulator.repl_command(
+        'D1 = [["name", "shape"], ["west", box(0, 0, 1, 1)], ["east", box(2, 0, 3, 1)]]'
+    )
+    simulator.repl_command("A1 = [Point(0.5, 0.5), Point(2.5, 0.5), Point(5, 5)]")
+    return simulator
+
+
+def test_spatial_lookup(regions):
+    regions.run_cell("B1", '=geo.spatial_lookup(A1:A3, D1:E3, "name", "within", "-")')
+    assert [regions.get(f"B{row}") for row in range(1, 4)] == ["west", "east", "-"]
+
+    regions.run_cell("C1", "=geo.spatial_lookup(A1:A3, D1:E3)")
+    assert [regions.get(f"C{row}") for row in range(1, 4)] == [True, True, False]
+
+    regions.run_cell("F1", '=geo.spatial_lookup(A2, D1:E3, "name")')
+    assert regions.get("F1") == "east"
+
+    regions.run_cell("E3", "=box(4, 4, 6, 6)")
+    assert [regions.get(f"B{row}") for row in range(1, 4)] == ["west", "-", "east"]
+
+
+def test_distance_in_meters(regions):
+    # One degree of longitude along the equator:
+    regions.run_cell("F1", "=geo.distance(Point(0, 0), Point(1, 0))")
+    assert regions.get("F1") == pytest.approx(111_319, rel=1e-3)
+    regions.run_cell("F2", "=geo.area(box(0, 0, 1, 1))")
+    assert regions.get("F2") == pytest.approx(111_319**2, rel=1e-2)
+
+
+def test_range_frames_are_reused(regions):
+    regions.repl_command("first = geo.range_frame(D1:E3)")
+    regions.repl_command("G1 = geo.range_frame(D1:E3) is first")
+    regions.repl_command(
+        "G2 = geo.range_frame(D1:E3).frame.sindex is first.frame.sindex"
+    )
+    assert regions.get("G1") is True
+    assert regions.get("G2") is True
+
+    regions.run_cell("D2", "north")
+    regions.repl_command("G3 = geo.range_frame(D1:E3) is first")
+    assert regions.get("G3") is False
@@ -32,6 +32,7 @@ from neptyne_kernel.neptyne_protocol import (
     WidgetValidateParamsContent,
     WidgetValueContent,
 )
+from neptyne_kernel.packed_cells import unpack_cell_updates
 from neptyne_kernel.sheet_api import NeptyneSheetCollection
 from neptyne_kernel.tyne_model.cell import SheetCell
 from neptyne_kernel.tyne_model.jupyter_notebook import Output
@@ -311,6 +312,10 @@ class Simulator:
         msg_type = reply[HEADER_TAG][MSG_TYPE_TAG]
         if msg_type == MessageTypes.SHEET_UPDATE.value:
             cell_updates = reply[CONTENT_TAG]["cellUpdates"]
+            if packed_cells := reply[CONTENT_TAG].get("packedCells"):
+                cell_updates = cell_updates + unpack_cell_updates(
+                    packed_cells, reply["buffers"][0]
+                )
             for update in cell_updates:
                 update = reflate_cell(update)
                 cell_id = update["cellId"]
@@ -569,6 +574,8 @@ class Simulator:
                 sheet_id = 0
             cell_id = Address.from_a1_or_str(cell_id, sheet_id)
         dash = self.get_dash()
+        # The graph is only complete once every sheet is loaded
+        dash.cells.hydrate_all()
         dash.graph.check_integrity()
         return dash.sheet_cell_for_address(cell_id)
 
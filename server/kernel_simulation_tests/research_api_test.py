@@ -0,0 +1,217 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from neptyne_kernel.pending_call import CallPending, deferring_calls
+from neptyne_kernel.renderers import StrWithSource
+from neptyne_kernel.spreadsheet_error import PYTHON_ERROR, SpreadsheetError
+
+
+class StubProxy(ThreadingHTTPServer):
+    """Answers /research/<method> like the research proxy, slowly"""
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.requests: list[tuple[str, list]] = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: StubProxy
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        method = url.path.rsplit("/", 1)[-1]
+        args = json.loads(parse_qs(url.query)["args"][0])
+        with self.server.lock:
+            self.server.requests.append((method, args))
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        time.sleep(0.05)
+        with self.server.lock:
+            self.server.active -= 1
+        if args[0] == "fail":
+            payload = {"error": "no answer"}
+        elif method == "research":
+            payload = {"value": f"{args[1]}!", "source": "https://example.com"}
+        else:
+            payload = {"value": " ".join(map(str, args))}
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def ai(simulator):
+    # Importing the API needs the kernel's shell:
+    from neptyne_kernel.neptyne_api.ai import ai
+
+    ai._payloads.clear()
+    yield ai
+    ai._payloads.clear()
+
+
+@pytest.fixture
+def proxy(monkeypatch, tmp_path):
+    server = StubProxy()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("API_PROXY_HOST_PORT", f"127.0.0.1:{server.server_port}")
+    monkeypatch.setenv("NEPTYNE_AI_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("NEPTYNE_API_TOKEN", "token")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def stored(ai) -> None:
+    """Waits for the answers that came in to be cached"""
+    while ai._in_flight:
+        time.sleep(0.01)
+
+
+def test_identical_calls_are_deduplicated_and_cached(ai, proxy):
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(ai.value("capital of", "France"))
+        )
+        for _ in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["capital of France"] * 10
+    assert proxy.requests == [("value", ["capital of", "France"])]
+
+    # Persisted, so it survives the kernel:
+    ai._payloads.clear()
+    research = ai.research("capital of", "France")
+    assert isinstance(research, StrWithSource)
+    ai._payloads.clear()
+    assert ai.value("capital of", "France") == "capital of France"
+    assert ai.research("capital of", "France") == "France!"
+    assert len(proxy.requests) == 2
+
+
+def test_deferred_calls_run_concurrently(ai, proxy):
+    futures = []
+    with deferring_calls():
+        for i in range(ai.MAX_CONCURRENT_CALLS):
+            with pytest.raises(CallPending) as pending:
+                ai.value("count", i)
+            futures.append(pending.value.future)
+    for future in futures:
+        future.result()
+    assert proxy.max_active > 1
+
+    with deferring_calls():
+        assert ai.value("count", 3) == "count 3"
+    assert len(proxy.requests) == ai.MAX_CONCURRENT_CALLS
+
+
+def test_failures_are_not_cached(ai, proxy):
+    with deferring_calls(), pytest.raises(CallPending) as pending:
+        ai.value("fail")
+    pending.value.future.result()
+    # Evaluating again reports the failure of the call that was waited for:
+    with pytest.raises(ValueError, match="no answer"):
+        ai.value("fail")
+    assert len(proxy.requests) == 1
+    with pytest.raises(ValueError):
+        ai.value("fail")
+    assert len(proxy.requests) == 2
+
+
+def test_never_cache(simulator, ai, proxy):
+    ai.value("now", caching="never")
+    ai.value("now", caching="never")
+    assert len(proxy.requests) == 2
+    ai.value("now")
+    ai.value("now")
+    assert len(proxy.requests) == 3
+    with pytest.raises(ValueError):
+        ai.value("now", caching="sometimes")
+
+    # Called by a function of the user that is never cached:
+    simulator.repl_command(
+        "import neptyne as nt\n"
+        "@nt.cache.never\n"
+        "def ask():\n"
+        '    return ai.value("now")\n'
+    )
+    simulator.repl_command("ask()")
+    simulator.repl_command("ask()")
+    assert len(proxy.requests) == 5
+    assert not hasattr(ai.value, "caching")
+
+
+def test_cached_answers_expire(ai, proxy, monkeypatch):
+    assert ai.value("capital of", "France") == "capital of France"
+    stored(ai)
+    later = time.time() + ai.CACHE_SECONDS + 1
+    monkeypatch.setattr(ai.time, "time", lambda: later)
+    ai.value("capital of", "France")
+    assert len(proxy.requests) == 2
+
+    # Also when read from disk:
+    stored(ai)
+    ai._payloads.clear()
+    monkeypatch.setattr(ai.time, "time", lambda: later + ai.CACHE_SECONDS + 1)
+    ai.value("capital of", "France")
+    assert len(proxy.requests) == 3
+
+
+def test_ai_formulas_recalculate_concurrently(simulator, ai, proxy):
+    rows = 2 * ai.MAX_CONCURRENT_CALLS
+    for row in range(1, rows + 1):
+        simulator.run_cell(f"A{row}", str(row % ai.MAX_CONCURRENT_CALLS))
+        simulator.run_cell(f"B{row}", f'=ai.value("count", A{row})')
+    simulator.run_cell("C1", f"=B1 + B{rows}")
+    for row in range(1, rows + 1):
+        assert simulator.get(f"B{row}") == f"count {row % ai.MAX_CONCURRENT_CALLS}"
+    assert simulator.get("C1") == "count 1count 0"
+
+    proxy.requests.clear()
+    proxy.max_active = 0
+    ai._payloads.clear()
+    simulator.run_cell("A1", "100")
+    simulator.repl_command("for row in range(1, 17): N_[0, row - 1, 0] = row + 1000")
+    for row in range(1, rows + 1):
+        assert simulator.get(f"B{row}") == f"count {row + 1000}"
+    assert simulator.get("C1") == "count 1001count 1016"
+    assert proxy.max_active > 1
+    # One for A1 being set to 100, then one per row:
+    assert len(proxy.requests) == rows + 1
+
+
+def test_unreachable_proxy_shows_an_error(simulator, ai, monkeypatch, tmp_path):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setenv("API_PROXY_HOST_PORT", f"127.0.0.1:{port}")
+    monkeypatch.setenv("NEPTYNE_AI_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("NEPTYNE_API_TOKEN", "token")
+
+    simulator.run_cell("B1", "France")
+    simulator.run_cell("C1", '=ai.value("capital of", B1)')
+    simulator.run_cell("D1", "=B1 + '!'")
+    simulator.run_cell("B1", "Spain")
+    error = simulator.get("C1")
+    assert isinstance(error, SpreadsheetError)
+    assert error.ename == PYTHON_ERROR.ename
+    # The rest of the sheet still recalculates:
+    assert simulator.get("D1") == "Spain!"
@@ -191,3 +191,36 @@ def set_A1_range():
     assert simulator.get("B1") == 3
     assert simulator.get("C1") == 3
     assert simulator.get("D1") == 3
+
+
+def test_profile_recalc(simulator):
+    simulator.repl_command("def slow(x): return sum(range(10000)) + x")
+    simulator.run_cell("A1", "1")
+    profiler = simulator.get_dash().profile_recalc()
+    simulator.run_cell("B1", "=slow(A1)")
+    simulator.run_cell("A1", "2", expected_cells={"B1"})
+    profiler.stop()
+    assert simulator.get_dash().profiler is None
+
+    assert simulator.get("B1") == sum(range(10000)) + 2
+    b1 = profiler.cells[Address.from_a1("B1")]
+    assert b1.cell == "Sheet0!B1"
+    assert b1.evaluations == 2
+    assert b1.wall_time > 0
+    assert profiler.ref_reads >= 2
+    assert profiler.max_cascade_depth >= 0
+    assert "Sheet0!B1" in profiler.to_folded()
+
+
+def test_kernel_metrics(simulator):
+    dash = simulator.get_dash()
+    dash.metrics.take(min_interval=0)
+    simulator.run_cell("A1", "1")
+    simulator.run_cell("B1", "=A1 + 1")
+    simulator.run_cell("A1", "2", expected_cells={"B1"})
+    dash.flush_dirty_cells_now()
+
+    content = dash.metrics.take(min_interval=0)
+    assert content.cells_evaluated >= 4
+    assert sum(content.cascade_depth_counts) >= 3
+    assert content.flushes >= 1
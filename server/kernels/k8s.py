@@ -19,6 +19,7 @@ from neptyne_kernel.launch_ipykernel import (
     SHELL_PORT,
     STDIN_PORT,
 )
+from server import metrics
 from server.k8s_annotations import (
     ANNOTATION_CLAIMED_AT,
     ANNOTATION_LAST_ACTIVITY,
@@ -144,6 +145,9 @@ class KernelPodPool:
 
         await self.cleanup_pods(api)
 
+        metrics.POD_POOL_AVAILABLE.set(self.pods.qsize(), shard=self.shard_index)
+        metrics.POD_POOL_PENDING.set(len(self.pending_pods), shard=self.shard_index)
+
         queue_size = self.pods.qsize() + len(self.pending_pods)
         if queue_size < self.desired_size:
             logger.debug("queue size is %s, creating pod", queue_size)
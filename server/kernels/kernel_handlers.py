@@ -4,6 +4,7 @@ import logging
 import re
 import sys
 import traceback
+from asyncio import Future
 from datetime import datetime, timezone
 from typing import Any
 from urllib.parse import urlparse
@@ -18,7 +19,6 @@ from tornado.websocket import (
 )
 from tornado_sqlalchemy import SessionMixin
 
-from neptyne_kernel.json_tools import json_default
 from neptyne_kernel.neptyne_protocol import MessageTypes
 from neptyne_kernel.session_info import NeptyneSessionInfo
 from neptyne_kernel.streamlit_config import STREAMLIT_PORT, stream_url_path
@@ -30,9 +30,10 @@ from ..msg_handler_meta import ClientMessageContext
 from ..neptyne_kernel_service import NeptyneKernelService
 from ..proxied_tyne import ProxiedTyne
 from ..streamlit_session_mixin import StreamlitSessionMixin
-from ..tyne_contents_manager import TyneContentsManager, get_tyne_access_level, shard_id
+from ..tyne_contents_manager import TyneContentsManager, shard_id
 from ..tyne_info import KernelInitTimeout, KernelSubscriber
 from ..users import authenticate_request
+from ..websocket_fanout import SendQueue, SharedMessage
 
 tracer = trace.get_tracer(__name__)
 
@@ -61,9 +62,12 @@ class ConnectedKernelHandler(SessionMixin, WebSocketHandler):
     user_name: str
     user_profile_image: str
     access_level: AccessLevel | None
+    session_info: NeptyneSessionInfo | None
+    session_info_version: int
 
     asked_for_auth: bool
     message_queue: list
+    send_queue: SendQueue | None
     allow_other_gsheets: bool
 
     def initialize(
@@ -77,8 +81,11 @@ class ConnectedKernelHandler(SessionMixin, WebSocketHandler):
         self.kernel_manager = kernel_manager
         self.session_id = str(uuid4())
         self.tyne_proxy = None
+        self.session_info = None
+        self.session_info_version = -1
         self.asked_for_auth = False
         self.message_queue = []
+        self.send_queue = None
 
         # Two properties to satisfy the WebsocketMixin's origin check
         self.allow_origin = None
@@ -143,7 +150,7 @@ class ConnectedKernelHandler(SessionMixin, WebSocketHandler):
             if not isinstance(user, NonUser):
                 self.tyne_proxy.load_user_secrets(user.id, session)
             self.tyne_proxy.load_user_secrets(None, session)
-            self.access_level = get_tyne_access_level(
+            self.access_level = self.tyne_contents_manager.get_access_level(
                 self.tyne_id, session, user, gsheet_auth_token is not None
             )
         await self.connect_to_kernel(subscribe)
@@ -166,6 +173,7 @@ class ConnectedKernelHandler(SessionMixin, WebSocketHandler):
                         user_profile_image=self.user_profile_image,
                         close=self.close,
                         on_kernel_msg=self.on_kernel_message,
+                        on_shared_msg=self.on_shared_message,
                     )
                 else:
                     subscriber = None
@@ -197,15 +205,21 @@ class ConnectedKernelHandler(SessionMixin, WebSocketHandler):
         self.tyne_id = tyne_id
 
     def on_kernel_message(self, stream: Any, msg: dict) -> None:
+        self.on_shared_message(SharedMessage.from_kernel(stream, msg))
+
+    def on_shared_message(self, message: SharedMessage) -> None:
         if self.ws_connection and not self.ws_connection.is_closing():
-            now = datetime.now(timezone.utc)
-            msg[HEADER_TAG]["server_reply_at"] = now.isoformat()
-            channel = getattr(stream, "channel", None)
-            if channel:
-                msg["channel"] = channel
-            self.write_message(
-                json.dumps(msg, default=json_default), binary=isinstance(msg, bytes)
-            )
+            if self.send_queue is None:
+                self.send_queue = SendQueue(self.ws_connection, self.close)
+            self.send_queue.put(message)
+
+    def write_message(
+        self, message: bytes | str | dict[str, Any], binary: bool = False
+    ) -> "Future[None]":
+        # Whatever the kernel sent before goes out first:
+        if self.send_queue is not None:
+            self.send_queue.flush(force=True)
+        return super().write_message(message, binary=binary)
 
 
 class TyneWebsocketHandler(ConnectedKernelHandler):
@@ -252,27 +266,18 @@ class TyneWebsocketHandler(ConnectedKernelHandler):
         assert self.tyne_proxy
 
         msg[HEADER_TAG]["server_receive_at"] = datetime.now(timezone.utc)
+        self.get_session_info().write_to_header(msg[HEADER_TAG])
 
-        session_info = NeptyneSessionInfo(
-            session_id=self.session_id,
-            user_email=self.user_email,
-            user_name=self.user_name,
-            user_secrets=self.tyne_proxy.get_user_secrets(self.user_id)
-            if self.user_id
-            else {},
-            tyne_secrets=self.tyne_proxy.get_tyne_secrets(),
-            user_profile_image=self.user_profile_image,
-            user_api_token="",
-            sheets_api_token="",
-        )
-        session_info.write_to_header(msg[HEADER_TAG])
-
+        # The connection reuses one session for all its messages instead of making a
+        # new one for each:
+        session = self.session
         try:
-            with self.make_session() as session:
-                await self.tyne_proxy.handle_client_message(
-                    ClientMessageContext(msg, session, self.user_id, self.access_level)
-                )
+            await self.tyne_proxy.handle_client_message(
+                ClientMessageContext(msg, session, self.user_id, self.access_level)
+            )
+            session.commit()
         except Exception as e:
+            session.rollback()
             # We shouldn't handle user errors here -- this is a catch-all to prevent killing
             # the connection when something unexpected goes wrong. If possible, handle
             # errors in the tyne message handlers
@@ -287,13 +292,41 @@ class TyneWebsocketHandler(ConnectedKernelHandler):
                     "error",
                 )
             )
+        finally:
+            # Releases the connection and forgets loaded objects; the session stays usable
+            session.close()
+
+    def get_session_info(self) -> NeptyneSessionInfo:
+        assert self.tyne_proxy
+        if (
+            self.session_info is None
+            or self.session_info_version != self.tyne_proxy.secrets_version
+        ):
+            self.session_info = NeptyneSessionInfo(
+                session_id=self.session_id,
+                user_email=self.user_email,
+                user_name=self.user_name,
+                user_secrets=self.tyne_proxy.get_user_secrets(self.user_id)
+                if self.user_id
+                else {},
+                tyne_secrets=self.tyne_proxy.get_tyne_secrets(),
+                user_profile_image=self.user_profile_image,
+                user_api_token="",
+                sheets_api_token="",
+            )
+            self.session_info_version = self.tyne_proxy.secrets_version
+        return self.session_info
 
     def on_close(self) -> None:
+        if self.send_queue is not None:
+            self.send_queue.stop()
         try:
             if self.tyne_proxy:
                 self.tyne_proxy.update_kernel_subscriber(self.session_id, None)
         except ValueError:
             pass
+        if self._session is not None:
+            self._session.close()
 
 
 class StreamlitWebsocketHandler(StreamlitSessionMixin, ConnectedKernelHandler):
@@ -17,6 +17,7 @@ META_DATA_TAG = "metadata"
 MSG_TYPE_TAG = "msg_type"
 CONTENT_TAG = "content"
 PARENT_HEADER_TAG = "parent_header"
+BUFFERS_TAG = "buffers"
 Msg = dict[str, Any]
 MsgContent = dict[str, Any]
 DEFAULT_CONTENT = {
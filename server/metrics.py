@@ -0,0 +1,410 @@
+"""Aggregated metrics for the server, exposed in the Prometheus text format on /metrics.
+
+This is a deliberately small subset of what prometheus_client offers: counters, gauges and
+histograms with labels, all living in one registry. Everything runs on the event loop or
+holds the registry lock, so updates are cheap enough for the per message paths.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+
+from tornado import web
+from tornado.log import access_log
+
+from neptyne_kernel.neptyne_protocol import KernelMetricsContent
+
+T = TypeVar("T")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+SLOW_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+BYTE_BUCKETS = tuple(float(4**i * 1024) for i in range(9))  # 1KiB .. 64MiB
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+# Series with this label identify tynes, so they are only served to a scraper that
+# authenticates with METRICS_TOKEN:
+TYNE_LABEL = "tyne"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.metrics: dict[str, "Metric"] = {}
+
+    def register(self, metric: "Metric") -> None:
+        if metric.name in self.metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self.metrics[metric.name] = metric
+
+    def render(self, with_tyne_series: bool = True) -> str:
+        lines: list[str] = []
+        with self.lock:
+            for metric in self.metrics.values():
+                if not with_tyne_series and TYNE_LABEL in metric.labelnames:
+                    continue
+                lines.append(f"# HELP {metric.name} {metric.documentation}")
+                lines.append(f"# TYPE {metric.name} {metric.type_name}")
+                lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    type_name: str
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        registry: Registry = REGISTRY,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = registry.lock
+        self._values: dict[tuple[str, ...], Any] = {}
+        registry.register(self)
+
+    def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        if labels.keys() != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def remove(self, **labels: Any) -> None:
+        """Drop the series for these label values, e.g. when a tyne is closed. Labels that
+        are left out match any value."""
+        with self._lock:
+            for key in list(self._values):
+                if all(
+                    key[self.labelnames.index(name)] == str(value)
+                    for name, value in labels.items()
+                ):
+                    del self._values[key]
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self._values.items():
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_total{labels} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self._values.items():
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class _HistogramValue:
+    __slots__ = ("bucket_counts", "count", "sum")
+
+    def __init__(self, num_buckets: int) -> None:
+        self.bucket_counts = [0] * num_buckets
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+        registry: Registry = REGISTRY,
+    ) -> None:
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = (*sorted(buckets), math.inf)
+
+    def observe(self, value: float, count: int = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            hist = self._values.get(key)
+            if hist is None:
+                hist = self._values[key] = _HistogramValue(len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist.bucket_counts[i] += count
+                    break
+            hist.count += count
+            hist.sum += value * count
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: Any) -> int:
+        hist = self._values.get(self._key(labels))
+        return hist.count if hist else 0
+
+    def samples(self) -> Iterator[str]:
+        for key, hist in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, hist.bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(
+                    (*self.labelnames, "le"), (*key, _format_value(bound))
+                )
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(hist.sum)}"
+            yield f"{self.name}_count{labels} {hist.count}"
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "neptyne_http_request_duration_seconds",
+    "Time spent handling HTTP requests, per handler",
+    ("handler", "method", "status"),
+)
+
+KERNEL_MESSAGES = Counter(
+    "neptyne_kernel_messages",
+    "Messages received from kernels, per tyne",
+    ("tyne",),
+)
+KERNEL_MESSAGE_SECONDS = Histogram(
+    "neptyne_kernel_message_seconds",
+    "Time to process a kernel message and fan it out to the subscribers",
+    ("channel",),
+)
+KERNEL_MESSAGE_FANOUT = Histogram(
+    "neptyne_kernel_message_fanout",
+    "Number of subscribers a kernel message was sent to",
+    buckets=COUNT_BUCKETS,
+)
+WEBSOCKET_PENDING_BYTES = Gauge(
+    "neptyne_websocket_pending_bytes",
+    "Bytes written to client websockets that have not been flushed yet",
+)
+WEBSOCKET_SEND_BACKLOG = Histogram(
+    "neptyne_websocket_send_backlog_bytes",
+    "Unflushed bytes of a client websocket at the time of a write",
+    buckets=BYTE_BUCKETS,
+)
+WEBSOCKET_DROPPED_CELL_UPDATES = Counter(
+    "neptyne_websocket_dropped_cell_updates",
+    "Cell updates not sent to slow clients because a later update replaced them",
+)
+
+TYNE_SAVE_SECONDS = Histogram(
+    "neptyne_tyne_save_seconds",
+    "Time to decode and store a tyne sent by the kernel",
+    buckets=SLOW_BUCKETS,
+)
+TYNE_SAVE_BYTES = Histogram(
+    "neptyne_tyne_save_bytes",
+    "Size of the sheets blob of a tyne save",
+    buckets=BYTE_BUCKETS,
+)
+
+KERNEL_STARTUP_SECONDS = Histogram(
+    "neptyne_kernel_startup_seconds",
+    "Time from requesting a kernel until it is initialized with the tyne",
+    ("for_tick",),
+    buckets=SLOW_BUCKETS,
+)
+POD_POOL_AVAILABLE = Gauge(
+    "neptyne_pod_pool_available",
+    "Kernel pods that are running and ready to be assigned",
+    ("shard",),
+)
+POD_POOL_PENDING = Gauge(
+    "neptyne_pod_pool_pending",
+    "Kernel pods that have been requested but are not running yet",
+    ("shard",),
+)
+
+EXECUTOR_QUEUE_DEPTH = Gauge(
+    "neptyne_executor_queue_depth",
+    "Tasks submitted to an executor that have not finished yet",
+    ("executor",),
+)
+EXECUTOR_TASK_SECONDS = Histogram(
+    "neptyne_executor_task_seconds",
+    "Time from submitting a task to an executor until it finished",
+    ("executor",),
+    buckets=SLOW_BUCKETS,
+)
+
+TICKS_SCHEDULED = Gauge(
+    "neptyne_ticks_scheduled",
+    "Tyne ticks held by the tick scheduler of this server",
+)
+TICK_LATENESS_SECONDS = Histogram(
+    "neptyne_tick_lateness_seconds",
+    "Time between when a tick was due and when the scheduler fired it",
+)
+
+API_QUOTA_DB_SECONDS = Histogram(
+    "neptyne_api_quota_db_seconds",
+    "Time spent in the database for API quota bookkeeping",
+    ("operation",),
+)
+
+KERNEL_CELLS_EVALUATED = Counter(
+    "neptyne_kernel_cells_evaluated",
+    "Cells evaluated by kernels, per tyne",
+    ("tyne",),
+)
+KERNEL_CASCADE_DEPTH = Histogram(
+    "neptyne_kernel_cascade_depth",
+    "Number of side effect cascades a recalculation needed",
+    buckets=tuple(range(11)),
+)
+KERNEL_FLUSHES = Counter(
+    "neptyne_kernel_flushes",
+    "Sheet updates sent by kernels to clients",
+)
+KERNEL_FLUSHED_CELLS = Counter(
+    "neptyne_kernel_flushed_cells",
+    "Cells included in the sheet updates sent by kernels",
+)
+
+
+def record_kernel_metrics(tyne: str, content: KernelMetricsContent) -> None:
+    KERNEL_CELLS_EVALUATED.inc(content.cells_evaluated, tyne=tyne)
+    for depth, count in enumerate(content.cascade_depth_counts):
+        if count:
+            KERNEL_CASCADE_DEPTH.observe(depth, count=int(count))
+    KERNEL_FLUSHES.inc(content.flushes)
+    KERNEL_FLUSHED_CELLS.inc(content.flushed_cells)
+
+
+def forget_tyne(tyne: str) -> None:
+    KERNEL_MESSAGES.remove(tyne=tyne)
+    KERNEL_CELLS_EVALUATED.remove(tyne=tyne)
+
+
+async def run_in_executor(
+    executor: Executor, name: str, func: Callable[..., T], *args: Any
+) -> T:
+    """loop.run_in_executor that keeps track of the queue depth and task time of the
+    executor under name."""
+    EXECUTOR_QUEUE_DEPTH.inc(executor=name)
+    try:
+        with EXECUTOR_TASK_SECONDS.time(executor=name):
+            return await asyncio.get_event_loop().run_in_executor(executor, func, *args)
+    finally:
+        EXECUTOR_QUEUE_DEPTH.dec(executor=name)
+
+
+def log_request(handler: web.RequestHandler) -> None:
+    """Application log_function that records the request time per handler and then logs
+    the request like tornado does by default."""
+    request_time = handler.request.request_time()
+    status = handler.get_status()
+    HTTP_REQUEST_SECONDS.observe(
+        request_time,
+        handler=type(handler).__name__,
+        method=handler.request.method,
+        status=status,
+    )
+    if status < 400:
+        log_method = access_log.info
+    elif status < 500:
+        log_method = access_log.warning
+    else:
+        log_method = access_log.error
+    log_method(
+        "%d %s %.2fms",
+        status,
+        handler._request_summary(),
+        1000.0 * request_time,
+    )
+
+
+class MetricsHandler(web.RequestHandler):
+    def get(self) -> None:
+        # Without a token configured, the series labeled with tyne ids are left out:
+        token = os.getenv("METRICS_TOKEN")
+        authorized = bool(token) and (
+            self.request.headers.get("Authorization") == f"Bearer {token}"
+        )
+        if token and not authorized:
+            raise web.HTTPError(403)
+        self.set_header("Content-Type", CONTENT_TYPE)
+        self.finish(REGISTRY.render(with_tyne_series=authorized))
@@ -0,0 +1,103 @@
+import pytest
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+from tornado.web import Application
+
+from neptyne_kernel.neptyne_protocol import KernelMetricsContent
+from server import metrics
+from server.fake_executor import FakeExecutor
+from server.metrics import Counter, Gauge, Histogram, MetricsHandler, Registry
+
+
+def test_render():
+    registry = Registry()
+    counter = Counter("requests", "Requests", ("tyne",), registry=registry)
+    gauge = Gauge("pending", "Pending", registry=registry)
+    histogram = Histogram(
+        "latency", "Latency", ("channel",), buckets=(0.1, 1), registry=registry
+    )
+
+    counter.inc(tyne='a"b')
+    counter.inc(2, tyne='a"b')
+    gauge.inc(5)
+    gauge.dec(2)
+    histogram.observe(0.05, channel="iopub")
+    histogram.observe(0.5, channel="iopub")
+    histogram.observe(3, count=2, channel="iopub")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE requests counter" in lines
+    assert 'requests_total{tyne="a\\"b"} 3' in lines
+    assert "pending 3" in lines
+    assert 'latency_bucket{channel="iopub",le="0.1"} 1' in lines
+    assert 'latency_bucket{channel="iopub",le="1"} 2' in lines
+    assert 'latency_bucket{channel="iopub",le="+Inf"} 4' in lines
+    assert 'latency_sum{channel="iopub"} 6.55' in lines
+    assert 'latency_count{channel="iopub"} 4' in lines
+
+    # Left out for scrapers that aren't trusted with tyne ids:
+    assert "requests_total" not in registry.render(with_tyne_series=False)
+    assert "pending 3" in registry.render(with_tyne_series=False).splitlines()
+
+    counter.remove(tyne='a"b')
+    assert "requests_total" not in registry.render()
+
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+    with pytest.raises(ValueError):
+        Gauge("pending", "Duplicate", registry=registry)
+
+
+@pytest.mark.asyncio
+async def test_run_in_executor():
+    before = metrics.EXECUTOR_TASK_SECONDS.count(executor="test")
+    assert await metrics.run_in_executor(FakeExecutor(), "test", pow, 2, 10) == 1024
+    assert metrics.EXECUTOR_TASK_SECONDS.count(executor="test") == before + 1
+    assert metrics.EXECUTOR_QUEUE_DEPTH.value(executor="test") == 0
+
+
+def test_record_kernel_metrics():
+    evaluated = metrics.KERNEL_CELLS_EVALUATED.value(tyne="tyne1")
+    cascades = metrics.KERNEL_CASCADE_DEPTH.count()
+    metrics.record_kernel_metrics(
+        "tyne1",
+        KernelMetricsContent.from_dict(
+            {
+                "cellsEvaluated": 7,
+                "cascadeDepthCounts": [3, 1, 0],
+                "flushes": 2,
+                "flushedCells": 9,
+            }
+        ),
+    )
+    assert metrics.KERNEL_CELLS_EVALUATED.value(tyne="tyne1") == evaluated + 7
+    assert metrics.KERNEL_CASCADE_DEPTH.count() == cascades + 4
+
+    metrics.forget_tyne("tyne1")
+    assert metrics.KERNEL_CELLS_EVALUATED.value(tyne="tyne1") == 0
+
+
+@pytest.mark.asyncio
+async def test_metrics_handler(monkeypatch):
+    metrics.KERNEL_MESSAGES.inc(tyne="secret-tyne")
+    sock, port = bind_unused_port()
+    server = HTTPServer(Application([("/metrics", MetricsHandler)]))
+    server.add_sockets([sock])
+    client = AsyncHTTPClient()
+    url = f"http://127.0.0.1:{port}/metrics"
+    try:
+        monkeypatch.delenv("METRICS_TOKEN", raising=False)
+        body = (await client.fetch(url)).body.decode()
+        assert "neptyne_kernel_message_seconds" in body
+        assert "secret-tyne" not in body
+
+        monkeypatch.setenv("METRICS_TOKEN", "token")
+        with pytest.raises(HTTPClientError) as error:
+            await client.fetch(url)
+        assert error.value.code == 403
+        response = await client.fetch(url, headers={"Authorization": "Bearer token"})
+        assert "secret-tyne" in response.body.decode()
+    finally:
+        server.stop()
+        metrics.forget_tyne("secret-tyne")
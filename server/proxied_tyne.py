@@ -25,6 +25,7 @@ from neptyne_kernel.neptyne_protocol import (
     DeleteSheetContent,
     InsertDeleteReplyCellType,
     InstallRequirementsContent,
+    KernelMetricsContent,
     MessageTypes,
     RenameSheetContent,
     RenameTyneContent,
@@ -40,6 +41,7 @@ from neptyne_kernel.session_info import NeptyneSessionInfo
 from neptyne_kernel.transformation import Transformation
 from neptyne_kernel.tyne_model.cell import CODEPANEL_CELL_ID, NotebookCell
 from neptyne_kernel.tyne_model.kernel_init_data import TyneInitializationData
+from server import metrics
 from server.image_upload import decode_image, upload_image_to_gcs
 from server.messages import (
     CELL_ID_TAG,
@@ -73,6 +75,7 @@ from server.tyne_info import (
     TyneInfoCaller,
 )
 from server.tyne_storer import TyneStorer, blob_to_sheets
+from server.websocket_fanout import SharedMessage
 
 logger = logging.getLogger("kernelLogger")
 tracer = trace.get_tracer(__name__)
@@ -106,6 +109,11 @@ class ProxiedTyne(TyneInfoCaller, MessageHandler):
     tyne_storer: TyneStorer
     kernel_name: str
     user_secrets: dict[int | None, dict[str, str]]
+    # Users whose secrets were read from the database. Changes go through
+    # set_user_secret(s), so these don't need to be read again:
+    loaded_secrets: set[int | None]
+    # Bumped whenever user_secrets changes, so connections know to rebuild their session info
+    secrets_version: int
     kernel_subscribers: dict[str, KernelSubscriber]
     kernel_initialized: asyncio.Event
     last_user_activity: float
@@ -134,6 +142,8 @@ class ProxiedTyne(TyneInfoCaller, MessageHandler):
         self.tyne_storer = tyne_storer
         self.kernel_name = kernel_name
         self.user_secrets = {}
+        self.loaded_secrets = set()
+        self.secrets_version = 0
         self.kernel_subscribers = {}
         self.kernel_initialized = asyncio.Event()
         self.last_user_activity = 0
@@ -204,9 +214,12 @@ class ProxiedTyne(TyneInfoCaller, MessageHandler):
         )
 
         if not just_to_self:
+            shared = SharedMessage.from_kernel(self.fake_zmq_stream, reply)
             for subscriber_id, subscriber in [*self.kernel_subscribers.items()]:
                 if subscriber_id != session_id:
-                    if inspect.iscoroutinefunction(subscriber.on_kernel_msg):
+                    if subscriber.on_shared_msg is not None:
+                        subscriber.on_shared_msg(shared)
+                    elif inspect.iscoroutinefunction(subscriber.on_kernel_msg):
                         loop = asyncio.get_event_loop()
                         self.callback_tasks.add(
                             loop.create_task(
@@ -347,6 +360,7 @@ class ProxiedTyne(TyneInfoCaller, MessageHandler):
 
     def disconnect(self) -> None:
         self.tyne_info.disconnect()
+        metrics.forget_tyne(self.tyne_info.file_name)
 
     def disconnect_clients(self) -> None:
         for subscriber in self.kernel_subscribers.values():
@@ -361,6 +375,12 @@ class ProxiedTyne(TyneInfoCaller, MessageHandler):
             self.trigger_save(event)
 
     async def on_kernel_message(self, stream: Any, msg: Msg) -> None:
+        metrics.KERNEL_MESSAGES.inc(tyne=self.tyne_info.file_name)
+        channel = getattr(stream, "channel", "")
+        with metrics.KERNEL_MESSAGE_SECONDS.time(channel=channel):
+            await self._on_kernel_message(stream, msg)
+
+    async def _on_kernel_message(self, stream: Any, msg: Msg) -> None:
         ctx = extract_trace_context(msg)
         with tracer.start_as_current_span(
             "process_kernel_message", context=ctx
@@ -381,7 +401,9 @@ class ProxiedTyne(TyneInfoCaller, MessageHandler):
         NeptyneSessionInfo.strip_from_message_header(msg[PARENT_HEADER_TAG])
 
         did_send_to_subscriber = False
+        sent_to = 0
         if patched_msg is not None:
+            shared = SharedMessage.from_kernel(stream, patched_msg)
             if (
                 stream.channel == "iopub"
                 # we give special treatment to execute_reply messages so all subscribers know
@@ -389,18 +411,14 @@ class ProxiedTyne(TyneInfoCaller, MessageHandler):
                 or patched_msg[HEADER_TAG][MSG_TYPE_TAG] == "execute_reply"
             ):
                 for subscriber in self.kernel_subscribers.values():
-                    if inspect.iscoroutinefunction(subscriber.on_kernel_msg):
-                        await subscriber.on_kernel_msg(stream, patched_msg)
-                    else:
-                        subscriber.on_kernel_msg(stream, patched_msg)
+                    await self.send_to_subscriber(subscriber, stream, shared)
                     did_send_to_subscriber = True
+                    sent_to += 1
             else:
                 if session_id and (sub := self.kernel_subscribers.get(session_id)):
-                    if inspect.iscoroutinefunction(sub.on_kernel_msg):
-                        await sub.on_kernel_msg(stream, patched_msg)
-                    else:
-                        sub.on_kernel_msg(stream, patched_msg)
+                    await self.send_to_subscriber(sub, stream, shared)
                     did_send_to_subscriber = True
+                    sent_to = 1
 
             if (
                 not did_send_to_subscriber
@@ -409,12 +427,24 @@ class ProxiedTyne(TyneInfoCaller, MessageHandler):
                 # If the kernel requests input but there is no subscriber listening, it will be stuck.
                 # Un-stick it by sending an empty input.
                 self.tyne_info.send_to_stdin(None)
+            metrics.KERNEL_MESSAGE_FANOUT.observe(sent_to)
 
         # Handle shutdown after broadcasting message, so we get a chance to write to the websocket
         # before we close it
         if msg[PARENT_HEADER_TAG].get(MSG_TYPE_TAG) == "shutdown_request":
             self.tyne_info.handle_shutdown()
 
+    @staticmethod
+    async def send_to_subscriber(
+        subscriber: KernelSubscriber, stream: Any, shared: SharedMessage
+    ) -> None:
+        if subscriber.on_shared_msg is not None:
+            subscriber.on_shared_msg(shared)
+        elif inspect.iscoroutinefunction(subscriber.on_kernel_msg):
+            await subscriber.on_kernel_msg(stream, shared.msg)
+        else:
+            subscriber.on_kernel_msg(stream, shared.msg)
+
     async def tick(
         self,
         load_content: Callable[
@@ -458,7 +488,7 @@ class ProxiedTyne(TyneInfoCaller, MessageHandler):
         record.values = {**record.values, key: value}
         session.add(record)
         session.commit()
-        self.load_user_secrets(user_id, session)
+        self.load_user_secrets(user_id, session, refresh=True)
 
     def get_user_secrets(self, user_id: int | None) -> dict[str, str]:
         return self.user_secrets.get(user_id, {})
@@ -479,7 +509,11 @@ class ProxiedTyne(TyneInfoCaller, MessageHandler):
             min_next_tick=0,
         )
 
-    def load_user_secrets(self, user_id: int | None, session: Session) -> None:
+    def load_user_secrets(
+        self, user_id: int | None, session: Session, refresh: bool = False
+    ) -> None:
+        if user_id in self.loaded_secrets and not refresh:
+            return
         secrets = session.execute(
             select(TyneSecrets.values)
             .join(TyneSecrets.tyne)
@@ -491,6 +525,10 @@ class ProxiedTyne(TyneInfoCaller, MessageHandler):
 
         if secrets:
             self.user_secrets[user_id] = {k: str(v) for k, v in secrets[0][0].items()}
+        else:
+            self.user_secrets.pop(user_id, None)
+        self.loaded_secrets.add(user_id)
+        self.secrets_version += 1
 
     def set_user_secrets(
         self, user_id: int | None, session: Session, secrets: dict[str, str]
@@ -513,8 +551,9 @@ class ProxiedTyne(TyneInfoCaller, MessageHandler):
         record.values = secrets
         session.add(record)
         session.commit()
-        if secrets:
-            self.user_secrets[user_id] = {**secrets}
+        self.user_secrets[user_id] = {**secrets}
+        self.loaded_secrets.add(user_id)
+        self.secrets_version += 1
 
     @client_message_handler(MessageTypes.RENAME_TYNE)
     def rename_tyne(self, context: ClientMessageContext) -> None:
@@ -1087,6 +1126,12 @@ class ProxiedTyne(TyneInfoCaller, MessageHandler):
                 user_api_token=None,
             )
 
+    @kernel_message_handler(MessageTypes.KERNEL_METRICS)
+    def on_kernel_metrics(self, msg: Msg) -> None:
+        metrics.record_kernel_metrics(
+            self.tyne_info.file_name, KernelMetricsContent.from_dict(msg[CONTENT_TAG])
+        )
+
     @kernel_message_handler(MessageTypes.RERUN_CELLS)
     def on_kernel_rerun_cells(self, msg: Msg) -> Msg:
         msg_content = RerunCellsContent.from_dict(msg[CONTENT_TAG])
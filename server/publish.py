@@ -1,6 +1,11 @@
+import asyncio
+import hashlib
 import json
 import re
 import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 from typing import (
     Any,
@@ -14,6 +19,7 @@ from tornado_sqlalchemy import SessionMixin
 from neptyne_kernel.cell_address import (
     Address,
 )
+from neptyne_kernel.json_tools import json_default
 from neptyne_kernel.neptyne_protocol import (
     CellAttribute,
 )
@@ -28,12 +34,19 @@ from neptyne_kernel.widgets.output_widgets import (
     plotly_to_image,
 )
 
+from . import metrics
 from .aiohttp_client_session_mixin import HTTPClientSessionMixin
 from .models import NonUser
+from .tyne_content import TyneContent
 from .tyne_contents_manager import NoSuchTyneError, TyneContentsManager
 
 META_TAG_REGEX = re.compile(r'<meta (name|property)="([^"]*)" content="([^"]*)"\s*/?>')
 
+RENDER_EXECUTOR = "render"
+RENDER_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Published tynes whose embedded cells we keep resolved between requests:
+EMBED_CACHE_MAX_TYNES = 256
+
 
 def domain_from_request(request: HTTPServerRequest) -> str:
     if forwarded_host := request.headers.get("X-Forwarded-Host"):
@@ -98,8 +111,9 @@ def cells_and_sizes(
 
 
 def get_embed_content(
-    tyne_sheets: TyneSheets,
-    cell_id: str | None,
+    cell: SheetCell | None,
+    width: int,
+    height: int,
     tyne_url: str,
     max_width: int,
     max_height: int,
@@ -111,7 +125,6 @@ def get_embed_content(
         f'padding: 2px; text-decoration: none">'
         f"See the data</a>"
     )
-    cell, width, height = cells_and_sizes(tyne_sheets, cell_id)
     if cell:
         for data in cell.iterate_outputs_data():
             if CONTENT_TYPE in data:
@@ -133,20 +146,173 @@ def get_embed_content(
     return 0, 0, ""
 
 
-async def render_cell(
-    tyne_sheets: TyneSheets,
-    cell_id: str | None,
-    format: str,
-    http_client: aiohttp.ClientSession | None = None,
-    return_place_holder: bool = True,
-) -> bytes:
-    cell, width, height = cells_and_sizes(tyne_sheets, cell_id)
+def figure_for_cell(cell: SheetCell | None) -> dict | None:
     if cell:
         for data in cell.iterate_outputs_data():
             if isinstance(data, dict) and PLOTLY_MIME_TYPE in data:
                 fig_dict = data[PLOTLY_MIME_TYPE]
                 assert isinstance(fig_dict, dict)
-                return plotly_to_image(fig_dict, width, height, format)
+                return fig_dict
+    return None
+
+
+def render_key(fig_dict: dict, width: int, height: int, format: str) -> str:
+    """A hash of everything that goes into rendering a figure"""
+    encoded = json.dumps(
+        [fig_dict, width, height, format], sort_keys=True, default=json_default
+    )
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class RenderCache:
+    """Rendered figures by render_key, so a figure that is requested over and over (a
+    published tyne shared on social media gets a lot of crawler traffic) is rendered once.
+    Renders run in an executor, off the event loop, and concurrent requests for the same
+    figure wait for the same render.
+
+    Also keeps the resolved embedded cells of recently requested tynes per last_modified
+    so that serving them again doesn't load the tyne content. When such a tyne is saved
+    and the figure of a cell that was requested changes, on_save renders the new version
+    right away.
+    """
+
+    def __init__(
+        self,
+        executor: Executor | None = None,
+        max_bytes: int = RENDER_CACHE_MAX_BYTES,
+    ) -> None:
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="render"
+        )
+        self.max_bytes = max_bytes
+        self.images: OrderedDict[str, bytes] = OrderedDict()
+        self.size = 0
+        self.rendering: dict[str, asyncio.Future[bytes]] = {}
+        # tyne file name -> (last_modified, cell_id -> cells_and_sizes):
+        self.embeds: OrderedDict[
+            str, tuple[datetime, dict[str | None, tuple[SheetCell | None, int, int]]]
+        ] = OrderedDict()
+        # tyne file name -> the (cell_id, format)s whose images were requested:
+        self.rendered_cells: dict[str, set[tuple[str | None, str]]] = {}
+        self.pending_renders: set[asyncio.Task] = set()
+
+    def get(self, key: str) -> bytes | None:
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+        return image
+
+    def put(self, key: str, image: bytes) -> None:
+        if key in self.images:
+            return
+        self.images[key] = image
+        self.size += len(image)
+        while self.size > self.max_bytes and len(self.images) > 1:
+            _, dropped = self.images.popitem(last=False)
+            self.size -= len(dropped)
+
+    async def render(
+        self,
+        fig_dict: dict,
+        width: int,
+        height: int,
+        format: str,
+        key: str | None = None,
+    ) -> bytes:
+        if key is None:
+            key = render_key(fig_dict, width, height, format)
+        if (image := self.get(key)) is not None:
+            return image
+        if (in_flight := self.rendering.get(key)) is not None:
+            return await in_flight
+
+        future = asyncio.get_event_loop().create_future()
+        self.rendering[key] = future
+        try:
+            image = await metrics.run_in_executor(
+                self.executor,
+                RENDER_EXECUTOR,
+                plotly_to_image,
+                fig_dict,
+                width,
+                height,
+                format,
+            )
+        except Exception as e:
+            future.set_exception(e)
+            # Don't complain about the exception if nobody else was waiting for it:
+            future.exception()
+            raise
+        finally:
+            del self.rendering[key]
+        self.put(key, image)
+        future.set_result(image)
+        return image
+
+    def get_cell(
+        self,
+        tyne_file_name: str,
+        last_modified: datetime,
+        cell_id: str | None,
+    ) -> tuple[SheetCell | None, int, int] | None:
+        cached = self.embeds.get(tyne_file_name)
+        if cached is None or cached[0] != last_modified:
+            return None
+        self.embeds.move_to_end(tyne_file_name)
+        return cached[1].get(cell_id)
+
+    def put_cell(
+        self,
+        tyne_file_name: str,
+        last_modified: datetime,
+        cell_id: str | None,
+        cell_and_sizes: tuple[SheetCell | None, int, int],
+    ) -> None:
+        cached = self.embeds.get(tyne_file_name)
+        if cached is None or cached[0] != last_modified:
+            cached = (last_modified, {})
+            self.embeds[tyne_file_name] = cached
+        cached[1][cell_id] = cell_and_sizes
+        self.embeds.move_to_end(tyne_file_name)
+        while len(self.embeds) > EMBED_CACHE_MAX_TYNES:
+            dropped, _ = self.embeds.popitem(last=False)
+            self.rendered_cells.pop(dropped, None)
+
+    def on_save(self, tyne_file_name: str, content: TyneContent) -> None:
+        """TyneStorer save listener: re-render the images of this tyne that have been
+        requested before, but only those whose figure changed."""
+        self.embeds.pop(tyne_file_name, None)
+        if tyne_file_name not in self.rendered_cells or content.optional_sheets is None:
+            return
+        for cell_id, format in self.rendered_cells[tyne_file_name]:
+            cell, width, height = cells_and_sizes(content.optional_sheets, cell_id)
+            fig_dict = figure_for_cell(cell)
+            if fig_dict is None:
+                continue
+            key = render_key(fig_dict, width, height, format)
+            if key in self.images or key in self.rendering:
+                continue
+            task = asyncio.create_task(
+                self.render(fig_dict, width, height, format, key)
+            )
+            self.pending_renders.add(task)
+            task.add_done_callback(self.pending_renders.discard)
+
+
+async def render_cell(
+    cell: SheetCell | None,
+    width: int,
+    height: int,
+    format: str,
+    http_client: aiohttp.ClientSession | None = None,
+    return_place_holder: bool = True,
+    render_cache: RenderCache | None = None,
+) -> bytes:
+    fig_dict = figure_for_cell(cell)
+    if fig_dict is not None:
+        if render_cache is not None:
+            return await render_cache.render(fig_dict, width, height, format)
+        return plotly_to_image(fig_dict, width, height, format)
     if return_place_holder:
         assert http_client
         resp = await http_client.get("https://app.neptyne.com/img/preview.png")
@@ -224,8 +390,11 @@ class MetaTagProxyHandler(SessionMixin, web.RequestHandler, HTTPClientSessionMix
 
 
 class TyneEmbedHandler(SessionMixin, web.RequestHandler, HTTPClientSessionMixin):
-    def initialize(self, tyne_contents_manager: TyneContentsManager) -> None:
+    def initialize(
+        self, tyne_contents_manager: TyneContentsManager, render_cache: RenderCache
+    ) -> None:
         self.tyne_contents_manager = tyne_contents_manager
+        self.render_cache = render_cache
 
     async def get(
         self,
@@ -256,15 +425,40 @@ class TyneEmbedHandler(SessionMixin, web.RequestHandler, HTTPClientSessionMixin)
             except NoSuchTyneError:
                 raise web.HTTPError(404, "Tyne not found")
 
-            tyne_content = await self.tyne_contents_manager.tyne_store.load(
-                tyne_id, self.session
+            cell_and_sizes = self.render_cache.get_cell(
+                tyne_id, tyne.last_modified, cell_id
             )
+            if cell_and_sizes is None:
+                tyne_content = await self.tyne_contents_manager.tyne_store.load(
+                    tyne_id, self.session
+                )
+                cell_and_sizes = cells_and_sizes(tyne_content.sheets, cell_id)
+                self.render_cache.put_cell(
+                    tyne_id, tyne.last_modified, cell_id, cell_and_sizes
+                )
+            cell, width, height = cell_and_sizes
 
             if format == "png":
                 self.set_header("Content-Type", "image/" + format)
+                fig_dict = figure_for_cell(cell)
+                if fig_dict is not None:
+                    key = render_key(fig_dict, width, height, format)
+                    self.set_header("Etag", f'"{key}"')
+                    if self.check_etag_header():
+                        self.set_status(304)
+                        await self.finish()
+                        return
+                    self.render_cache.rendered_cells.setdefault(tyne_id, set()).add(
+                        (cell_id, format)
+                    )
                 http_client = await self.get_http_client()
                 img = await render_cell(
-                    tyne_content.sheets, cell_id, format, http_client
+                    cell,
+                    width,
+                    height,
+                    format,
+                    http_client,
+                    render_cache=self.render_cache,
                 )
                 await self.finish(img)
                 return
@@ -274,7 +468,7 @@ class TyneEmbedHandler(SessionMixin, web.RequestHandler, HTTPClientSessionMixin)
             embed_url = domain + "/embed/" + tyne_id
 
             width, height, content = get_embed_content(
-                tyne_content.sheets, cell_id, tyne_url, max_width, max_height
+                cell, width, height, tyne_url, max_width, max_height
             )
 
             if not content:
@@ -1,7 +1,16 @@
+import asyncio
 import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from server.publish import META_TAG_REGEX
+import pytest
+
+from neptyne_kernel.cell_address import Address
+from neptyne_kernel.tyne_model.cell import SheetCell
+from neptyne_kernel.tyne_model.jupyter_notebook import Output, OutputType
+from neptyne_kernel.widgets.output_widgets import PLOTLY_MIME_TYPE
+from server.publish import META_TAG_REGEX, RenderCache, cells_and_sizes, render_cell
+from server.tyne_content import TyneContent
 
 
 def test_regex_matches_index_html():
@@ -10,3 +19,64 @@ def test_regex_matches_index_html():
     ).read_text()
     matches = re.findall(META_TAG_REGEX, index_html)
     assert len(matches) == 15
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self) -> None:
+        super().__init__(max_workers=2)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+def plot_content(y: list[int]) -> TyneContent:
+    content = TyneContent.empty()
+    addr = Address.from_a1("A1")
+    output = Output(
+        data={PLOTLY_MIME_TYPE: {"data": [{"type": "bar", "y": y}], "layout": {}}},  # type: ignore
+        execution_count=None,
+        metadata=None,
+        output_type=OutputType.EXECUTE_RESULT,
+        name=None,
+        text=None,
+        ename=None,
+        evalue=None,
+        traceback=None,
+    )
+    content.sheets.sheets[0].cells[addr] = SheetCell(cell_id=addr, output=output)
+    return content
+
+
+@pytest.mark.asyncio
+async def test_render_cache():
+    executor = CountingExecutor()
+    cache = RenderCache(executor)
+    content = plot_content([1, 2, 3])
+    cell, width, height = cells_and_sizes(content.sheets, "A1")
+
+    images = await asyncio.gather(
+        *(render_cell(cell, width, height, "png", render_cache=cache) for _ in range(5))
+    )
+    assert images[0].startswith(b"\x89PNG")
+    assert all(image == images[0] for image in images)
+    assert executor.submitted == 1
+    assert (
+        await render_cell(cell, width, height, "png", render_cache=cache) == images[0]
+    )
+    assert executor.submitted == 1
+
+    cache.rendered_cells["tyne"] = {("A1", "png")}
+    # A save that doesn't change the figure doesn't render:
+    cache.on_save("tyne", plot_content([1, 2, 3]))
+    assert not cache.pending_renders
+
+    changed = plot_content([3, 2, 1])
+    cache.on_save("tyne", changed)
+    await asyncio.gather(*cache.pending_renders)
+    assert executor.submitted == 2
+    cell, width, height = cells_and_sizes(changed.sheets, "A1")
+    await render_cell(cell, width, height, "png", render_cache=cache)
+    assert executor.submitted == 2
+    executor.shutdown()
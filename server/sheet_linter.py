@@ -29,6 +29,7 @@ from tiktoken import Encoding
 from tornado.web import HTTPError, RequestHandler
 
 from neptyne_kernel.cell_address import Address
+from server import metrics
 
 DO_UPLOADS = True
 
@@ -316,8 +317,8 @@ async def excel_to_grids(
     if executor is None:
         with ProcessPoolExecutor() as executor:
             return await excel_to_grids(blob_or_filename, executor=executor)
-    return await asyncio.get_running_loop().run_in_executor(
-        executor, exec_excel_to_grids, blob_or_filename
+    return await metrics.run_in_executor(
+        executor, "sheet_linter", exec_excel_to_grids, blob_or_filename
     )
 
 
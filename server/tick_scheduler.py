@@ -0,0 +1,210 @@
+import asyncio
+import heapq
+import logging
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from server.metrics import TICK_LATENESS_SECONDS, TICKS_SCHEDULED
+from server.models import Tyne as TyneModel
+
+logger = logging.getLogger(__name__)
+
+# How far ahead of the clock we pull scheduled ticks from the database:
+LOOKAHEAD_SECONDS = 120
+# How often we go back to the database for ticks that moved into the lookahead window:
+REFILL_INTERVAL_SECONDS = 30
+# Ticks read from the database per query:
+REFILL_BATCH_SIZE = 1000
+# A tyne that ticked is expected to save a new next_tick. If it doesn't (the tick failed
+# or the save got lost), try again after this long, like the old once-a-minute scan did:
+RETRY_SECONDS = 60
+# How often we look for ticks that are due but were never scheduled, because they were
+# written by another server or without going through schedule():
+OVERDUE_SCAN_INTERVAL_SECONDS = 60
+MAX_CONCURRENT_TICKS = 16
+
+
+class TickScheduler:
+    """Keeps the upcoming ticks of the tynes owned by this shard in a heap and fires
+    each one when it is due.
+
+    The heap is fed incrementally: refill() pages through the tynes with a next_tick
+    that moved into the lookahead window since the last refill, using the next_tick
+    index, and saves call schedule() so that ticks set within the window that was
+    already read are picked up without going back to the database. Ticks written
+    behind the window some other way are caught by rescan_overdue() once they are due.
+    At most max_concurrent ticks run at once; the rest wait their turn in order.
+    """
+
+    def __init__(
+        self,
+        is_owner_shard: Callable[[str], bool],
+        *,
+        clock: Callable[[], float] = time.time,
+        max_concurrent: int = MAX_CONCURRENT_TICKS,
+        lookahead: float = LOOKAHEAD_SECONDS,
+        batch_size: int = REFILL_BATCH_SIZE,
+    ) -> None:
+        self.is_owner_shard = is_owner_shard
+        self.clock = clock
+        self.lookahead = lookahead
+        self.batch_size = batch_size
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+
+        self.heap: list[tuple[float, str]] = []
+        self.scheduled: dict[str, float] = {}
+        self.loaded_until: tuple[int, int] = (0, 0)  # (next_tick, id) read so far
+        self.running: set[asyncio.Task] = set()
+        self.wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self.scheduled)
+
+    def schedule(self, tyne_file_name: str, next_tick: float | None) -> None:
+        if not next_tick or not self.is_owner_shard(tyne_file_name):
+            self.unschedule(tyne_file_name)
+            return
+        previous = self.scheduled.get(tyne_file_name)
+        if previous == next_tick:
+            return
+        self.scheduled[tyne_file_name] = next_tick
+        heapq.heappush(self.heap, (next_tick, tyne_file_name))
+        TICKS_SCHEDULED.set(len(self.scheduled))
+        if previous is None or next_tick < previous:
+            self.wakeup.set()
+
+    def unschedule(self, tyne_file_name: str) -> None:
+        # The heap entry stays behind and is skipped when it comes up:
+        if self.scheduled.pop(tyne_file_name, None) is not None:
+            TICKS_SCHEDULED.set(len(self.scheduled))
+
+    def refill(self, session: Session) -> int:
+        """Read the ticks that came into the lookahead window since the last refill.
+        Returns the number of ticks scheduled."""
+        horizon = int(self.clock() + self.lookahead)
+        count = 0
+        while True:
+            last_tick, last_id = self.loaded_until
+            if last_tick >= horizon:
+                break
+            statement = (
+                select(TyneModel.id, TyneModel.file_name, TyneModel.next_tick)
+                .filter(
+                    or_(
+                        TyneModel.next_tick > last_tick,
+                        and_(TyneModel.next_tick == last_tick, TyneModel.id > last_id),
+                    )
+                )
+                .filter(TyneModel.next_tick <= horizon)
+                .order_by(TyneModel.next_tick, TyneModel.id)
+                .limit(self.batch_size)
+            )
+            rows = session.execute(statement).all()
+            for tyne_id, file_name, next_tick in rows:
+                if self.is_owner_shard(file_name):
+                    self.schedule(file_name, next_tick)
+                    count += 1
+            if len(rows) < self.batch_size:
+                self.loaded_until = (horizon, 0)
+                break
+            self.loaded_until = (rows[-1].next_tick, rows[-1].id)
+        return count
+
+    def rescan_overdue(self, session: Session) -> int:
+        """Schedule the ticks that are due but not scheduled. Returns their number."""
+        now = int(self.clock())
+        count = 0
+        last_id = 0
+        while True:
+            statement = (
+                select(TyneModel.id, TyneModel.file_name, TyneModel.next_tick)
+                .filter(TyneModel.next_tick <= now, TyneModel.id > last_id)
+                .order_by(TyneModel.id)
+                .limit(self.batch_size)
+            )
+            rows = session.execute(statement).all()
+            for tyne_id, file_name, next_tick in rows:
+                if file_name not in self.scheduled and self.is_owner_shard(file_name):
+                    self.schedule(file_name, next_tick)
+                    count += 1
+            if len(rows) < self.batch_size:
+                return count
+            last_id = rows[-1].id
+
+    def seconds_until_next(self) -> float | None:
+        self._drop_stale()
+        if not self.heap:
+            return None
+        return max(0.0, self.heap[0][0] - self.clock())
+
+    def pop_due(self) -> list[str]:
+        now = self.clock()
+        due = []
+        while True:
+            self._drop_stale()
+            if not self.heap or self.heap[0][0] > now:
+                return due
+            when, tyne_file_name = heapq.heappop(self.heap)
+            TICK_LATENESS_SECONDS.observe(now - when)
+            # Until the tyne saves a new next_tick, assume the tick needs retrying:
+            self.scheduled[tyne_file_name] = now + RETRY_SECONDS
+            heapq.heappush(self.heap, (now + RETRY_SECONDS, tyne_file_name))
+            due.append(tyne_file_name)
+
+    def _drop_stale(self) -> None:
+        heap = self.heap
+        while heap and self.scheduled.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    def fire_due(self, fire: Callable[[str], Awaitable[None]]) -> list[asyncio.Task]:
+        """Start a task for every tick that is due. The tasks queue up on the
+        concurrency limit in the order they were due."""
+        tasks = []
+        for tyne_file_name in self.pop_due():
+            task = asyncio.create_task(self._fire(fire, tyne_file_name))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+            tasks.append(task)
+        return tasks
+
+    async def _fire(
+        self, fire: Callable[[str], Awaitable[None]], tyne_file_name: str
+    ) -> None:
+        async with self.semaphore:
+            try:
+                await fire(tyne_file_name)
+            except Exception:
+                logger.exception("tick failed for %s", tyne_file_name)
+
+    async def run(
+        self,
+        fire: Callable[[str], Awaitable[None]],
+        sessionmaker: Callable[[], Session],
+    ) -> None:
+        next_refill = 0.0
+        next_rescan = 0.0
+        while True:
+            if self.clock() >= next_refill:
+                try:
+                    with sessionmaker() as session:
+                        self.refill(session)
+                        if self.clock() >= next_rescan:
+                            self.rescan_overdue(session)
+                            next_rescan = self.clock() + OVERDUE_SCAN_INTERVAL_SECONDS
+                except Exception:
+                    logger.exception("failed to load scheduled ticks")
+                next_refill = self.clock() + REFILL_INTERVAL_SECONDS
+            self.fire_due(fire)
+
+            delay = next_refill - self.clock()
+            until_next = self.seconds_until_next()
+            if until_next is not None:
+                delay = min(delay, until_next)
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=max(delay, 0.01))
+            except asyncio.TimeoutError:
+                pass
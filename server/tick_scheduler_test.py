@@ -0,0 +1,185 @@
+import asyncio
+import random
+import time
+from contextlib import nullcontext, suppress
+
+import pytest
+from sqlalchemy import insert
+
+from .models import Tyne
+from .tick_scheduler import RETRY_SECONDS, TickScheduler
+from .tyne_contents_manager import shard_id
+
+START = 1_700_000_000
+
+
+class FakeClock:
+    def __init__(self, now: float = START) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_tick_scheduler_simulated_clock(dbsession):
+    rng = random.Random(42)
+    ticks = {f"tyne{i:05}": START + rng.randint(0, 3600) for i in range(10_000)}
+    dbsession.execute(
+        insert(Tyne),
+        [
+            {"file_name": file_name, "next_tick": next_tick}
+            for file_name, next_tick in ticks.items()
+        ],
+    )
+    owned = {
+        file_name: next_tick
+        for file_name, next_tick in ticks.items()
+        if shard_id(file_name, 2) == 0
+    }
+
+    clock = FakeClock()
+    scheduler = TickScheduler(
+        lambda file_name: shard_id(file_name, 2) == 0,
+        clock=clock,
+        max_concurrent=4,
+        batch_size=500,
+    )
+
+    fired: dict[str, float] = {}
+    active = 0
+    max_active = 0
+
+    async def fire(file_name: str) -> None:
+        nonlocal active, max_active
+        active += 1
+        max_active = max(max_active, active)
+        assert file_name not in fired
+        fired[file_name] = clock()
+        await asyncio.sleep(0)
+        # The kernel saves when it is done, and this one has nothing left to do:
+        scheduler.schedule(file_name, 0)
+        active -= 1
+
+    queries = 0
+    execute = dbsession.execute
+
+    def counting_execute(*args, **kwargs):
+        nonlocal queries
+        queries += 1
+        return execute(*args, **kwargs)
+
+    dbsession.execute = counting_execute
+
+    next_refill = clock.now
+    while clock.now <= START + 3600 + 1:
+        if clock.now >= next_refill:
+            scheduler.refill(dbsession)
+            # The window we hold in memory never covers more than the lookahead:
+            assert len(scheduler) <= len(owned)
+            next_refill += 30
+        await asyncio.gather(*scheduler.fire_due(fire))
+        clock.now += 0.25
+
+    assert fired.keys() == owned.keys()
+    assert all(0 <= fired[name] - owned[name] < 1 for name in owned)
+    assert max_active == 4
+    # Each refill only reads what moved into the window, not every scheduled tyne:
+    assert queries < 3600 / 30 + len(ticks) / 500 + 10
+    assert len(scheduler) == 0
+
+
+@pytest.mark.asyncio
+async def test_tick_scheduler_schedule_on_save(dbsession):
+    clock = FakeClock()
+    scheduler = TickScheduler(lambda file_name: file_name != "other", clock=clock)
+    fired = []
+
+    async def fire(file_name: str) -> None:
+        fired.append(file_name)
+
+    scheduler.schedule("a", START + 10)
+    scheduler.schedule("b", START + 5)
+    scheduler.schedule("other", START + 1)
+    scheduler.schedule("b", START + 20)
+    assert len(scheduler) == 2
+    assert scheduler.seconds_until_next() == 10
+
+    clock.now = START + 10
+    await asyncio.gather(*scheduler.fire_due(fire))
+    assert fired == ["a"]
+    # Until a saves its next tick, it is retried:
+    assert scheduler.scheduled["a"] == START + 10 + RETRY_SECONDS
+
+    # a's kernel saves that it has no more ticks, b got moved out:
+    scheduler.schedule("a", 0)
+    scheduler.unschedule("b")
+    clock.now = START + 100
+    await asyncio.gather(*scheduler.fire_due(fire))
+    assert fired == ["a"]
+    assert len(scheduler) == 0
+    assert scheduler.seconds_until_next() is None
+
+
+@pytest.mark.asyncio
+async def test_tick_scheduler_rescans_overdue_ticks(dbsession):
+    clock = FakeClock()
+    scheduler = TickScheduler(lambda file_name: file_name != "other", clock=clock)
+    scheduler.refill(dbsession)
+
+    # Written by another server, behind the window that was already read:
+    dbsession.execute(
+        insert(Tyne),
+        [
+            {"file_name": "elsewhere", "next_tick": START + 10},
+            {"file_name": "other", "next_tick": START + 10},
+            {"file_name": "later", "next_tick": START + 100},
+        ],
+    )
+    scheduler.refill(dbsession)
+    assert len(scheduler) == 0
+    assert scheduler.rescan_overdue(dbsession) == 0
+
+    clock.now = START + 10
+    scheduler.refill(dbsession)
+    assert scheduler.rescan_overdue(dbsession) == 1
+    assert scheduler.scheduled == {"elsewhere": START + 10}
+    fired = []
+
+    async def fire(file_name: str) -> None:
+        fired.append(file_name)
+
+    await asyncio.gather(*scheduler.fire_due(fire))
+    assert fired == ["elsewhere"]
+    # Waiting for its retry, so not scheduled again:
+    assert scheduler.rescan_overdue(dbsession) == 0
+
+
+@pytest.mark.asyncio
+async def test_tick_scheduler_run(dbsession):
+    scheduler = TickScheduler(lambda file_name: True)
+    fired = {}
+
+    async def fire(file_name: str) -> None:
+        fired[file_name] = time.time()
+
+    runner = asyncio.create_task(scheduler.run(fire, lambda: nullcontext(dbsession)))
+    try:
+        await asyncio.sleep(0.05)
+        # Scheduling wakes the loop up, it doesn't wait for the next refill:
+        due = time.time() + 0.2
+        scheduler.schedule("soon", due)
+        await asyncio.sleep(0.5)
+    finally:
+        runner.cancel()
+        with suppress(asyncio.CancelledError):
+            await runner
+    assert 0 <= fired["soon"] - due < 0.1
+
+
+@pytest.mark.asyncio
+async def test_tick_scheduler_fed_by_storer(tyne_contents_manager):
+    scheduler = tyne_contents_manager.tick_scheduler
+    for listener in tyne_contents_manager.tyne_store.next_tick_listeners:
+        listener("saved", START)
+    assert scheduler.scheduled == {"saved": START}
@@ -8,7 +8,7 @@ from datetime import datetime
 from functools import partial
 from typing import Any, Awaitable, Callable, Literal
 
-from sqlalchemy import null, select, true, update
+from sqlalchemy import null, true, update
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.orm import Query, Session
 
@@ -33,6 +33,7 @@ from server.models import (
 from server.models import Tyne as TyneModel
 from server.neptyne_kernel_service import NeptyneKernelService
 from server.proxied_tyne import ProxiedTyne
+from server.tick_scheduler import TickScheduler
 from server.tyne_content import (
     TyneContent,
     TyneModelWithContent,
@@ -45,6 +46,12 @@ from server.tyne_info import (
 )
 from server.tyne_storer import TyneStorer
 
+# How long an access level is reused before checking the database again. Sharing changes
+# made through this server invalidate it right away; this bounds the delay for changes
+# made on other shards or to organization membership.
+ACCESS_LEVEL_TTL_SECONDS = 30
+MAX_CACHED_ACCESS_LEVELS = 10_000
+
 
 def shard_id(tyne_file_name: str, num_shards: int) -> int:
     return hashlib.md5(tyne_file_name.encode()).digest()[0] % num_shards
@@ -72,9 +79,51 @@ class TyneContentsManager(TyneImportMixin, TyneExportMixin):
         self.shard_index = shard_index
         self.num_shards = num_shards
 
+        self.access_levels: dict[
+            str, dict[tuple[Any, bool, str | None], tuple[AccessLevel | None, float]]
+        ] = {}
+
+        self.tick_scheduler = TickScheduler(self.is_owner_shard)
+        tyne_store.next_tick_listeners.append(self.tick_scheduler.schedule)
+
     def is_owner_shard(self, tyne_file_name: str) -> bool:
         return shard_id(tyne_file_name, self.num_shards) == self.shard_index
 
+    def get_access_level(
+        self,
+        tyne_file_name: str,
+        session: Session,
+        user: User | NonUser,
+        is_gsheet_tyne: bool = False,
+        api_key: str | None = None,
+    ) -> AccessLevel | None:
+        """get_tyne_access_level, remembered per tyne and user for
+        ACCESS_LEVEL_TTL_SECONDS"""
+        user_key = user.id if isinstance(user, User) else user
+        key = (user_key, is_gsheet_tyne, api_key)
+        now = time.monotonic()
+        cached = self.access_levels.get(tyne_file_name, {}).get(key)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+
+        access_level = get_tyne_access_level(
+            tyne_file_name, session, user, is_gsheet_tyne, api_key
+        )
+        if len(self.access_levels) >= MAX_CACHED_ACCESS_LEVELS:
+            self.access_levels = {
+                file_name: live
+                for file_name, levels in self.access_levels.items()
+                if (live := {k: v for k, v in levels.items() if v[1] > now})
+            }
+        self.access_levels.setdefault(tyne_file_name, {})[key] = (
+            access_level,
+            now + ACCESS_LEVEL_TTL_SECONDS,
+        )
+        return access_level
+
+    def invalidate_access_levels(self, tyne_file_name: str) -> None:
+        self.access_levels.pop(tyne_file_name, None)
+
     async def disable_tick(
         self,
         session: Session,
@@ -84,6 +133,7 @@ class TyneContentsManager(TyneImportMixin, TyneExportMixin):
         if not self.is_owner_shard(tyne_file_name):
             raise WrongShardError()
 
+        self.tick_scheduler.unschedule(tyne_file_name)
         if tyne_proxy := self.tynes.get(tyne_file_name):
             tyne_proxy.disconnect()
             tyne_proxy.disconnect_clients()
@@ -98,63 +148,59 @@ class TyneContentsManager(TyneImportMixin, TyneExportMixin):
         session.execute(statement)
         session.commit()
 
-    async def tick(
-        self, session: Session, kernel_manager: NeptyneKernelService
+    async def tick_tyne(
+        self,
+        session: Session,
+        kernel_manager: NeptyneKernelService,
+        tyne_file_name: str,
     ) -> None:
-        async def load_content(tyne_id: str) -> TyneInitializationData:
-            model = (
-                session.query(TyneModel).filter(TyneModel.file_name == tyne_id).one()
-            )
-            tyne_content = await self.tyne_store.load(tyne_id, session)
+        async def load_content() -> TyneInitializationData:
+            tyne_content = await self.tyne_store.load(tyne_file_name, session)
             return get_initialization_payload(
                 model,
                 tyne_content,
-                shard_id(tyne_id, self.num_shards),
+                shard_id(tyne_file_name, self.num_shards),
             )
 
-        tynes_to_tick = self.load_tynes_to_tick(session)
-
-        tick_futures = []
-        for tyne_file_name in tynes_to_tick:
-            tick_futures.append(
-                self.tynes[tyne_file_name].tick(
-                    partial(load_content, tyne_file_name), kernel_manager
-                )
+        model = (
+            session.query(TyneModel).filter(TyneModel.file_name == tyne_file_name).one()
+        )
+        if tyne_file_name not in self.tynes:
+            self.tynes[tyne_file_name] = ProxiedTyne(
+                model,
+                tyne_storer=self.tyne_store,
+                kernel_name=self.kernel_name,
             )
+        try:
+            await self.tynes[tyne_file_name].tick(load_content, kernel_manager)
+        except Exception as e:
+            print(f"tick error in tyne : {tyne_file_name}", e, file=sys.stderr)
+            # TODO: notify the user?
+            await self.disable_tick(session, tyne_file_name, kernel_manager)
 
-        results = await asyncio.gather(*tick_futures, return_exceptions=True)
-        for tyne_file_name, result in zip(tynes_to_tick, results):
-            if isinstance(result, Exception):
-                print(
-                    f"tick error in tyne : {tyne_file_name}",
-                    result,
-                    file=sys.stderr,
-                )
-                # TODO: notify the user?
-                await self.disable_tick(session, tyne_file_name, kernel_manager)
-
-    def load_tynes_to_tick(self, session: Session) -> list[str]:
-        statement = (
-            select(TyneModel)
-            .filter(TyneModel.next_tick > 0)
-            .filter(TyneModel.next_tick < time.time() + 120)
+    async def tick(
+        self, session: Session, kernel_manager: NeptyneKernelService
+    ) -> None:
+        """Fire the ticks that are due now. The server uses run_tick_scheduler instead,
+        which also fires ticks that come due in between."""
+        self.tick_scheduler.refill(session)
+        self.tick_scheduler.rescan_overdue(session)
+        await asyncio.gather(
+            *self.tick_scheduler.fire_due(
+                partial(self.tick_tyne, session, kernel_manager)
+            )
         )
 
-        to_tick = []
+    async def run_tick_scheduler(
+        self,
+        sessionmaker: Callable[[], Session],
+        kernel_manager: NeptyneKernelService,
+    ) -> None:
+        async def fire(tyne_file_name: str) -> None:
+            with sessionmaker() as session:
+                await self.tick_tyne(session, kernel_manager, tyne_file_name)
 
-        for (tyne_model,) in session.execute(statement):
-            if not self.is_owner_shard(tyne_model.file_name):
-                continue
-            if tyne_model.file_name not in self.tynes:
-                tyne_info = ProxiedTyne(
-                    tyne_model,
-                    tyne_storer=self.tyne_store,
-                    kernel_name=self.kernel_name,
-                )
-                self.tynes[tyne_model.file_name] = tyne_info
-            print("queueing", tyne_model.file_name, "for tick")
-            to_tick.append(tyne_model.file_name)
-        return to_tick
+        await self.tick_scheduler.run(fire, sessionmaker)
 
     async def new_db_model(
         self, session: Session, user: User | None, file_name: str | None = None
@@ -176,6 +222,8 @@ class TyneContentsManager(TyneImportMixin, TyneExportMixin):
                 ).scalar()
                 if not exists:
                     break
+        # Someone may have been refused access to this name before it existed:
+        self.invalidate_access_levels(file_name)
         model = TyneModel(
             file_name=file_name,
             version=TYNE_PROTOCOL_VERSION,
@@ -231,9 +279,9 @@ class TyneContentsManager(TyneImportMixin, TyneExportMixin):
     ) -> ProxiedTyne | None:
         tyne_proxy = self.tynes.get(tyne_file_name)
         if tyne_proxy:
-            # it exists in the cache, but hit the database to make sure the user has access
+            # it exists in the cache, but make sure the user has access
             if (
-                get_tyne_access_level(
+                self.get_access_level(
                     tyne_file_name,
                     session,
                     user,
@@ -274,6 +322,8 @@ class TyneContentsManager(TyneImportMixin, TyneExportMixin):
 
         tyne_model.file_name = new_file_name
         session.commit()
+        self.invalidate_access_levels(old_file_name)
+        self.invalidate_access_levels(new_file_name)
 
         if old_tyne := self.tynes.get(old_file_name):
             old_tyne.disconnect()
@@ -341,6 +391,7 @@ class TyneContentsManager(TyneImportMixin, TyneExportMixin):
         set_tyne_property(model, "copied_from", tyne_id)
         session.add(model)
         session.commit()
+        self.tick_scheduler.schedule(model.file_name, model.next_tick)
         return new_tyne
 
     async def delete_tyne(self, session: Session, file_name: str, user: User) -> None:
@@ -364,6 +415,7 @@ class TyneContentsManager(TyneImportMixin, TyneExportMixin):
         session.query(EmailShare).filter(EmailShare.tyne_id == tyne_id).delete()
         session.query(TyneSecrets).filter(TyneSecrets.tyne_id == tyne_id).delete()
         session.query(TyneModel).filter(TyneModel.id == tyne_id).delete()
+        self.invalidate_access_levels(file_name)
 
     def get_tyne_property(self, tyne: TyneModel, key: str, default_value: Any) -> Any:
         return (
@@ -440,6 +492,7 @@ class TyneContentsManager(TyneImportMixin, TyneExportMixin):
         for record in existing_shares.values():
             session.delete(record)
 
+        self.invalidate_access_levels(tyne.file_name)
         return emails_to_send
 
     async def prepare_for_shutdown(self, timeout: float = 30) -> None:
@@ -6,6 +6,7 @@ import openpyxl
 import pytest
 from google.auth.credentials import AnonymousCredentials
 from gspread.exceptions import APIError
+from sqlalchemy import event
 from tornado.web import HTTPError
 
 from neptyne_kernel.cell_address import Address
@@ -147,6 +148,65 @@ async def test_sharing(tyne_contents_manager, dbsession):
     )
 
 
+@pytest.mark.asyncio
+async def test_access_level_cache(tyne_contents_manager, dbsession):
+    user = mock_user()
+    tyne = (await tyne_contents_manager.new_tyne(dbsession, user)).tyne_model
+
+    other = User(
+        firebase_users=[FirebaseUser(firebase_uid="other.uid")],
+        name="Other",
+        email="other@neptyne.com",
+    )
+    other.tyne_owner = TyneOwner(handle=other.email)
+    dbsession.add(other)
+    dbsession.commit()
+
+    queries = []
+
+    def count_query(*args):
+        queries.append(args[2])
+
+    event.listen(dbsession.get_bind(), "before_cursor_execute", count_query)
+
+    assert (
+        tyne_contents_manager.get_access_level(tyne.file_name, dbsession, other) is None
+    )
+    assert queries
+    queries.clear()
+    for _ in range(10):
+        assert (
+            tyne_contents_manager.get_access_level(tyne.file_name, dbsession, other)
+            is None
+        )
+    event.remove(dbsession.get_bind(), "before_cursor_execute", count_query)
+    assert queries == []
+
+    tyne_contents_manager.share_tyne(
+        tyne,
+        dbsession,
+        TyneShareResponse(
+            description="",
+            is_app=False,
+            shares=[
+                ShareRecord(
+                    access_level=ClientAccessLevel.EDIT, email=other.email, name=None
+                )
+            ],
+            users=[],
+            general_access_level=None,
+            general_access_scope=None,
+            share_message=None,
+            team_name=None,
+        ),
+    )
+    dbsession.commit()
+    assert (
+        tyne_contents_manager.get_access_level(tyne.file_name, dbsession, other)
+        == AccessLevel.EDIT
+    )
+
+
 @pytest.mark.asyncio
 async def test_import_tyne_json(dbsession, tyne_contents_manager):
     user = mock_user()
@@ -709,6 +769,7 @@ async def test_copy_tyne(tyne_contents_manager, dbsession):
     user = mock_user()
     source_tyne = (await tyne_contents_manager.new_tyne(dbsession, user)).tyne_model
     source_tyne.notebooks[0].requirements = "numpy"
+    source_tyne.next_tick = 1_700_000_000
     dbsession.add(source_tyne)
 
     model = (
@@ -716,6 +777,10 @@ async def test_copy_tyne(tyne_contents_manager, dbsession):
             dbsession, source_tyne.file_name, None, user
         )
     ).tyne_model
+    # The copy ticks too, without waiting for the scheduler to find it:
+    assert tyne_contents_manager.tick_scheduler.scheduled[model.file_name] == (
+        1_700_000_000
+    )
     assert model.notebooks[0].contents == source_tyne.notebooks[0].contents
     assert model.sheets[0].contents == source_tyne.sheets[0].contents
     assert model.name == source_tyne.name + " (copy)"
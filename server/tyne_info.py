@@ -61,6 +61,7 @@ from neptyne_kernel.tyne_model.kernel_init_data import (
 )
 from neptyne_kernel.tyne_model.table_for_ai import TableForAI
 
+from . import metrics
 from .codeassist import (
     ReplCodeAssistReply,
     ai_history,
@@ -180,6 +181,9 @@ class KernelSubscriber:
     user_name: str
     user_profile_image: str
     close: Callable
+    # Called with a SharedMessage instead of on_kernel_msg, if set, so that the message
+    # is serialized once for all the subscribers:
+    on_shared_msg: Callable | None = None
 
     def to_json(self) -> dict[str, str]:
         return {
@@ -852,7 +856,8 @@ class TyneInfo:
             | None
         ) = None,
     ) -> None:
-        deadline = time.monotonic() + init_timeout
+        start = time.monotonic()
+        deadline = start + init_timeout
         async with self.connect_lock:
             if self.kernel_client is not None:
                 if update_subscriber:
@@ -944,6 +949,10 @@ class TyneInfo:
                 await kernel_manager.shutdown_kernel(self.file_name)
                 raise
 
+            metrics.KERNEL_STARTUP_SECONDS.observe(
+                time.monotonic() - start, for_tick=for_tick
+            )
+
     def stop_heartbeat(self) -> None:
         if self.heartbeat_task and not self.heartbeat_task.cancelled():
             self.heartbeat_task.cancel()
@@ -1,27 +1,30 @@
-import asyncio
 import json
 import math
 from concurrent.futures import Executor, ProcessPoolExecutor
 from datetime import datetime
 from multiprocessing import cpu_count, get_context
-from typing import Any
+from typing import Any, Callable
 
 from sqlalchemy.orm import Session
 
 from neptyne_kernel.json_tools import dict_from_bytes
 from neptyne_kernel.tyne_model.cell import NotebookCell
 from neptyne_kernel.tyne_model.events import Event
+from neptyne_kernel.tyne_model.kernel_init_data import decode_sheet_cells
 from neptyne_kernel.tyne_model.save_message import (
     V1DashSaveMessage,
     json_encode,
     tyne_content_dict,
 )
 from neptyne_kernel.tyne_model.sheet import TyneSheets
+from server import metrics
 from server import models as orm
 from server.blob_store import BlobStore, LocalFileStore
 from server.models import db, set_tyne_property
 from server.tyne_content import TyneContent, tyne_sheets_from_orm_model
 
+STORER_EXECUTOR = "tyne_storer"
+
 
 def init_db_subprocess(config: dict[str, str]) -> None:
     orm.db.engine.dispose(close=False)
@@ -46,6 +49,9 @@ def blob_to_sheets(
                 message.graph,
             )
         )
+        for sheet_id, block in message.lazy_sheets.items():
+            if sheet := sheets.sheets.get(sheet_id):
+                sheet.cells.update(decode_sheet_cells(block))
         return sheets, message.next_tick
     else:
         raise ValueError("Unknown sheets_blob_version %s" % version)
@@ -58,7 +64,7 @@ def decode_and_save(
     notebook_cells: list[NotebookCell],
     events: list[Event] | None,
     min_next_tick: int = 0,
-) -> TyneContent:
+) -> tuple[TyneContent, float | None]:
     sheets, next_tick = blob_to_sheets(sheets_blob, sheets_blob_version)
     if next_tick:
         next_tick = max(min_next_tick, next_tick)
@@ -68,7 +74,7 @@ def decode_and_save(
         optional_events=None if events is None else events,
     )
     save_to_db(tyne_file_name, content, next_tick, requirements=None)
-    return content
+    return content, next_tick
 
 
 def save_to_db(
@@ -128,6 +134,10 @@ class TyneStorer:
 
         self.executor = executor
         self.blob_store = blob_store or LocalFileStore()
+        # Called with the file name and the new next_tick whenever a save changes it:
+        self.next_tick_listeners: list[Callable[[str, float], None]] = []
+        # Called with the file name and the content whenever the kernel saved the sheets:
+        self.save_listeners: list[Callable[[str, TyneContent], None]] = []
 
     async def decode_and_save(
         self,
@@ -139,25 +149,41 @@ class TyneStorer:
         events: list[Event] | None,
         min_next_tick: int = 0,
     ) -> None:
-        content = await asyncio.get_event_loop().run_in_executor(
-            self.executor,
-            decode_and_save,
-            tyne_file_name,
-            sheets_blob,
-            sheets_blob_version,
-            notebook_cells,
-            events,
-            min_next_tick,
-        )
-        if sheets_blob is not None and events is not None:
-            # Don't store in contents store if we're only updating the notebook cells:
-            await self.save_content_to_store(tyne_file_name, content)
+        if sheets_blob is not None:
+            metrics.TYNE_SAVE_BYTES.observe(len(sheets_blob))
+        with metrics.TYNE_SAVE_SECONDS.time():
+            content, next_tick = await metrics.run_in_executor(
+                self.executor,
+                STORER_EXECUTOR,
+                decode_and_save,
+                tyne_file_name,
+                sheets_blob,
+                sheets_blob_version,
+                notebook_cells,
+                events,
+                min_next_tick,
+            )
+            if next_tick is not None:
+                for listener in self.next_tick_listeners:
+                    listener(tyne_file_name, math.floor(next_tick))
+            if sheets_blob is not None:
+                for save_listener in self.save_listeners:
+                    save_listener(tyne_file_name, content)
+            if sheets_blob is not None and events is not None:
+                # Don't store in contents store if we're only updating the notebook cells:
+                await self.save_content_to_store(tyne_file_name, content)
 
     async def save(
         self, tyne_file_name: str, content: TyneContent, requirements: str | None = None
     ) -> None:
-        await asyncio.get_event_loop().run_in_executor(
-            self.executor, save_to_db, tyne_file_name, content, None, requirements
+        await metrics.run_in_executor(
+            self.executor,
+            STORER_EXECUTOR,
+            save_to_db,
+            tyne_file_name,
+            content,
+            None,
+            requirements,
         )
         await self.save_content_to_store(tyne_file_name, content)
 
@@ -193,8 +219,8 @@ class TyneStorer:
         return content
 
     async def set_tyne_property(self, tyne_id: int, key: str, value: Any) -> None:
-        await asyncio.get_event_loop().run_in_executor(
-            self.executor, exec_set_tyne_property, tyne_id, key, value
+        await metrics.run_in_executor(
+            self.executor, STORER_EXECUTOR, exec_set_tyne_property, tyne_id, key, value
         )
 
     def cleanup(self) -> None:
@@ -2,12 +2,15 @@ import pytest
 
 import server.models as orm
 from neptyne_kernel.cell_address import Address
+from neptyne_kernel.mime_handling import output_to_value
 from neptyne_kernel.neptyne_protocol import Severity
-from neptyne_kernel.tyne_model.cell import CellMetadata, NotebookCell
+from neptyne_kernel.tyne_model.cell import CellMetadata, NotebookCell, SheetCell
 from neptyne_kernel.tyne_model.dash_graph import DashGraph
+from neptyne_kernel.tyne_model.kernel_init_data import encode_sheet_cells
 from neptyne_kernel.tyne_model.save_message import V1DashSaveMessage
 from neptyne_kernel.tyne_model.sheet import TyneSheets
 from server.models import Event, Tyne
+from server.tyne_storer import blob_to_sheets
 from testing.seed_test_data import create_test_models
 
 
@@ -76,3 +79,23 @@ async def test_tyne_store(dbsession, tyne_store):
 
         assert saved2.events[0].message == "hello"
         assert saved2.sheets[0].contents[addr.to_cell_id()]["raw_code"] == "=1+1"
+
+
+def test_blob_to_sheets_lazy_sheets():
+    sheets = TyneSheets()
+    _, lazy_sheet = sheets.new_sheet("Lazy")
+    address = Address(0, 0, lazy_sheet.id)
+    lazy_sheet.cells[address] = SheetCell(cell_id=address, output=42)
+    block = encode_sheet_cells(lazy_sheet)
+    lazy_sheet.cells = {}
+
+    msg = V1DashSaveMessage(
+        sheets_without_cells=sheets,
+        cells={0: {Address(0, 0, 0): 1}},
+        cell_meta={},
+        graph=DashGraph(),
+        lazy_sheets={lazy_sheet.id: block},
+    )
+    loaded, _ = blob_to_sheets(msg.to_bytes(), V1DashSaveMessage.VERSION)
+    assert loaded.get(Address(0, 0, 0)).output == 1
+    assert output_to_value(loaded.get(address).output.data) == 42
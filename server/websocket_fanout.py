@@ -0,0 +1,312 @@
+"""Kernel messages go out to every browser that has the tyne open. Each message is
+serialized, and compressed for the websockets that negotiated permessage-deflate, once,
+and the bytes are shared by all the websockets it is sent to.
+
+Every websocket sends through a SendQueue. Messages that arrive within a few milliseconds
+of each other are written to the socket as one write. While the client hasn't read what
+was written to it yet, new messages wait in the queue, and a sheet update in the queue
+loses the cells that a later update changes again: a slow client skips values it would
+only have overwritten, instead of the server buffering every one of them.
+
+Writing frames directly to the socket relies on Tornado internals. With a version of
+Tornado that they aren't known for, or a connection that doesn't have them, the queue
+hands its messages to the connection's write_message instead, and Tornado compresses them
+for every websocket itself.
+
+Messages with buffers, like sheet updates with packed numbers, go out as binary frames in
+the format of jupyter_server, which the client's KernelConnection reads.
+"""
+
+import json
+import struct
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Callable, NamedTuple
+
+import tornado
+from tornado.ioloop import IOLoop
+from tornado.iostream import StreamClosedError
+from tornado.websocket import WebSocketClosedError, WebSocketProtocol
+
+from neptyne_kernel.json_tools import json_default
+from neptyne_kernel.neptyne_protocol import MessageTypes
+
+from . import metrics
+from .messages import (
+    BUFFERS_TAG,
+    CONTENT_TAG,
+    HEADER_TAG,
+    META_DATA_TAG,
+    MSG_TYPE_TAG,
+)
+
+COALESCE_SECONDS = 0.005
+# Bursts that get this big are written without waiting for the rest:
+COALESCE_BYTES = 64 * 1024
+# Unread bytes of a client beyond which new messages wait in its queue:
+MAX_PENDING_BYTES = 4 * 1024 * 1024
+# A client this far behind is disconnected; it loads the tyne again when it reconnects:
+MAX_QUEUED_BYTES = 64 * 1024 * 1024
+
+FIN = 0x80
+RSV1 = 0x40
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+
+
+class Deflate(NamedTuple):
+    level: int
+    wbits: int
+    mem_level: int
+
+
+def cell_key(cell: dict[str, Any] | list) -> Any:
+    cell_id = cell["cellId"] if isinstance(cell, dict) else cell[0]
+    return tuple(cell_id) if isinstance(cell_id, list) else cell_id
+
+
+class SharedMessage:
+    """A message for the websockets, serialized and compressed on first use"""
+
+    def __init__(self, msg: dict[str, Any]) -> None:
+        self.msg = msg
+        self._data: bytes | None = None
+        self._deflated: dict[Deflate, bytes] = {}
+        self._cell_keys: set[Any] | None = None
+
+    @classmethod
+    def from_kernel(cls, stream: Any, msg: dict[str, Any]) -> "SharedMessage":
+        msg[HEADER_TAG]["server_reply_at"] = datetime.now(timezone.utc).isoformat()
+        if channel := getattr(stream, "channel", None):
+            msg["channel"] = channel
+        return cls(msg)
+
+    @property
+    def has_buffers(self) -> bool:
+        return bool(self.msg.get(BUFFERS_TAG))
+
+    @property
+    def data(self) -> bytes:
+        if self._data is None:
+            if self.has_buffers:
+                self._data = serialize_binary_message(self.msg)
+            else:
+                self._data = json.dumps(self.msg, default=json_default).encode()
+        return self._data
+
+    def deflated(self, deflate: Deflate) -> bytes:
+        if (data := self._deflated.get(deflate)) is None:
+            # A new compressor for every message, so that any client can decompress it,
+            # whatever it was sent before:
+            compressor = zlib.compressobj(
+                deflate.level, zlib.DEFLATED, -deflate.wbits, deflate.mem_level
+            )
+            data = compressor.compress(self.data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            # permessage-deflate leaves out the empty block the sync flush ends with:
+            data = self._deflated[deflate] = data[:-4]
+        return data
+
+    def frame(self, deflate: Deflate | None) -> bytes:
+        opcode = OPCODE_BINARY if self.has_buffers else OPCODE_TEXT
+        if deflate is None:
+            return frame(self.data, opcode)
+        return frame(self.deflated(deflate), opcode | RSV1)
+
+    @property
+    def is_sheet_update(self) -> bool:
+        return self.msg[HEADER_TAG][MSG_TYPE_TAG] == MessageTypes.SHEET_UPDATE.value
+
+    @property
+    def cell_keys(self) -> set[Any]:
+        """The cells this sheet update changes, leaving out its packed cells, which stay
+        as they are"""
+        if self._cell_keys is None:
+            self._cell_keys = {
+                cell_key(cell) for cell in self.msg[CONTENT_TAG]["cellUpdates"]
+            }
+        return self._cell_keys
+
+    def without_cells(self, keys: set[Any]) -> "SharedMessage | None":
+        """This sheet update without the cells in keys, or None if nothing is left"""
+        cells = [
+            cell
+            for cell in self.msg[CONTENT_TAG]["cellUpdates"]
+            if cell_key(cell) not in keys
+        ]
+        # The undo of an update is still needed when all of its cells have changed since:
+        if not cells and not self.msg.get(META_DATA_TAG):
+            return None
+        return SharedMessage(
+            {**self.msg, CONTENT_TAG: {**self.msg[CONTENT_TAG], "cellUpdates": cells}}
+        )
+
+
+def frame(payload: bytes, flags: int) -> bytes:
+    """An unmasked frame, the way a server sends it. flags include the opcode."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("BB", FIN | flags, length)
+    elif length <= 0xFFFF:
+        header = struct.pack("!BBH", FIN | flags, 126, length)
+    else:
+        header = struct.pack("!BBQ", FIN | flags, 127, length)
+    return header + payload
+
+
+def serialize_binary_message(msg: dict[str, Any]) -> bytes:
+    """The number of parts, the offset of each part and then the parts: msg without its
+    buffers as JSON, followed by the buffers"""
+    parts = [
+        json.dumps(
+            {key: value for key, value in msg.items() if key != BUFFERS_TAG},
+            default=json_default,
+        ).encode(),
+        *(bytes(buffer) for buffer in msg[BUFFERS_TAG]),
+    ]
+    offsets = [4 * (len(parts) + 1)]
+    for part in parts[:-1]:
+        offsets.append(offsets[-1] + len(part))
+    return b"".join([struct.pack(f"!{len(parts) + 1}I", len(parts), *offsets), *parts])
+
+
+def deserialize_binary_message(data: bytes) -> dict[str, Any]:
+    (count,) = struct.unpack_from("!I", data)
+    offsets = [*struct.unpack_from(f"!{count}I", data, 4), len(data)]
+    parts = [data[start:end] for start, end in zip(offsets, offsets[1:])]
+    msg = json.loads(parts[0])
+    msg[BUFFERS_TAG] = parts[1:]
+    return msg
+
+
+# The versions of Tornado whose websocket internals SendQueue writes its frames past:
+RAW_FRAME_TORNADO_VERSIONS = {(6, 2), (6, 3), (6, 4)}
+COMPRESSOR_ATTRIBUTES = (
+    "_compressor",
+    "_compression_level",
+    "_max_wbits",
+    "_mem_level",
+)
+
+
+def writes_raw_frames(connection: WebSocketProtocol) -> bool:
+    """Whether frames can be written to the stream of connection directly, next to the
+    ones Tornado writes itself"""
+    if tornado.version_info[:2] not in RAW_FRAME_TORNADO_VERSIONS:
+        return False
+    if not callable(getattr(getattr(connection, "stream", None), "write", None)):
+        return False
+    if not hasattr(connection, "_compressor"):
+        return False
+    compressor = connection._compressor  # type: ignore
+    return compressor is None or all(
+        hasattr(compressor, attribute) for attribute in COMPRESSOR_ATTRIBUTES
+    )
+
+
+def shared_deflate(connection: WebSocketProtocol) -> Deflate | None:
+    """How messages to connection should be compressed, if at all. Stops Tornado from
+    compressing the messages it writes itself against the ones before them, since those
+    may have been written by a SendQueue. Only for connections writes_raw_frames allows."""
+    compressor = connection._compressor  # type: ignore
+    if compressor is None:
+        return None
+    # A server may always reset its compression context, whatever was negotiated:
+    compressor._compressor = None
+    return Deflate(
+        compressor._compression_level, compressor._max_wbits, compressor._mem_level
+    )
+
+
+class SendQueue:
+    def __init__(
+        self, connection: WebSocketProtocol, close: Callable[[], None]
+    ) -> None:
+        self.connection = connection
+        self.close_connection = close
+        self.raw_frames = writes_raw_frames(connection)
+        self.deflate = shared_deflate(connection) if self.raw_frames else None
+        self.queue: list[SharedMessage] = []
+        self.queued_bytes = 0
+        self.pending_bytes = 0
+        self.closed = False
+        self._timeout: object | None = None
+
+    def put(self, message: SharedMessage) -> None:
+        if self.closed:
+            return
+        if message.is_sheet_update and self.queue:
+            self.drop_superseded(message.cell_keys)
+        self.queue.append(message)
+        self.queued_bytes += len(message.data)
+        if self.queued_bytes > MAX_QUEUED_BYTES:
+            self.stop()
+            self.close_connection()
+        elif self.queued_bytes >= COALESCE_BYTES:
+            self.flush()
+        elif self._timeout is None:
+            self._timeout = IOLoop.current().call_later(COALESCE_SECONDS, self.flush)
+
+    def stop(self) -> None:
+        self.closed = True
+        self.queue = []
+        if self._timeout is not None:
+            IOLoop.current().remove_timeout(self._timeout)
+            self._timeout = None
+
+    def drop_superseded(self, keys: set[Any]) -> None:
+        queue = []
+        for queued in self.queue:
+            if queued.is_sheet_update and not keys.isdisjoint(queued.cell_keys):
+                self.queued_bytes -= len(queued.data)
+                dropped = len(queued.cell_keys & keys)
+                metrics.WEBSOCKET_DROPPED_CELL_UPDATES.inc(dropped)
+                if (pruned := queued.without_cells(keys)) is None:
+                    continue
+                queued = pruned
+                self.queued_bytes += len(queued.data)
+            queue.append(queued)
+        self.queue = queue
+
+    def flush(self, force: bool = False) -> None:
+        """Writes the queued messages, unless the client still has to read too much of
+        what was written before. force writes them anyway."""
+        if self._timeout is not None:
+            IOLoop.current().remove_timeout(self._timeout)
+            self._timeout = None
+        if self.closed or not self.queue:
+            return
+        if self.pending_bytes > MAX_PENDING_BYTES and not force:
+            # Tried again once the writes before are done:
+            return
+        queue = self.queue
+        self.queue = []
+        self.queued_bytes = 0
+        try:
+            if self.raw_frames:
+                data = b"".join(message.frame(self.deflate) for message in queue)
+                future = self.connection.stream.write(data)
+                size = len(data)
+            else:
+                # The protocol's own write_message, not the handler's, which flushes
+                # this queue:
+                for message in queue:
+                    future = self.connection.write_message(
+                        message.data, binary=message.has_buffers
+                    )
+                size = sum(len(message.data) for message in queue)
+        except (StreamClosedError, WebSocketClosedError):
+            self.closed = True
+            return
+        self.pending_bytes += size
+        metrics.WEBSOCKET_PENDING_BYTES.inc(size)
+        metrics.WEBSOCKET_SEND_BACKLOG.observe(self.pending_bytes)
+
+        def on_written(_future: Any) -> None:
+            self.pending_bytes -= size
+            metrics.WEBSOCKET_PENDING_BYTES.dec(size)
+            if _future.cancelled() or _future.exception() is not None:
+                self.closed = True
+            elif self.queue and self._timeout is None:
+                self.flush()
+
+        future.add_done_callback(on_written)
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import zlib
+
+import pytest
+import tornado.web
+import tornado.websocket
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+
+from neptyne_kernel.neptyne_protocol import MessageTypes
+
+from . import websocket_fanout
+from .websocket_fanout import Deflate, SendQueue, SharedMessage
+
+
+def message(msg_type: str, content: dict, metadata: dict | None = None) -> dict:
+    return {
+        "header": {"msg_type": msg_type},
+        "parent_header": {},
+        "metadata": metadata or {},
+        "content": content,
+    }
+
+
+def sheet_update(*cells: list, metadata: dict | None = None) -> SharedMessage:
+    return SharedMessage(
+        message(MessageTypes.SHEET_UPDATE.value, {"cellUpdates": [*cells]}, metadata)
+    )
+
+
+def test_deflated_messages_decompress_after_any_other():
+    deflate = Deflate(6, 15, 8)
+    shared = SharedMessage(message("stream", {"text": "hello " * 100}))
+    assert shared.deflated(deflate) is shared.deflated(deflate)
+
+    # Browsers keep their decompression context from one message to the next:
+    decompressor = zlib.decompressobj(-15)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15, 8)
+    for data in (
+        compressor.compress(b"x" * 1000) + compressor.flush(zlib.Z_SYNC_FLUSH),
+        shared.deflated(deflate) + b"\x00\x00\xff\xff",
+    ):
+        result = decompressor.decompress(data)
+    assert json.loads(result) == shared.msg
+
+
+def test_messages_with_buffers_are_binary():
+    msg = message(MessageTypes.SHEET_UPDATE.value, {"cellUpdates": []})
+    shared = SharedMessage({**msg, "buffers": [b"\x00" * 8, memoryview(b"abc")]})
+    assert websocket_fanout.deserialize_binary_message(shared.data) == {
+        **msg,
+        "buffers": [b"\x00" * 8, b"abc"],
+    }
+    assert shared.frame(None)[0] == 0x82
+    assert shared.frame(Deflate(6, 15, 8))[0] == 0xC2
+
+    plain = SharedMessage({**msg, "buffers": []})
+    assert json.loads(plain.data) == {**msg, "buffers": []}
+    assert plain.frame(None)[0] == 0x81
+
+
+class FakeStream:
+    def __init__(self) -> None:
+        self.written: list[bytes] = []
+        self.futures: list[asyncio.Future] = []
+
+    def write(self, data: bytes) -> asyncio.Future:
+        self.written.append(data)
+        self.futures.append(asyncio.get_running_loop().create_future())
+        return self.futures[-1]
+
+
+class FakeConnection:
+    _compressor = None
+
+    def __init__(self) -> None:
+        self.stream = FakeStream()
+
+
+def cells_sent(stream: FakeStream) -> list:
+    data = b"".join(stream.written)
+    messages = []
+    while data:
+        length, start = data[1], 2
+        if length == 126:
+            length, start = int.from_bytes(data[2:4], "big"), 4
+        messages.append(json.loads(data[start : start + length]))
+        data = data[start + length :]
+    return [msg["content"].get("cellUpdates") for msg in messages]
+
+
+@pytest.mark.asyncio
+async def test_send_queue_coalesces_and_drops_superseded(monkeypatch):
+    monkeypatch.setattr(websocket_fanout, "MAX_PENDING_BYTES", 0)
+    connection = FakeConnection()
+    queue = SendQueue(connection, lambda: None)  # type: ignore
+
+    queue.put(sheet_update([[0, 0, 0], 1], [[1, 0, 0], 1]))
+    queue.put(SharedMessage(message("stream", {})))
+    await asyncio.sleep(websocket_fanout.COALESCE_SECONDS * 2)
+    # Both went out in one write:
+    assert len(connection.stream.written) == 1
+    assert cells_sent(connection.stream) == [[[[0, 0, 0], 1], [[1, 0, 0], 1]], None]
+
+    # The client hasn't read that yet, so these wait:
+    queue.put(sheet_update([[0, 0, 0], 2], [[1, 0, 0], 2]))
+    queue.put(sheet_update([[0, 0, 0], 3], metadata={"undo": {}}))
+    queue.put(SharedMessage(message("stream", {})))
+    queue.put(sheet_update([[1, 0, 0], 3]))
+    queue.put(sheet_update([[0, 0, 0], 4]))
+    await asyncio.sleep(websocket_fanout.COALESCE_SECONDS * 2)
+    assert len(connection.stream.written) == 1
+
+    connection.stream.futures[0].set_result(None)
+    await asyncio.sleep(0)
+    assert cells_sent(connection.stream)[2:] == [
+        # The undo of an update is kept when its cells are not:
+        [],
+        None,
+        [[[1, 0, 0], 3]],
+        [[[0, 0, 0], 4]],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_send_queue_closes_clients_that_fall_too_far_behind(monkeypatch):
+    monkeypatch.setattr(websocket_fanout, "MAX_PENDING_BYTES", 0)
+    monkeypatch.setattr(websocket_fanout, "MAX_QUEUED_BYTES", 1000)
+    closed = []
+    connection = FakeConnection()
+    queue = SendQueue(connection, lambda: closed.append(True))  # type: ignore
+    queue.put(SharedMessage(message("stream", {})))
+    await asyncio.sleep(websocket_fanout.COALESCE_SECONDS * 2)
+    for i in range(20):
+        queue.put(SharedMessage(message("stream", {"text": f"{i}" * 50})))
+    assert closed == [True]
+    assert queue.queue == []
+
+
+class FanoutHandler(tornado.websocket.WebSocketHandler):
+    send_queue: SendQueue
+
+    def get_compression_options(self) -> dict:
+        return {}
+
+    def open(self) -> None:
+        self.send_queue = SendQueue(self.ws_connection, self.close)  # type: ignore
+
+    def write_message(self, message, binary=False):  # type: ignore
+        self.send_queue.flush(force=True)
+        return super().write_message(message, binary=binary)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("raw_frames", [True, False])
+async def test_shared_messages_reach_compressed_websockets(monkeypatch, raw_frames):
+    if not raw_frames:
+        # As with a version of Tornado whose internals aren't known:
+        monkeypatch.setattr(websocket_fanout, "RAW_FRAME_TORNADO_VERSIONS", set())
+    handlers: list[FanoutHandler] = []
+    first_bytes: list[int] = []
+
+    class Handler(FanoutHandler):
+        def open(self) -> None:
+            super().open()
+            stream = self.ws_connection.stream  # type: ignore
+            write = stream.write
+
+            def recording_write(data: bytes) -> asyncio.Future:
+                first_bytes.append(data[0])
+                return write(data)
+
+            stream.write = recording_write
+            handlers.append(self)
+
+    sock, port = bind_unused_port()
+    server = HTTPServer(tornado.web.Application([("/ws", Handler)]))
+    server.add_sockets([sock])
+    clients = [
+        await tornado.websocket.websocket_connect(
+            f"ws://127.0.0.1:{port}/ws", compression_options={}
+        )
+        for _ in range(2)
+    ]
+    while len(handlers) < 2:
+        await asyncio.sleep(0.01)
+    try:
+        assert all(handler.send_queue.raw_frames == raw_frames for handler in handlers)
+        update = message(MessageTypes.SHEET_UPDATE.value, {"cellUpdates": []})
+        messages = [
+            *(
+                SharedMessage(message("stream", {"text": f"line {i} " * 20}))
+                for i in range(5)
+            ),
+            SharedMessage({**update, "buffers": [b"\x01" * 64]}),
+        ]
+        for shared in messages:
+            for handler in handlers:
+                handler.send_queue.put(shared)
+        # Written by Tornado itself, after the queued ones:
+        for handler in handlers:
+            handler.write_message(json.dumps(message("status", {"text": "done"})))
+        for client in clients:
+            received = [await client.read_message() for _ in range(7)]
+            assert [json.loads(data) for data in received[:5]] == [
+                shared.msg for shared in messages[:5]
+            ]
+            assert isinstance(received[5], bytes)
+            assert websocket_fanout.deserialize_binary_message(received[5]) == {
+                **update,
+                "buffers": [b"\x01" * 64],
+            }
+            assert json.loads(received[6]) == message("status", {"text": "done"})
+        # Every frame went out compressed:
+        assert first_bytes and all(byte & websocket_fanout.RSV1 for byte in first_bytes)
+        # Compressed once for both, when the queue writes the frames itself:
+        assert all(
+            len(shared._deflated) == (1 if raw_frames else 0) for shared in messages
+        )
+    finally:
+        for client in clients:
+            client.close()
+        server.stop()